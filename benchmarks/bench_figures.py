@@ -0,0 +1,42 @@
+"""Benchmarks for figure rendering."""
+
+import shutil
+import tempfile
+from pathlib import Path
+
+from benchmarks.payloads import SCALES, panel_arrays
+from scripts.utils.plotting import FigureSpec, draw_lines, draw_scatter, render
+
+
+class RenderFigure:
+    """Render a line chart and a scatter plot, including LTTB downsampling."""
+
+    params = SCALES
+    param_names = ["scale"]
+
+    def setup(self, scale):
+        panel = panel_arrays(scale)
+        self.tmp = Path(tempfile.mkdtemp())
+        x = panel.index.values
+        self.lines = FigureSpec(
+            self.tmp / "lines.png",
+            draw_lines,
+            {"series": [{"x": x, "y": panel[col].values, "label": col}
+                        for col in ("log_mcap", "DGS10")]},
+            {"title": "Market cap and 10Y yield", "legend": True},
+        )
+        self.scatter = FigureSpec(
+            self.tmp / "scatter.png",
+            draw_scatter,
+            {"x": panel["d_log_mcap"].values, "y": panel["DGS10"].diff().values,
+             "kw": {"alpha": 0.3}},
+        )
+
+    def teardown(self, scale):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def time_render_lines(self, scale):
+        render(self.lines)
+
+    def time_render_scatter(self, scale):
+        render(self.scatter)
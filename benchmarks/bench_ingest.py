@@ -0,0 +1,51 @@
+"""Benchmarks for parsing DefiLlama and FRED payloads."""
+
+from benchmarks.payloads import (
+    SCALES,
+    defillama_aggregate,
+    defillama_token,
+    fred_observations,
+)
+from scripts.ingest.fetch_stablecoin_caps import process_stablecoin_data
+from scripts.ingest.fetch_stablecoin_panel import parse_token_history
+from scripts.utils.fred_api import combine_series, observations_to_frame
+
+
+class ProcessStablecoinData:
+    """Aggregate ``/stablecoincharts/all`` payload to a DataFrame."""
+
+    params = SCALES
+    param_names = ["scale"]
+
+    def setup(self, scale):
+        self.raw = defillama_aggregate(scale)
+
+    def time_process(self, scale):
+        process_stablecoin_data(self.raw, "2018-01-01", "2026-01-01")
+
+
+class ParseTokenHistory:
+    """Streaming parse of a per-token ``/stablecoin/{id}`` payload."""
+
+    # The 100x payload is 150 MB of JSON and takes minutes to build and parse
+    params = SCALES[:2]
+    param_names = ["scale"]
+
+    def setup(self, scale):
+        self.raw = defillama_token(scale)
+
+    def time_parse(self, scale):
+        parse_token_history(self.raw)
+
+
+class CombineTreasurySeries:
+    """FRED observations to one date-indexed frame with spreads."""
+
+    params = SCALES
+    param_names = ["scale"]
+
+    def setup(self, scale):
+        self.payloads = fred_observations(scale)
+
+    def time_combine(self, scale):
+        combine_series([observations_to_frame(sid, data) for sid, data in self.payloads.items()])
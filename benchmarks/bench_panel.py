@@ -0,0 +1,26 @@
+"""Benchmarks for building the daily analysis panel."""
+
+from benchmarks.payloads import SCALES, defillama_aggregate, fred_observations
+from scripts.ingest.fetch_stablecoin_caps import process_stablecoin_data
+from scripts.panel import build_panel
+from scripts.utils.fred_api import combine_series, observations_to_frame
+
+
+class BuildPanel:
+    """Daily calendar merge of stablecoin caps and Treasury yields.
+
+    Above scale 1 the caps are intraday snapshots, so the merge also has to
+    normalise and de-duplicate them to one row per day.
+    """
+
+    params = SCALES
+    param_names = ["scale"]
+
+    def setup(self, scale):
+        self.caps = process_stablecoin_data(defillama_aggregate(scale))
+        self.yields = combine_series(
+            [observations_to_frame(sid, data) for sid, data in fred_observations().items()]
+        )
+
+    def time_build_panel(self, scale):
+        build_panel(self.caps, self.yields)
@@ -0,0 +1,77 @@
+"""Benchmarks for the correlation, Granger and VAR kernels."""
+
+from benchmarks.payloads import MCAP_COLUMNS, SCALES, YIELD_COLUMNS, panel_arrays
+from scripts.stats.extremes import extreme_grid
+from scripts.stats.granger import granger_table
+from scripts.stats.rolling import rolling_corr
+from scripts.stats.summary import summarise
+from scripts.stats.var_irf import bootstrap_irf, fit_var, select_order
+from scripts.stats.var_rolling import var_path
+from scripts.stats.xcorr import lagged_xcorr
+
+VAR_COLUMNS = ["d_log_mcap", "DGS10", "10Y-2Y"]
+
+
+class _Panel:
+    """Synthetic panel of ``scale`` times the real number of days."""
+
+    params = SCALES
+    param_names = ["scale"]
+
+    def setup(self, scale):
+        self.panel = panel_arrays(scale)
+        self.changes = self.panel.diff()
+        self.Y = self.changes[VAR_COLUMNS].dropna().values
+
+
+class RollingCorr(_Panel):
+    def time_rolling_corr(self, scale):
+        rolling_corr(self.panel["log_mcap"].values, self.panel[YIELD_COLUMNS].values)
+
+
+class LaggedXcorr(_Panel):
+    def time_lagged_xcorr(self, scale):
+        lagged_xcorr(self.changes[MCAP_COLUMNS].values, self.changes[YIELD_COLUMNS].values)
+
+
+class ExtremeGrid(_Panel):
+    # Each permutation is a pass over the whole grid, so 100x would take minutes
+    params = SCALES[:2]
+
+    def time_extreme_grid(self, scale):
+        extreme_grid(self.changes[YIELD_COLUMNS].values, self.panel["log_mcap"].values,
+                     permutations=100)
+
+
+class Summarise(_Panel):
+    def time_summarise_chunks(self, scale):
+        summarise(self.panel.iloc[i:i + 4096] for i in range(0, len(self.panel), 4096))
+
+
+class GrangerTable(_Panel):
+    def time_granger_table(self, scale):
+        granger_table(self.changes, MCAP_COLUMNS[1:], YIELD_COLUMNS)
+
+
+class VarFit(_Panel):
+    def time_fit_var(self, scale):
+        fit_var(self.Y, 5)
+
+    def time_select_order(self, scale):
+        select_order(self.Y)
+
+
+class BootstrapIRF(_Panel):
+    # Each replication refits the VAR, so 100x would take minutes
+    params = SCALES[:2]
+
+    def time_bootstrap_irf(self, scale):
+        bootstrap_irf(self.Y, 2, replications=200)
+
+
+class VarPath(_Panel):
+    # One rank-one update and downdate per day, in Python
+    params = SCALES[:2]
+
+    def time_rolling_var_path(self, scale):
+        var_path(self.Y, 5, window=250)
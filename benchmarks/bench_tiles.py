@@ -0,0 +1,47 @@
+"""Benchmarks for the dashboard's tile rollups and range queries."""
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.payloads import REAL_CHAINS, REAL_DAYS, SCALES, SEED, panel_arrays
+from scripts.tiles import TileStore, build_tiles
+
+
+def daily_series(scale: int) -> pd.DataFrame:
+    """The panel's series from 2018 on, plus ``REAL_CHAINS * scale`` token caps."""
+    panel = panel_arrays()
+    panel.index = pd.date_range("2018-01-01", periods=REAL_DAYS, freq="D", name="date")
+    rng = np.random.default_rng(SEED)
+    tokens = np.exp(np.cumsum(rng.normal(0.0, 0.01, (REAL_DAYS, REAL_CHAINS * scale)), axis=0))
+    return panel.join(pd.DataFrame(tokens, index=panel.index).add_prefix("token:"))
+
+
+class BuildTiles:
+    """Daily, weekly and monthly rollups of every series."""
+
+    params = SCALES
+    param_names = ["scale"]
+
+    def setup(self, scale):
+        self.daily = daily_series(scale)
+
+    def time_build_tiles(self, scale):
+        build_tiles(self.daily)
+
+
+class QueryTiles:
+    """Uncached range queries, as on a dashboard zoom, over the full history."""
+
+    params = SCALES
+    param_names = ["scale"]
+
+    def setup(self, scale):
+        self.store = TileStore(build_tiles(daily_series(scale)))
+
+    def time_query_full_range(self, scale):
+        self.store.query.cache_clear()
+        self.store.query("token:0", max_points=1000)
+
+    def time_query_zoomed(self, scale):
+        self.store.query.cache_clear()
+        self.store.query("DGS10", "2021-02-03", "2022-11-30", max_points=1000)
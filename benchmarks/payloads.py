@@ -0,0 +1,164 @@
+"""Synthetic DefiLlama and FRED payloads for the benchmark suite.
+
+Each generator returns a payload shaped like the real API response at
+``scale`` times its real size, with a fixed seed so every run times the same
+work. Scale 1 matches the live endpoints as of this writing:
+
+* ``/stablecoincharts/all``: one entry per day since late 2017
+  (``REAL_DAYS``). Larger scales sample the same calendar span more densely,
+  so the timestamps stay inside the range ``pandas`` can represent.
+* ``/stablecoin/{id}``: ``REAL_CHAINS`` chains of ``REAL_TOKEN_DAYS`` daily
+  balances. Larger scales add chains, as the widest tokens already span
+  hundreds of them.
+* FRED ``series/observations``: ``REAL_FRED_SERIES`` series of business-day
+  observations since 2018, with ``"."`` on holidays. Larger scales add series.
+
+``panel_arrays`` builds the equivalent daily panel for the statistics
+kernels, where only the number of rows matters.
+
+Example:
+    >>> from benchmarks.payloads import defillama_aggregate
+    >>> from scripts.ingest.fetch_stablecoin_caps import process_stablecoin_data
+    >>> df = process_stablecoin_data(defillama_aggregate(scale=10))
+"""
+
+import json
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+# Constants
+SCALES = (1, 10, 100)
+SEED = 0
+DAY = 86400
+T0 = 1511913600  # 2017-11-29, first day of the aggregate chart
+REAL_DAYS = 2900
+REAL_CHAINS = 10
+REAL_TOKEN_DAYS = 1500
+REAL_FRED_SERIES = 6
+FRED_START = "2018-01-01"
+FRED_END = "2026-10-16"
+FRED_SERIES = ["DGS3MO", "DGS1", "DGS2", "DGS5", "DGS10", "DGS30"]
+MCAP_COLUMNS = ["log_mcap", "d_log_mcap", "usdt_share"]
+YIELD_COLUMNS = ["DGS3MO", "DGS1", "DGS2", "DGS5", "DGS10", "DGS30", "10Y-2Y", "10Y-3M"]
+
+
+def _walk(rng: np.random.Generator, n: int, start: float, scale: float) -> np.ndarray:
+    """Positive geometric random walk."""
+    return start * np.exp(np.cumsum(rng.normal(0.0, scale, n)))
+
+
+def defillama_aggregate(scale: int = 1, seed: int = SEED) -> List[Dict]:
+    """Payload of the aggregate ``/stablecoincharts/all`` endpoint.
+
+    Args:
+        scale: Multiple of the real number of entries
+        seed: Random seed
+
+    Returns:
+        List of daily (or, above scale 1, intraday) entries
+    """
+    rng = np.random.default_rng(seed)
+    n = REAL_DAYS * scale
+    dates = T0 + np.arange(n) * (DAY // scale)
+    supply = _walk(rng, n, 5e9, 0.01 / np.sqrt(scale))
+    usd = supply * (1 + rng.normal(0.0, 1e-3, n))
+    return [
+        {
+            "date": str(date),
+            "totalCirculating": {"peggedUSD": s, "peggedEUR": s * 1e-3},
+            "totalCirculatingUSD": {"peggedUSD": u, "peggedEUR": u * 1e-3},
+        }
+        for date, s, u in zip(dates.tolist(), supply.tolist(), usd.tolist())
+    ]
+
+
+def defillama_token(scale: int = 1, symbol: str = "USDT", seed: int = SEED) -> bytes:
+    """Raw JSON payload of the per-token ``/stablecoin/{id}`` endpoint.
+
+    Args:
+        scale: Multiple of the real number of chains
+        symbol: Token symbol
+        seed: Random seed
+
+    Returns:
+        UTF-8 encoded JSON, as ``parse_token_history`` reads it off the wire
+    """
+    rng = np.random.default_rng(seed)
+    dates = (T0 + np.arange(REAL_TOKEN_DAYS) * DAY).tolist()
+    chains = {}
+    for c in range(REAL_CHAINS * scale):
+        values = _walk(rng, REAL_TOKEN_DAYS, 1e8, 0.02).tolist()
+        chains[f"Chain{c}"] = {
+            "tokens": [
+                {"date": d, "circulating": {"peggedUSD": v}, "bridgedTo": {"peggedUSD": 0.0}}
+                for d, v in zip(dates, values)
+            ]
+        }
+    payload = {
+        "id": "1",
+        "symbol": symbol,
+        "pegType": "peggedUSD",
+        "tokens": [{"date": dates[-1], "circulating": {"peggedUSD": 0.0}}],
+        "chainBalances": chains,
+    }
+    return json.dumps(payload).encode()
+
+
+def fred_observations(
+    scale: int = 1, end_date: str = FRED_END, seed: int = SEED
+) -> Dict[str, Dict]:
+    """Payloads of the FRED ``series/observations`` endpoint, one per series.
+
+    Args:
+        scale: Multiple of the real number of series
+        end_date: Last observation date
+        seed: Random seed
+
+    Returns:
+        Mapping of series ID to parsed JSON response
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(FRED_START, end_date).strftime("%Y-%m-%d").tolist()
+    payloads = {}
+    for i in range(REAL_FRED_SERIES * scale):
+        base = FRED_SERIES[i % len(FRED_SERIES)]
+        series_id = base if i < len(FRED_SERIES) else f"{base}_{i // len(FRED_SERIES)}"
+        values = 2.0 + np.cumsum(rng.normal(0.0, 0.03, len(dates)))
+        holidays = rng.random(len(dates)) < 0.04
+        payloads[series_id] = {
+            "observations": [
+                {"date": d, "value": "." if h else f"{v:.2f}"}
+                for d, v, h in zip(dates, values.tolist(), holidays.tolist())
+            ]
+        }
+    return payloads
+
+
+def panel_arrays(scale: int = 1, seed: int = SEED) -> pd.DataFrame:
+    """Daily panel with the columns the statistics kernels use.
+
+    Args:
+        scale: Multiple of the real number of days
+        seed: Random seed
+
+    Returns:
+        DataFrame with ``MCAP_COLUMNS`` and ``YIELD_COLUMNS`` on a RangeIndex;
+        yields are missing on weekends, as in the real panel
+    """
+    rng = np.random.default_rng(seed)
+    n = REAL_DAYS * scale
+    d_log_mcap = rng.normal(0.0, 0.01, n)
+    data = {
+        "log_mcap": 22.0 + np.cumsum(d_log_mcap),
+        "d_log_mcap": d_log_mcap,
+        "usdt_share": 0.6 + 0.01 * np.cumsum(rng.normal(0.0, 0.1, n)) / np.sqrt(n),
+    }
+    weekend = np.arange(n) % 7 >= 5
+    # Lagged mcap changes feed into yields so the Granger and VAR fits find something
+    shock = np.r_[np.zeros(2), d_log_mcap[:-2]]
+    for col in YIELD_COLUMNS:
+        changes = rng.normal(0.0, 0.03, n) + 0.5 * shock
+        data[col] = np.where(weekend, np.nan, 2.0 + np.cumsum(changes))
+    return pd.DataFrame(data)
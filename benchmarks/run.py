@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""Run the benchmark suite and compare the timings with a stored baseline.
+
+Benchmarks follow the asv layout: each ``benchmarks/bench_*.py`` module holds
+classes with ``time_*`` methods, a ``params`` tuple of payload scales (see
+``benchmarks.payloads``) and optional ``setup``/``teardown`` methods that take
+the same parameter. Setup is not timed. Each benchmark is run once to warm
+up, then in samples of enough calls to last ``MIN_SAMPLE_TIME``, and the
+fastest per-call time is kept, as ``timeit`` recommends.
+
+The baseline records the timings together with the machine they were taken
+on. A benchmark more than ``--tolerance`` times slower than its baseline is a
+regression and makes the run exit with status 1, so ``make bench`` can gate
+CI. Timings only compare on the same kind of machine: refresh the baseline
+with ``--save`` when the runner changes.
+
+Example:
+    $ python -m benchmarks.run                       # compare with baseline.json
+    $ python -m benchmarks.run --filter Granger --scales 1 10
+    $ python -m benchmarks.run --save                # record a new baseline
+"""
+
+import argparse
+import gc
+import importlib
+import inspect
+import json
+import logging
+import os
+import platform
+import re
+import sys
+import time
+import warnings
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Constants
+BENCH_DIR = Path(__file__).resolve().parent
+BASELINE_FILE = BENCH_DIR / "baseline.json"
+DEFAULT_TOLERANCE = 1.5
+MIN_SAMPLE_TIME = 0.05
+MAX_TIME = 2.0
+REPEAT = 5
+
+
+class Benchmark(NamedTuple):
+    """One benchmark method at one parameter value."""
+
+    name: str
+    cls: type
+    method: str
+    param: Any
+
+
+class Comparison(NamedTuple):
+    """Timing of one benchmark against its baseline."""
+
+    name: str
+    baseline: Optional[float]
+    current: float
+    ratio: Optional[float]
+    status: str
+
+
+def discover(
+    pattern: Optional[str] = None, scales: Optional[Sequence[int]] = None
+) -> List[Benchmark]:
+    """Collect the benchmarks in ``benchmarks/bench_*.py``.
+
+    Args:
+        pattern: Regular expression a benchmark name must contain
+        scales: Only keep these parameter values
+
+    Returns:
+        Benchmarks named ``module.Class.method(param)``, in file order
+    """
+    benchmarks = []
+    for path in sorted(BENCH_DIR.glob("bench_*.py")):
+        module = importlib.import_module(f"benchmarks.{path.stem}")
+        for cls_name, cls in inspect.getmembers(module, inspect.isclass):
+            if cls.__module__ != module.__name__ or cls_name.startswith("_"):
+                continue
+            methods = [m for m in dir(cls) if m.startswith("time_")]
+            for method in methods:
+                for param in getattr(cls, "params", (None,)):
+                    if scales is not None and param not in scales:
+                        continue
+                    name = f"{path.stem}.{cls_name}.{method}({param})"
+                    if pattern is None or re.search(pattern, name):
+                        benchmarks.append(Benchmark(name, cls, method, param))
+    return benchmarks
+
+
+def time_benchmark(bench: Benchmark) -> float:
+    """Time one benchmark.
+
+    Args:
+        bench: Benchmark to run
+
+    Returns:
+        Fastest per-call time in seconds
+    """
+    instance = bench.cls()
+    if hasattr(instance, "setup"):
+        instance.setup(bench.param)
+    func = getattr(instance, bench.method)
+    gc_enabled = gc.isenabled()
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            start = time.perf_counter()
+            func(bench.param)
+            first = time.perf_counter() - start
+            # A single call that already fills the budget is its own sample
+            if first >= MAX_TIME:
+                return first
+            number = max(1, int(MIN_SAMPLE_TIME / max(first, 1e-9)))
+            samples: List[float] = []
+            spent = first
+            gc.disable()
+            while len(samples) < REPEAT and (not samples or spent < MAX_TIME):
+                start = time.perf_counter()
+                for _ in range(number):
+                    func(bench.param)
+                elapsed = time.perf_counter() - start
+                samples.append(elapsed / number)
+                spent += elapsed
+            return min(samples)
+    finally:
+        if gc_enabled:
+            gc.enable()
+        if hasattr(instance, "teardown"):
+            instance.teardown(bench.param)
+
+
+def machine_info() -> Dict[str, Any]:
+    """Describe the machine and the library versions the timings depend on."""
+    import numpy as np
+    import pandas as pd
+
+    return {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+
+def read_baseline(path: Path = BASELINE_FILE) -> Dict[str, Any]:
+    """Read a stored baseline, or an empty one if there is none."""
+    if not path.exists():
+        return {"machine": {}, "results": {}}
+    return json.loads(path.read_text())
+
+
+def write_baseline(
+    results: Dict[str, float], path: Path = BASELINE_FILE, merge: bool = True
+) -> Path:
+    """Store timings as the new baseline.
+
+    Args:
+        results: Benchmark name to seconds
+        path: Baseline file
+        merge: Keep stored timings of benchmarks that were not run
+
+    Returns:
+        Path of the written file
+    """
+    stored = read_baseline(path)["results"] if merge else {}
+    stored.update(results)
+    baseline = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "machine": machine_info(),
+        "results": dict(sorted(stored.items())),
+    }
+    path.write_text(json.dumps(baseline, indent=2) + "\n")
+    return path
+
+
+def compare(
+    results: Dict[str, float],
+    baseline: Dict[str, float],
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> List[Comparison]:
+    """Compare timings with their baseline.
+
+    Args:
+        results: Benchmark name to seconds for this run
+        baseline: Benchmark name to seconds from the baseline
+        tolerance: Slowdown factor above which a benchmark has regressed;
+            a speed-up by the same factor is reported as an improvement
+
+    Returns:
+        One comparison per benchmark in ``results``, with status ``ok``,
+        ``regressed``, ``improved`` or ``new``
+    """
+    rows = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            rows.append(Comparison(name, None, current, None, "new"))
+            continue
+        ratio = current / base if base > 0 else float("inf")
+        if ratio > tolerance:
+            status = "regressed"
+        elif ratio < 1 / tolerance:
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append(Comparison(name, base, current, ratio, status))
+    return rows
+
+
+def format_seconds(seconds: Optional[float]) -> str:
+    """Format a duration with a unit that keeps three significant digits."""
+    if seconds is None:
+        return "-"
+    for unit, factor in (("s", 1.0), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= factor:
+            return f"{seconds / factor:.3g}{unit}"
+    return f"{seconds / 1e-9:.3g}ns"
+
+
+def print_table(rows: Sequence[Comparison]) -> None:
+    """Print comparisons as an aligned table."""
+    width = max([len(row.name) for row in rows] + [9])
+    print(f"{'benchmark':<{width}}  {'baseline':>9}  {'current':>9}  {'ratio':>6}  status")
+    for row in rows:
+        ratio = "-" if row.ratio is None else f"{row.ratio:.2f}"
+        print(f"{row.name:<{width}}  {format_seconds(row.baseline):>9}  "
+              f"{format_seconds(row.current):>9}  {ratio:>6}  {row.status}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the benchmark suite")
+    parser.add_argument("--filter", help="Only run benchmarks whose name matches this regex")
+    parser.add_argument("--scales", type=int, nargs="+", help="Only run these payload scales")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE, help="Baseline file")
+    parser.add_argument("--save", action="store_true",
+                        help="Store the timings as the new baseline instead of failing")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Slowdown factor that counts as a regression")
+    parser.add_argument("--list", action="store_true", help="List the benchmarks and exit")
+    args = parser.parse_args()
+
+    benchmarks = discover(args.filter, args.scales)
+    if args.list:
+        print("\n".join(bench.name for bench in benchmarks))
+        sys.exit(0)
+    if not benchmarks:
+        parser.error("no benchmarks match")
+
+    results = {}
+    for bench in benchmarks:
+        results[bench.name] = time_benchmark(bench)
+        logger.info(f"{bench.name}: {format_seconds(results[bench.name])}")
+
+    baseline = read_baseline(args.baseline)
+    rows = compare(results, baseline["results"], args.tolerance)
+    print_table(rows)
+
+    if args.save:
+        logger.info(f"Saved baseline to {write_baseline(results, args.baseline)}")
+        sys.exit(0)
+    if baseline["machine"] and baseline["machine"] != machine_info():
+        logger.warning("Baseline was recorded on a different machine or library versions; "
+                       "timings may not be comparable")
+    regressed = [row.name for row in rows if row.status == "regressed"]
+    if regressed:
+        logger.error(f"{len(regressed)} benchmark(s) slower than {args.tolerance}x baseline: "
+                     + ", ".join(regressed))
+        sys.exit(1)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""Plotly Dash dashboard of stablecoin market caps, yields, spreads and correlations.
+
+The app never touches the raw datasets. It serves every chart from the
+pre-aggregated tiles of ``scripts.tiles``, which are rebuilt at start-up only
+if the panel or token panel changed. Each zoom or pan is one cached
+``TileStore.query`` per series: the browser reports its width, and the query
+returns at most that many points, at the finest resolution that fits and with
+a min/max band where buckets merge days.
+
+Needs ``dash`` (``pip install -e ".[dashboard]"``).
+
+Example:
+    $ python -m dashboard.app                 # http://127.0.0.1:8050
+    $ python -m dashboard.app --port 8080 --debug
+"""
+
+import argparse
+import logging
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from scripts.tiles import DEFAULT_MAX_POINTS, RESOLUTIONS, TileStore, ensure_tiles
+
+if TYPE_CHECKING:
+    import dash
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_SERIES = ["mcap", "DGS10", "10Y-2Y"]
+# Upper bound on the points per series, whatever width the browser reports
+MAX_POINTS = 4000
+# Series in USD go on the right axis, rates and correlations on the left
+USD_PREFIXES = ("mcap", "token:")
+
+
+def to_day(value: Optional[str]) -> Optional[str]:
+    """Round a Plotly axis value to its day, so nearby ranges share cache entries."""
+    if value is None:
+        return None
+    return pd.Timestamp(value).strftime("%Y-%m-%d")
+
+
+def axis_range(relayout: Optional[Dict]) -> Tuple[Optional[str], Optional[str]]:
+    """The x-axis range of a ``relayoutData`` event, rounded to days.
+
+    Args:
+        relayout: Plotly relayout data; None before the first interaction
+
+    Returns:
+        (start, end), or (None, None) for the full range
+    """
+    if not relayout or relayout.get("xaxis.autorange"):
+        return None, None
+    if "xaxis.range" in relayout:
+        start, end = relayout["xaxis.range"]
+    else:
+        start, end = relayout.get("xaxis.range[0]"), relayout.get("xaxis.range[1]")
+    return to_day(start), to_day(end)
+
+
+def point_budget(width: Optional[int]) -> int:
+    """Points per series for a chart ``width`` pixels wide."""
+    return min(int(width or DEFAULT_MAX_POINTS), MAX_POINTS)
+
+
+def figure(
+    store: TileStore,
+    series: Sequence[str],
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    resolution: str = "auto",
+    max_points: int = DEFAULT_MAX_POINTS,
+) -> Dict:
+    """Plotly figure of ``series`` over a date range, served from the tiles.
+
+    Args:
+        store: Loaded tiles
+        series: Series names, see ``TileStore.series``
+        start: First date; the start of the data if None
+        end: Last date; the end of the data if None
+        resolution: Tile resolution or ``auto``
+        max_points: Most points per series
+
+    Returns:
+        Figure as a dict of traces and layout
+    """
+    traces: List[Dict] = []
+    resolutions = set()
+    for name in series:
+        window = store.query(name, start, end, resolution, max_points)
+        resolutions.add(window.resolution)
+        yaxis = "y2" if name.startswith(USD_PREFIXES) else "y"
+        if window.resolution != store.resolutions[0]:
+            # Band of each bucket's min and max, drawn under the line
+            band = {"x": window.dates, "mode": "lines", "line": {"width": 0},
+                    "hoverinfo": "skip", "showlegend": False, "yaxis": yaxis,
+                    "legendgroup": name}
+            traces.append({**band, "y": window.high})
+            traces.append({**band, "y": window.low, "fill": "tonexty", "opacity": 0.2})
+        traces.append({"x": window.dates, "y": window.values, "mode": "lines", "name": name,
+                       "yaxis": yaxis, "legendgroup": name})
+
+    xaxis: Dict = {"type": "date", "rangeslider": {"visible": False}}
+    if start is not None and end is not None:
+        xaxis["range"] = [start, end]
+    return {
+        "data": traces,
+        "layout": {
+            "title": {"text": f"Resolution: {', '.join(sorted(resolutions)) or '-'}"},
+            "xaxis": xaxis,
+            "yaxis": {"title": {"text": "Rate / correlation"}},
+            "yaxis2": {"title": {"text": "USD"}, "overlaying": "y", "side": "right"},
+            "legend": {"orientation": "h"},
+            # Keep the user's zoom when the figure is replaced
+            "uirevision": "tiles",
+            "margin": {"l": 60, "r": 60, "t": 40, "b": 40},
+        },
+    }
+
+
+def create_app(store: TileStore) -> "dash.Dash":
+    """Dash app with a series picker, a resolution switch and one chart.
+
+    Args:
+        store: Loaded tiles
+
+    Returns:
+        The app, ready to ``run``
+    """
+    from dash import Dash, Input, Output, dcc, html
+
+    app = Dash(__name__, title="Stablecoin reserve shock")
+    app.layout = html.Div(
+        [
+            html.Div(
+                [
+                    dcc.Dropdown(
+                        id="series",
+                        options=store.series,
+                        value=[name for name in DEFAULT_SERIES if name in store.series],
+                        multi=True,
+                        style={"flex": "1"},
+                    ),
+                    dcc.RadioItems(
+                        id="resolution",
+                        options=["auto", *RESOLUTIONS],
+                        value="auto",
+                        inline=True,
+                    ),
+                ],
+                style={"display": "flex", "gap": "1em", "alignItems": "center"},
+            ),
+            dcc.Graph(id="chart", style={"height": "80vh"}),
+            dcc.Store(id="width"),
+        ]
+    )
+
+    # The browser reports its width once, so the server knows how many points fit
+    app.clientside_callback(
+        "function(_) { return window.innerWidth; }",
+        Output("width", "data"),
+        Input("chart", "id"),
+    )
+
+    @app.callback(
+        Output("chart", "figure"),
+        Input("series", "value"),
+        Input("resolution", "value"),
+        Input("chart", "relayoutData"),
+        Input("width", "data"),
+    )
+    def update_chart(series, resolution, relayout, width):
+        start, end = axis_range(relayout)
+        return figure(store, series or [], start, end, resolution, point_budget(width))
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stablecoin and Treasury dashboard")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8050, help="Port to listen on")
+    parser.add_argument("--debug", action="store_true", help="Dash debug mode with hot reload")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the tiles first")
+    args = parser.parse_args()
+
+    store = TileStore.load(ensure_tiles(force=args.rebuild))
+    logger.info(f"Loaded {len(store.series)} series from {store.bounds()[0].date()} "
+                f"to {store.bounds()[1].date()}")
+    create_app(store).run(host=args.host, port=args.port, debug=args.debug)
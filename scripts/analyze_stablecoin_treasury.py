@@ -6,230 +6,289 @@ Saves plots to figures/ and outputs a text report with key findings.
 """
 import os
 from pathlib import Path
-import pandas as pd
-import matplotlib.pyplot as plt
+from typing import Optional
+
 import numpy as np
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import PolynomialFeatures
-from statsmodels.regression.linear_model import OLS
-from statsmodels.tools import add_constant
+import pandas as pd
+
+from scripts.panel import SPREAD_COLUMNS, YIELD_COLUMNS, load_panel
+from scripts.stats.extremes import (
+    extreme_masks,
+    extreme_responses,
+    forward_changes,
+    plot_extreme_grid,
+)
+from scripts.stats.regression import design, nonlinear_fits, threshold_scan
+from scripts.stats.rolling import rolling_corr
+from scripts.stats.xcorr import lag_profile, peak_lags, plot_xcorr_heatmap, xcorr_frame
+from scripts.utils.plotting import FigureSpec, draw_hist, draw_lines, draw_scatter, render_all
 
 # Directories and files
-RAW_DIR = Path("data/raw")
 FIG_DIR = Path("figures")
 REPORT_FILE = Path("figures/analysis_report.txt")
-STABLECOIN_FILE = RAW_DIR / "stablecoin_caps.parq"
-TREASURY_FILE = RAW_DIR / "treasury_yields.parq"
-
-# Ensure figures directory exists
-FIG_DIR.mkdir(parents=True, exist_ok=True)
-
-# Load data
-stablecoins = pd.read_parquet(STABLECOIN_FILE)
-treasury = pd.read_parquet(TREASURY_FILE)
-
-# Preprocess stablecoin data
-df_stable = stablecoins.copy()
-df_stable = df_stable.rename(columns={"timestamp": "date"})
-df_stable["date"] = pd.to_datetime(df_stable["date"])
-df_stable = df_stable.set_index("date").sort_index()
-
-# Preprocess treasury data
-df_treasury = treasury.copy()
-
-# Merge on date (inner join to keep only overlapping dates)
-df = df_stable.join(df_treasury, how="inner")
-
-# Drop rows with missing values in key columns
-df = df.dropna(subset=["circulating_supply_usd", "DGS10", "DGS3MO"])
-
-# --- Analysis ---
-report_lines = []
-
-# Summary statistics for all yields and spreads
-cols_to_describe = [
-    "circulating_supply_usd", "DGS3MO", "DGS1", "DGS2", "DGS5", "DGS10", "DGS30",
-    "10Y-2Y", "10Y-3M", "2Y-3M"
-]
-existing_cols = [col for col in cols_to_describe if col in df.columns]
-report_lines.append("Summary Statistics (all yields and spreads):\n")
-report_lines.append(str(df[existing_cols].describe()))
-report_lines.append("\n")
-
-# Correlation matrix (all yields and spreads)
-corr = df[existing_cols].corr()
-report_lines.append("Correlation Matrix (all yields and spreads):\n")
-report_lines.append(str(corr))
-report_lines.append("\n")
-
-# --- Lagged correlations ---
-report_lines.append("Lagged Correlations (Stablecoin Market Cap vs. Yields/Spreads):\n")
-for col in existing_cols[1:]:
-    lag_corr = df["circulating_supply_usd"].corr(df[col].shift(5))  # 5-day lag
-    report_lines.append(f"  5-day lag: circulating_supply_usd vs. {col}: {lag_corr:.3f}")
-    lag_corr_20 = df["circulating_supply_usd"].corr(df[col].shift(20))  # 20-day lag
-    report_lines.append(f"  20-day lag: circulating_supply_usd vs. {col}: {lag_corr_20:.3f}")
-report_lines.append("\n")
-
-# --- Rolling correlations ---
-window = 30
-report_lines.append(f"Rolling {window}-day Correlations (Stablecoin Market Cap vs. Yields/Spreads):\n")
-for col in existing_cols[1:]:
-    rolling_corr = df["circulating_supply_usd"].rolling(window).corr(df[col])
-    plt.figure(figsize=(10, 4))
-    rolling_corr.plot()
-    plt.title(f"Rolling {window}-day Correlation: Market Cap vs. {col}")
-    plt.ylabel("Correlation")
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / f"rolling_corr_marketcap_{col}.png")
-    plt.close()
-    report_lines.append(f"  Saved rolling correlation plot for {col}.")
-report_lines.append("\n")
-
-# --- Visualization ---
-# 1. Stablecoin market cap over time
-plt.figure(figsize=(10, 6))
-df["circulating_supply_usd"].plot(label="Stablecoin Market Cap (USD)", color="blue")
-plt.ylabel("Stablecoin Market Cap (USD)")
-plt.title("Stablecoin Market Cap Over Time")
-plt.legend()
-plt.tight_layout()
-plt.savefig(FIG_DIR / "stablecoin_market_cap.png")
-plt.close()
-
-# 2. All Treasury yields over time
-plt.figure(figsize=(10, 6))
-df[[col for col in ["DGS3MO", "DGS1", "DGS2", "DGS5", "DGS10", "DGS30"] if col in df.columns]].plot()
-plt.ylabel("Yield (%)")
-plt.title("Treasury Yields (All Maturities)")
-plt.legend()
-plt.tight_layout()
-plt.savefig(FIG_DIR / "treasury_yields_all.png")
-plt.close()
-
-# 3. All spreads over time
-spread_cols = [col for col in ["10Y-2Y", "10Y-3M", "2Y-3M"] if col in df.columns]
-if spread_cols:
-    plt.figure(figsize=(10, 6))
-    df[spread_cols].plot()
-    plt.ylabel("Yield Spread (%)")
-    plt.title("Treasury Yield Spreads")
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / "treasury_yield_spreads.png")
-    plt.close()
-
-# 4. Market cap vs. each yield (scatter)
-for col in ["DGS3MO", "DGS1", "DGS2", "DGS5", "DGS10", "DGS30"]:
-    if col in df.columns:
-        plt.figure(figsize=(7, 5))
-        plt.scatter(df[col], df["circulating_supply_usd"], alpha=0.5)
-        plt.xlabel(f"{col} Yield (%)")
-        plt.ylabel("Stablecoin Market Cap (USD)")
-        plt.title(f"Market Cap vs. {col} Yield")
-        plt.tight_layout()
-        plt.savefig(FIG_DIR / f"marketcap_vs_{col}.png")
-        plt.close()
-
-# 5. Market cap vs. each spread (scatter)
-for col in spread_cols:
-    plt.figure(figsize=(7, 5))
-    plt.scatter(df[col], df["circulating_supply_usd"], alpha=0.5)
-    plt.xlabel(f"{col} Spread (%)")
-    plt.ylabel("Stablecoin Market Cap (USD)")
-    plt.title(f"Market Cap vs. {col} Spread")
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / f"marketcap_vs_{col}.png")
-    plt.close()
-
-# --- Key findings (simple) ---
-if "DGS10" in df.columns:
-    if corr.loc["circulating_supply_usd", "DGS10"] < -0.2:
-        report_lines.append("There is a negative correlation between stablecoin market cap and 10Y Treasury yield.\n")
-    elif corr.loc["circulating_supply_usd", "DGS10"] > 0.2:
-        report_lines.append("There is a positive correlation between stablecoin market cap and 10Y Treasury yield.\n")
-    else:
-        report_lines.append("There is little to no correlation between stablecoin market cap and 10Y Treasury yield.\n")
-
-# === Niche/Nuanced Analyses ===
-
-# 1. Nonlinearity: Quadratic and threshold effects
-for col in ["DGS3MO", "DGS10", "10Y-2Y", "10Y-3M"]:
-    if col in df.columns:
-        x = df[col].values.reshape(-1, 1)
+# Figure manifest of this script alone, so it lists exactly the figures written here
+CACHE_FILE = Path("data/cache/figures_analysis.json")
+
+
+def line_series(df: pd.DataFrame, columns):
+    """Line series for draw_lines, one per panel column."""
+    return [{"x": df.index.values, "y": df[col].values, "label": col} for col in columns]
+
+
+def main(workers: Optional[int] = None) -> None:
+    """Run the analysis, render the figures and write the report.
+
+    Args:
+        workers: Processes used to render figures (default: CPU count)
+    """
+    # Ensure figures directory exists
+    FIG_DIR.mkdir(parents=True, exist_ok=True)
+
+    # Load the shared daily panel on Treasury trading days, as the yields are observed
+    df = load_panel(
+        columns=["circulating_supply_usd"] + YIELD_COLUMNS + SPREAD_COLUMNS,
+        trading_days_only=True,
+    )
+
+    # Drop rows with missing values in key columns
+    df = df.dropna(subset=["circulating_supply_usd", "DGS10", "DGS3MO"])
+
+    # --- Analysis ---
+    report_lines = []
+    # Figures are collected as specs and rendered together at the end
+    figures = []
+
+    # Summary statistics for all yields and spreads
+    cols_to_describe = [
+        "circulating_supply_usd", "DGS3MO", "DGS1", "DGS2", "DGS5", "DGS10", "DGS30",
+        "10Y-2Y", "10Y-3M", "2Y-3M"
+    ]
+    existing_cols = [col for col in cols_to_describe if col in df.columns]
+    report_lines.append("Summary Statistics (all yields and spreads):\n")
+    report_lines.append(str(df[existing_cols].describe()))
+    report_lines.append("\n")
+
+    # Correlation matrix (all yields and spreads)
+    corr = df[existing_cols].corr()
+    report_lines.append("Correlation Matrix (all yields and spreads):\n")
+    report_lines.append(str(corr))
+    report_lines.append("\n")
+
+    # --- Lagged correlations ---
+    # Full -60..+60 lead/lag profile in one batched pass; lags are trading days
+    xcorr = xcorr_frame(df, ["circulating_supply_usd"], existing_cols[1:], max_lag=60, min_periods=2)
+    profile = lag_profile(xcorr, "circulating_supply_usd")
+    report_lines.append("Lagged Correlations (Stablecoin Market Cap vs. Yields/Spreads):\n")
+    for col in existing_cols[1:]:
+        report_lines.append(f"  5-day lag: circulating_supply_usd vs. {col}: {profile.loc[5, col]:.3f}")
+        report_lines.append(f"  20-day lag: circulating_supply_usd vs. {col}: {profile.loc[20, col]:.3f}")
+    report_lines.append("\n")
+    report_lines.append("Peak Lead/Lag Correlations (lags -60..+60, > 0 means the series leads):\n")
+    for _, row in peak_lags(xcorr).iterrows():
+        report_lines.append(f"  {row['y']}: lag {row['lag']:+d}, corr {row['corr']:.3f}")
+    report_lines.append("\n")
+    plot_xcorr_heatmap(xcorr, "circulating_supply_usd", FIG_DIR / "xcorr_heatmap_marketcap.png",
+                       title="Lead/Lag Correlation: Market Cap vs. Yields/Spreads")
+
+    # --- Rolling correlations ---
+    windows = (7, 30, 90, 180)
+    rolling = rolling_corr(df["circulating_supply_usd"], df[existing_cols[1:]], windows)
+    report_lines.append(f"Rolling {'/'.join(map(str, windows))}-day Correlations (Stablecoin Market Cap vs. Yields/Spreads):\n")
+    for j, col in enumerate(existing_cols[1:]):
+        figures.append(FigureSpec(
+            FIG_DIR / f"rolling_corr_marketcap_{col}.png",
+            draw_lines,
+            {"series": [{"x": df.index.values, "y": rolling[w, j], "label": f"{window}-day"}
+                        for w, window in enumerate(windows)]},
+            {"figsize": (10, 4), "title": f"Rolling Correlation: Market Cap vs. {col}",
+             "ylabel": "Correlation", "legend": True},
+        ))
+        report_lines.append(f"  Saved rolling correlation plot for {col}.")
+    report_lines.append("\n")
+
+    # --- Visualization ---
+    # 1. Stablecoin market cap over time
+    figures.append(FigureSpec(
+        FIG_DIR / "stablecoin_market_cap.png",
+        draw_lines,
+        {"series": [{"x": df.index.values, "y": df["circulating_supply_usd"].values,
+                     "label": "Stablecoin Market Cap (USD)", "kw": {"color": "blue"}}]},
+        {"ylabel": "Stablecoin Market Cap (USD)", "title": "Stablecoin Market Cap Over Time",
+         "legend": True},
+    ))
+
+    # 2. All Treasury yields over time
+    yield_cols = [col for col in ["DGS3MO", "DGS1", "DGS2", "DGS5", "DGS10", "DGS30"] if col in df.columns]
+    figures.append(FigureSpec(
+        FIG_DIR / "treasury_yields_all.png",
+        draw_lines,
+        {"series": line_series(df, yield_cols)},
+        {"ylabel": "Yield (%)", "title": "Treasury Yields (All Maturities)", "legend": True},
+    ))
+
+    # 3. All spreads over time
+    spread_cols = [col for col in ["10Y-2Y", "10Y-3M", "2Y-3M"] if col in df.columns]
+    if spread_cols:
+        figures.append(FigureSpec(
+            FIG_DIR / "treasury_yield_spreads.png",
+            draw_lines,
+            {"series": line_series(df, spread_cols)},
+            {"ylabel": "Yield Spread (%)", "title": "Treasury Yield Spreads", "legend": True},
+        ))
+
+    # 4. Market cap vs. each yield (scatter)
+    for col in yield_cols:
+        figures.append(FigureSpec(
+            FIG_DIR / f"marketcap_vs_{col}.png",
+            draw_scatter,
+            {"x": df[col].values, "y": df["circulating_supply_usd"].values, "kw": {"alpha": 0.5}},
+            {"figsize": (7, 5), "xlabel": f"{col} Yield (%)", "ylabel": "Stablecoin Market Cap (USD)",
+             "title": f"Market Cap vs. {col} Yield"},
+        ))
+
+    # 5. Market cap vs. each spread (scatter)
+    for col in spread_cols:
+        figures.append(FigureSpec(
+            FIG_DIR / f"marketcap_vs_{col}.png",
+            draw_scatter,
+            {"x": df[col].values, "y": df["circulating_supply_usd"].values, "kw": {"alpha": 0.5}},
+            {"figsize": (7, 5), "xlabel": f"{col} Spread (%)", "ylabel": "Stablecoin Market Cap (USD)",
+             "title": f"Market Cap vs. {col} Spread"},
+        ))
+
+    # --- Key findings (simple) ---
+    if "DGS10" in df.columns:
+        if corr.loc["circulating_supply_usd", "DGS10"] < -0.2:
+            report_lines.append("There is a negative correlation between stablecoin market cap and 10Y Treasury yield.\n")
+        elif corr.loc["circulating_supply_usd", "DGS10"] > 0.2:
+            report_lines.append("There is a positive correlation between stablecoin market cap and 10Y Treasury yield.\n")
+        else:
+            report_lines.append("There is little to no correlation between stablecoin market cap and 10Y Treasury yield.\n")
+
+    # === Niche/Nuanced Analyses ===
+
+    # 1. Nonlinearity: Quadratic and threshold effects
+    # All regressors and specifications are solved in one batched QR per design width,
+    # with Newey-West standard errors; thresholds are scanned over a grid
+    nonlinear_cols = [col for col in ["DGS3MO", "DGS10", "10Y-2Y", "10Y-3M"] if col in df.columns]
+    fits = nonlinear_fits(df, "circulating_supply_usd", nonlinear_cols, cov_type="HAC")
+    report_lines.append("Nonlinearity (Market Cap on each yield; Newey-West SEs):\n")
+    for col in nonlinear_cols:
+        x = df[col].values
         y = df["circulating_supply_usd"].values
-        # Linear
-        linreg = LinearRegression().fit(x, y)
-        # Quadratic
-        poly = PolynomialFeatures(degree=2)
-        x2 = poly.fit_transform(x)
-        quadreg = LinearRegression().fit(x2, y)
-        # Piecewise (threshold at median)
-        thresh = np.median(x)
-        x_piece = np.hstack([x, (x > thresh).astype(int)])
-        pwreg = LinearRegression().fit(x_piece, y)
+        fit = fits[fits["regressor"] == col].set_index("spec")
+        scan = threshold_scan(x, y, n_grid=200)
+        best = scan.fit.params[scan.best]
+        thresh = fit.loc["piecewise", "threshold"]
         # Plot
-        x_plot = np.linspace(x.min(), x.max(), 100).reshape(-1, 1)
-        y_lin = linreg.predict(x_plot)
-        y_quad = quadreg.predict(poly.transform(x_plot))
-        y_pw = pwreg.predict(np.hstack([x_plot, (x_plot > thresh).astype(int)]))
-        plt.figure(figsize=(7, 5))
-        plt.scatter(x, y, alpha=0.3, label="Data")
-        plt.plot(x_plot, y_lin, label="Linear", color="blue")
-        plt.plot(x_plot, y_quad, label="Quadratic", color="red", linestyle="--")
-        plt.plot(x_plot, y_pw, label=f"Piecewise (thresh={thresh:.2f})", color="green", linestyle=":")
-        plt.xlabel(f"{col}")
-        plt.ylabel("Stablecoin Market Cap (USD)")
-        plt.title(f"Nonlinear fits: Market Cap vs {col}")
-        plt.legend()
-        plt.tight_layout()
-        plt.savefig(FIG_DIR / f"nonlinear_marketcap_vs_{col}.png")
-        plt.close()
+        x_plot = np.linspace(x.min(), x.max(), 100)
+        coefs = {spec: fit.loc[spec, [c for c in fit.columns if c.startswith("coef_")]].dropna().values
+                 for spec in fit.index}
+        y_lin = design(x_plot, "linear") @ coefs["linear"]
+        y_quad = design(x_plot, "quadratic") @ coefs["quadratic"]
+        y_pw = design(x_plot, "piecewise", thresh) @ coefs["piecewise"]
+        y_grid = design(x_plot, "piecewise", scan.best_threshold) @ best
+        figures.append(FigureSpec(
+            FIG_DIR / f"nonlinear_marketcap_vs_{col}.png",
+            draw_scatter,
+            {
+                "x": x, "y": y, "label": "Data", "kw": {"alpha": 0.3},
+                "lines": [
+                    {"x": x_plot, "y": y_lin, "label": "Linear", "kw": {"color": "blue"}},
+                    {"x": x_plot, "y": y_quad, "label": "Quadratic",
+                     "kw": {"color": "red", "linestyle": "--"}},
+                    {"x": x_plot, "y": y_pw, "label": f"Piecewise (thresh={thresh:.2f})",
+                     "kw": {"color": "green", "linestyle": ":"}},
+                    {"x": x_plot, "y": y_grid,
+                     "label": f"Piecewise, best grid (thresh={scan.best_threshold:.2f})",
+                     "kw": {"color": "purple", "linestyle": "-."}},
+                ],
+            },
+            {"figsize": (7, 5), "xlabel": f"{col}", "ylabel": "Stablecoin Market Cap (USD)",
+             "title": f"Nonlinear fits: Market Cap vs {col}", "legend": True},
+        ))
         # Print R^2
-        print(f"Nonlinearity {col}: Linear R2={linreg.score(x, y):.3f}, Quad R2={quadreg.score(x2, y):.3f}, Piecewise R2={pwreg.score(x_piece, y):.3f}")
-
-# 2. Extreme event responses
-for col in ["DGS3MO", "DGS10", "10Y-2Y", "10Y-3M"]:
-    if col in df.columns:
-        changes = df[col].diff()
-        std = changes.std()
-        extreme_days = changes.abs() > 2 * std
-        cap_changes = df["circulating_supply_usd"].pct_change()
-        cap_changes = cap_changes.replace([np.inf, -np.inf], np.nan)  # Remove inf
-        extreme_cap = cap_changes[extreme_days]
-        normal_cap = cap_changes[~extreme_days]
-        print(f"Extreme event response for {col}: mean cap change on extreme days={extreme_cap.mean():.4f}, normal days={normal_cap.mean():.4f}, n_extreme={extreme_cap.count()}")
-        # Plot
-        plt.figure(figsize=(7, 4))
-        plt.hist(normal_cap.dropna(), bins=30, alpha=0.5, label="Normal")
-        plt.hist(extreme_cap.dropna(), bins=15, alpha=0.7, label="Extreme", color="red")
-        plt.title(f"Stablecoin Cap Change: Extreme vs Normal {col} Moves")
-        plt.xlabel("Daily % Change in Market Cap")
-        plt.ylabel("Frequency")
-        plt.legend()
-        plt.tight_layout()
-        plt.savefig(FIG_DIR / f"extreme_event_marketcap_{col}.png")
-        plt.close()
-
-# 3. Idiosyncratic spreads
-spread_defs = {"5Y-2Y": ("DGS5", "DGS2"), "30Y-10Y": ("DGS30", "DGS10"), "5Y-3M": ("DGS5", "DGS3MO")}
-for spread, (long, short) in spread_defs.items():
-    if long in df.columns and short in df.columns:
-        df[spread] = df[long] - df[short]
-        corr = df["circulating_supply_usd"].corr(df[spread])
-        print(f"Idiosyncratic spread {spread}: correlation with market cap = {corr:.3f}")
+        r2 = fit["rsquared"]
+        print(f"Nonlinearity {col}: Linear R2={r2['linear']:.3f}, Quad R2={r2['quadratic']:.3f}, Piecewise R2={r2['piecewise']:.3f}")
+        report_lines.append(
+            f"  {col}: linear slope {fit.loc['linear', 'coef_1']:.4g} (SE {fit.loc['linear', 'se_1']:.4g}), "
+            f"R2 linear={r2['linear']:.3f}, quadratic={r2['quadratic']:.3f}, "
+            f"piecewise at median={r2['piecewise']:.3f}, "
+            f"best threshold {scan.best_threshold:.2f} (R2={scan.rsquared[scan.best]:.3f})"
+        )
+    report_lines.append("\n")
+
+    # 2. Extreme event responses
+    # Every threshold (1-4 s.d.), forward horizon (0-20 days), side and yield/spread
+    # in one broadcasted pass, with circular-shift permutation p-values
+    extreme_cols = [col for col in YIELD_COLUMNS + SPREAD_COLUMNS if col in df.columns]
+    extremes = extreme_responses(df[extreme_cols].diff(), df["circulating_supply_usd"],
+                                 workers=workers or os.cpu_count() or 1)
+    report_lines.append("Extreme Event Responses (cumulative market cap change after moves "
+                        "beyond 2 s.d., extreme minus normal days; permutation p-values):\n")
+    cells = extremes[(extremes["side"] == "both") & (extremes["threshold"] == 2.0)]
+    for col in extreme_cols:
+        row = cells[cells["driver"] == col].set_index("horizon")
+        report_lines.append(
+            f"  {col} (n={row.loc[0, 'n_extreme']}): "
+            + ", ".join(f"h={h}: {row.loc[h, 'diff']:+.4f} (p={row.loc[h, 'p_value']:.3f})"
+                        for h in (0, 5, 20))
+        )
+    report_lines.append("  Most significant cells across thresholds, horizons and sides:")
+    for _, row in extremes.nsmallest(5, "p_value").iterrows():
+        report_lines.append(
+            f"    {row['driver']} {row['side']} > {row['threshold']:g} s.d., h={row['horizon']}: "
+            f"{row['diff']:+.4f} (p={row['p_value']:.3f}, n={row['n_extreme']})"
+        )
+    report_lines.append("\n")
+    extreme_days = extreme_masks(df[extreme_cols].diff().values, [2.0], ["both"])[0, 0]
+    cap_changes = forward_changes(df["circulating_supply_usd"].values, [0])[:, 0]
+    for j, col in enumerate(extreme_cols):
+        if col not in ["DGS3MO", "DGS10", "10Y-2Y", "10Y-3M"]:
+            continue
+        row = cells[(cells["driver"] == col) & (cells["horizon"] == 0)].iloc[0]
+        print(f"Extreme event response for {col}: mean cap change on extreme days={row['mean_extreme']:.4f}, normal days={row['mean_normal']:.4f}, n_extreme={row['n_extreme']}")
         # Plot
-        plt.figure(figsize=(7, 5))
-        plt.scatter(df[spread], df["circulating_supply_usd"], alpha=0.4)
-        plt.xlabel(f"{spread} Spread (%)")
-        plt.ylabel("Stablecoin Market Cap (USD)")
-        plt.title(f"Market Cap vs {spread} Spread")
-        plt.tight_layout()
-        plt.savefig(FIG_DIR / f"marketcap_vs_{spread}.png")
-        plt.close()
-
-# Save report
-with open(REPORT_FILE, "w") as f:
-    f.write("\n".join(report_lines))
-
-print(f"Enhanced analysis complete. Plots saved to {FIG_DIR}/ and report saved to {REPORT_FILE}.") 
\ No newline at end of file
+        extreme_cap = cap_changes[extreme_days[:, j]]
+        normal_cap = cap_changes[~extreme_days[:, j]]
+        figures.append(FigureSpec(
+            FIG_DIR / f"extreme_event_marketcap_{col}.png",
+            draw_hist,
+            {"hists": [
+                {"values": normal_cap[np.isfinite(normal_cap)], "bins": 30, "label": "Normal",
+                 "kw": {"alpha": 0.5}},
+                {"values": extreme_cap[np.isfinite(extreme_cap)], "bins": 15, "label": "Extreme",
+                 "kw": {"alpha": 0.7, "color": "red"}},
+            ]},
+            {"figsize": (7, 4), "title": f"Stablecoin Cap Change: Extreme vs Normal {col} Moves",
+             "xlabel": "Daily % Change in Market Cap", "ylabel": "Frequency", "legend": True},
+        ))
+    plot_extreme_grid(extremes, FIG_DIR / "extreme_event_grid.png")
+
+    # 3. Idiosyncratic spreads (precomputed in the panel)
+    for spread in ["5Y-2Y", "30Y-10Y", "5Y-3M"]:
+        if spread in df.columns:
+            corr = df["circulating_supply_usd"].corr(df[spread])
+            print(f"Idiosyncratic spread {spread}: correlation with market cap = {corr:.3f}")
+            # Plot
+            figures.append(FigureSpec(
+                FIG_DIR / f"marketcap_vs_{spread}.png",
+                draw_scatter,
+                {"x": df[spread].values, "y": df["circulating_supply_usd"].values,
+                 "kw": {"alpha": 0.4}},
+                {"figsize": (7, 5), "xlabel": f"{spread} Spread (%)",
+                 "ylabel": "Stablecoin Market Cap (USD)", "title": f"Market Cap vs {spread} Spread"},
+            ))
+
+    # Render the figures whose inputs changed, in parallel
+    render_all(figures, workers=workers, cache_file=CACHE_FILE)
+
+    # Save report
+    with open(REPORT_FILE, "w") as f:
+        f.write("\n".join(report_lines))
+
+    print(f"Enhanced analysis complete. Plots saved to {FIG_DIR}/ and report saved to {REPORT_FILE}.") 
+
+
+if __name__ == "__main__":
+    main()
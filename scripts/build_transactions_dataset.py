@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""Build the stablecoin mint/burn event dataset from Ethereum logs.
+
+This script scans ``Transfer`` logs from/to the zero address for several
+stablecoin contracts over a block range. The range is split into shards that
+are fetched concurrently over JSON-RPC (``eth_getLogs``). When a provider
+rejects a shard for returning too many results, the shard is split in half
+and retried. Each completed shard is written as its own parquet part file and
+recorded in a checkpoint, so an interrupted backfill resumes where it stopped
+and the output directory only ever grows.
+
+Tether's legacy contract mints and burns through ``Issue``/``Redeem`` rather
+than zero-address transfers, so USDT supply changes made that way are not
+captured by this scan.
+
+Example:
+    $ ETH_RPC_URL=http://localhost:8545 python build_transactions_dataset.py \\
+        --from-block 18000000 --to-block 18100000 --tokens USDC DAI
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set
+
+import httpx
+import pandas as pd
+import pyarrow.dataset as ds
+from dotenv import load_dotenv
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
+
+from scripts.utils.instrument import instrumented
+from scripts.utils.io import iter_batches
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+class Token(NamedTuple):
+    """ERC-20 contract to scan."""
+
+    address: str
+    decimals: int
+
+
+# Constants
+TOKENS: Dict[str, Token] = {
+    "USDT": Token("0xdAC17F958D2ee523a2206206994597C13D831ec7", 6),
+    "USDC": Token("0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48", 6),
+    "DAI": Token("0x6B175474E89094C44Da98b954EedeAC495271d0F", 18),
+    "FDUSD": Token("0xc5f0f7b66764F6ec8C8Dff7BA683102295E16409", 18),
+    "USDe": Token("0x4c9EDD5852cd905f086C759E8383e09bff1E68B3", 18),
+}
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+ZERO_TOPIC = "0x" + "0" * 64
+DEFAULT_RPC_URL = os.getenv("ETH_RPC_URL", "http://localhost:8545")
+DEFAULT_START_BLOCK = 4_832_686  # First block of 2018-01-01 UTC
+DEFAULT_SHARD_SIZE = 20_000
+DEFAULT_CONCURRENCY = 8
+DEFAULT_MIN_AMOUNT = 500_000_000
+OUTPUT_DIR = Path("data/raw/mint_burn")
+CHECKPOINT_FILE = "_checkpoint.json"
+
+# Substrings providers use when a getLogs query exceeds their result cap
+RANGE_ERROR_HINTS = (
+    "more than",
+    "too many",
+    "limit exceeded",
+    "block range",
+    "response size",
+    "query timeout",
+)
+
+
+class RPCError(Exception):
+    """JSON-RPC error response."""
+
+    def __init__(self, code: int, message: str) -> None:
+        super().__init__(f"RPC error {code}: {message}")
+        self.code = code
+        self.message = message
+
+    @property
+    def is_range_error(self) -> bool:
+        """Whether the provider rejected the query for covering too much."""
+        message = self.message.lower()
+        return self.code == -32005 or any(hint in message for hint in RANGE_ERROR_HINTS)
+
+
+class Shard(NamedTuple):
+    """Inclusive block range for one token.
+
+    ``last`` is the final block of the shard's cell on the fixed grid;
+    ``end`` is clipped to the scanned range, so it is before ``last`` for
+    the open shard at the chain head.
+    """
+
+    symbol: str
+    start: int
+    end: int
+    last: int
+
+    @property
+    def key(self) -> str:
+        return f"{self.symbol}:{self.start}:{self.last}"
+
+    @property
+    def complete(self) -> bool:
+        """Whether the shard covers its whole grid cell."""
+        return self.end == self.last
+
+
+def plan_shards(
+    symbols: List[str],
+    from_block: int,
+    to_block: int,
+    shard_size: int = DEFAULT_SHARD_SIZE,
+) -> List[Shard]:
+    """Split a block range into shards on a fixed grid for each token.
+
+    Shard boundaries are multiples of ``shard_size``, not offsets from
+    ``to_block``, so a rerun after the chain head advances sees the same
+    shard keys, and the open shard at the head keeps its key as it grows.
+
+    Args:
+        symbols: Token symbols to scan
+        from_block: First block (inclusive)
+        to_block: Last block (inclusive)
+        shard_size: Blocks per shard
+
+    Returns:
+        Shards ordered by block, then token
+    """
+    if to_block < from_block:
+        raise ValueError("to_block must not be before from_block")
+    first_cell = from_block // shard_size * shard_size
+    return [
+        Shard(symbol, max(cell, from_block), min(cell + shard_size - 1, to_block),
+              cell + shard_size - 1)
+        for cell in range(first_cell, to_block + 1, shard_size)
+        for symbol in symbols
+    ]
+
+
+class Checkpoint:
+    """Set of completed shard keys persisted as JSON.
+
+    Args:
+        path: Checkpoint file path
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.done: Set[str] = set()
+        if path.exists():
+            self.done = set(json.loads(path.read_text())["done"])
+
+    def __contains__(self, shard: Shard) -> bool:
+        return shard.key in self.done
+
+    def mark(self, shard: Shard) -> None:
+        """Record a shard as complete and persist atomically."""
+        self.done.add(shard.key)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"done": sorted(self.done)}))
+        tmp.replace(self.path)
+
+
+EVENT_DTYPES = {
+    "token": "object",
+    "event": "object",
+    "block_number": "int64",
+    "log_index": "int64",
+    "tx_hash": "object",
+    "counterparty": "object",
+    "amount": "float64",
+    "block_timestamp": "datetime64[s]",
+}
+
+
+def decode_transfer(log: dict, event: str, symbol: str, decimals: int) -> dict:
+    """Decode a raw ``Transfer`` log into an event row.
+
+    Args:
+        log: Raw log dict from ``eth_getLogs``
+        event: ``mint`` or ``burn``
+        symbol: Token symbol
+        decimals: Token decimals
+
+    Returns:
+        Event row with the amount in token units
+    """
+    counterparty_topic = log["topics"][2] if event == "mint" else log["topics"][1]
+    return {
+        "token": symbol,
+        "event": event,
+        "block_number": int(log["blockNumber"], 16),
+        "log_index": int(log["logIndex"], 16),
+        "tx_hash": log["transactionHash"],
+        "counterparty": "0x" + counterparty_topic[-40:],
+        "amount": int(log["data"], 16) / 10**decimals,
+    }
+
+
+@retry(
+    retry=retry_if_exception_type(httpx.TransportError),
+    wait=wait_exponential(multiplier=1, min=4, max=10),
+    stop=stop_after_attempt(3),
+    reraise=True,
+)
+async def rpc_call(client: httpx.AsyncClient, rpc_url: str, method: str, params: list):
+    """Send one JSON-RPC request with retry on transport errors.
+
+    Args:
+        client: Async HTTP client instance
+        rpc_url: JSON-RPC endpoint
+        method: RPC method name
+        params: RPC params
+
+    Returns:
+        The ``result`` field of the response
+
+    Raises:
+        RPCError: If the node returns a JSON-RPC error
+        httpx.HTTPError: If the request fails after retries
+    """
+    payload = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+    response = await client.post(rpc_url, json=payload)
+    response.raise_for_status()
+    body = response.json()
+    if "error" in body:
+        raise RPCError(body["error"].get("code", 0), body["error"].get("message", ""))
+    return body["result"]
+
+
+class LogScanner:
+    """Concurrent, resumable ``eth_getLogs`` scanner for mint/burn transfers.
+
+    Args:
+        client: Async HTTP client instance
+        rpc_url: JSON-RPC endpoint
+        output_dir: Directory for parquet part files and the checkpoint
+        concurrency: Number of shards fetched at once
+        min_amount: Minimum transfer size (token units) to keep
+        tokens: Token registry, defaults to ``TOKENS``
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        rpc_url: str = DEFAULT_RPC_URL,
+        output_dir: Path = OUTPUT_DIR,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        min_amount: float = DEFAULT_MIN_AMOUNT,
+        tokens: Optional[Dict[str, Token]] = None,
+    ) -> None:
+        self.client = client
+        self.rpc_url = rpc_url
+        self.output_dir = Path(output_dir)
+        self.concurrency = concurrency
+        self.min_amount = min_amount
+        self.tokens = tokens or TOKENS
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.checkpoint = Checkpoint(self.output_dir / CHECKPOINT_FILE)
+        # Bounds the per-block timestamp requests, which are not queued like shards
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.splits = 0
+
+    async def call(self, method: str, params: list):
+        return await rpc_call(self.client, self.rpc_url, method, params)
+
+    async def latest_block(self) -> int:
+        """Return the node's latest block number."""
+        return int(await self.call("eth_blockNumber", []), 16)
+
+    async def get_logs(self, address: str, topics: list, start: int, end: int) -> List[dict]:
+        """Fetch logs for a block range, halving it while the provider refuses.
+
+        Args:
+            address: Contract address
+            topics: Topic filter
+            start: First block (inclusive)
+            end: Last block (inclusive)
+
+        Returns:
+            Raw log dicts
+
+        Raises:
+            RPCError: If a single block still exceeds the provider's cap, or
+                on any non-range error
+        """
+        query = {"address": address, "topics": topics, "fromBlock": hex(start), "toBlock": hex(end)}
+        try:
+            return await self.call("eth_getLogs", [query])
+        except RPCError as e:
+            if not e.is_range_error or start == end:
+                raise
+        self.splits += 1
+        mid = (start + end) // 2
+        logger.debug(f"Splitting {address} {start}-{end} at {mid}")
+        return await self.get_logs(address, topics, start, mid) + await self.get_logs(
+            address, topics, mid + 1, end
+        )
+
+    async def block_timestamps(self, blocks: Set[int]) -> Dict[int, int]:
+        """Fetch UNIX timestamps for a set of block numbers, ``concurrency`` at a time."""
+
+        async def fetch(block: int):
+            async with self.semaphore:
+                return await self.call("eth_getBlockByNumber", [hex(block), False])
+
+        results = await asyncio.gather(*(fetch(b) for b in sorted(blocks)))
+        return {b: int(r["timestamp"], 16) for b, r in zip(sorted(blocks), results)}
+
+    @instrumented
+    async def scan_shard(self, shard: Shard) -> pd.DataFrame:
+        """Fetch, decode and filter mint and burn transfers for one shard.
+
+        Args:
+            shard: Token and block range to scan
+
+        Returns:
+            DataFrame of events above ``min_amount``
+        """
+        token = self.tokens[shard.symbol]
+        mints = await self.get_logs(token.address, [TRANSFER_TOPIC, ZERO_TOPIC], shard.start, shard.end)
+        burns = await self.get_logs(
+            token.address, [TRANSFER_TOPIC, None, ZERO_TOPIC], shard.start, shard.end
+        )
+        rows = [decode_transfer(log, "mint", shard.symbol, token.decimals) for log in mints]
+        rows += [decode_transfer(log, "burn", shard.symbol, token.decimals) for log in burns]
+        rows = [row for row in rows if row["amount"] >= self.min_amount]
+
+        df = pd.DataFrame(rows, columns=list(EVENT_DTYPES))
+        if not df.empty:
+            timestamps = await self.block_timestamps(set(df["block_number"]))
+            df["block_timestamp"] = pd.to_datetime(df["block_number"].map(timestamps), unit="s")
+            df = df.sort_values(["block_number", "log_index"]).reset_index(drop=True)
+        return df.astype(EVENT_DTYPES)
+
+    def write_shard(self, shard: Shard, df: pd.DataFrame) -> None:
+        """Write a shard's part file, then mark it done if it is complete.
+
+        Part file names are derived from the shard key, so a shard re-scanned
+        after a crash between the two steps, or the open shard at the chain
+        head re-scanned by a later run, overwrites its own file.
+        """
+        part = self.output_dir / f"part-{shard.symbol}-{shard.start:010d}-{shard.last:010d}.parq"
+        tmp = part.with_suffix(".tmp")
+        df.to_parquet(tmp, compression="gzip", index=False)
+        tmp.replace(part)
+        if shard.complete:
+            self.checkpoint.mark(shard)
+
+    async def run(self, shards: List[Shard]) -> int:
+        """Scan all pending shards with a pool of concurrent workers.
+
+        Args:
+            shards: Shards from ``plan_shards``
+
+        Returns:
+            Number of events written in this run
+        """
+        pending = [shard for shard in shards if shard not in self.checkpoint]
+        logger.info(f"{len(shards) - len(pending)} of {len(shards)} shards already done")
+        queue: "asyncio.Queue[Shard]" = asyncio.Queue()
+        for shard in pending:
+            queue.put_nowait(shard)
+        written = 0
+
+        async def worker() -> None:
+            nonlocal written
+            while True:
+                try:
+                    shard = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                df = await self.scan_shard(shard)
+                self.write_shard(shard, df)
+                written += len(df)
+                logger.info(f"{shard.key}: {len(df)} events")
+
+        workers = [asyncio.create_task(worker()) for _ in range(max(1, self.concurrency))]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            raise
+        return written
+
+
+@instrumented
+def load_events(
+    output_dir: Path = OUTPUT_DIR,
+    min_amount: Optional[float] = None,
+) -> pd.DataFrame:
+    """Load all scanned events from the part files.
+
+    With ``min_amount`` set, the part files are streamed chunk by chunk with
+    the amount filter pushed down, so only large events are ever held.
+    Events are unique by ``(tx_hash, log_index)``; part files that overlap,
+    e.g. written under an older shard plan, do not double-count them.
+
+    Args:
+        output_dir: Directory written by ``LogScanner``
+        min_amount: Optional smallest amount to keep
+
+    Returns:
+        DataFrame of events ordered by block
+    """
+    empty = pd.DataFrame(columns=list(EVENT_DTYPES)).astype(EVENT_DTYPES)
+    parts = sorted(Path(output_dir).glob("part-*.parq"))
+    if min_amount is None:
+        frames = [pd.read_parquet(part) for part in parts]
+    else:
+        large = ds.field("amount") >= min_amount
+        # Streamed chunks lose the stored pandas metadata; keep the object columns
+        text = {col: dtype for col, dtype in EVENT_DTYPES.items() if dtype == "object"}
+        frames = [chunk.astype(text)
+                  for part in parts for chunk in iter_batches(part, filter=large)]
+    if not frames:
+        return empty
+    df = pd.concat(frames, ignore_index=True)
+    df = df.drop_duplicates(["tx_hash", "log_index"])
+    return df.sort_values(["block_number", "log_index"]).reset_index(drop=True)
+
+
+async def main(
+    from_block: int = DEFAULT_START_BLOCK,
+    to_block: Optional[int] = None,
+    symbols: Optional[List[str]] = None,
+    shard_size: int = DEFAULT_SHARD_SIZE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    min_amount: float = DEFAULT_MIN_AMOUNT,
+    rpc_url: str = DEFAULT_RPC_URL,
+) -> None:
+    """Main function to scan and save mint/burn events.
+
+    Args:
+        from_block: First block (inclusive)
+        to_block: Last block (inclusive), defaults to the latest block
+        symbols: Token symbols to scan, defaults to all of ``TOKENS``
+        shard_size: Blocks per shard
+        concurrency: Number of shards fetched at once
+        min_amount: Minimum transfer size (token units) to keep
+        rpc_url: JSON-RPC endpoint
+    """
+    symbols = symbols or list(TOKENS)
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60.0) as client:
+        scanner = LogScanner(client, rpc_url, OUTPUT_DIR, concurrency, min_amount)
+        if to_block is None:
+            to_block = await scanner.latest_block()
+        shards = plan_shards(symbols, from_block, to_block, shard_size)
+        written = await scanner.run(shards)
+    logger.info(f"Saved {written} events to {OUTPUT_DIR} ({scanner.splits} shard splits)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scan stablecoin mint/burn events")
+    parser.add_argument("--from-block", type=int, default=DEFAULT_START_BLOCK, help="First block")
+    parser.add_argument("--to-block", type=int, default=None, help="Last block (default: latest)")
+    parser.add_argument("--tokens", nargs="+", default=list(TOKENS), help="Token symbols to scan")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE, help="Blocks per shard")
+    parser.add_argument(
+        "--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Shards fetched at once"
+    )
+    parser.add_argument(
+        "--min-amount", type=float, default=DEFAULT_MIN_AMOUNT, help="Minimum transfer size (USD)"
+    )
+    parser.add_argument("--rpc-url", default=DEFAULT_RPC_URL, help="JSON-RPC endpoint")
+    args = parser.parse_args()
+    asyncio.run(
+        main(
+            args.from_block,
+            args.to_block,
+            args.tokens,
+            args.shard_size,
+            args.concurrency,
+            args.min_amount,
+            args.rpc_url,
+        )
+    )
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Single command-line entry point for the stablecoin reserve shock analysis.
+
+Each subcommand imports what it needs only when it runs, so ``--help`` and
+``status`` do not load matplotlib, statsmodels or scipy, and do not need API
+credentials. Subcommands that wrap an existing script forward their remaining
+arguments to it unchanged, e.g. ``reserve-shock granger --maxlag 10``.
+
+Example:
+    $ reserve-shock --help
+    $ reserve-shock status
+    $ reserve-shock show --columns log_mcap DGS10 --tail 5
+    $ reserve-shock pipeline --from panel
+    $ python -m scripts.cli analyze
+"""
+
+import argparse
+import runpy
+import sys
+from typing import Dict, List, Optional, Tuple
+
+# Constants
+PROG = "reserve-shock"
+
+# Subcommands that run an existing script: name -> (module, help)
+SCRIPTS: Dict[str, Tuple[str, str]] = {
+    "fetch-caps": ("scripts.ingest.fetch_stablecoin_caps", "Fetch aggregate stablecoin caps"),
+    "fetch-yields": ("scripts.ingest.fetch_treasury_yields", "Fetch Treasury yields from FRED"),
+    "fetch-token-panel": ("scripts.ingest.fetch_stablecoin_panel",
+                          "Fetch the per-token, per-chain stablecoin panel"),
+    "fetch-transfers": ("scripts.build_transactions_dataset",
+                        "Scan mint/burn transfers from an Ethereum node"),
+    "parse-attestations": ("scripts.ingest.parse_attestations",
+                           "Parse reserve tables from issuer attestation reports"),
+    "panel": ("scripts.panel", "Build the daily analysis panel"),
+    "features": ("scripts.make_features", "Per-token, per-chain features of the token panel"),
+    "xcorr": ("scripts.stats.xcorr", "All-pairs lead/lag cross-correlations"),
+    "rolling": ("scripts.stats.rolling", "Multi-window rolling correlations"),
+    "granger": ("scripts.stats.granger", "Granger-causality sweep"),
+    "irf": ("scripts.stats.var_irf", "Bootstrapped VAR impulse responses"),
+    "var-paths": ("scripts.stats.var_rolling", "Rolling and recursive VAR re-estimation"),
+    "extremes": ("scripts.stats.extremes", "Responses to extreme yield and spread moves"),
+    "summary": ("scripts.stats.summary", "Out-of-core summary statistics and correlations"),
+    "event-study": ("scripts.stats.event_study", "Event study around mint/burn shocks"),
+    "tiles": ("scripts.tiles", "Pre-aggregate the dashboard's multi-resolution tiles"),
+    "analyze": ("scripts.analyze_stablecoin_treasury", "Correlation analysis, figures and report"),
+    "report": ("scripts.generate_statistical_results",
+               "VAR, Granger and IRF results for the paper"),
+    "pipeline": ("scripts.pipeline", "Run the stale parts of the full pipeline"),
+}
+
+
+def run_script(name: str, args: List[str]) -> int:
+    """Run a wrapped script as ``__main__`` with the given arguments.
+
+    Args:
+        name: Subcommand name in ``SCRIPTS``
+        args: Arguments passed on to the script
+
+    Returns:
+        Exit code (0 unless the script exits with another code)
+    """
+    module = SCRIPTS[name][0]
+    saved = sys.argv
+    # runpy replaces argv[0] with the module's path; the arguments are kept
+    sys.argv = [saved[0], *args]
+    try:
+        runpy.run_module(module, run_name="__main__", alter_sys=True)
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    finally:
+        sys.argv = saved
+    return 0
+
+
+def status(args: argparse.Namespace) -> int:
+    """Print the state of the cached panel and of each pipeline task."""
+    from scripts.panel import INPUTS, PANEL_FILE, PANEL_VERSION, input_hashes, read_manifest
+    from scripts.pipeline import plan
+
+    manifest = read_manifest()
+    if not manifest or not PANEL_FILE.exists():
+        print(f"Panel: not built ({PANEL_FILE})")
+    else:
+        current = input_hashes()
+        print(f"Panel: {PANEL_FILE} v{manifest['version']}, {manifest['rows']} rows, "
+              f"{len(manifest['columns'])} columns, built {manifest['built_at']}")
+        if manifest["version"] != PANEL_VERSION:
+            print(f"  version {manifest['version']} is outdated (current {PANEL_VERSION})")
+        for name in INPUTS:
+            changed = manifest["inputs"].get(name) != current[name]
+            print(f"  {name}: {'changed since build' if changed else 'unchanged'}")
+
+    print("Pipeline:")
+    for name, state in plan().items():
+        print(f"  {name}: {state}")
+    return 0
+
+
+def show(args: argparse.Namespace) -> int:
+    """Print the cached panel without rebuilding it."""
+    import pandas as pd
+
+    from scripts.panel import PANEL_FILE, load_panel
+
+    if not PANEL_FILE.exists():
+        print(f"No panel at {PANEL_FILE}; run `{PROG} panel` first", file=sys.stderr)
+        return 1
+    panel = load_panel(columns=args.columns, trading_days_only=args.trading_days, rebuild=False)
+    with pd.option_context("display.width", 200, "display.max_columns", 12):
+        print(panel.tail(args.tail))
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the top-level parser with one subparser per subcommand."""
+    parser = argparse.ArgumentParser(
+        prog=PROG, description="Stablecoin reserve shock analysis"
+    )
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+    subparsers.required = True
+
+    status_parser = subparsers.add_parser("status", help="Show panel and pipeline state")
+    status_parser.set_defaults(func=status)
+
+    show_parser = subparsers.add_parser("show", help="Print the cached panel")
+    show_parser.add_argument("--columns", nargs="+", help="Columns to load (default: all)")
+    show_parser.add_argument("--tail", type=int, default=10, help="Rows to print")
+    show_parser.add_argument("--trading-days", action="store_true",
+                             help="Keep only Treasury trading days")
+    show_parser.set_defaults(func=show)
+
+    # Wrapped scripts parse their own arguments, including --help
+    for name, (_, help_text) in SCRIPTS.items():
+        subparsers.add_parser(name, help=help_text, add_help=False)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Parse the command line and run the subcommand.
+
+    Args:
+        argv: Arguments without the program name (default: ``sys.argv[1:]``)
+
+    Returns:
+        Exit code
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in SCRIPTS:
+        return run_script(argv[0], argv[1:])
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,15 @@
-import pandas as pd
+from scripts.panel import load_panel
+
 
 def collect_data():
-    # Collect stablecoin data
-    stablecoin_data = collect_stablecoin_data()
-    
-    # Collect Treasury yield data
-    treasury_data = collect_treasury_data()
-    
-    # Merge datasets
-    df = pd.merge(stablecoin_data, treasury_data, on='date', how='inner')
-    
+    # Stablecoin caps and Treasury yields merged on Treasury trading days
+    df = load_panel(trading_days_only=True).reset_index()
+
     # Filter for the study period
     df = df[(df['date'] >= '2024-11-01') & (df['date'] <= '2025-04-30')]
-    
+
     # Save to CSV
     df.to_csv('data/stablecoin_treasury_data.csv', index=False)
     print("Data collection complete. Dataset saved to data/stablecoin_treasury_data.csv")
-    
-    return df 
\ No newline at end of file
+
+    return df
@@ -1,35 +1,25 @@
-import pandas as pd
-import numpy as np
 from statsmodels.tsa.api import VAR
-from statsmodels.tsa.stattools import grangercausalitytests
 import matplotlib.pyplot as plt
 import seaborn as sns
 from pathlib import Path
 
-# Set style for plots
-plt.style.use('seaborn-v0_8')
-sns.set_theme(style="whitegrid")
+from scripts.make_features import load_features
+from scripts.panel import load_panel
+from scripts.stats.granger import granger_table
+from scripts.stats.var_irf import DEFAULT_SPECS, plot_irfs, run_specifications, select_order
+from scripts.utils.plotting import (
+    FigureSpec, draw_heatmap, draw_lines, draw_regplots, render_all
+)
+
+YIELDS = ['DGS3MO', 'DGS1', 'DGS2', 'DGS5', 'DGS10', 'DGS30']
+SPREADS = ['10Y-2Y', '10Y-3M', '2Y-3M']
 
 def load_data():
-    """Load and prepare the data for analysis."""
-    # Load the data
-    market_cap = pd.read_parquet('data/raw/stablecoin_caps.parq')
-    treasury_yields = pd.read_parquet('data/raw/treasury_yields.parq')
-    
-    # Convert timestamp to datetime and set as index
-    market_cap['timestamp'] = pd.to_datetime(market_cap['timestamp'])
-    market_cap = market_cap.set_index('timestamp')
+    """Load market cap, yields and spreads from the shared daily panel."""
+    # Keep Treasury trading days, matching the frequency the yields are observed at
+    df = load_panel(columns=['circulating_supply_usd'] + YIELDS + SPREADS, trading_days_only=True)
     # Rename for clarity
-    market_cap = market_cap.rename(columns={'circulating_supply_usd': 'market_cap'})
-    # Keep only the market cap column
-    market_cap = market_cap[['market_cap']]
-    
-    # Align index to date only (remove time)
-    market_cap.index = market_cap.index.date
-    treasury_yields.index = pd.to_datetime(treasury_yields.index).date
-    
-    # Merge the data
-    df = pd.merge(market_cap, treasury_yields, left_index=True, right_index=True)
+    df = df.rename(columns={'circulating_supply_usd': 'market_cap'})
     # Drop rows with missing values
     df = df.dropna()
     return df
@@ -45,72 +35,78 @@ def run_var_analysis(df, maxlags=5):
     
     return results
 
+def run_irf_analysis(df, replications=2000, horizon=20):
+    """Bootstrapped responses to a 1 s.d. log market cap shock across specifications."""
+    irf_data = df.join(load_features(['log_mcap'], trading_days_only=True))
+    baseline = DEFAULT_SPECS[0].columns
+    lag_selection = select_order(irf_data[baseline].values)
+    irfs = run_specifications(irf_data, DEFAULT_SPECS, horizon=horizon, replications=replications)
+    return lag_selection, irfs
+
 def run_granger_tests(df, maxlag=5):
-    """Run Granger causality tests and return results."""
-    granger_results = {}
-    
-    # Test each yield against market cap
-    for col in ['DGS3MO', 'DGS1', 'DGS2', 'DGS5', 'DGS10', 'DGS30']:
-        # Test if yield Granger-causes market cap
-        gc_res1 = grangercausalitytests(df[['market_cap', col]], maxlag=maxlag, verbose=False)
-        # Test if market cap Granger-causes yield
-        gc_res2 = grangercausalitytests(df[[col, 'market_cap']], maxlag=maxlag, verbose=False)
-        
-        granger_results[col] = {
-            'yield_to_marketcap': gc_res1,
-            'marketcap_to_yield': gc_res2
-        }
-    
-    return granger_results
+    """Run Granger causality F-tests between each yield and market cap, both ways."""
+    # One tidy table of F-stats and p-values for every pair and lag up to maxlag
+    return granger_table(df, causes=YIELDS, effects=['market_cap'], maxlag=maxlag,
+                         both_directions=True)
 
-def generate_additional_figures(df):
-    """Generate additional figures for the paper."""
-    # Create figures directory if it doesn't exist
-    Path('figures').mkdir(exist_ok=True)
-    
-    # 1. Heatmap of correlations
-    plt.figure(figsize=(12, 8))
-    corr_matrix = df.corr()
-    sns.heatmap(corr_matrix, annot=True, cmap='coolwarm', center=0, fmt='.2f')
-    plt.title('Correlation Matrix: Market Cap and Treasury Yields')
-    plt.tight_layout()
-    plt.savefig('figures/correlation_heatmap.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    
-    # 2. Rolling volatility
-    plt.figure(figsize=(12, 6))
-    volatility = df['market_cap'].pct_change().rolling(window=20).std()
-    plt.plot(volatility.index, volatility.values)
-    plt.title('20-Day Rolling Volatility of Stablecoin Market Cap')
-    plt.ylabel('Volatility')
-    plt.grid(True)
-    plt.savefig('figures/market_cap_volatility.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    
-    # 3. Yield curve changes
-    plt.figure(figsize=(12, 6))
-    yield_curves = df[['DGS3MO', 'DGS1', 'DGS2', 'DGS5', 'DGS10', 'DGS30']]
-    yield_changes = yield_curves.pct_change().rolling(window=20).mean()
-    plt.plot(yield_changes.index, yield_changes.values)
-    plt.title('20-Day Rolling Average Yield Changes')
-    plt.ylabel('Percentage Change')
-    plt.legend(yield_changes.columns)
-    plt.grid(True)
-    plt.savefig('figures/yield_changes.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    
-    # 4. Market cap vs yield scatter with regression
-    plt.figure(figsize=(10, 6))
-    for col in ['DGS3MO', 'DGS1', 'DGS2', 'DGS5', 'DGS10', 'DGS30']:
-        sns.regplot(data=df, x=col, y='market_cap', scatter_kws={'alpha':0.3}, label=col)
-    plt.title('Market Cap vs Treasury Yields with Regression Lines')
-    plt.xlabel('Yield (%)')
-    plt.ylabel('Market Cap (Billions USD)')
-    plt.legend()
-    plt.savefig('figures/market_cap_vs_all_yields.png', dpi=300, bbox_inches='tight')
-    plt.close()
+def generate_additional_figures(df, workers=None):
+    """Generate additional figures for the paper.
+
+    Figures are rendered in parallel, and figures whose data is unchanged since
+    the last run are skipped.
+    """
+    style = {"mpl_style": "seaborn-v0_8-whitegrid", "dpi": 300, "bbox_inches": "tight"}
+    features = load_features(['mcap_vol_20'] + [f'{col}_pct_mean_20' for col in YIELDS],
+                             trading_days_only=True).reindex(df.index)
+    volatility = features['mcap_vol_20']
+    yield_changes = features.drop(columns='mcap_vol_20').set_axis(YIELDS, axis=1)
+
+    figures = [
+        # 1. Heatmap of correlations
+        FigureSpec(
+            'figures/correlation_heatmap.png',
+            draw_heatmap,
+            {"matrix": df.corr(), "kw": {"annot": True, "cmap": 'coolwarm', "center": 0,
+                                         "fmt": '.2f'}},
+            {**style, "figsize": (12, 8),
+             "title": 'Correlation Matrix: Market Cap and Treasury Yields'},
+        ),
+        # 2. Rolling volatility
+        FigureSpec(
+            'figures/market_cap_volatility.png',
+            draw_lines,
+            {"series": [{"x": volatility.index.values, "y": volatility.values}]},
+            {**style, "figsize": (12, 6), "tight_layout": False,
+             "title": '20-Day Rolling Volatility of Stablecoin Market Cap',
+             "ylabel": 'Volatility', "grid": True},
+        ),
+        # 3. Yield curve changes
+        FigureSpec(
+            'figures/yield_changes.png',
+            draw_lines,
+            {"series": [{"x": yield_changes.index.values, "y": yield_changes[col].values,
+                         "label": col} for col in yield_changes.columns]},
+            {**style, "figsize": (12, 6), "tight_layout": False,
+             "title": '20-Day Rolling Average Yield Changes', "ylabel": 'Percentage Change',
+             "legend": True, "grid": True},
+        ),
+        # 4. Market cap vs yield scatter with regression
+        FigureSpec(
+            'figures/market_cap_vs_all_yields.png',
+            draw_regplots,
+            {"frame": df, "y": 'market_cap', "xs": YIELDS, "kw": {"alpha": 0.3}},
+            {**style, "figsize": (10, 6), "tight_layout": False,
+             "title": 'Market Cap vs Treasury Yields with Regression Lines',
+             "xlabel": 'Yield (%)', "ylabel": 'Market Cap (Billions USD)', "legend": True},
+        ),
+    ]
+    render_all(figures, workers=workers)
 
 def main():
+    # Set style for plots
+    plt.style.use('seaborn-v0_8')
+    sns.set_theme(style="whitegrid")
+
     # Load data
     df = load_data()
     
@@ -119,6 +115,11 @@ def main():
     
     # Run Granger causality tests
     granger_results = run_granger_tests(df)
+
+    # Bootstrapped impulse responses
+    lag_selection, irfs = run_irf_analysis(df)
+    Path('figures').mkdir(exist_ok=True)
+    plot_irfs(irfs[irfs['spec'] != 'differences'], 'figures/irf_log_mcap.png')
     
     # Generate additional figures
     generate_additional_figures(df)
@@ -130,15 +131,27 @@ def main():
     print("\nVAR Model Summary:")
     print(var_results.summary())
     
+    print("\nVAR Lag Selection (baseline variables):")
+    print(lag_selection.round(4))
+    print(f"Selected: AIC={lag_selection['aic'].idxmin()}, BIC={lag_selection['bic'].idxmin()}")
+
+    print("\nImpulse Responses to a 1 s.d. Log Market Cap Shock (95% bootstrap bands):")
+    print(irfs[irfs['horizon'].isin([0, 5, 10, 20])].round(4).to_string(index=False))
+
     print("\nGranger Causality Test Results:")
-    for yield_type, results in granger_results.items():
+    lag1 = granger_results[granger_results['lag'] == 1].set_index(['cause', 'effect'])
+    for yield_type in YIELDS:
         print(f"\n{yield_type}:")
         print("Yield to Market Cap:")
-        print(f"F-statistic: {results['yield_to_marketcap'][1][0]['ssr_ftest'][0]:.2f}")
-        print(f"p-value: {results['yield_to_marketcap'][1][0]['ssr_ftest'][1]:.4f}")
+        print(f"F-statistic: {lag1.loc[(yield_type, 'market_cap'), 'f_stat']:.2f}")
+        print(f"p-value: {lag1.loc[(yield_type, 'market_cap'), 'p_value']:.4f}")
         print("Market Cap to Yield:")
-        print(f"F-statistic: {results['marketcap_to_yield'][1][0]['ssr_ftest'][0]:.2f}")
-        print(f"p-value: {results['marketcap_to_yield'][1][0]['ssr_ftest'][1]:.4f}")
+        print(f"F-statistic: {lag1.loc[('market_cap', yield_type), 'f_stat']:.2f}")
+        print(f"p-value: {lag1.loc[('market_cap', yield_type), 'p_value']:.4f}")
+
+    print("\nGranger Causality p-values by lag:")
+    print(granger_results.pivot_table(index=['cause', 'effect'], columns='lag', values='p_value')
+          .round(4).to_string())
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -2,10 +2,12 @@
 """Fetch stablecoin market cap data from DefiLlama API.
 
 This module fetches and stores stablecoin market cap data from the DefiLlama API.
-It processes the aggregated data and saves it in parquet format with gzip compression.
+It processes the aggregated data and saves it as a year/month-partitioned parquet
+dataset (see ``scripts.utils.io``).
 
 Example:
     $ python fetch_stablecoin_caps.py --start 2023-01-01 --end 2024-03-01
+    $ python fetch_stablecoin_caps.py --incremental
 """
 
 import argparse
@@ -15,9 +17,15 @@ from pathlib import Path
 from typing import Optional
 
 import httpx
+import numpy as np
 import pandas as pd
 from tenacity import retry, stop_after_attempt, wait_exponential
 
+from scripts.utils.http_cache import cached_async_client
+from scripts.utils.incremental import DEFAULT_OVERLAP_DAYS, incremental_start
+from scripts.utils.instrument import instrumented
+from scripts.utils.io import migrate_legacy, upsert_dataset, write_dataset
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -30,7 +38,7 @@ DEFILLAMA_API_URL = "https://stablecoins.llama.fi/stablecoincharts/all"
 DEFAULT_START_DATE = "2018-01-01"
 DEFAULT_END_DATE = datetime.now().strftime("%Y-%m-%d")
 OUTPUT_DIR = Path("data/raw")
-OUTPUT_FILE = OUTPUT_DIR / "stablecoin_caps.parq"
+OUTPUT_PATH = OUTPUT_DIR / "stablecoin_caps"
 
 
 def parse_date(date_str: str) -> int:
@@ -43,9 +51,11 @@ def unix_to_date(ts: int) -> pd.Timestamp:
     return pd.to_datetime(ts, unit="s")
 
 
+@instrumented
 @retry(
     wait=wait_exponential(multiplier=1, min=4, max=10),
     stop=stop_after_attempt(3),
+    reraise=True,
 )
 async def fetch_stablecoin_data(client: httpx.AsyncClient) -> dict:
     """Fetch stablecoin data from DefiLlama API with retry logic.
@@ -62,6 +72,7 @@ async def fetch_stablecoin_data(client: httpx.AsyncClient) -> dict:
     return response.json()
 
 
+@instrumented
 def process_stablecoin_data(
     raw_data: list,
     start_date: Optional[str] = None,
@@ -76,27 +87,33 @@ def process_stablecoin_data(
     Returns:
         DataFrame with processed stablecoin data
     """
-    records = []
     start_ts = parse_date(start_date) if start_date else None
     end_ts = parse_date(end_date) if end_date else None
 
-    for entry in raw_data:
-        ts = int(entry.get("date"))
-        if start_ts and ts < start_ts:
-            continue
-        if end_ts and ts > end_ts:
-            continue
-            
-        circulating = entry.get("totalCirculating", {}).get("peggedUSD", 0)
-        circulating_usd = entry.get("totalCirculatingUSD", {}).get("peggedUSD", 0)
-        
-        records.append({
-            "timestamp": unix_to_date(ts),
-            "circulating_supply": circulating,
-            "circulating_supply_usd": circulating_usd,
-        })
-    
-    df = pd.DataFrame(records)
+    # Build columns directly instead of one dict per row, then filter and
+    # convert timestamps in a single vectorised pass.
+    timestamps = np.fromiter(
+        (int(entry.get("date")) for entry in raw_data),
+        dtype="int64",
+        count=len(raw_data),
+    )
+    circulating = [entry.get("totalCirculating", {}).get("peggedUSD", 0) for entry in raw_data]
+    circulating_usd = [entry.get("totalCirculatingUSD", {}).get("peggedUSD", 0)
+                       for entry in raw_data]
+
+    mask = np.ones(len(timestamps), dtype=bool)
+    if start_ts:
+        mask &= timestamps >= start_ts
+    if end_ts:
+        mask &= timestamps <= end_ts
+
+    df = pd.DataFrame(
+        {
+            "timestamp": pd.to_datetime(timestamps[mask], unit="s"),
+            "circulating_supply": pd.Series(circulating)[mask].to_numpy(),
+            "circulating_supply_usd": pd.Series(circulating_usd)[mask].to_numpy(),
+        }
+    )
     if not df.empty:
         df = df.sort_values("timestamp")
     return df
@@ -105,24 +122,36 @@ def process_stablecoin_data(
 async def main(
     start_date: str = DEFAULT_START_DATE,
     end_date: str = DEFAULT_END_DATE,
+    incremental: bool = False,
+    overlap_days: int = DEFAULT_OVERLAP_DAYS,
 ) -> None:
     """Main function to fetch and save stablecoin data.
 
+    In incremental mode only rows from the stored watermark minus
+    ``overlap_days`` onwards are processed and upserted into the existing
+    dataset, rewriting only the partitions they fall in. DefiLlama's
+    aggregate endpoint has no date filter, so the payload itself is still
+    the full history.
+
     Args:
         start_date: Start date in YYYY-MM-DD format
         end_date: End date in YYYY-MM-DD format
+        incremental: Only process and upsert rows after the stored watermark
+        overlap_days: Days before the watermark to re-process for revisions
     """
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    async with httpx.AsyncClient() as client:
+    if incremental:
+        migrate_legacy(OUTPUT_PATH, "timestamp")
+        start_date = incremental_start(OUTPUT_PATH, "timestamp", start_date, overlap_days)
+    async with cached_async_client() as client:
         try:
             raw_data = await fetch_stablecoin_data(client)
             df = process_stablecoin_data(raw_data, start_date, end_date)
-            df.to_parquet(
-                OUTPUT_FILE,
-                compression="gzip",
-                index=False,
-            )
-            logger.info(f"Saved {len(df)} records to {OUTPUT_FILE}")
+            if incremental:
+                partitions = upsert_dataset(df, OUTPUT_PATH, "timestamp")
+            else:
+                partitions = write_dataset(df, OUTPUT_PATH, "timestamp", overwrite=True)
+            logger.info(f"Saved {len(df)} records in {len(partitions)} partitions to {OUTPUT_PATH}")
         except httpx.HTTPError as e:
             logger.error(f"Failed to fetch data: {e}")
             raise
@@ -140,6 +169,17 @@ if __name__ == "__main__":
         default=DEFAULT_END_DATE,
         help="End date (YYYY-MM-DD)",
     )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only fetch rows after the last stored date",
+    )
+    parser.add_argument(
+        "--overlap-days",
+        type=int,
+        default=DEFAULT_OVERLAP_DAYS,
+        help="Days before the last stored date to re-fetch in incremental mode",
+    )
     args = parser.parse_args()
     import asyncio
-    asyncio.run(main(args.start, args.end)) 
\ No newline at end of file
+    asyncio.run(main(args.start, args.end, args.incremental, args.overlap_days))
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""Fetch a per-token, per-chain stablecoin panel from DefiLlama API.
+
+This module builds a long-format token x chain x day panel of circulating
+supply from DefiLlama's per-asset endpoint (``/stablecoin/{id}``). Each
+token's response is parsed incrementally with ijson into columnar buffers,
+converted to a DataFrame with one vectorised timestamp conversion and
+appended to the output parquet as its own row group, so peak memory is
+bounded by one token's history rather than the full nested payload.
+
+Example:
+    $ python fetch_stablecoin_panel.py --tokens USDT USDC DAI --start 2023-01-01
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+from array import array
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Union
+
+import httpx
+import ijson
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from tenacity import retry, stop_after_attempt, wait_exponential
+
+from scripts.ingest.fetch_stablecoin_caps import parse_date
+from scripts.utils.http_cache import cached_async_client
+from scripts.utils.instrument import instrumented
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFILLAMA_ASSETS_URL = "https://stablecoins.llama.fi/stablecoins"
+DEFILLAMA_ASSET_URL = "https://stablecoins.llama.fi/stablecoin/{asset_id}"
+DEFAULT_TOKENS = ["USDT", "USDC", "DAI", "FDUSD", "USDe"]
+DEFAULT_PEG_TYPE = "peggedUSD"
+DEFAULT_START_DATE = "2018-01-01"
+DEFAULT_END_DATE = datetime.now().strftime("%Y-%m-%d")
+OUTPUT_DIR = Path("data/raw")
+OUTPUT_FILE = OUTPUT_DIR / "stablecoin_panel.parq"
+
+PANEL_SCHEMA = pa.schema(
+    [
+        ("date", pa.timestamp("s")),
+        ("token_id", pa.string()),
+        ("symbol", pa.string()),
+        ("chain", pa.string()),
+        ("circulating", pa.float64()),
+    ]
+)
+
+_CHAIN_PREFIX = "chainBalances."
+_ITEM_SUFFIX = ".tokens.item"
+
+
+class ChainBalanceBuffer:
+    """Columnar buffers for one token's per-chain history.
+
+    Rows are accumulated in typed arrays (chain code, UNIX timestamp, value)
+    rather than as Python dicts, and turned into a DataFrame in one step.
+    """
+
+    def __init__(self) -> None:
+        self.chains: Dict[str, int] = {}
+        self.chain_codes = array("i")
+        self.timestamps = array("q")
+        self.values = array("d")
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def append(self, chain: str, ts: int, value: float) -> None:
+        """Append one (chain, timestamp, value) observation."""
+        code = self.chains.setdefault(chain, len(self.chains))
+        self.chain_codes.append(code)
+        self.timestamps.append(ts)
+        self.values.append(value)
+
+    def to_frame(
+        self,
+        token_id: str,
+        symbol: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """Convert the buffers to a long-format DataFrame.
+
+        Args:
+            token_id: DefiLlama asset ID
+            symbol: Token symbol
+            start_date: Optional start date (YYYY-MM-DD)
+            end_date: Optional end date (YYYY-MM-DD)
+
+        Returns:
+            DataFrame with columns date, token_id, symbol, chain, circulating
+        """
+        timestamps = np.frombuffer(self.timestamps, dtype="int64")
+        mask = np.ones(len(timestamps), dtype=bool)
+        if start_date:
+            mask &= timestamps >= parse_date(start_date)
+        if end_date:
+            mask &= timestamps <= parse_date(end_date)
+
+        chain_names = sorted(self.chains, key=self.chains.get)
+        codes = np.frombuffer(self.chain_codes, dtype="int32")[mask]
+        df = pd.DataFrame(
+            {
+                "date": pd.to_datetime(timestamps[mask], unit="s"),
+                "token_id": token_id,
+                "symbol": symbol,
+                "chain": np.asarray(chain_names, dtype=object)[codes],
+                "circulating": np.frombuffer(self.values, dtype="float64")[mask],
+            }
+        )
+        return df.sort_values(["chain", "date"], kind="stable").reset_index(drop=True)
+
+
+class ChainBalanceParser:
+    """Incremental consumer of ijson events from a ``/stablecoin/{id}`` payload.
+
+    Only ``chainBalances.<chain>.tokens[*].date`` and
+    ``chainBalances.<chain>.tokens[*].circulating.<peg_type>`` are kept; the
+    aggregated ``tokens`` array and per-chain bridge details are skipped.
+
+    Args:
+        peg_type: Peg key to read from ``circulating`` (e.g. ``peggedUSD``)
+    """
+
+    def __init__(self, peg_type: str = DEFAULT_PEG_TYPE) -> None:
+        self.buffer = ChainBalanceBuffer()
+        self._date_suffix = _ITEM_SUFFIX + ".date"
+        self._value_suffix = _ITEM_SUFFIX + ".circulating." + peg_type
+        self._ts: Optional[int] = None
+        self._value = 0.0
+
+    def feed(self, prefix: str, event: str, value) -> None:
+        """Consume one ``(prefix, event, value)`` tuple from ``ijson.parse``."""
+        if not prefix.startswith(_CHAIN_PREFIX):
+            return
+        if prefix.endswith(_ITEM_SUFFIX):
+            if event == "start_map":
+                self._ts, self._value = None, 0.0
+            elif event == "end_map" and self._ts is not None:
+                chain = prefix[len(_CHAIN_PREFIX) : -len(_ITEM_SUFFIX)]
+                self.buffer.append(chain, self._ts, self._value)
+        elif prefix.endswith(self._date_suffix):
+            self._ts = int(value)
+        elif prefix.endswith(self._value_suffix) and value is not None:
+            self._value = float(value)
+
+
+@instrumented
+def parse_token_history(source, peg_type: str = DEFAULT_PEG_TYPE) -> ChainBalanceBuffer:
+    """Parse a ``/stablecoin/{id}`` payload from a bytes or file-like source.
+
+    Args:
+        source: Raw JSON bytes or a binary file-like object
+        peg_type: Peg key to read from ``circulating``
+
+    Returns:
+        Filled column buffers
+    """
+    parser = ChainBalanceParser(peg_type)
+    for prefix, event, value in ijson.parse(source, use_float=True):
+        parser.feed(prefix, event, value)
+    return parser.buffer
+
+
+class _AsyncByteReader:
+    """Expose an async byte iterator through the ``read`` API ijson expects."""
+
+    def __init__(self, chunks: AsyncIterator[bytes]) -> None:
+        self._chunks = chunks
+
+    async def read(self, size: int = -1) -> bytes:
+        # ijson probes the stream type with read(0) and discards the result
+        if size == 0:
+            return b""
+        # An empty chunk would signal EOF to ijson, so skip over any
+        async for chunk in self._chunks:
+            if chunk:
+                return chunk
+        return b""
+
+
+async def fetch_stablecoin_assets(client: httpx.AsyncClient) -> List[dict]:
+    """Fetch the list of stablecoin assets tracked by DefiLlama.
+
+    Args:
+        client: Async HTTP client instance
+    Returns:
+        List of asset dicts (id, name, symbol, pegType, ...)
+    Raises:
+        httpx.HTTPError: If the API request fails
+    """
+    response = await client.get(DEFILLAMA_ASSETS_URL)
+    response.raise_for_status()
+    return response.json()["peggedAssets"]
+
+
+def select_assets(
+    assets: Iterable[dict],
+    symbols: Optional[Iterable[str]] = None,
+    peg_type: str = DEFAULT_PEG_TYPE,
+) -> List[dict]:
+    """Pick the assets to ingest by symbol and peg type.
+
+    Args:
+        assets: Asset dicts from ``fetch_stablecoin_assets``
+        symbols: Symbols to keep (case-insensitive); all assets if None
+        peg_type: Peg type to keep
+
+    Returns:
+        Matching asset dicts
+    """
+    wanted = {s.upper() for s in symbols} if symbols else None
+    selected = [
+        asset
+        for asset in assets
+        if asset.get("pegType") == peg_type
+        and (wanted is None or str(asset.get("symbol", "")).upper() in wanted)
+    ]
+    if wanted:
+        missing = wanted - {str(a["symbol"]).upper() for a in selected}
+        if missing:
+            logger.warning(f"No DefiLlama asset found for: {', '.join(sorted(missing))}")
+    return selected
+
+
+@retry(
+    wait=wait_exponential(multiplier=1, min=4, max=10),
+    stop=stop_after_attempt(3),
+    reraise=True,
+)
+@instrumented
+async def fetch_token_history(
+    client: httpx.AsyncClient,
+    asset_id: str,
+    peg_type: str = DEFAULT_PEG_TYPE,
+) -> ChainBalanceBuffer:
+    """Stream and parse one asset's per-chain history with retry logic.
+
+    Args:
+        client: Async HTTP client instance
+        asset_id: DefiLlama asset ID
+        peg_type: Peg key to read from ``circulating``
+    Returns:
+        Filled column buffers
+    Raises:
+        httpx.HTTPError: If the API request fails after retries
+    """
+    parser = ChainBalanceParser(peg_type)
+    url = DEFILLAMA_ASSET_URL.format(asset_id=asset_id)
+    async with client.stream("GET", url) as response:
+        response.raise_for_status()
+        reader = _AsyncByteReader(response.aiter_bytes())
+        async for prefix, event, value in ijson.parse_async(reader, use_float=True):
+            parser.feed(prefix, event, value)
+    return parser.buffer
+
+
+@instrumented
+async def write_panel(
+    client: httpx.AsyncClient,
+    assets: List[dict],
+    output_file: Union[str, Path],
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    peg_type: str = DEFAULT_PEG_TYPE,
+) -> int:
+    """Fetch each asset in turn and append it to the output parquet.
+
+    Assets are processed one at a time so only one token's history is held
+    in memory; each token becomes one row group in the output file. The
+    panel is written to a temporary file that replaces ``output_file`` only
+    once every asset is in, so a failed run leaves the previous panel intact.
+
+    Args:
+        client: Async HTTP client instance
+        assets: Asset dicts from ``select_assets``
+        output_file: Path of the parquet file to write
+        start_date: Optional start date (YYYY-MM-DD)
+        end_date: Optional end date (YYYY-MM-DD)
+        peg_type: Peg key to read from ``circulating``
+
+    Returns:
+        Number of rows written
+    """
+    rows = 0
+    tmp = Path(output_file).with_suffix(".tmp")
+    try:
+        with pq.ParquetWriter(tmp, PANEL_SCHEMA, compression="zstd") as writer:
+            for asset in assets:
+                buffer = await fetch_token_history(client, str(asset["id"]), peg_type)
+                df = buffer.to_frame(str(asset["id"]), asset["symbol"], start_date, end_date)
+                writer.write_table(
+                    pa.Table.from_pandas(df, schema=PANEL_SCHEMA, preserve_index=False)
+                )
+                rows += len(df)
+                logger.info(f"{asset['symbol']}: {len(df)} rows across {len(buffer.chains)} chains")
+        os.replace(tmp, output_file)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return rows
+
+
+async def main(
+    start_date: str = DEFAULT_START_DATE,
+    end_date: str = DEFAULT_END_DATE,
+    tokens: Optional[List[str]] = None,
+    peg_type: str = DEFAULT_PEG_TYPE,
+) -> None:
+    """Main function to fetch and save the stablecoin panel.
+
+    Args:
+        start_date: Start date in YYYY-MM-DD format
+        end_date: End date in YYYY-MM-DD format
+        tokens: Token symbols to ingest; all tokens with ``peg_type`` if empty
+        peg_type: Peg type to ingest
+    """
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    async with cached_async_client(timeout=60.0) as client:
+        try:
+            assets = select_assets(await fetch_stablecoin_assets(client), tokens, peg_type)
+            rows = await write_panel(client, assets, OUTPUT_FILE, start_date, end_date, peg_type)
+            logger.info(f"Saved {rows} records for {len(assets)} tokens to {OUTPUT_FILE}")
+        except httpx.HTTPError as e:
+            logger.error(f"Failed to fetch data: {e}")
+            raise
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch per-token, per-chain stablecoin panel")
+    parser.add_argument(
+        "--start",
+        default=DEFAULT_START_DATE,
+        help="Start date (YYYY-MM-DD)",
+    )
+    parser.add_argument(
+        "--end",
+        default=DEFAULT_END_DATE,
+        help="End date (YYYY-MM-DD)",
+    )
+    parser.add_argument(
+        "--tokens",
+        nargs="*",
+        default=DEFAULT_TOKENS,
+        help="Token symbols to ingest (empty for all)",
+    )
+    parser.add_argument(
+        "--peg-type",
+        default=DEFAULT_PEG_TYPE,
+        help="DefiLlama peg type to ingest",
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.start, args.end, args.tokens, args.peg_type))
@@ -1,21 +1,35 @@
 #!/usr/bin/env python3
 """Fetch Treasury yield data from FRED API.
 
-This script fetches Treasury yields from the FRED API and saves them to a parquet file.
+This script fetches Treasury yields from the FRED API and saves them to a
+year/month-partitioned parquet dataset (see ``scripts.utils.io``).
 It includes yields for 3-month, 1-year, 2-year, 5-year, 10-year, and 30-year Treasuries,
 as well as common yield spreads (10Y-2Y, 10Y-3M, 2Y-3M).
 
 Example:
     $ python fetch_treasury_yields.py --start 2023-01-01 --end 2024-03-01
+    $ python fetch_treasury_yields.py --async --max-concurrency 8 --rate-limit 2
+    $ python fetch_treasury_yields.py --incremental
 """
 
 import argparse
+import asyncio
 import logging
 from datetime import datetime
 from pathlib import Path
+from typing import Dict
 
 import pandas as pd
-from scripts.utils.fred_api import fetch_treasury_yields, TREASURY_SERIES, YIELD_SPREADS
+from scripts.utils.fred_api import (
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_REQUESTS_PER_SECOND,
+    TREASURY_SERIES,
+    YIELD_SPREADS,
+    fetch_treasury_yields,
+    fetch_treasury_yields_async,
+)
+from scripts.utils.incremental import DEFAULT_OVERLAP_DAYS, incremental_start
+from scripts.utils.io import migrate_legacy, upsert_dataset, write_dataset
 
 # Configure logging
 logging.basicConfig(
@@ -28,7 +42,19 @@ logger = logging.getLogger(__name__)
 DEFAULT_START_DATE = "2018-01-01"
 DEFAULT_END_DATE = datetime.now().strftime("%Y-%m-%d")
 OUTPUT_DIR = Path("data/raw")
-OUTPUT_FILE = OUTPUT_DIR / "treasury_yields.parq"
+OUTPUT_PATH = OUTPUT_DIR / "treasury_yields"
+
+
+def column_descriptions() -> Dict[str, str]:
+    """Describe each Treasury series and spread column.
+
+    Returns:
+        Mapping of column name to description
+    """
+    descriptions = dict(TREASURY_SERIES)
+    for long_term, short_term, spread_name in YIELD_SPREADS:
+        descriptions[spread_name] = f"{TREASURY_SERIES[long_term]} - {TREASURY_SERIES[short_term]}"
+    return descriptions
 
 
 def add_metadata(df: pd.DataFrame) -> pd.DataFrame:
@@ -40,41 +66,67 @@ def add_metadata(df: pd.DataFrame) -> pd.DataFrame:
     Returns:
         DataFrame with added metadata
     """
-    # Add series descriptions
-    for series_id, description in TREASURY_SERIES.items():
-        if series_id in df.columns:
-            df[series_id].attrs["description"] = description
-
-    # Add spread descriptions
-    for long_term, short_term, spread_name in YIELD_SPREADS:
-        if spread_name in df.columns:
-            df[spread_name].attrs["description"] = f"{TREASURY_SERIES[long_term]} - {TREASURY_SERIES[short_term]}"
+    for column, description in column_descriptions().items():
+        if column in df.columns:
+            df[column].attrs["description"] = description
 
     return df
 
 
-def main(start_date: str = DEFAULT_START_DATE, end_date: str = DEFAULT_END_DATE) -> None:
+def main(
+    start_date: str = DEFAULT_START_DATE,
+    end_date: str = DEFAULT_END_DATE,
+    use_async: bool = False,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+    incremental: bool = False,
+    overlap_days: int = DEFAULT_OVERLAP_DAYS,
+) -> None:
     """Main function to fetch and save Treasury yield data.
 
+    In incremental mode only observations from the stored watermark minus
+    ``overlap_days`` onwards are requested and upserted into the existing
+    dataset, rewriting only the partitions they fall in.
+
     Args:
         start_date: Start date in YYYY-MM-DD format
         end_date: End date in YYYY-MM-DD format
+        use_async: Fetch all series concurrently instead of one at a time
+        max_concurrency: Maximum in-flight requests in async mode
+        requests_per_second: Request rate limit in async mode
+        incremental: Only fetch observations after the stored watermark
+        overlap_days: Days before the watermark to re-fetch for revisions
     """
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    if incremental:
+        migrate_legacy(OUTPUT_PATH, "date")
+        start_date = incremental_start(OUTPUT_PATH, "date", start_date, overlap_days)
     
     try:
         # Fetch data
-        yields = fetch_treasury_yields(start_date, end_date)
+        if use_async:
+            yields = asyncio.run(
+                fetch_treasury_yields_async(
+                    start_date,
+                    end_date,
+                    max_concurrency=max_concurrency,
+                    requests_per_second=requests_per_second,
+                )
+            )
+        else:
+            yields = fetch_treasury_yields(start_date, end_date)
         
         # Add metadata
         yields = add_metadata(yields)
-        
-        # Save to parquet with gzip compression
-        yields.to_parquet(
-            OUTPUT_FILE,
-            compression="gzip",
-        )
-        logger.info(f"Saved Treasury yields to {OUTPUT_FILE}")
+
+        # Save as a partitioned dataset, merging into stored history if incremental
+        if incremental:
+            upsert_dataset(yields, OUTPUT_PATH, "date", descriptions=column_descriptions())
+        else:
+            write_dataset(
+                yields, OUTPUT_PATH, "date", overwrite=True, descriptions=column_descriptions()
+            )
+        logger.info(f"Saved Treasury yields to {OUTPUT_PATH}")
         
         # Print summary statistics
         logger.info("\nSummary statistics:")
@@ -102,6 +154,43 @@ if __name__ == "__main__":
         default=DEFAULT_END_DATE,
         help="End date (YYYY-MM-DD)",
     )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Fetch all series concurrently",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=DEFAULT_MAX_CONCURRENCY,
+        help="Maximum in-flight requests in async mode",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=DEFAULT_REQUESTS_PER_SECOND,
+        help="Maximum requests per second in async mode",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only fetch observations after the last stored date",
+    )
+    parser.add_argument(
+        "--overlap-days",
+        type=int,
+        default=DEFAULT_OVERLAP_DAYS,
+        help="Days before the last stored date to re-fetch in incremental mode",
+    )
     
     args = parser.parse_args()
-    main(args.start, args.end) 
\ No newline at end of file
+    main(
+        args.start,
+        args.end,
+        args.use_async,
+        args.max_concurrency,
+        args.rate_limit,
+        args.incremental,
+        args.overlap_days,
+    )
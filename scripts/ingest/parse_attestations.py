@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""Parse reserve-composition tables from issuer attestation reports.
+
+Circle, Tether and Paxos publish monthly attestations whose reserve tables
+list holdings by instrument: Treasury bills, reverse repurchase agreements,
+cash and bank deposits, money market funds and so on. This stage reads a
+local directory of the reports. It extracts the text of each page
+(pdfplumber for PDFs; ``.txt`` exports such as ``pdftotext -layout`` output
+are read as they are) and maps each table row to an asset class by its
+label. It writes a normalised issuer x month x asset-class parquet.
+
+Files are parsed in a process pool. Each parse result is cached as JSON,
+keyed by the SHA-256 of the file's content and the parser version. A rerun
+over hundreds of reports therefore parses only new or changed files, and
+renaming a file costs nothing.
+
+Needs ``pdfplumber`` for PDFs (``pip install -e ".[attestations]"``).
+
+Example:
+    $ python scripts/ingest/parse_attestations.py --input-dir external/attestations
+    $ python scripts/ingest/parse_attestations.py --workers 8 --force
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+from scripts.utils.instrument import instrumented
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Constants
+INPUT_DIR = Path("external/attestations")
+OUTPUT_FILE = Path("data/raw/attestations.parq")
+CACHE_DIR = Path(os.getenv("ATTESTATION_CACHE_DIR", "data/cache/attestations"))
+# Bump to re-parse every cached file after a change to the parsing rules
+PARSER_VERSION = 2
+ASSET_CLASSES = ("tbills", "repo", "cash", "mmf", "other")
+ISSUERS: Dict[str, str] = {
+    "circle": "Circle",
+    "usdc": "Circle",
+    "tether": "Tether",
+    "usdt": "Tether",
+    "paxos": "Paxos",
+    "usdp": "Paxos",
+    "pyusd": "Paxos",
+}
+
+# Row label -> asset class; the first matching pattern wins, so the specific
+# ones (non-U.S. bills, reverse repo, funds) come before the generic ones
+ASSET_PATTERNS: List[Tuple[str, re.Pattern]] = [
+    ("other", re.compile(r"non[- ]?u\.?s\.? treasur", re.I)),
+    ("repo", re.compile(r"repurchase|\brepos?\b", re.I)),
+    ("mmf", re.compile(r"money market|reserve fund|government fund|\bmmfs?\b", re.I)),
+    ("tbills", re.compile(r"treasury bills?|\bt-bills?\b|u\.?s\.? treasur", re.I)),
+    ("cash", re.compile(r"\bcash\b|bank deposits?|deposits (at|with|in)", re.I)),
+    ("other", re.compile(r"commercial paper|certificates? of deposit|corporate bonds?|"
+                         r"precious metals?|bitcoin|secured loans?|other investments?|"
+                         r"municipal|agency securities", re.I)),
+]
+# Subtotal and total rows would double count their components
+TOTAL_PATTERN = re.compile(r"^\s*(sub)?total\b|\btotal (reserves?|assets|investments)\b", re.I)
+# An amount at the end of a line, with parentheses for negative values and
+# an optional % column. The number needs a currency sign, thousands
+# separators or decimals, so footnote markers like "(1)" and years in a
+# label ("maturing before 2025") are not amounts
+NUMBER = r"-?\d{1,3}(?:,\d{3})+(?:\.\d+)?|-?\d+\.\d+"
+AMOUNT_PATTERN = re.compile(rf"(\(?)(?:(?:US)?\$\s*((?:{NUMBER})|-?\d+)|((?:{NUMBER})))"
+                            r"\s*(\)?)(?:\s+\(?-?\d+(?:\.\d+)?\s*%\)?)?\s*$")
+# Footnote markers and years; never amounts, even after a currency sign
+NON_AMOUNT_PATTERN = re.compile(r"^\(\d{1,2}\)$|^(?:19|20)\d{2}$")
+UNIT_PATTERN = re.compile(r"\bin (thousands|millions|billions)\b|"
+                          r"\b(?:usd|us\$|\$) ?(thousands|millions|billions)\b", re.I)
+UNITS = {"thousands": 1e3, "millions": 1e6, "billions": 1e9}
+MONTHS = "january|february|march|april|may|june|july|august|september|october|november|december"
+# "March 31, 2024" or "31 March 2024"
+DATE = rf"(?:({MONTHS})\s+(\d{{1,2}}),?|(\d{{1,2}})\s+({MONTHS}),?)\s+(\d{{4}})"
+DATE_PATTERN = re.compile(rf"\b(?:as of|as at)\s+{DATE}", re.I)
+ANY_DATE_PATTERN = re.compile(rf"\b{DATE}", re.I)
+FILE_DATE_PATTERN = re.compile(r"(20\d{2})[-_.]?(0[1-9]|1[0-2])")
+
+
+class AttestationError(ValueError):
+    """Raised when a report has no recognisable issuer, date or reserve table."""
+
+
+def _pdf_text(path: Path) -> str:
+    """Text of every page of a PDF, keeping the row layout of its tables."""
+    import pdfplumber
+
+    with pdfplumber.open(path) as pdf:
+        return "\n".join(page.extract_text(layout=True) or "" for page in pdf.pages)
+
+
+def _plain_text(path: Path) -> str:
+    return path.read_text(encoding="utf-8", errors="replace")
+
+
+# File suffix -> text extractor
+EXTRACTORS: Dict[str, Callable[[Path], str]] = {
+    ".pdf": _pdf_text,
+    ".txt": _plain_text,
+}
+
+
+def file_key(path: Union[str, Path]) -> str:
+    """Cache key of a report: the SHA-256 of its content and the parser version."""
+    digest = hashlib.sha256(f"v{PARSER_VERSION}:".encode())
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def detect_issuer(text: str, name: str = "") -> str:
+    """Issuer named most often in the report, or in its file name.
+
+    Raises:
+        AttestationError: If no known issuer is mentioned
+    """
+    counts: Dict[str, int] = {}
+    for word in re.findall(r"[a-z]+", text.lower()):
+        if word in ISSUERS:
+            counts[ISSUERS[word]] = counts.get(ISSUERS[word], 0) + 1
+    if counts:
+        return max(counts, key=counts.get)
+    for word in re.findall(r"[a-z]+", name.lower()):
+        if word in ISSUERS:
+            return ISSUERS[word]
+    raise AttestationError(f"No known issuer in {name or 'report'}")
+
+
+def detect_date(text: str, name: str = "") -> pd.Timestamp:
+    """Reporting date: ``as of <date>``, else the first date in the text or file name.
+
+    Raises:
+        AttestationError: If no date is found
+    """
+    match = DATE_PATTERN.search(text) or ANY_DATE_PATTERN.search(text)
+    if match:
+        month, day, day_first, month_second, year = match.groups()
+        return pd.Timestamp(datetime.strptime(
+            f"{month or month_second} {day or day_first} {year}", "%B %d %Y"))
+    match = FILE_DATE_PATTERN.search(name)
+    if match:
+        return pd.Timestamp(int(match.group(1)), int(match.group(2)), 1) + pd.offsets.MonthEnd(0)
+    raise AttestationError(f"No reporting date in {name or 'report'}")
+
+
+def asset_class(label: str) -> Optional[str]:
+    """Asset class of a reserve table row, or None for rows that are not holdings."""
+    if TOTAL_PATTERN.search(label):
+        return None
+    for name, pattern in ASSET_PATTERNS:
+        if pattern.search(label):
+            return name
+    return None
+
+
+def find_amount(line: str) -> Optional[re.Match]:
+    """Match of the amount at the end of a line, or None if it has none."""
+    match = AMOUNT_PATTERN.search(line)
+    if match and NON_AMOUNT_PATTERN.match(re.sub(r"US|[$\s]", "", match.group(0))):
+        return None
+    return match
+
+
+def parse_amount(token: str) -> float:
+    """Parse ``$1,234.5`` or ``(1,234)`` into a float."""
+    match = find_amount(token.strip())
+    if not match:
+        raise ValueError(f"Not an amount: {token!r}")
+    opening, signed, number, closing = match.groups()
+    value = float((signed or number).replace(",", ""))
+    return -value if opening and closing else value
+
+
+def parse_text(text: str, name: str = "") -> List[Dict]:
+    """Reserve holdings by asset class from the text of one report.
+
+    Each line ending in an amount is a table row. Its label (the text before
+    the amount) gives the asset class. A label line of a known class without
+    an amount carries its class to the next line, for rows whose amount is
+    on a continuation line. Amounts are scaled by the most recent
+    ``in millions``-style unit note, and rows of the same class are summed.
+
+    Args:
+        text: Report text, one table row per line
+        name: File name, for fallbacks and messages
+
+    Returns:
+        One record per asset class with ``issuer``, ``report_date``,
+        ``asset_class`` and ``amount_usd``
+
+    Raises:
+        AttestationError: If no issuer, date or holdings are found
+    """
+    issuer = detect_issuer(text, name)
+    report_date = detect_date(text, name)
+    scale = 1.0
+    amounts: Dict[str, float] = {}
+    carried: Optional[str] = None
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        unit = UNIT_PATTERN.search(line)
+        if unit:
+            scale = UNITS[(unit.group(1) or unit.group(2)).lower()]
+        match = find_amount(line)
+        label = (line[: match.start()] if match else line).strip(" .:$\t")
+        cls = asset_class(label)
+        if not match:
+            carried = cls
+            continue
+        if cls is None and not TOTAL_PATTERN.search(label):
+            cls = carried
+        carried = None
+        if cls is None:
+            continue
+        amounts[cls] = amounts.get(cls, 0.0) + parse_amount(line[match.start():]) * scale
+    if not amounts:
+        raise AttestationError(f"No reserve table rows in {name or 'report'}")
+    return [
+        {"issuer": issuer, "report_date": report_date.strftime("%Y-%m-%d"),
+         "asset_class": cls, "amount_usd": amounts[cls]}
+        for cls in ASSET_CLASSES if cls in amounts
+    ]
+
+
+def parse_file(path: Union[str, Path]) -> List[Dict]:
+    """Extract and parse one report; runs in a worker process."""
+    path = Path(path)
+    return parse_text(EXTRACTORS[path.suffix.lower()](path), path.name)
+
+
+def report_files(input_dir: Union[str, Path]) -> List[Path]:
+    """Reports under ``input_dir`` with a supported suffix, sorted by path."""
+    return sorted(p for p in Path(input_dir).rglob("*")
+                  if p.is_file() and p.suffix.lower() in EXTRACTORS)
+
+
+def _read_entry(path: Path) -> Optional[List[Dict]]:
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)["records"]
+
+
+def _write_entry(path: Path, source: Path, records: List[Dict]) -> None:
+    """Atomically write one cache entry."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump({"source": str(source), "parser_version": PARSER_VERSION, "records": records}, f)
+    os.replace(tmp, path)
+
+
+@instrumented
+def parse_directory(
+    input_dir: Union[str, Path] = INPUT_DIR,
+    cache_dir: Union[str, Path] = CACHE_DIR,
+    workers: Optional[int] = None,
+    force: bool = False,
+) -> pd.DataFrame:
+    """Parse every report in a directory, reusing cached results of unchanged files.
+
+    Files that fail to parse are logged and skipped. They are not cached,
+    so they are tried again on the next run.
+
+    Args:
+        input_dir: Directory of attestation reports, searched recursively
+        cache_dir: Directory of per-file parse results
+        workers: Processes to parse with (default: CPU count)
+        force: Re-parse every file, ignoring the cache
+
+    Returns:
+        Normalised frame, see ``normalise``
+    """
+    cache_dir = Path(cache_dir)
+    files = report_files(input_dir)
+    records: List[Dict] = []
+    pending: Dict[Path, Path] = {}
+    for path in files:
+        entry = cache_dir / f"{file_key(path)}.json"
+        cached = None if force else _read_entry(entry)
+        if cached is None:
+            pending[path] = entry
+        else:
+            records.extend({**record, "file": path.name} for record in cached)
+
+    failed = 0
+    if pending:
+        workers = min(workers or os.cpu_count() or 1, len(pending))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(parse_file, path): path for path in pending}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    parsed = future.result()
+                except Exception as e:
+                    failed += 1
+                    logger.warning(f"Could not parse {path}: {e}")
+                    continue
+                _write_entry(pending[path], path, parsed)
+                records.extend({**record, "file": path.name} for record in parsed)
+    logger.info(f"{len(files)} reports: {len(pending) - failed} parsed, "
+                f"{len(files) - len(pending)} from cache, {failed} failed")
+    return normalise(records)
+
+
+def normalise(records: Sequence[Dict]) -> pd.DataFrame:
+    """One row per issuer, month and asset class.
+
+    When several reports cover the same issuer and month (a restatement, or
+    a mid-month report), the one with the latest reporting date wins, then
+    the last by file name.
+
+    Args:
+        records: Parsed records with ``issuer``, ``report_date``,
+            ``asset_class``, ``amount_usd`` and ``file``
+
+    Returns:
+        Frame with ``issuer``, ``month`` (first day), ``report_date``,
+        ``asset_class``, ``amount_usd``, ``share`` of the month's parsed
+        reserves and the source ``file``, sorted by issuer, month and class
+    """
+    columns = ["issuer", "month", "report_date", "asset_class", "amount_usd", "share", "file"]
+    if not records:
+        return pd.DataFrame(columns=columns)
+    df = pd.DataFrame.from_records(records)
+    df["report_date"] = pd.to_datetime(df["report_date"])
+    df["month"] = df["report_date"].dt.to_period("M").dt.to_timestamp()
+    # Keep every class of the winning report, not the latest row per class
+    latest = df.sort_values(["report_date", "file"]).groupby(["issuer", "month"])["file"].last()
+    df = df.merge(latest.rename("winner"), left_on=["issuer", "month"], right_index=True)
+    df = df[df["file"] == df["winner"]].drop(columns="winner")
+    df["share"] = df["amount_usd"] / df.groupby(["issuer", "month"])["amount_usd"].transform("sum")
+    df["asset_class"] = pd.Categorical(df["asset_class"], categories=ASSET_CLASSES)
+    df = df.sort_values(["issuer", "month", "asset_class"]).reset_index(drop=True)
+    df["asset_class"] = df["asset_class"].astype(str)
+    return df[columns]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse reserve tables from attestation reports")
+    parser.add_argument("--input-dir", default=str(INPUT_DIR),
+                        help="Directory of attestation PDFs or text exports")
+    parser.add_argument("--output", default=str(OUTPUT_FILE), help="Normalised parquet output")
+    parser.add_argument("--cache-dir", default=str(CACHE_DIR), help="Per-file parse cache")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Re-parse every file")
+    args = parser.parse_args()
+
+    if not Path(args.input_dir).is_dir():
+        raise SystemExit(f"No attestation directory at {args.input_dir}")
+    df = parse_directory(args.input_dir, args.cache_dir, args.workers, args.force)
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(args.output, index=False)
+    logger.info(f"Wrote {len(df)} rows for {df['issuer'].nunique()} issuers to {args.output}")
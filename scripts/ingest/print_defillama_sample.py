@@ -1,12 +1,13 @@
 #!/usr/bin/env python3
-import httpx
 import asyncio
 import json
 
+from scripts.utils.http_cache import cached_async_client
+
 API_URL = "https://stablecoins.llama.fi/stablecoincharts/all"
 
 async def main():
-    async with httpx.AsyncClient() as client:
+    async with cached_async_client() as client:
         resp = await client.get(API_URL)
         resp.raise_for_status()
         data = resp.json()
@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+"""Per-token features and the feature store of the daily panel.
+
+``token_features`` reads the token x chain panel written by
+``fetch_stablecoin_panel.py`` (one row per date, token and chain) and
+derives, for each token and chain in date order:
+
+* ``log_circulating``, ``d_circulating``, ``pct_change`` and
+  ``d_log_circulating``
+* the rolling mean and standard deviation of ``d_log_circulating`` over each
+  of ``WINDOWS`` rows (``d_log_circulating_mean_7`` etc.), with a full window
+  required as in pandas' ``rolling(w)``
+* ``token_circulating``, the token's supply summed over chains on the date,
+  and ``chain_share``, the chain's share of it
+
+The pandas backend computes these eagerly. The Polars backend expresses them
+as one LazyFrame query over ``scan_parquet``, so Polars plans the whole
+computation, runs it across cores and, with ``--streaming``, writes the
+result in batches without holding the panel in memory. Both backends produce
+the same frame.
+
+The feature store holds the series the analysis scripts derive from the
+daily panel: log market cap and its changes, yield levels, changes and
+spreads, and rolling volatilities. ``FEATURES`` declares each one as a panel
+column, a transform and a window, from which its lookback follows.
+``--store`` materialises them to a partitioned dataset. Later runs recompute
+only the rows from the stored watermark minus ``DEFAULT_OVERLAP_DAYS``,
+reading just ``lookback`` earlier rows per feature, and upsert them; a
+changed definition rebuilds the store. The VAR, Granger and event-study
+scripts read features by name with ``load_features``.
+
+Example:
+    $ python -m scripts.make_features
+    $ python -m scripts.make_features --backend polars --streaming
+    $ python -m scripts.make_features --store          # refresh the store's tail
+    $ python -m scripts.make_features --store --full   # recompute all of it
+
+    >>> from scripts.make_features import load_features, token_features
+    >>> features = token_features(pd.read_parquet(TOKEN_PANEL_FILE), backend="polars")
+    >>> changes = load_features(["chg_log_mcap", "chg_DGS10"], trading_days_only=True)
+"""
+
+import argparse
+import json
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from scripts.panel import (
+    BACKENDS,
+    PROCESSED_DIR,
+    SPREAD_COLUMNS,
+    TOKEN_PANEL_FILE,
+    YIELD_COLUMNS,
+    ensure_panel,
+    load_panel,
+    read_manifest,
+)
+from scripts.utils.incremental import DEFAULT_OVERLAP_DAYS
+from scripts.utils.instrument import instrumented
+from scripts.utils.io import read_dataset, upsert_dataset, write_dataset
+
+if TYPE_CHECKING:
+    import polars as pl
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Constants
+WINDOWS = (7, 30)
+KEYS = ["symbol", "chain"]
+FEATURES_FILE = PROCESSED_DIR / "token_features.parquet"
+FEATURE_STORE = PROCESSED_DIR / "features"
+# Bump to rebuild the store after changing how a transform is computed
+FEATURE_STORE_VERSION = 1
+
+
+def feature_columns(windows: Sequence[int] = WINDOWS) -> List[str]:
+    """Names of the derived columns, in output order."""
+    rolling = [f"d_log_circulating_{stat}_{w}" for w in windows for stat in ("mean", "std")]
+    return ["log_circulating", "d_circulating", "pct_change", "d_log_circulating", *rolling,
+            "token_circulating", "chain_share"]
+
+
+def _features_pandas(df: pd.DataFrame, windows: Sequence[int]) -> pd.DataFrame:
+    df = df.sort_values([*KEYS, "date"], kind="stable").reset_index(drop=True)
+    groups = df.groupby(KEYS, sort=False)["circulating"]
+    circulating = df["circulating"].astype("float64")
+    df["log_circulating"] = np.log(circulating.where(circulating > 0))
+    df["d_circulating"] = groups.diff()
+    df["pct_change"] = circulating / groups.shift() - 1
+    df["d_log_circulating"] = df.groupby(KEYS, sort=False)["log_circulating"].diff()
+    changes = df.groupby(KEYS, sort=False)["d_log_circulating"]
+    for w in windows:
+        # Rolling results are indexed by (symbol, chain, row); align them on the row
+        df[f"d_log_circulating_mean_{w}"] = changes.rolling(w).mean().droplevel(KEYS)
+        df[f"d_log_circulating_std_{w}"] = changes.rolling(w).std().droplevel(KEYS)
+    df["token_circulating"] = df.groupby(["symbol", "date"])["circulating"].transform("sum")
+    df["chain_share"] = circulating / df["token_circulating"]
+    return df
+
+
+def token_features_query(
+    panel: "pl.LazyFrame", windows: Sequence[int] = WINDOWS
+) -> "pl.LazyFrame":
+    """The features of ``token_features`` as a single Polars query.
+
+    Args:
+        panel: Lazy long-format panel, e.g. ``pl.scan_parquet(TOKEN_PANEL_FILE)``
+        windows: Rolling window lengths in rows
+
+    Returns:
+        Lazy frame with the panel's columns followed by ``feature_columns``,
+        sorted by symbol, chain and date
+    """
+    import polars as pl
+
+    by = {"partition_by": KEYS}
+    circulating = pl.col("circulating").cast(pl.Float64)
+    changes = pl.col("d_log_circulating")
+    rolling = [
+        expr
+        for w in windows
+        for expr in (
+            changes.rolling_mean(w, min_samples=w).over(**by).alias(f"d_log_circulating_mean_{w}"),
+            changes.rolling_std(w, min_samples=w).over(**by).alias(f"d_log_circulating_std_{w}"),
+        )
+    ]
+    return (
+        panel.sort([*KEYS, "date"], maintain_order=True)
+        .with_columns(
+            pl.when(circulating > 0).then(circulating.log()).alias("log_circulating"),
+            circulating.diff().over(**by).alias("d_circulating"),
+            (circulating / circulating.shift().over(**by) - 1).alias("pct_change"),
+            circulating.sum().over(["symbol", "date"]).alias("token_circulating"),
+        )
+        .with_columns(
+            pl.col("log_circulating").diff().over(**by).alias("d_log_circulating"),
+            (circulating / pl.col("token_circulating")).alias("chain_share"),
+        )
+        .with_columns(rolling)
+        .select(pl.exclude(feature_columns(windows)), *feature_columns(windows))
+    )
+
+
+@instrumented
+def token_features(
+    df: pd.DataFrame, windows: Sequence[int] = WINDOWS, backend: str = "pandas"
+) -> pd.DataFrame:
+    """Per-token, per-chain features of a long-format panel.
+
+    Args:
+        df: Panel with ``date``, ``symbol``, ``chain`` and ``circulating``
+            columns, one row per date, token and chain
+        windows: Rolling window lengths in rows
+        backend: ``pandas`` or ``polars``
+
+    Returns:
+        The panel's columns followed by ``feature_columns``, sorted by
+        symbol, chain and date
+
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}; expected one of {BACKENDS}")
+    if backend == "pandas":
+        return _features_pandas(df.copy(), windows)
+
+    import polars as pl
+
+    out = token_features_query(pl.from_pandas(df).lazy(), windows).collect().to_pandas()
+    # Polars has no second-resolution datetimes; restore the input's unit
+    return out.astype({"date": df["date"].dtype})
+
+
+@instrumented
+def write_features(
+    path: Union[str, Path] = TOKEN_PANEL_FILE,
+    output: Union[str, Path] = FEATURES_FILE,
+    backend: str = "pandas",
+    streaming: bool = False,
+) -> Path:
+    """Compute the features of a token panel file and write them to parquet.
+
+    Args:
+        path: Token x chain panel written by ``fetch_stablecoin_panel.py``
+        output: Features file
+        backend: ``pandas`` or ``polars``
+        streaming: With Polars, process the panel in batches with the
+            streaming engine and write the result as it is produced
+
+    Returns:
+        Path of the written file
+    """
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    if backend == "pandas":
+        token_features(pd.read_parquet(path)).to_parquet(output, index=False)
+        return output
+
+    import polars as pl
+
+    query = token_features_query(pl.scan_parquet(path))
+    if streaming:
+        query.sink_parquet(output)
+    else:
+        query.collect().write_parquet(output)
+    return output
+
+
+def _log(values: pd.Series, window: int) -> pd.Series:
+    values = values.astype("float64")
+    return np.log(values.where(values > 0))
+
+
+# Transform name -> (function of the source column and window, lookback in rows)
+TRANSFORMS = {
+    "level": (lambda values, window: values, lambda window: 0),
+    "log": (_log, lambda window: 0),
+    "diff": (lambda values, window: values.diff(window), lambda window: window),
+    "log_diff": (lambda values, window: _log(values, window).diff(window), lambda window: window),
+    "pct_change_std": (lambda values, window: values.pct_change().rolling(window).std(),
+                       lambda window: window),
+    "pct_change_mean": (lambda values, window: values.pct_change().rolling(window).mean(),
+                        lambda window: window),
+}
+
+
+class Feature(NamedTuple):
+    """A stored series derived from one panel column."""
+
+    name: str
+    source: str
+    transform: str = "level"
+    window: int = 1
+    # Computed over Treasury trading days only, and missing on other days
+    trading_days: bool = False
+    description: str = ""
+
+    @property
+    def lookback(self) -> int:
+        """Rows before a date that its value depends on."""
+        return TRANSFORMS[self.transform][1](self.window)
+
+    def compute(self, values: pd.Series) -> pd.Series:
+        """Apply the transform to the source column."""
+        return TRANSFORMS[self.transform][0](values, self.window)
+
+
+FEATURES = [
+    Feature("log_mcap", "circulating_supply_usd", "log",
+            description="Log total stablecoin market cap"),
+    Feature("d_log_mcap", "circulating_supply_usd", "log_diff",
+            description="Daily change in log market cap"),
+    Feature("chg_log_mcap", "circulating_supply_usd", "log_diff", trading_days=True,
+            description="Change in log market cap since the previous trading day"),
+    Feature("mcap_vol_20", "circulating_supply_usd", "pct_change_std", 20, trading_days=True,
+            description="20-trading-day rolling volatility of market cap returns"),
+    *[Feature(col, col, description=f"{col} level, forward-filled over non-trading days")
+      for col in YIELD_COLUMNS + SPREAD_COLUMNS],
+    *[Feature(f"d_{col}", col, "diff", description=f"Daily change in {col}")
+      for col in YIELD_COLUMNS + SPREAD_COLUMNS],
+    *[Feature(f"chg_{col}", col, "diff", trading_days=True,
+              description=f"Change in {col} since the previous trading day")
+      for col in YIELD_COLUMNS + SPREAD_COLUMNS],
+    *[Feature(f"{col}_pct_mean_20", col, "pct_change_mean", 20, trading_days=True,
+              description=f"20-trading-day rolling mean of {col} percentage changes")
+      for col in YIELD_COLUMNS],
+]
+FEATURES_BY_NAME = {feature.name: feature for feature in FEATURES}
+
+
+def definitions(features: Sequence[Feature] = FEATURES) -> Dict[str, List]:
+    """What determines each feature's values, as recorded in the store manifest."""
+    return {f.name: [f.source, f.transform, f.window, f.trading_days] for f in features}
+
+
+def manifest_file(path: Union[str, Path] = FEATURE_STORE) -> Path:
+    """Manifest stored next to a feature store directory."""
+    path = Path(path)
+    return path.with_name(f"{path.name}_manifest.json")
+
+
+def read_store_manifest(path: Union[str, Path] = FEATURE_STORE) -> Dict:
+    """Read a feature store's manifest, or an empty dict if there is none."""
+    file = manifest_file(path)
+    if not file.exists():
+        return {}
+    return json.loads(file.read_text())
+
+
+@instrumented
+def compute_features(
+    panel: pd.DataFrame,
+    features: Sequence[Feature] = FEATURES,
+    since: Optional[pd.Timestamp] = None,
+) -> pd.DataFrame:
+    """Compute features from the daily panel, optionally only from a date on.
+
+    With ``since``, each feature reads its ``lookback`` rows before ``since``
+    and nothing earlier, so the result equals the tail of a full computation.
+
+    Args:
+        panel: Daily panel with ``trading_day`` and the features' source columns
+        features: Features to compute
+        since: First date to compute; all dates if None
+
+    Returns:
+        Frame indexed by ``date`` with ``trading_day`` and one column per feature
+    """
+    dates = panel.index if since is None else panel.index[panel.index >= since]
+    out = pd.DataFrame({"trading_day": panel["trading_day"].reindex(dates)}, index=dates)
+    trading = panel[panel["trading_day"]]
+    for feature in features:
+        rows = trading if feature.trading_days else panel
+        first = 0 if since is None else max(rows.index.searchsorted(since) - feature.lookback, 0)
+        out[feature.name] = feature.compute(rows[feature.source].iloc[first:]).reindex(dates)
+    return out
+
+
+@instrumented
+def materialise_features(
+    panel: pd.DataFrame,
+    path: Union[str, Path] = FEATURE_STORE,
+    features: Sequence[Feature] = FEATURES,
+    full: bool = False,
+    overlap_days: int = DEFAULT_OVERLAP_DAYS,
+    panel_inputs: Optional[Dict[str, str]] = None,
+) -> int:
+    """Write features to a year/month-partitioned store, recomputing only its tail.
+
+    If the store exists with the same definitions, only the rows from its
+    watermark minus ``overlap_days`` are recomputed (so that revised panel
+    rows are picked up) and upserted; otherwise the store is rebuilt.
+
+    Args:
+        panel: Daily panel with ``trading_day`` and the features' source columns
+        path: Store directory
+        features: Features to store
+        full: Recompute every row
+        overlap_days: Days before the watermark to recompute
+        panel_inputs: Panel input hashes to record, used by ``ensure_features``
+
+    Returns:
+        Number of rows recomputed
+    """
+    path = Path(path)
+    manifest = read_store_manifest(path)
+    incremental = (
+        not full
+        and path.is_dir()
+        and manifest.get("version") == FEATURE_STORE_VERSION
+        and manifest.get("definitions") == definitions(features)
+    )
+    descriptions = {f.name: f.description for f in features if f.description}
+    if incremental:
+        since = pd.Timestamp(manifest["last_date"]) - timedelta(days=overlap_days)
+        frame = compute_features(panel, features, since)
+        upsert_dataset(frame, path, "date", descriptions=descriptions)
+    else:
+        frame = compute_features(panel, features)
+        write_dataset(frame, path, "date", overwrite=True, descriptions=descriptions)
+
+    manifest_file(path).write_text(
+        json.dumps(
+            {
+                "version": FEATURE_STORE_VERSION,
+                "definitions": definitions(features),
+                "panel_inputs": panel_inputs,
+                "last_date": panel.index.max().isoformat(),
+                "updated_at": datetime.now().isoformat(timespec="seconds"),
+            },
+            indent=2,
+        )
+    )
+    logger.info(f"{'Updated' if incremental else 'Rebuilt'} feature store {path} "
+                f"with {len(frame)} rows")
+    return len(frame)
+
+
+@instrumented
+def ensure_features(full: bool = False, path: Union[str, Path] = FEATURE_STORE) -> Path:
+    """Bring the feature store up to date with the panel.
+
+    Nothing is recomputed if the panel's inputs and the definitions are
+    unchanged since the store was last written.
+
+    Args:
+        full: Recompute every row
+        path: Store directory
+
+    Returns:
+        Path to the store
+    """
+    path = Path(path)
+    ensure_panel()
+    panel_inputs = read_manifest().get("inputs")
+    manifest = read_store_manifest(path)
+    if (
+        not full
+        and path.is_dir()
+        and manifest.get("version") == FEATURE_STORE_VERSION
+        and manifest.get("definitions") == definitions()
+        and manifest.get("panel_inputs") == panel_inputs
+    ):
+        logger.info(f"Feature store {path} is up to date")
+        return path
+
+    sources = sorted({feature.source for feature in FEATURES})
+    panel = load_panel(columns=["trading_day", *sources], rebuild=False)
+    materialise_features(panel, path, full=full, panel_inputs=panel_inputs)
+    return path
+
+
+@instrumented
+def load_features(
+    names: Sequence[str],
+    trading_days_only: bool = False,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    refresh: bool = True,
+    path: Union[str, Path] = FEATURE_STORE,
+) -> pd.DataFrame:
+    """Read stored features by name.
+
+    Args:
+        names: Feature names, see ``FEATURES``
+        trading_days_only: Keep only days with a Treasury observation
+        start: Optional first date (inclusive)
+        end: Optional last date (inclusive)
+        refresh: Update the store first if the panel changed
+        path: Store directory
+
+    Returns:
+        Features indexed by ``date``, in the order of ``names``
+
+    Raises:
+        KeyError: If a name is not a declared feature
+    """
+    unknown = [name for name in names if name not in FEATURES_BY_NAME]
+    if unknown:
+        raise KeyError(f"Unknown features {unknown}; see make_features.FEATURES")
+    if refresh:
+        ensure_features(path=path)
+    df = read_dataset(path, columns=["trading_day", *names], start=start, end=end)
+    if trading_days_only:
+        df = df[df["trading_day"]]
+    return df[list(names)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Token features and the panel feature store")
+    parser.add_argument("--store", action="store_true",
+                        help="Update the panel feature store instead of the token features")
+    parser.add_argument("--full", action="store_true",
+                        help="With --store: recompute every row, not just the tail")
+    parser.add_argument("--input", type=Path, default=TOKEN_PANEL_FILE, help="Token panel")
+    parser.add_argument("--output", type=Path, default=FEATURES_FILE, help="Features file")
+    parser.add_argument("--backend", choices=BACKENDS, default="pandas",
+                        help="Compute eagerly with pandas or as a lazy Polars query")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Polars only: stream the panel through in batches")
+    args = parser.parse_args()
+    if args.store:
+        ensure_features(full=args.full)
+    else:
+        if args.streaming and args.backend != "polars":
+            parser.error("--streaming needs --backend polars")
+        if not args.input.exists():
+            parser.error(f"No token panel at {args.input}; run fetch_stablecoin_panel.py first")
+        output = write_features(args.input, args.output, args.backend, args.streaming)
+        logger.info(f"Wrote features to {output}")
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""Build the canonical analysis-ready daily panel.
+
+The panel merges stablecoin market caps and Treasury yields on one daily
+calendar. Yields are forward-filled over weekends and holidays, and log market
+cap, first differences and all yield spreads are derived once. It is written to
+``data/processed/`` as an uncompressed Feather (Arrow IPC) file so readers can
+memory-map it. A manifest records the panel version and a content hash of each
+input dataset, and the panel is only rebuilt when one of them changes.
+
+The panel can be built eagerly with pandas or as one Polars LazyFrame query
+(``--backend polars``, needs the optional ``polars`` package). Both backends
+produce the same panel.
+
+Example:
+    $ python scripts/panel.py                     # rebuild if inputs changed
+    $ python scripts/panel.py --force             # always rebuild
+    $ python scripts/panel.py --force --backend polars
+
+    >>> from scripts.panel import load_panel
+    >>> panel = load_panel(columns=["log_mcap", "3M-1Y"])
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+from scripts.utils.instrument import instrumented
+from scripts.utils.io import iter_batches, legacy_file, read_dataset
+
+if TYPE_CHECKING:
+    import polars as pl
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Bump whenever the panel's construction changes, to force a rebuild
+PANEL_VERSION = 1
+
+# Constants
+RAW_DIR = Path("data/raw")
+PROCESSED_DIR = Path("data/processed")
+PANEL_FILE = PROCESSED_DIR / f"panel_v{PANEL_VERSION}.feather"
+MANIFEST_FILE = PROCESSED_DIR / "panel_manifest.json"
+TOKEN_PANEL_FILE = RAW_DIR / "stablecoin_panel.parq"
+INPUTS: Dict[str, Path] = {
+    "stablecoin_caps": RAW_DIR / "stablecoin_caps",
+    "treasury_yields": RAW_DIR / "treasury_yields",
+}
+YIELD_COLUMNS = ["DGS3MO", "DGS1", "DGS2", "DGS5", "DGS10", "DGS30"]
+
+# (long, short, name) for every spread used in the analyses
+SPREADS = [
+    ("DGS10", "DGS2", "10Y-2Y"),
+    ("DGS10", "DGS3MO", "10Y-3M"),
+    ("DGS2", "DGS3MO", "2Y-3M"),
+    ("DGS5", "DGS2", "5Y-2Y"),
+    ("DGS30", "DGS10", "30Y-10Y"),
+    ("DGS5", "DGS3MO", "5Y-3M"),
+    ("DGS3MO", "DGS1", "3M-1Y"),
+]
+SPREAD_COLUMNS = [name for _, _, name in SPREADS]
+
+# Longest run of missing days (weekends plus holidays) that is forward-filled
+FFILL_LIMIT = 5
+BACKENDS = ("pandas", "polars")
+# Rows per chunk when streaming the token x chain panel; 0 reads it whole
+TOKEN_BATCH_ROWS = int(os.getenv("TOKEN_BATCH_ROWS", "0"))
+
+
+def hash_path(path: Path) -> str:
+    """Content hash of a dataset directory's parquet files or a single file.
+
+    Args:
+        path: Dataset directory (or its legacy single-file location)
+
+    Returns:
+        Hex SHA-256 digest, or ``"missing"`` if nothing exists
+    """
+    path = Path(path)
+    if path.is_dir():
+        root, files = path, sorted(path.rglob("*.parquet"))
+    elif legacy_file(path).exists():
+        root, files = legacy_file(path).parent, [legacy_file(path)]
+    else:
+        return "missing"
+    digest = hashlib.sha256()
+    for file in files:
+        digest.update(str(file.relative_to(root)).encode())
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def input_hashes(inputs: Optional[Dict[str, Path]] = None) -> Dict[str, str]:
+    """Hash every panel input.
+
+    Args:
+        inputs: Mapping of input name to dataset path, defaults to ``INPUTS``
+
+    Returns:
+        Mapping of input name to content hash
+    """
+    return {name: hash_path(path) for name, path in (inputs or INPUTS).items()}
+
+
+@instrumented
+def build_panel(
+    stablecoins: pd.DataFrame, treasury: pd.DataFrame, backend: str = "pandas"
+) -> pd.DataFrame:
+    """Align stablecoin caps and yields on a daily calendar and derive features.
+
+    Args:
+        stablecoins: Stablecoin caps with a ``timestamp`` column
+        treasury: Treasury yields indexed by date
+        backend: ``pandas`` or ``polars`` (see ``panel_query``)
+
+    Returns:
+        Daily panel indexed by ``date`` over the period both inputs cover
+
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}; expected one of {BACKENDS}")
+    if backend == "polars":
+        import polars as pl
+
+        caps = pl.from_pandas(stablecoins).lazy()
+        yields = pl.from_pandas(treasury.rename_axis("date").reset_index()).lazy()
+        panel = panel_query(caps, yields).collect().to_pandas().set_index("date")
+        # Polars computes in nanoseconds; keep the input's unit as pandas does
+        unit = stablecoins["timestamp"].dt.unit
+        panel.index = pd.DatetimeIndex(panel.index, freq="D").as_unit(unit)
+        return panel
+
+    caps = stablecoins.rename(columns={"timestamp": "date"}).set_index("date").sort_index()
+    caps.index = caps.index.normalize()
+    caps = caps[~caps.index.duplicated(keep="last")]
+    yields = treasury[[col for col in YIELD_COLUMNS if col in treasury.columns]].sort_index()
+    yields.index = pd.DatetimeIndex(yields.index).normalize()
+
+    observed = yields.dropna(how="all")
+    start = max(caps.index.min(), observed.index.min())
+    end = min(caps.index.max(), observed.index.max())
+    calendar = pd.date_range(start, end, freq="D", name="date")
+
+    panel = caps.reindex(calendar)
+    panel["trading_day"] = calendar.isin(observed.index)
+    panel = panel.join(yields.reindex(calendar).ffill(limit=FFILL_LIMIT))
+
+    for long_term, short_term, name in SPREADS:
+        if long_term in panel.columns and short_term in panel.columns:
+            panel[name] = panel[long_term] - panel[short_term]
+
+    market_cap = panel["circulating_supply_usd"].astype("float64")
+    panel["log_mcap"] = np.log(market_cap.where(market_cap > 0))
+    panel["d_log_mcap"] = panel["log_mcap"].diff()
+    for col in YIELD_COLUMNS + SPREAD_COLUMNS:
+        if col in panel.columns:
+            panel[f"d_{col}"] = panel[col].diff()
+    return panel
+
+
+def panel_query(caps: "pl.LazyFrame", yields: "pl.LazyFrame") -> "pl.LazyFrame":
+    """The panel build of ``build_panel`` as a single Polars query.
+
+    Nothing is computed until the result is collected, so Polars can plan
+    the joins and column expressions together and run them across cores.
+
+    Args:
+        caps: Stablecoin caps with a ``timestamp`` column
+        yields: Treasury yields with a ``date`` column
+
+    Returns:
+        Lazy daily panel with a ``date`` column, in ``build_panel``'s
+        column order
+    """
+    import polars as pl
+
+    day = pl.Datetime("ns")
+    caps = (
+        caps.rename({"timestamp": "date"})
+        .with_columns(pl.col("date").cast(day))
+        .sort("date", maintain_order=True)
+        .with_columns(pl.col("date").dt.truncate("1d"))
+        .unique("date", keep="last", maintain_order=True)
+    )
+    cap_columns = [col for col in caps.collect_schema().names() if col != "date"]
+    yield_columns = [col for col in YIELD_COLUMNS if col in yields.collect_schema().names()]
+    yields = (
+        yields.select(pl.col("date").cast(day).dt.truncate("1d"), *yield_columns)
+        .sort("date", maintain_order=True)
+    )
+    observed = yields.filter(pl.any_horizontal(pl.col(yield_columns).is_not_null()))
+
+    bounds = pl.concat(
+        [frame.select(pl.col("date").min().alias("start"), pl.col("date").max().alias("end"))
+         for frame in (caps, observed)]
+    ).select(pl.col("start").max(), pl.col("end").min())
+    calendar = bounds.select(
+        pl.datetime_range(pl.col("start").first(), pl.col("end").first(), "1d", time_unit="ns")
+        .alias("date")
+    )
+    trading = observed.select("date", pl.lit(True).alias("trading_day"))
+
+    spreads = [
+        (pl.col(long_term) - pl.col(short_term)).alias(name)
+        for long_term, short_term, name in SPREADS
+        if long_term in yield_columns and short_term in yield_columns
+    ]
+    spread_columns = [expr.meta.output_name() for expr in spreads]
+    market_cap = pl.col("circulating_supply_usd").cast(pl.Float64)
+    return (
+        calendar.join(caps, on="date", how="left")
+        .join(trading, on="date", how="left")
+        .join(yields, on="date", how="left")
+        .sort("date")
+        .with_columns(
+            pl.col("trading_day").fill_null(False),
+            pl.col(yield_columns).fill_null(strategy="forward", limit=FFILL_LIMIT),
+        )
+        .with_columns(*spreads, pl.when(market_cap > 0).then(market_cap.log()).alias("log_mcap"))
+        .with_columns(
+            pl.col("log_mcap").diff().alias("d_log_mcap"),
+            *[pl.col(col).diff().alias(f"d_{col}") for col in yield_columns + spread_columns],
+        )
+        .select(
+            "date", *cap_columns, "trading_day", *yield_columns, *spread_columns,
+            "log_mcap", "d_log_mcap", *[f"d_{col}" for col in yield_columns + spread_columns],
+        )
+    )
+
+
+def read_manifest() -> Dict:
+    """Read the panel manifest, or an empty dict if there is none."""
+    if not MANIFEST_FILE.exists():
+        return {}
+    return json.loads(MANIFEST_FILE.read_text())
+
+
+@instrumented
+def ensure_panel(force: bool = False, backend: str = "pandas") -> Path:
+    """Rebuild the panel if its version or any input hash changed.
+
+    Args:
+        force: Rebuild even if the panel is current
+        backend: ``pandas`` or ``polars``; both build the same panel
+
+    Returns:
+        Path to the panel file
+    """
+    hashes = input_hashes()
+    manifest = read_manifest()
+    current = (
+        manifest.get("version") == PANEL_VERSION
+        and manifest.get("inputs") == hashes
+        and PANEL_FILE.exists()
+    )
+    if current and not force:
+        logger.info(f"Panel {PANEL_FILE} is up to date")
+        return PANEL_FILE
+
+    stablecoins = read_dataset(INPUTS["stablecoin_caps"])
+    treasury = read_dataset(INPUTS["treasury_yields"])
+    panel = build_panel(stablecoins, treasury, backend)
+
+    PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+    # Uncompressed so that readers can memory-map it without decoding
+    panel.reset_index().to_feather(PANEL_FILE, compression="uncompressed")
+    MANIFEST_FILE.write_text(
+        json.dumps(
+            {
+                "version": PANEL_VERSION,
+                "inputs": hashes,
+                "rows": len(panel),
+                "columns": list(panel.columns),
+                "built_at": datetime.now().isoformat(timespec="seconds"),
+            },
+            indent=2,
+        )
+    )
+    logger.info(f"Built panel {PANEL_FILE} with {len(panel)} rows")
+    return PANEL_FILE
+
+
+@instrumented
+def load_panel(
+    columns: Optional[Sequence[str]] = None,
+    trading_days_only: bool = False,
+    rebuild: bool = True,
+) -> pd.DataFrame:
+    """Load the daily panel, memory-mapped.
+
+    Args:
+        columns: Columns to load; all columns if None
+        trading_days_only: Keep only days with a Treasury observation
+        rebuild: Rebuild the panel first if its inputs changed
+
+    Returns:
+        Panel indexed by ``date``
+    """
+    path = ensure_panel() if rebuild else PANEL_FILE
+    wanted: Optional[List[str]] = None
+    if columns is not None:
+        wanted = ["date"] + list(columns)
+        if trading_days_only and "trading_day" not in wanted:
+            wanted.append("trading_day")
+    table = feather.read_table(path, columns=wanted, memory_map=True)
+    panel = table.to_pandas().set_index("date")
+    if trading_days_only:
+        panel = panel[panel["trading_day"]]
+        if columns is not None and "trading_day" not in columns:
+            panel = panel.drop(columns="trading_day")
+    return panel
+
+
+@instrumented
+def load_token_caps(
+    calendar: Optional[pd.DatetimeIndex] = None,
+    path: Path = TOKEN_PANEL_FILE,
+    batch_rows: int = TOKEN_BATCH_ROWS,
+) -> pd.DataFrame:
+    """Per-token circulating supply summed over chains, one column per symbol.
+
+    With ``batch_rows`` set, the token panel is streamed in chunks and each
+    chunk is summed to (date, symbol) before the next is read, so memory is
+    bounded by the chunk plus the result rather than by the chain count.
+
+    Args:
+        calendar: Dates to align to, e.g. a loaded panel's index
+        path: Token x chain panel written by ``fetch_stablecoin_panel.py``
+        batch_rows: Rows per chunk; 0 reads the panel whole
+
+    Returns:
+        Wide frame indexed by ``date``; empty if the token panel does not exist
+    """
+    if not Path(path).exists():
+        logger.warning(f"No token panel at {path}; skipping per-token caps")
+        return pd.DataFrame(index=calendar)
+    columns = ["date", "symbol", "circulating"]
+    if not batch_rows:
+        long = pd.read_parquet(path, columns=columns)
+        long["date"] = pd.to_datetime(long["date"]).dt.normalize()
+        wide = long.pivot_table(index="date", columns="symbol", values="circulating",
+                                aggfunc="sum")
+    else:
+        # Chunk sums are partial sums of the same (date, symbol) totals
+        totals = None
+        for chunk in iter_batches(path, columns, batch_rows=batch_rows):
+            chunk["date"] = pd.to_datetime(chunk["date"]).dt.normalize()
+            part = chunk.groupby(["date", "symbol"])["circulating"].sum()
+            totals = part if totals is None else totals.add(part, fill_value=0)
+        if totals is None:
+            return pd.DataFrame(index=calendar)
+        wide = totals.unstack("symbol").sort_index()
+    wide.columns.name = None
+    return wide if calendar is None else wide.reindex(calendar)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the daily analysis panel")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if inputs are unchanged")
+    parser.add_argument("--backend", choices=BACKENDS, default="pandas",
+                        help="Build eagerly with pandas or as a lazy Polars query")
+    args = parser.parse_args()
+    ensure_panel(force=args.force, backend=args.backend)
@@ -0,0 +1,545 @@
+#!/usr/bin/env python3
+"""Declarative DAG runner for the data -> panel -> stats -> figures -> report pipeline.
+
+Each task runs one of the repo's scripts as ``python -m <module> <args>`` and
+declares the files it reads and writes. Dependencies are inferred from those
+declarations: a task depends on every task that writes one of its inputs.
+Independent tasks run in parallel.
+
+A task is memoised on a key that hashes its code (the module and every
+``scripts.*`` module it imports), its arguments and the content of its inputs.
+Keys of the last successful run are stored in ``data/cache/pipeline.json``;
+a task whose key is unchanged and whose outputs exist is skipped. Because
+inputs are hashed by content, a task that re-runs but writes identical outputs
+does not invalidate anything downstream.
+
+Fetch tasks read remote sources that change without any local change, so
+they are volatile: they run on every pipeline run, incrementally where the
+script supports it, and only their changed outputs re-run downstream tasks.
+
+Every task runs inside an instrumentation stage named ``task.<name>``, and
+its instrumented functions append their metrics to ``data/cache/metrics.jsonl``
+(or ``METRICS_FILE``) tagged with the task and a run ID; see
+``scripts.utils.instrument`` for summaries and Prometheus output.
+
+Example:
+    $ python -m scripts.pipeline                 # run whatever is stale
+    $ python -m scripts.pipeline --dry-run       # show what would run
+    $ python -m scripts.pipeline --from panel    # panel and everything after it
+    $ python -m scripts.pipeline --only figures  # one task, inputs as they are
+    $ python -m scripts.pipeline --prometheus /var/lib/node_exporter/reserve_shock.prom
+
+    >>> from scripts.pipeline import run_pipeline
+    >>> statuses = run_pipeline(start="panel", jobs=2)
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set
+
+from scripts.ingest.parse_attestations import INPUT_DIR as ATTESTATIONS_DIR
+from scripts.ingest.parse_attestations import OUTPUT_FILE as ATTESTATIONS_FILE
+from scripts.make_features import FEATURE_STORE, FEATURES_FILE, manifest_file
+from scripts.panel import INPUTS, PANEL_FILE, PROCESSED_DIR, RAW_DIR, TOKEN_PANEL_FILE
+from scripts.tiles import TILES_DIR
+from scripts.utils.instrument import DEFAULT_METRICS_FILE, read_records, write_prometheus
+from scripts.utils.io import SCHEMA_FILE, legacy_file
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Constants
+ROOT = Path(__file__).resolve().parent.parent
+STATE_FILE = Path("data/cache/pipeline.json")
+LOG_DIR = Path("data/cache/pipeline_logs")
+FIG_DIR = Path("figures")
+# Render manifest of analyze_stablecoin_treasury, listing every figure it writes
+ANALYSIS_FIGURES = Path("data/cache/figures_analysis.json")
+
+
+class Task(NamedTuple):
+    """One step of the pipeline.
+
+    Attributes:
+        name: Unique task name
+        module: Module run with ``python -m``
+        args: Command-line arguments, part of the memo key
+        inputs: Files or directories read by the task
+        outputs: Files or directories written by the task
+        stdout: File the task's standard output is saved to (also an output)
+        optional: Only run when selected explicitly with ``--only``/``--from``
+        volatile: Never up to date, for tasks that read remote sources
+    """
+
+    name: str
+    module: str
+    args: Sequence[str] = ()
+    inputs: Sequence[Path] = ()
+    outputs: Sequence[Path] = ()
+    stdout: Optional[Path] = None
+    optional: bool = False
+    volatile: bool = False
+
+
+TASKS = [
+    # Fetch
+    Task("fetch_caps", "scripts.ingest.fetch_stablecoin_caps", args=["--incremental"],
+         outputs=[INPUTS["stablecoin_caps"]], volatile=True),
+    Task("fetch_yields", "scripts.ingest.fetch_treasury_yields", args=["--incremental"],
+         outputs=[INPUTS["treasury_yields"]], volatile=True),
+    Task("fetch_token_panel", "scripts.ingest.fetch_stablecoin_panel",
+         outputs=[TOKEN_PANEL_FILE], volatile=True),
+    # Needs an Ethereum JSON-RPC node (ETH_RPC_URL); resumes from its checkpoint
+    Task("fetch_transfers", "scripts.build_transactions_dataset",
+         outputs=[RAW_DIR / "mint_burn"], optional=True, volatile=True),
+    # Needs issuer attestation reports under external/attestations
+    Task("parse_attestations", "scripts.ingest.parse_attestations",
+         inputs=[ATTESTATIONS_DIR],
+         outputs=[ATTESTATIONS_FILE], optional=True),
+    # Panel
+    Task("panel", "scripts.panel",
+         inputs=list(INPUTS.values()),
+         outputs=[PANEL_FILE]),
+    Task("features", "scripts.make_features",
+         inputs=[TOKEN_PANEL_FILE],
+         outputs=[FEATURES_FILE]),
+    Task("feature_store", "scripts.make_features", args=["--store"],
+         inputs=[PANEL_FILE],
+         outputs=[FEATURE_STORE, manifest_file(FEATURE_STORE)]),
+    # Stats
+    Task("xcorr", "scripts.stats.xcorr",
+         args=["--figure", str(FIG_DIR / "xcorr_heatmap_log_mcap_changes.png")],
+         inputs=[PANEL_FILE, TOKEN_PANEL_FILE],
+         outputs=[PROCESSED_DIR / "xcorr.parquet",
+                  FIG_DIR / "xcorr_heatmap_log_mcap_changes.png"]),
+    Task("granger", "scripts.stats.granger",
+         inputs=[FEATURE_STORE, TOKEN_PANEL_FILE],
+         outputs=[PROCESSED_DIR / "granger.parquet"],
+         stdout=PROCESSED_DIR / "granger_significant.txt"),
+    Task("rolling", "scripts.stats.rolling",
+         inputs=[PANEL_FILE],
+         outputs=[PROCESSED_DIR / "rolling_corr.parquet",
+                  PROCESSED_DIR / "rolling_corr_state.npz"]),
+    Task("event_study", "scripts.stats.event_study",
+         inputs=[FEATURE_STORE, RAW_DIR / "mint_burn"],
+         outputs=[PROCESSED_DIR / "event_study.parquet", FIG_DIR / "event_study_car.png"],
+         optional=True),
+    Task("var_paths", "scripts.stats.var_rolling",
+         inputs=[FEATURE_STORE],
+         outputs=[PROCESSED_DIR / "var_paths_coefs.parquet",
+                  PROCESSED_DIR / "var_paths_irf.parquet",
+                  FIG_DIR / "var_path_irf_DGS3MO.png"]),
+    # Figures
+    Task("figures", "scripts.analyze_stablecoin_treasury",
+         inputs=[PANEL_FILE],
+         outputs=[FIG_DIR / "analysis_report.txt", ANALYSIS_FIGURES]),
+    # Dashboard tiles
+    Task("tiles", "scripts.tiles",
+         inputs=[PANEL_FILE, TOKEN_PANEL_FILE],
+         outputs=[TILES_DIR]),
+    # Report
+    Task("report", "scripts.generate_statistical_results",
+         inputs=[PANEL_FILE, FEATURE_STORE],
+         outputs=[FIG_DIR / "irf_log_mcap.png", FIG_DIR / "correlation_heatmap.png"],
+         stdout=FIG_DIR / "statistical_results.txt"),
+]
+
+
+def task_outputs(task: Task) -> List[Path]:
+    """All paths a task writes, including its saved standard output."""
+    return list(task.outputs) + ([task.stdout] if task.stdout else [])
+
+
+def dependencies(tasks: Sequence[Task]) -> Dict[str, Set[str]]:
+    """Infer each task's upstream tasks from declared inputs and outputs.
+
+    Args:
+        tasks: Pipeline tasks
+
+    Returns:
+        Mapping of task name to the names of the tasks it depends on
+
+    Raises:
+        ValueError: If two tasks declare the same output or names repeat
+    """
+    writers = {}
+    for task in tasks:
+        for path in task_outputs(task):
+            if Path(path) in writers:
+                raise ValueError(
+                    f"{path} is written by both {writers[Path(path)]} and {task.name}"
+                )
+            writers[Path(path)] = task.name
+    if len({task.name for task in tasks}) != len(tasks):
+        raise ValueError("Task names must be unique")
+    return {
+        task.name: {writers[Path(path)] for path in task.inputs if Path(path) in writers}
+        for task in tasks
+    }
+
+
+def downstream(deps: Dict[str, Set[str]], name: str) -> Set[str]:
+    """A task and every task that depends on it, directly or not."""
+    found, frontier = {name}, [name]
+    while frontier:
+        current = frontier.pop()
+        for task, upstream in deps.items():
+            if current in upstream and task not in found:
+                found.add(task)
+                frontier.append(task)
+    return found
+
+
+def select_tasks(
+    tasks: Sequence[Task],
+    only: Optional[Sequence[str]] = None,
+    start: Optional[str] = None,
+) -> List[str]:
+    """Names of the tasks to run.
+
+    Args:
+        tasks: Pipeline tasks
+        only: Run exactly these tasks; their upstream outputs are used as they are
+        start: Run this task and everything downstream of it
+
+    Returns:
+        Selected task names, in declaration order
+
+    Raises:
+        ValueError: On unknown task names
+    """
+    names = [task.name for task in tasks]
+    for name in list(only or []) + ([start] if start else []):
+        if name not in names:
+            raise ValueError(f"Unknown task {name!r}; choose from {', '.join(names)}")
+    if only:
+        return [name for name in names if name in only]
+    optional = {task.name for task in tasks if task.optional}
+    if start:
+        selected = downstream(dependencies(tasks), start)
+        return [
+            name for name in names
+            if name in selected and (name == start or name not in optional)
+        ]
+    return [name for name in names if name not in optional]
+
+
+def module_file(module: str, root: Path = ROOT) -> Path:
+    """Source file of a module under ``root``."""
+    return root.joinpath(*module.split(".")).with_suffix(".py")
+
+
+def code_files(module: str, root: Path = ROOT) -> List[Path]:
+    """A module's source file plus those of every local module it imports.
+
+    Imports are followed transitively, as long as the imported module lives
+    under the same top-level package as ``module``.
+
+    Args:
+        module: Dotted module name
+        root: Repository root
+
+    Returns:
+        Sorted source files
+    """
+    package = module.split(".")[0]
+    seen: Set[Path] = set()
+    frontier = [module]
+    while frontier:
+        path = module_file(frontier.pop(), root)
+        if path in seen or not path.exists():
+            continue
+        seen.add(path)
+        for node in ast.walk(ast.parse(path.read_text())):
+            if isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+                names = [node.module]
+            elif isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            else:
+                continue
+            frontier.extend(name for name in names if name.split(".")[0] == package)
+    return sorted(seen)
+
+
+def hash_path(path: Path) -> str:
+    """Content hash of a file or of every file under a directory.
+
+    Datasets that only exist in their legacy single-file layout are hashed
+    from that file. The ``updated_at`` stamp of a dataset's schema sidecar
+    is left out, as every upsert rewrites it even when no row changes.
+
+    Args:
+        path: File or directory
+
+    Returns:
+        Hex SHA-256 digest, or ``"missing"`` if nothing exists
+    """
+    path = Path(path)
+    if path.is_dir():
+        root, files = path, sorted(p for p in path.rglob("*") if p.is_file())
+    elif path.exists():
+        root, files = path.parent, [path]
+    elif legacy_file(path).exists():
+        root, files = path.parent, [legacy_file(path)]
+    else:
+        return "missing"
+    digest = hashlib.sha256()
+    for file in files:
+        digest.update(str(file.relative_to(root)).encode())
+        if file.name == SCHEMA_FILE:
+            schema = json.loads(file.read_text())
+            schema.pop("updated_at", None)
+            digest.update(json.dumps(schema, sort_keys=True).encode())
+            continue
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def task_key(task: Task, root: Path = ROOT) -> str:
+    """Memo key of a task: its code, arguments and input contents.
+
+    Args:
+        task: Pipeline task
+        root: Repository root that task paths are relative to
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([task.module, list(task.args)]).encode())
+    for path in code_files(task.module, root):
+        digest.update(str(path.relative_to(root)).encode())
+        digest.update(path.read_bytes())
+    for path in task.inputs:
+        digest.update(f"{path}:{hash_path(root / path)}".encode())
+    return digest.hexdigest()
+
+
+def outputs_exist(task: Task, root: Path = ROOT) -> bool:
+    """Whether every declared output of a task exists."""
+    return all(hash_path(root / path) != "missing" for path in task_outputs(task))
+
+
+def read_state(root: Path = ROOT) -> Dict[str, str]:
+    """Memo keys of the last successful run of each task."""
+    path = root / STATE_FILE
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def write_state(state: Dict[str, str], root: Path = ROOT) -> None:
+    """Atomically store the memo keys."""
+    path = root / STATE_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, indent=2, sort_keys=True))
+    os.replace(tmp, path)
+
+
+def metrics_file(root: Path = ROOT) -> Path:
+    """Metrics file the tasks append to, relative paths taken from ``root``."""
+    return root / os.getenv("METRICS_FILE", str(DEFAULT_METRICS_FILE))
+
+
+def execute(task: Task, root: Path = ROOT, run_id: Optional[str] = None) -> int:
+    """Run one task in a subprocess from the repository root.
+
+    Standard error, and standard output unless the task saves it elsewhere,
+    go to ``data/cache/pipeline_logs/<task>.log``. The task's module runs
+    inside a ``task.<name>`` instrumentation stage.
+
+    Args:
+        task: Pipeline task
+        root: Repository root
+        run_id: Pipeline run ID recorded with the task's metrics
+
+    Returns:
+        The subprocess return code
+    """
+    env = dict(os.environ)
+    paths = dict.fromkeys([str(root), str(ROOT), env.get("PYTHONPATH")])
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, paths))
+    env.setdefault("MPLBACKEND", "Agg")
+    env["METRICS_FILE"] = str(metrics_file(root))
+    env["PIPELINE_TASK"] = task.name
+    if run_id:
+        env["PIPELINE_RUN_ID"] = run_id
+    log_file = root / LOG_DIR / f"{task.name}.log"
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    command = [sys.executable, "-m", "scripts.utils.instrument", "run",
+               "--stage", f"task.{task.name}", task.module, *task.args]
+    logger.info(f"{task.name}: running {task.module}")
+    with open(log_file, "w") as log:
+        if task.stdout:
+            stdout_file = root / task.stdout
+            stdout_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(stdout_file, "w") as out:
+                result = subprocess.run(command, cwd=root, env=env, stdout=out, stderr=log)
+        else:
+            result = subprocess.run(command, cwd=root, env=env, stdout=log,
+                                    stderr=subprocess.STDOUT)
+    return result.returncode
+
+
+def up_to_date(task: Task, state: Dict[str, str], root: Path = ROOT) -> bool:
+    """Whether a task is not volatile, its memo key matches and its outputs exist."""
+    if task.volatile:
+        return False
+    return state.get(task.name) == task_key(task, root) and outputs_exist(task, root)
+
+
+def plan(
+    tasks: Sequence[Task] = TASKS,
+    only: Optional[Sequence[str]] = None,
+    start: Optional[str] = None,
+    force: bool = False,
+    root: Path = ROOT,
+) -> Dict[str, str]:
+    """Which selected tasks a run would execute, without running anything.
+
+    A stale task may change its outputs, so everything downstream of it is
+    reported stale as well.
+
+    Args:
+        tasks: Pipeline tasks
+        only: Plan exactly these tasks
+        start: Plan this task and everything downstream of it
+        force: Treat every selected task as stale
+        root: Repository root that task paths are relative to
+
+    Returns:
+        Mapping of selected task name to ``"stale"`` or ``"cached"``
+    """
+    deps = dependencies(tasks)
+    by_name = {task.name: task for task in tasks}
+    state = read_state(root)
+    statuses: Dict[str, str] = {}
+    for name in select_tasks(tasks, only, start):
+        upstream_stale = any(statuses.get(dep) == "stale" for dep in deps[name])
+        stale = force or upstream_stale or not up_to_date(by_name[name], state, root)
+        statuses[name] = "stale" if stale else "cached"
+    return statuses
+
+
+def run_pipeline(
+    tasks: Sequence[Task] = TASKS,
+    only: Optional[Sequence[str]] = None,
+    start: Optional[str] = None,
+    force: bool = False,
+    jobs: Optional[int] = None,
+    dry_run: bool = False,
+    root: Path = ROOT,
+    prometheus: Optional[Path] = None,
+) -> Dict[str, str]:
+    """Run the selected tasks in dependency order, skipping up-to-date ones.
+
+    A task is started as soon as every selected upstream task has finished.
+    If a task fails, everything downstream of it is skipped; independent
+    tasks still run.
+
+    Args:
+        tasks: Pipeline tasks
+        only: Run exactly these tasks
+        start: Run this task and everything downstream of it
+        force: Re-run the selected tasks even if they are up to date
+        jobs: Tasks run at once (default: CPU count)
+        dry_run: Only report which tasks are stale
+        root: Repository root that task paths are relative to
+        prometheus: Write this run's stage metrics to this Prometheus textfile
+
+    Returns:
+        Mapping of task name to ``"ran"``, ``"cached"``, ``"stale"`` (dry run),
+        ``"failed"`` or ``"skipped"`` (upstream failed)
+    """
+    if dry_run:
+        statuses = plan(tasks, only, start, force, root)
+        for name, status in statuses.items():
+            logger.info(f"{name}: {status}")
+        return statuses
+
+    by_name = {task.name: task for task in tasks}
+    deps = dependencies(tasks)
+    selected = select_tasks(tasks, only, start)
+    state = read_state(root)
+    statuses = {}
+    run_id = f"{datetime.now():%Y%m%dT%H%M%S}-{os.getpid()}"
+
+    pending = list(selected)
+    running = {}
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+        while pending or running:
+            n_pending = len(pending)
+            for name in list(pending):
+                upstream = deps[name] & set(selected)
+                if any(statuses.get(dep) in ("failed", "skipped") for dep in upstream):
+                    statuses[name] = "skipped"
+                    pending.remove(name)
+                    logger.warning(f"{name}: skipped, an upstream task failed")
+                elif all(dep in statuses for dep in upstream):
+                    pending.remove(name)
+                    if not force and up_to_date(by_name[name], state, root):
+                        statuses[name] = "cached"
+                        logger.info(f"{name}: up to date")
+                    else:
+                        running[pool.submit(execute, by_name[name], root, run_id)] = name
+            if not running:
+                if len(pending) == n_pending:
+                    raise ValueError(f"Dependency cycle among {', '.join(pending)}")
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                if future.result() == 0:
+                    statuses[name] = "ran"
+                    state[name] = task_key(by_name[name], root)
+                    write_state(state, root)
+                    logger.info(f"{name}: done")
+                else:
+                    statuses[name] = "failed"
+                    logger.error(f"{name}: failed, see {LOG_DIR / (name + '.log')}")
+    if prometheus:
+        records = read_records(metrics_file(root), run_id)
+        logger.info(f"Wrote metrics of run {run_id} to {write_prometheus(records, prometheus)}")
+    return statuses
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the analysis pipeline")
+    parser.add_argument("--only", nargs="+", metavar="TASK",
+                        help="Run only these tasks, using upstream outputs as they are")
+    parser.add_argument("--from", dest="start", metavar="TASK",
+                        help="Run this task and everything downstream of it")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-run the selected tasks even if up to date")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Tasks run in parallel")
+    parser.add_argument("--dry-run", action="store_true", help="Show which tasks are stale")
+    parser.add_argument("--list", action="store_true", help="List tasks and dependencies")
+    parser.add_argument("--prometheus", type=Path, metavar="PATH",
+                        help="Write the run's stage metrics to a Prometheus textfile")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, upstream in dependencies(TASKS).items():
+            print(f"{name}: {', '.join(sorted(upstream)) or '-'}")
+        sys.exit(0)
+    try:
+        statuses = run_pipeline(only=args.only, start=args.start, force=args.force,
+                                jobs=args.jobs, dry_run=args.dry_run, prometheus=args.prometheus)
+    except ValueError as e:
+        parser.error(str(e))
+    sys.exit(1 if "failed" in statuses.values() else 0)
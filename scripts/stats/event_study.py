@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""Event study of spread changes around stablecoin mint/burn shocks.
+
+Events are aligned to the panel's trading-day calendar, either by date
+(``daily``) or by block timestamp (``intraday``). Intraday alignment moves an
+event after the Treasury close to the next trading day. The
+[-pre, +post] window of every event and every series is then extracted with
+one fancy-indexing operation.
+
+Expected changes come from an AR(1) with intercept, fitted to each series over
+the estimation window that ends just before each event window. Its
+coefficients for every possible window end come from prefix sums of the
+lagged moments, so each event costs O(1) however long the window is.
+Abnormal changes, cumulative abnormal changes (CAR) and buy-and-hold abnormal
+returns (BHAR) are computed for all events and series at once. CAR t-stats
+use Newey-West standard errors across events in date order, which allows for
+events whose windows overlap. BHAR compounds changes, so it is only
+meaningful for return-like series such as market-cap growth.
+
+Example:
+    $ python scripts/stats/event_study.py --min-amount 100000000 --alignment intraday
+
+    >>> from scripts.stats.event_study import event_study
+    >>> result = event_study(panel[["d_10Y-2Y", "d_2Y-3M"]], events, alignment="intraday")
+"""
+
+import argparse
+import logging
+from pathlib import Path
+from typing import NamedTuple, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from scripts.utils.instrument import instrumented
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_PRE = 5
+DEFAULT_POST = 10
+DEFAULT_ESTIMATION = 120
+DEFAULT_MIN_ESTIMATION = 30
+DEFAULT_MIN_AMOUNT = 100_000_000
+ALIGNMENTS = ("daily", "intraday")
+# Treasury constant-maturity yields are end-of-day New York quotes
+MARKET_TZ = "America/New_York"
+MARKET_CLOSE = "16:00"
+FIG_DIR = Path("figures")
+OUTPUT_FILE = Path("data/processed/event_study.parquet")
+
+
+class EventStudyResult(NamedTuple):
+    """Per-event windows and the cross-event summary."""
+
+    events: pd.DataFrame  # aligned events, one row per usable event
+    offsets: np.ndarray  # (W,) relative trading days
+    series: list  # (S,) series names
+    abnormal: np.ndarray  # (E, W, S)
+    car: np.ndarray  # (E, W, S)
+    bhar: np.ndarray  # (E, W, S)
+    summary: pd.DataFrame  # tidy mean AR/CAR/BHAR with Newey-West t-stats
+
+
+def align_events(
+    timestamps: pd.Series,
+    calendar: pd.DatetimeIndex,
+    alignment: str = "daily",
+    close: str = MARKET_CLOSE,
+    tz: str = MARKET_TZ,
+) -> np.ndarray:
+    """Row of the calendar each event falls on (day 0).
+
+    Args:
+        timestamps: Event times, naive UTC (as block timestamps are stored)
+        calendar: Sorted trading days of the panel
+        alignment: ``daily`` uses the event's UTC date; ``intraday`` converts
+            to market time and moves events at or after ``close`` to the next day
+        close: Market close in market time, ``HH:MM``
+        tz: Market time zone
+
+    Returns:
+        Integer rows into ``calendar``; ``len(calendar)`` for events after it.
+        Events on non-trading days map to the next trading day.
+
+    Raises:
+        ValueError: If ``alignment`` is unknown
+    """
+    if alignment not in ALIGNMENTS:
+        raise ValueError(f"Unknown alignment {alignment!r}; expected one of {ALIGNMENTS}")
+    times = pd.DatetimeIndex(pd.to_datetime(timestamps))
+    if alignment == "daily":
+        dates = times.normalize()
+    else:
+        local = times.tz_localize("UTC").tz_convert(tz)
+        hour, minute = (int(part) for part in close.split(":"))
+        after_close = (local.hour * 60 + local.minute) >= hour * 60 + minute
+        dates = (local.normalize() + pd.to_timedelta(after_close.astype(int), unit="D"))
+        dates = dates.tz_localize(None)
+    return np.searchsorted(calendar.values, dates.values, side="left")
+
+
+def window_indices(rows: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """(E, W) calendar rows of every event window."""
+    return rows[:, None] + offsets[None, :]
+
+
+def _take(values: np.ndarray, idx: np.ndarray) -> np.ndarray:
+    """values[idx] with NaN for rows outside the array, in one gather."""
+    n_obs = len(values)
+    inside = (idx >= 0) & (idx < n_obs)
+    out = values[np.clip(idx, 0, n_obs - 1)]
+    out[~inside] = np.nan
+    return out
+
+
+def ar1_prefix_sums(values: np.ndarray) -> np.ndarray:
+    """Prefix sums of the AR(1) moments over (x[t-1], x[t]) pairs.
+
+    Args:
+        values: Array of shape (T, S)
+
+    Returns:
+        Array of shape (5, T + 1, S) with cumulative count, sum of x[t-1],
+        sum of x[t], sum of x[t-1]^2 and sum of x[t-1] * x[t], indexed by ``t``
+    """
+    lagged = np.vstack([np.full((1, values.shape[1]), np.nan), values[:-1]])
+    valid = np.isfinite(values) & np.isfinite(lagged)
+    x = np.where(valid, lagged, 0.0)
+    y = np.where(valid, values, 0.0)
+    moments = np.stack([valid.astype("float64"), x, y, x * x, x * y])
+    prefix = np.zeros((5,) + (len(values) + 1,) + values.shape[1:])
+    np.cumsum(moments, axis=1, out=prefix[:, 1:])
+    return prefix
+
+
+def ar1_coefficients(
+    prefix: np.ndarray,
+    starts: np.ndarray,
+    ends: np.ndarray,
+    min_obs: int = DEFAULT_MIN_ESTIMATION,
+) -> np.ndarray:
+    """AR(1) intercept and slope over target rows ``starts..ends - 1``.
+
+    Args:
+        prefix: Output of ``ar1_prefix_sums``
+        starts: First target row per event, shape (E,)
+        ends: One past the last target row per event, shape (E,)
+        min_obs: Minimum usable pairs; fewer gives NaN
+
+    Returns:
+        Array of shape (2, E, S) holding intercepts and slopes
+    """
+    n_rows = prefix.shape[1] - 1
+    starts = np.clip(starts, 0, n_rows)
+    ends = np.clip(ends, 0, n_rows)
+    n, sx, sy, sxx, sxy = prefix[:, ends] - prefix[:, starts]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+        intercept = (sy - slope * sx) / n
+    short = n < min_obs
+    slope[short] = np.nan
+    intercept[short] = np.nan
+    return np.stack([intercept, slope])
+
+
+def newey_west_tstat(x: np.ndarray, maxlags: int) -> np.ndarray:
+    """Newey-West t-statistic of the mean along the first axis.
+
+    Args:
+        x: Array of shape (E, ...); NaN entries are ignored
+        maxlags: Bartlett kernel bandwidth in observations
+
+    Returns:
+        t-statistics of shape x.shape[1:]
+    """
+    valid = np.isfinite(x)
+    n = valid.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(valid, x, 0.0).sum(axis=0) / n
+        dev = np.where(valid, x - mean, 0.0)
+        long_run = (dev * dev).sum(axis=0)
+        for lag in range(1, min(maxlags, len(x) - 1) + 1):
+            weight = 1 - lag / (maxlags + 1)
+            long_run += 2 * weight * (dev[lag:] * dev[:-lag]).sum(axis=0)
+        variance = long_run / n / n
+        return np.where(variance > 0, mean / np.sqrt(variance), np.nan)
+
+
+@instrumented
+def event_study(
+    data: pd.DataFrame,
+    events: pd.DataFrame,
+    pre: int = DEFAULT_PRE,
+    post: int = DEFAULT_POST,
+    estimation: int = DEFAULT_ESTIMATION,
+    min_estimation: int = DEFAULT_MIN_ESTIMATION,
+    alignment: str = "daily",
+    time_column: str = "timestamp",
+    by: Optional[str] = None,
+    maxlags: Optional[int] = None,
+) -> EventStudyResult:
+    """Abnormal changes, CARs and BHARs around every event for every series.
+
+    Args:
+        data: Series to study (e.g. spread changes), indexed by trading day
+        events: Event table with a ``time_column`` of naive UTC timestamps
+        pre: Days before the event in the window
+        post: Days after the event in the window
+        estimation: Length of the AR(1) estimation window
+        min_estimation: Minimum usable estimation pairs
+        alignment: ``daily`` or ``intraday``; see ``align_events``
+        time_column: Event timestamp column
+        by: Optional event column to summarise separately (e.g. mint/burn)
+        maxlags: Newey-West bandwidth across events; ``pre + post`` if None
+
+    Returns:
+        EventStudyResult
+    """
+    calendar = pd.DatetimeIndex(data.index)
+    values = data.to_numpy("float64")
+    offsets = np.arange(-pre, post + 1)
+
+    rows = align_events(events[time_column], calendar, alignment)
+    keep = rows < len(calendar)
+    aligned = events.loc[keep].assign(event_row=rows[keep], event_date=calendar[rows[keep]])
+    aligned = aligned.sort_values("event_row", kind="stable").reset_index(drop=True)
+    rows = aligned["event_row"].to_numpy()
+
+    # Coefficients fitted on [t0 - pre - estimation, t0 - pre)
+    prefix = ar1_prefix_sums(values)
+    intercept, slope = ar1_coefficients(prefix, rows - pre - estimation, rows - pre, min_estimation)
+
+    idx = window_indices(rows, offsets)
+    actual = _take(values, idx)  # (E, W, S) in one gather
+    lagged = _take(values, idx - 1)
+    expected = intercept[:, None, :] + slope[:, None, :] * lagged
+    abnormal = actual - expected
+    car = np.cumsum(abnormal, axis=1)
+    bhar = np.cumprod(1 + actual, axis=1) - np.cumprod(1 + expected, axis=1)
+
+    maxlags = pre + post if maxlags is None else maxlags
+    groups = [(None, np.ones(len(aligned), dtype=bool))]
+    if by is not None:
+        groups += [(key, (aligned[by] == key).to_numpy()) for key in aligned[by].unique()]
+    frames = []
+    for key, mask in groups:
+        frame = _summarise(abnormal[mask], car[mask], bhar[mask], offsets, list(data.columns),
+                           maxlags)
+        frame.insert(0, "group", "all" if key is None else key)
+        frames.append(frame)
+    summary = pd.concat(frames, ignore_index=True)
+    return EventStudyResult(aligned, offsets, list(data.columns), abnormal, car, bhar, summary)
+
+
+def _summarise(
+    abnormal: np.ndarray,
+    car: np.ndarray,
+    bhar: np.ndarray,
+    offsets: np.ndarray,
+    series: Sequence[str],
+    maxlags: int,
+) -> pd.DataFrame:
+    def mean(x: np.ndarray) -> np.ndarray:
+        n = np.isfinite(x).sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(n > 0, np.nansum(x, axis=0) / n, np.nan)
+
+    stats = {
+        "n": np.isfinite(car).sum(axis=0),
+        "mean_ar": mean(abnormal),
+        "t_ar": newey_west_tstat(abnormal, maxlags),
+        "mean_car": mean(car),
+        "t_car": newey_west_tstat(car, maxlags),
+        "mean_bhar": mean(bhar),
+        "t_bhar": newey_west_tstat(bhar, maxlags),
+    }
+    index = pd.MultiIndex.from_product([offsets, list(series)], names=["rel_day", "series"])
+    frame = pd.DataFrame({name: value.ravel() for name, value in stats.items()}, index=index)
+    return frame.reset_index()[["series", "rel_day"] + list(stats)]
+
+
+def shock_events(
+    transfers: pd.DataFrame,
+    min_amount: float = DEFAULT_MIN_AMOUNT,
+) -> pd.DataFrame:
+    """Event table of large mints and burns.
+
+    Args:
+        transfers: Output of ``build_transactions_dataset.load_events``
+        min_amount: Smallest token amount that counts as a shock
+
+    Returns:
+        Events with ``timestamp``, ``token``, ``event`` and ``amount``
+    """
+    large = transfers[transfers["amount"] >= min_amount]
+    return large.rename(columns={"block_timestamp": "timestamp"})[
+        ["timestamp", "token", "event", "amount"]
+    ].reset_index(drop=True)
+
+
+def plot_car(summary: pd.DataFrame, path: Union[str, Path], group: str = "all") -> Path:
+    """Plot mean CAR by relative day per series with Newey-West 95% bands."""
+    from matplotlib.figure import Figure
+
+    data = summary[summary["group"] == group]
+    fig = Figure(figsize=(10, 5))
+    ax = fig.subplots()
+    for series, frame in data.groupby("series", sort=False):
+        se = (frame["mean_car"] / frame["t_car"]).abs()
+        line = ax.plot(frame["rel_day"], frame["mean_car"], marker="o", label=series)[0]
+        ax.fill_between(frame["rel_day"], frame["mean_car"] - 1.96 * se,
+                        frame["mean_car"] + 1.96 * se, color=line.get_color(), alpha=0.15)
+    ax.axvline(0, color="black", linewidth=0.8)
+    ax.axhline(0, color="black", linewidth=0.8)
+    ax.set_xlabel("Trading days relative to event")
+    ax.set_ylabel("Mean CAR")
+    ax.set_title(f"Cumulative abnormal spread changes around mint/burn shocks ({group})")
+    ax.legend()
+    fig.tight_layout()
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(path)
+    return path
+
+
+if __name__ == "__main__":
+    from scripts.build_transactions_dataset import load_events
+    from scripts.make_features import load_features
+    from scripts.panel import SPREAD_COLUMNS
+
+    parser = argparse.ArgumentParser(description="Event study of spreads around mint/burn shocks")
+    parser.add_argument("--min-amount", type=float, default=DEFAULT_MIN_AMOUNT,
+                        help="Smallest mint/burn amount that counts as an event")
+    parser.add_argument("--alignment", choices=ALIGNMENTS, default="intraday",
+                        help="Align events by date or by block timestamp")
+    parser.add_argument("--pre", type=int, default=DEFAULT_PRE, help="Days before the event")
+    parser.add_argument("--post", type=int, default=DEFAULT_POST, help="Days after the event")
+    parser.add_argument("--estimation", type=int, default=DEFAULT_ESTIMATION,
+                        help="AR(1) estimation window in trading days")
+    parser.add_argument("--output", default=str(OUTPUT_FILE), help="Summary parquet output")
+    args = parser.parse_args()
+
+    changes = [f"d_{col}" for col in SPREAD_COLUMNS]
+    panel = load_features(changes, trading_days_only=True)
+    events = shock_events(load_events(min_amount=args.min_amount), args.min_amount)
+    if events.empty:
+        parser.error("No mint/burn events found; run build_transactions_dataset.py first")
+
+    result = event_study(panel, events, pre=args.pre, post=args.post,
+                         estimation=args.estimation, alignment=args.alignment, by="event")
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    result.summary.to_parquet(args.output, index=False)
+    plot_car(result.summary, FIG_DIR / "event_study_car.png")
+    logger.info(f"Studied {len(result.events)} events; summary written to {args.output}")
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""Stablecoin market cap responses to extreme yield and spread moves.
+
+An extreme move in a driver is a daily change beyond ``threshold`` standard
+deviations of its changes, in either direction (``both``), up or down. For
+every driver, threshold, side and forward horizon ``h``, the response is the
+cumulative percentage change in market cap from the day before the move to
+``h`` days after it. The statistic is the mean response after extreme moves
+minus the mean on the remaining days. The event masks form a
+(side x threshold x driver, T) matrix, so each group's sums and counts over
+all horizons come from one matrix product with the (T, horizon) response
+matrix. The whole grid takes one pass, with no loop per cell.
+
+P-values come from a circular-shift permutation test. Each draw rotates the
+responses against the event dates by a random offset, which keeps the
+clustering of extreme days and the overlap of forward windows. Draws run in
+chunks with their own seeds, optionally across processes, so the p-values do
+not depend on the number of workers.
+
+Example:
+    $ python scripts/stats/extremes.py --permutations 2000 --workers 4
+
+    >>> from scripts.stats.extremes import extreme_responses
+    >>> tidy = extreme_responses(panel[["DGS10", "10Y-2Y"]].diff(), panel["circulating_supply_usd"])
+"""
+
+import argparse
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from scripts.utils.instrument import instrumented
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_THRESHOLDS = (1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0)
+DEFAULT_HORIZONS = tuple(range(21))
+SIDES = ("both", "up", "down")
+DEFAULT_PERMUTATIONS = 1000
+DEFAULT_CHUNK_SIZE = 100
+# Most rotated response values held at once per chunk (32 MB of float64)
+BLOCK_ELEMENTS = 1 << 22
+# Cells with fewer extreme days are reported as NaN
+DEFAULT_MIN_EVENTS = 5
+FIG_DIR = Path("figures")
+OUTPUT_FILE = Path("data/processed/extremes.parquet")
+
+
+class ExtremeGrid(NamedTuple):
+    """Extreme-move statistics, each of shape (side, threshold, driver, horizon)."""
+
+    n_extreme: np.ndarray
+    mean_extreme: np.ndarray
+    mean_normal: np.ndarray
+    diff: np.ndarray
+    p_value: np.ndarray
+    permutations: int
+
+
+def forward_changes(levels: np.ndarray, horizons: Sequence[int] = DEFAULT_HORIZONS) -> np.ndarray:
+    """Cumulative percentage changes from the previous row to ``h`` rows ahead.
+
+    Args:
+        levels: Array of shape (T,); non-positive or missing values are missing
+        horizons: Forward horizons in rows
+
+    Returns:
+        Array of shape (T, len(horizons)). Entry ``[t, j]`` is
+        ``levels[t + h_j] / levels[t - 1] - 1``, NaN where either is missing.
+        Horizon 0 equals ``pct_change``.
+    """
+    levels = np.asarray(levels, dtype="float64")
+    levels = np.where(levels > 0, levels, np.nan)
+    T = len(levels)
+    # Pad so row t - 1 and row t + h can be taken for every t and h
+    padded = np.concatenate([[np.nan], levels, np.full(max(horizons) + 1, np.nan)])
+    ahead = padded[1 + np.arange(T)[:, None] + np.asarray(horizons)[None, :]]
+    return ahead / padded[:T, None] - 1
+
+
+def extreme_masks(
+    changes: np.ndarray,
+    thresholds: Sequence[float] = DEFAULT_THRESHOLDS,
+    sides: Sequence[str] = SIDES,
+) -> np.ndarray:
+    """Extreme-day masks for every side and threshold.
+
+    Args:
+        changes: Driver changes of shape (T, n); NaN marks a missing value
+        thresholds: Thresholds in standard deviations of each column
+        sides: Any of ``both``, ``up`` and ``down``
+
+    Returns:
+        Boolean array of shape (side, threshold, T, n); missing changes are
+        never extreme
+
+    Raises:
+        ValueError: If a side is not supported
+    """
+    unknown = set(sides) - set(SIDES)
+    if unknown:
+        raise ValueError(f"Unknown sides {sorted(unknown)}; expected {SIDES}")
+    changes = np.asarray(changes, dtype="float64")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = changes / np.nanstd(changes, axis=0, ddof=1)
+    z = np.where(np.isfinite(z), z, 0.0)
+    signed = {"both": np.abs(z), "up": z, "down": -z}
+    cutoffs = np.asarray(thresholds, dtype="float64")[:, None, None]
+    return np.stack([signed[side] > cutoffs for side in sides])
+
+
+def _group_means(
+    events: np.ndarray,
+    observed: np.ndarray,
+    responses: np.ndarray,
+    valid: np.ndarray,
+    min_events: int,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Event counts and mean responses on event and other days.
+
+    ``events`` is (cells, T) and ``observed`` (n, T); ``responses`` and
+    ``valid`` are (..., T, H) with missing responses zero-filled, so a
+    leading batch axis evaluates many rotations at once.
+    """
+    n_cells, n_drivers = len(events), len(observed)
+    count = events @ valid
+    total = events @ responses
+    # Every cell's driver is observed on the same days; repeat the driver sums per cell
+    all_count = np.tile(observed @ valid, (n_cells // n_drivers, 1))
+    all_total = np.tile(observed @ responses, (n_cells // n_drivers, 1))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        extreme = np.where(count >= min_events, total / count, np.nan)
+        normal = (all_total - total) / (all_count - count)
+    return count, extreme, normal
+
+
+def _null_chunk(
+    events: np.ndarray,
+    observed: np.ndarray,
+    responses: np.ndarray,
+    valid: np.ndarray,
+    observed_diff: np.ndarray,
+    min_events: int,
+    size: int,
+    seed: np.random.SeedSequence,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Exceedances of ``|diff|`` and valid draws for one chunk of rotations."""
+    rng = np.random.default_rng(seed)
+    T, H = responses.shape
+    offsets = rng.integers(1, T, size=size)
+    # Rotated responses are gathered a block of draws at a time to bound memory
+    block = max(1, BLOCK_ELEMENTS // (T * H))
+    exceed = np.zeros(observed_diff.shape, dtype="int64")
+    draws = np.zeros(observed_diff.shape, dtype="int64")
+    for start in range(0, size, block):
+        rows = (np.arange(T)[None, :] + offsets[start : start + block, None]) % T
+        _, extreme, normal = _group_means(events, observed, responses[rows], valid[rows],
+                                          min_events)
+        null = np.abs(extreme - normal)
+        # Allow for rounding, so a rotation equal to the data counts as at least as extreme
+        exceed += (null >= np.abs(observed_diff) * (1 - 1e-12)).sum(axis=0)
+        draws += np.isfinite(null).sum(axis=0)
+    return exceed, draws
+
+
+@instrumented
+def extreme_grid(
+    changes: np.ndarray,
+    levels: np.ndarray,
+    thresholds: Sequence[float] = DEFAULT_THRESHOLDS,
+    horizons: Sequence[int] = DEFAULT_HORIZONS,
+    sides: Sequence[str] = SIDES,
+    permutations: int = DEFAULT_PERMUTATIONS,
+    min_events: int = DEFAULT_MIN_EVENTS,
+    seed: int = 0,
+    workers: int = 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> ExtremeGrid:
+    """Responses of ``levels`` to extreme moves over a threshold x horizon grid.
+
+    Args:
+        changes: Driver changes of shape (T, n); NaN marks a missing value
+        levels: Response levels of shape (T,) on the same rows
+        thresholds: Thresholds in standard deviations of each driver
+        horizons: Forward horizons in rows
+        sides: Any of ``both``, ``up`` and ``down``
+        permutations: Circular-shift draws for the p-values; 0 skips them
+        min_events: Fewest extreme days with a response for a cell to be reported
+        seed: Root seed; chunk ``i`` uses the ``i``-th spawned child
+        workers: Processes to run chunks on; 1 runs in-process
+        chunk_size: Draws evaluated together per chunk
+
+    Returns:
+        ExtremeGrid with arrays of shape (side, threshold, driver, horizon)
+
+    Raises:
+        ValueError: If ``changes`` and ``levels`` have different lengths
+    """
+    changes = np.asarray(changes, dtype="float64")
+    changes = changes[:, None] if changes.ndim == 1 else changes
+    if len(changes) != len(levels):
+        raise ValueError(f"changes has {len(changes)} rows but levels has {len(levels)}")
+    T, n = changes.shape
+    shape = (len(sides), len(thresholds), n, len(horizons))
+
+    # (side, threshold, T, n) -> (side * threshold * n, T), drivers varying fastest
+    events = np.moveaxis(extreme_masks(changes, thresholds, sides), 2, -1).reshape(-1, T)
+    events = events.astype("float64")
+    observed = np.isfinite(changes).T.astype("float64")
+    responses = forward_changes(levels, horizons)
+    valid = np.isfinite(responses)
+    responses = np.where(valid, responses, 0.0)
+    valid = valid.astype("float64")
+
+    count, extreme, normal = _group_means(events, observed, responses, valid, min_events)
+    diff = extreme - normal
+
+    p_value = np.full(diff.shape, np.nan)
+    if permutations > 0:
+        sizes = [min(chunk_size, permutations - start)
+                 for start in range(0, permutations, chunk_size)]
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+        args = [(events, observed, responses, valid, diff, min_events, size, child)
+                for size, child in zip(sizes, seeds)]
+        if workers <= 1 or len(args) == 1:
+            chunks = [_null_chunk(*arg) for arg in args]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                chunks = list(pool.map(_null_chunk, *zip(*args)))
+        exceed = sum(chunk[0] for chunk in chunks)
+        draws = sum(chunk[1] for chunk in chunks)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            p_value = np.where(np.isfinite(diff), (1 + exceed) / (1 + draws), np.nan)
+
+    return ExtremeGrid(*(a.reshape(shape) for a in (count, extreme, normal, diff, p_value)),
+                       permutations)
+
+
+def extreme_responses(
+    changes: pd.DataFrame,
+    levels: pd.Series,
+    thresholds: Sequence[float] = DEFAULT_THRESHOLDS,
+    horizons: Sequence[int] = DEFAULT_HORIZONS,
+    sides: Sequence[str] = SIDES,
+    **kwargs,
+) -> pd.DataFrame:
+    """Tidy extreme-move responses of ``levels`` to every column of ``changes``.
+
+    Args:
+        changes: Driver changes, one column per driver
+        levels: Response levels on the same index
+        thresholds: Thresholds in standard deviations of each driver
+        horizons: Forward horizons in rows
+        sides: Any of ``both``, ``up`` and ``down``
+        **kwargs: Passed to ``extreme_grid``
+
+    Returns:
+        Long DataFrame with columns ``driver``, ``side``, ``threshold``,
+        ``horizon``, ``n_extreme``, ``mean_extreme``, ``mean_normal``,
+        ``diff`` and ``p_value``
+    """
+    grid = extreme_grid(changes.to_numpy("float64"),
+                        levels.reindex(changes.index).to_numpy("float64"),
+                        thresholds, horizons, sides, **kwargs)
+    index = pd.MultiIndex.from_product([list(sides), list(thresholds), list(changes.columns),
+                                        list(horizons)],
+                                       names=["side", "threshold", "driver", "horizon"])
+    tidy = pd.DataFrame(
+        {
+            "n_extreme": grid.n_extreme.ravel().astype("int64"),
+            "mean_extreme": grid.mean_extreme.ravel(),
+            "mean_normal": grid.mean_normal.ravel(),
+            "diff": grid.diff.ravel(),
+            "p_value": grid.p_value.ravel(),
+        },
+        index=index,
+    ).reset_index()
+    return tidy[["driver", "side", "threshold", "horizon", "n_extreme", "mean_extreme",
+                 "mean_normal", "diff", "p_value"]]
+
+
+def plot_extreme_grid(
+    tidy: pd.DataFrame,
+    path: Union[str, Path],
+    side: str = "both",
+    alpha: float = 0.05,
+    title: Optional[str] = None,
+) -> Path:
+    """Save one threshold x horizon heatmap of ``diff`` per driver.
+
+    Cells with a p-value below ``alpha`` are marked with a dot.
+
+    Args:
+        tidy: Output of ``extreme_responses``
+        path: Output image path
+        side: Side to plot
+        alpha: Significance level of the marked cells
+        title: Optional figure title
+
+    Returns:
+        Path of the saved figure
+    """
+    from matplotlib.figure import Figure
+
+    data = tidy[tidy["side"] == side]
+    drivers = list(dict.fromkeys(data["driver"]))
+    limit = np.nanmax(np.abs(data["diff"])) if data["diff"].notna().any() else 1.0
+    fig = Figure(figsize=(4 * len(drivers), 3.5))
+    axes = fig.subplots(1, len(drivers), squeeze=False, sharey=True)
+    for ax, driver in zip(axes[0], drivers):
+        cells = data[data["driver"] == driver]
+        diff = cells.pivot(index="threshold", columns="horizon", values="diff")
+        p_value = cells.pivot(index="threshold", columns="horizon", values="p_value")
+        mesh = ax.pcolormesh(diff.columns, diff.index, diff.to_numpy(), cmap="RdBu_r",
+                             vmin=-limit, vmax=limit, shading="nearest")
+        rows, cols = np.nonzero(p_value.to_numpy() < alpha)
+        ax.scatter(diff.columns[cols], diff.index[rows], s=6, color="black")
+        ax.set_title(driver)
+        ax.set_xlabel("Horizon (days)")
+    axes[0][0].set_ylabel("Threshold (s.d.)")
+    fig.colorbar(mesh, ax=axes[0].tolist(), label="Extreme minus normal cap change")
+    fig.suptitle(title or f"Market cap response to extreme moves ({side}; dots: p < {alpha})")
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(path, bbox_inches="tight")
+    return path
+
+
+if __name__ == "__main__":
+    from scripts.panel import SPREAD_COLUMNS, YIELD_COLUMNS, load_panel
+
+    parser = argparse.ArgumentParser(description="Responses to extreme yield and spread moves")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=list(DEFAULT_THRESHOLDS),
+                        help="Thresholds in standard deviations")
+    parser.add_argument("--max-horizon", type=int, default=max(DEFAULT_HORIZONS),
+                        help="Last forward horizon in trading days")
+    parser.add_argument("--permutations", type=int, default=DEFAULT_PERMUTATIONS,
+                        help="Circular-shift draws for the p-values")
+    parser.add_argument("--seed", type=int, default=0, help="Permutation seed")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes")
+    parser.add_argument("--output", default=str(OUTPUT_FILE), help="Tidy parquet output")
+    parser.add_argument("--figure", default=str(FIG_DIR / "extremes_heatmap.png"),
+                        help="Heatmap output")
+    args = parser.parse_args()
+
+    panel = load_panel(columns=["circulating_supply_usd"] + YIELD_COLUMNS + SPREAD_COLUMNS,
+                       trading_days_only=True)
+    panel = panel.dropna(subset=["circulating_supply_usd"])
+    tidy = extreme_responses(panel[YIELD_COLUMNS + SPREAD_COLUMNS].diff(),
+                             panel["circulating_supply_usd"], args.thresholds,
+                             range(args.max_horizon + 1), permutations=args.permutations,
+                             seed=args.seed, workers=args.workers)
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    tidy.to_parquet(args.output, index=False)
+    plot_extreme_grid(tidy, args.figure)
+    logger.info(f"Wrote {len(tidy)} extreme-move cells to {args.output}")
+    significant = tidy[tidy["p_value"] < 0.05].sort_values("p_value")
+    print(significant.head(20).to_string(index=False))
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""Granger-causality F-tests for many pairs and lags at once.
+
+The lagged matrix of every series is built once per panel. For each lag
+order, the restricted (own lags) and unrestricted (own plus cause lags)
+regressions of all pairs in a chunk are solved with one batched QR, and the
+F-test compares their residual sums of squares. Chunks of pairs are spread
+over a process pool, and each worker receives the panel once. Results match
+the ``ssr_ftest`` of statsmodels' ``grangercausalitytests``: lag order ``L``
+uses every row with ``L`` complete lags.
+
+F-statistics do not depend on each series' location or scale, so series are
+standardised first to keep the factorisations well conditioned.
+
+Example:
+    $ python scripts/stats/granger.py --maxlag 10 --workers 4
+
+    >>> from scripts.stats.granger import granger_table
+    >>> table = granger_table(panel, causes=["DGS10"], effects=["log_mcap"], maxlag=5)
+"""
+
+import argparse
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from scripts.utils.instrument import instrumented
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_MAXLAG = 5
+DEFAULT_CHUNK_SIZE = 64
+OUTPUT_FILE = Path("data/processed/granger.parquet")
+COLUMNS = ["cause", "effect", "lag", "f_stat", "p_value", "df_num", "df_denom", "nobs"]
+
+Pair = Tuple[int, int]
+
+# Set in each pool worker by _init_worker so the panel is sent only once
+_WORKER_LAGS: Optional[np.ndarray] = None
+_WORKER_VALUES: Optional[np.ndarray] = None
+
+
+def lag_tensor(values: np.ndarray, maxlag: int) -> np.ndarray:
+    """Lagged copies of every series.
+
+    Args:
+        values: Array of shape (T, N)
+        maxlag: Largest lag
+
+    Returns:
+        Array of shape (T, maxlag, N) with ``[t, l - 1, j] = values[t - l, j]``,
+        NaN where ``t < l``
+    """
+    n_obs, n_series = values.shape
+    lags = np.full((n_obs, maxlag, n_series), np.nan)
+    for lag in range(1, maxlag + 1):
+        lags[lag:, lag - 1] = values[:-lag]
+    return lags
+
+
+def _standardise(values: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore"):
+        scale = np.nanstd(values, axis=0)
+        scale = np.where(np.isfinite(scale) & (scale > 0), scale, 1.0)
+        return (values - np.nanmean(values, axis=0)) / scale
+
+
+def _ssr(X: np.ndarray, y: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """Residual sums of squares of a batch of regressions over their valid rows."""
+    X = np.where(valid[..., None], X, 0.0)
+    y = np.where(valid, y, 0.0)
+    q, _ = np.linalg.qr(X)
+    fitted = np.einsum("bnk,bk->bn", q, np.einsum("bnk,bn->bk", q, y))
+    return ((y - fitted) ** 2).sum(axis=1)
+
+
+def _granger_pairs(
+    lags: np.ndarray,
+    values: np.ndarray,
+    pairs: Sequence[Pair],
+    maxlag: int,
+) -> List[tuple]:
+    """F-tests for every pair and lag order, one batched solve per order and model."""
+    effect_idx = np.array([effect for _, effect in pairs])
+    cause_idx = np.array([cause for cause, _ in pairs])
+    y = values[:, effect_idx].T  # (B, T)
+    ones = np.ones(y.shape + (1,))
+    rows = []
+    for lag in range(1, maxlag + 1):
+        own = np.moveaxis(lags[:, :lag, effect_idx], 2, 0)  # (B, T, lag)
+        other = np.moveaxis(lags[:, :lag, cause_idx], 2, 0)
+        unrestricted = np.concatenate([ones, own, other], axis=2)
+        restricted = unrestricted[..., : lag + 1]
+        valid = np.isfinite(y) & np.isfinite(unrestricted).all(axis=2)
+        ssr_r = _ssr(restricted, y, valid)
+        ssr_u = _ssr(unrestricted, y, valid)
+        nobs = valid.sum(axis=1)
+        df_denom = nobs - 2 * lag - 1
+        with np.errstate(invalid="ignore", divide="ignore"):
+            f_stat = np.where(df_denom > 0, (ssr_r - ssr_u) / lag / (ssr_u / df_denom), np.nan)
+        p_value = stats.f.sf(f_stat, lag, np.maximum(df_denom, 1))
+        for b, (cause, effect) in enumerate(pairs):
+            rows.append((cause, effect, lag, f_stat[b], p_value[b], lag, int(df_denom[b]),
+                         int(nobs[b])))
+    return rows
+
+
+def _init_worker(values: np.ndarray, maxlag: int) -> None:
+    global _WORKER_LAGS, _WORKER_VALUES
+    _WORKER_VALUES = values
+    _WORKER_LAGS = lag_tensor(values, maxlag)
+
+
+def _worker(pairs: Sequence[Pair], maxlag: int) -> List[tuple]:
+    return _granger_pairs(_WORKER_LAGS, _WORKER_VALUES, pairs, maxlag)
+
+
+def _chunks(pairs: List[Pair], size: int) -> Iterable[List[Pair]]:
+    for start in range(0, len(pairs), size):
+        yield pairs[start : start + size]
+
+
+@instrumented
+def granger_table(
+    df: pd.DataFrame,
+    causes: Sequence[str],
+    effects: Sequence[str],
+    maxlag: int = DEFAULT_MAXLAG,
+    both_directions: bool = False,
+    workers: int = 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> pd.DataFrame:
+    """Granger-causality F-tests for every (cause, effect) pair and lag order.
+
+    Args:
+        df: Panel holding every series, one row per period
+        causes: Candidate causing series
+        effects: Series to explain
+        maxlag: Test lag orders 1..maxlag
+        both_directions: Also test every effect as a cause of every cause
+        workers: Processes to fan chunks out over; 1 runs in-process
+        chunk_size: Pairs solved together per batch
+
+    Returns:
+        Tidy frame with one row per (cause, effect, lag) and columns
+        ``COLUMNS``
+    """
+    columns = list(dict.fromkeys(list(causes) + list(effects)))
+    position = {col: i for i, col in enumerate(columns)}
+    names = [(c, e) for c, e in product(causes, effects) if c != e]
+    if both_directions:
+        names += [(e, c) for c, e in names if (e, c) not in names]
+    pairs = [(position[c], position[e]) for c, e in names]
+    values = _standardise(df[columns].to_numpy("float64"))
+
+    chunks = list(_chunks(pairs, chunk_size))
+    if workers <= 1 or len(chunks) == 1:
+        lags = lag_tensor(values, maxlag)
+        results = [_granger_pairs(lags, values, chunk, maxlag) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(values, maxlag)
+        ) as pool:
+            results = list(pool.map(_worker, chunks, [maxlag] * len(chunks)))
+
+    table = pd.DataFrame([row for rows in results for row in rows], columns=COLUMNS)
+    table["cause"] = [columns[i] for i in table["cause"]]
+    table["effect"] = [columns[i] for i in table["effect"]]
+    return table.sort_values(["cause", "effect", "lag"], kind="stable").reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    from scripts.make_features import load_features
+    from scripts.panel import SPREAD_COLUMNS, YIELD_COLUMNS, load_token_caps
+
+    parser = argparse.ArgumentParser(description="Granger-causality sweep over the panel")
+    parser.add_argument("--maxlag", type=int, default=DEFAULT_MAXLAG, help="Largest lag order")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes")
+    parser.add_argument("--levels", action="store_true",
+                        help="Test levels instead of first differences")
+    parser.add_argument("--output", default=str(OUTPUT_FILE), help="Tidy parquet output")
+    args = parser.parse_args()
+
+    tenors = YIELD_COLUMNS + SPREAD_COLUMNS
+    series = ["log_mcap"] + tenors
+    # Levels, or their changes since the previous trading day, from the feature store
+    features = series if args.levels else [f"chg_{col}" for col in series]
+    panel = load_features(features, trading_days_only=True).set_axis(series, axis=1)
+    tokens = load_token_caps(panel.index)
+    if not tokens.empty:
+        log_tokens = np.log(tokens.where(tokens > 0)).add_prefix("log_mcap_")
+        panel = panel.join(log_tokens if args.levels else log_tokens.diff())
+    caps = [col for col in panel.columns if col.startswith("log_mcap")]
+
+    table = granger_table(panel, causes=tenors, effects=caps, maxlag=args.maxlag,
+                          both_directions=True, workers=args.workers)
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    table.to_parquet(args.output, index=False)
+    logger.info(f"Wrote {len(table)} Granger tests to {args.output}")
+    significant = table[(table["p_value"] < 0.05) & (table["lag"] == args.maxlag)]
+    print(significant.to_string(index=False))
@@ -0,0 +1,273 @@
+"""Batched closed-form least squares with robust standard errors.
+
+Many small regressions that share a design width are stacked into one
+(batch x obs x regressors) array and solved with a single batched QR
+factorisation. This covers every regressor and specification of the
+nonlinearity analysis and every candidate breakpoint of a threshold scan.
+Standard errors can be classical, heteroskedasticity-consistent (HC0, HC1,
+HC3) or Newey-West HAC with a Bartlett kernel. They match statsmodels' ``OLS``
+with the same ``cov_type``.
+
+Rows with a missing value in ``y`` or any regressor are dropped per batch
+item by zero-weighting, so different items may use different rows. For HAC
+the kept rows are packed together first, so the kernel runs over consecutive
+kept rows as it does after statsmodels drops them.
+
+Example:
+    >>> from scripts.stats.regression import nonlinear_fits, threshold_scan
+    >>> fits = nonlinear_fits(panel, "circulating_supply_usd", ["DGS10", "10Y-2Y"])
+    >>> scan = threshold_scan(panel["DGS10"], panel["circulating_supply_usd"], n_grid=200)
+"""
+
+import logging
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from scripts.utils.instrument import instrumented
+
+logger = logging.getLogger(__name__)
+
+# Constants
+COV_TYPES = ("nonrobust", "HC0", "HC1", "HC3", "HAC")
+SPECIFICATIONS = ("linear", "quadratic", "piecewise")
+# Share of observations kept out of each regime when scanning thresholds
+DEFAULT_TRIM = 0.15
+DEFAULT_N_GRID = 100
+
+
+class OLSResult(NamedTuple):
+    """Batched OLS estimates; the leading axis indexes the batch."""
+
+    params: np.ndarray  # (B, k)
+    bse: np.ndarray  # (B, k)
+    cov: np.ndarray  # (B, k, k)
+    rsquared: np.ndarray  # (B,)
+    ssr: np.ndarray  # (B,)
+    nobs: np.ndarray  # (B,)
+    cov_type: str
+
+
+class ThresholdScan(NamedTuple):
+    """Grid search over breakpoints of a piecewise regression."""
+
+    thresholds: np.ndarray  # (G,)
+    ssr: np.ndarray  # (G,)
+    rsquared: np.ndarray  # (G,)
+    best: int
+    fit: OLSResult  # fits for every threshold
+
+    @property
+    def best_threshold(self) -> float:
+        return float(self.thresholds[self.best])
+
+
+def newey_west_lags(nobs: int) -> int:
+    """Newey-West (1994) rule-of-thumb lag length, ``floor(4 (n / 100) ^ (2/9))``."""
+    return int(np.floor(4 * (nobs / 100) ** (2 / 9)))
+
+
+def ols(
+    X: np.ndarray,
+    y: np.ndarray,
+    cov_type: str = "nonrobust",
+    maxlags: Optional[int] = None,
+) -> OLSResult:
+    """Solve a batch of least-squares problems with one batched QR.
+
+    Args:
+        X: Designs of shape (B, n, k), or (n, k) for a single regression;
+            include a constant column explicitly
+        y: Responses of shape (B, n) or (n,), broadcast across the batch
+        cov_type: One of ``COV_TYPES``
+        maxlags: HAC lag length; ``newey_west_lags`` of each item's kept rows if None
+
+    Returns:
+        OLSResult with a leading batch axis of size B (1 for a single design).
+        Items whose design is rank deficient get NaN estimates.
+
+    Raises:
+        ValueError: If ``cov_type`` is not supported
+    """
+    if cov_type not in COV_TYPES:
+        raise ValueError(f"Unsupported cov_type {cov_type!r}; expected one of {COV_TYPES}")
+    X = np.asarray(X, dtype="float64")
+    if X.ndim == 2:
+        X = X[None]
+    n_batch, n_obs, k = X.shape
+    y = np.broadcast_to(np.asarray(y, dtype="float64"), (n_batch, n_obs))
+
+    valid = np.isfinite(y) & np.isfinite(X).all(axis=-1)
+    X = np.where(valid[..., None], X, 0.0)
+    y = np.where(valid, y, 0.0)
+    nobs = valid.sum(axis=1)
+
+    q, r = np.linalg.qr(X)
+    diag = np.abs(np.diagonal(r, axis1=1, axis2=2))
+    singular = (diag <= 1e-10 * np.maximum(diag.max(axis=1, keepdims=True), 1e-300)).any(axis=1)
+    r = np.where(singular[:, None, None], np.eye(k), r)
+
+    r_inv = np.linalg.inv(r)
+    bread = r_inv @ np.swapaxes(r_inv, 1, 2)  # (X'X)^-1
+    params = (r_inv @ np.einsum("bnk,bn->bk", q, y)[..., None])[..., 0]
+    resid = (y - np.einsum("bnk,bk->bn", X, params)) * valid
+    ssr = (resid**2).sum(axis=1)
+    df_resid = nobs - k
+    y_mean = y.sum(axis=1) / np.maximum(nobs, 1)
+    tss = (((y - y_mean[:, None]) * valid) ** 2).sum(axis=1)
+
+    if cov_type == "nonrobust":
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cov = bread * (ssr / df_resid)[:, None, None]
+    else:
+        if cov_type == "HC3":
+            leverage = (q**2).sum(axis=-1)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                resid = np.where(valid, resid / (1 - leverage), 0.0)
+        scores = X * resid[..., None]
+        meat = np.swapaxes(scores, 1, 2) @ scores
+        if cov_type == "HAC":
+            # Move each item's kept rows to the front, in order, so lags skip dropped rows
+            order = np.argsort(~valid, axis=1, kind="stable")
+            scores = np.take_along_axis(scores, order[..., None], axis=1)
+            if maxlags is None:
+                lags = np.array([newey_west_lags(int(n)) for n in nobs])
+            else:
+                lags = np.full(n_batch, maxlags)
+            for lag in range(1, min(int(lags.max(initial=0)), n_obs - 1) + 1):
+                gamma = np.swapaxes(scores[:, lag:], 1, 2) @ scores[:, :-lag]
+                weight = np.where(lag <= lags, 1 - lag / (lags + 1), 0.0)
+                meat += weight[:, None, None] * (gamma + np.swapaxes(gamma, 1, 2))
+        cov = bread @ meat @ bread
+        if cov_type == "HC1":
+            cov *= (nobs / df_resid)[:, None, None]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rsquared = 1 - ssr / tss
+        bse = np.sqrt(np.diagonal(cov, axis1=1, axis2=2))
+    for array in (params, bse, rsquared, ssr):
+        array[singular] = np.nan
+    cov[singular] = np.nan
+    return OLSResult(params, bse, cov, rsquared, ssr, nobs, cov_type)
+
+
+def design(x: np.ndarray, spec: str, threshold: Optional[float] = None) -> np.ndarray:
+    """Design matrix for one specification of ``y`` on ``x``.
+
+    Args:
+        x: Regressor of shape (n,)
+        spec: ``linear`` (1, x), ``quadratic`` (1, x, x^2) or ``piecewise``
+            (1, x, 1[x > threshold])
+        threshold: Breakpoint for ``piecewise``; the median of ``x`` if None
+
+    Returns:
+        Array of shape (n, k)
+
+    Raises:
+        ValueError: If ``spec`` is unknown
+    """
+    x = np.asarray(x, dtype="float64")
+    ones = np.ones_like(x)
+    if spec == "linear":
+        return np.column_stack([ones, x])
+    if spec == "quadratic":
+        return np.column_stack([ones, x, x * x])
+    if spec == "piecewise":
+        if threshold is None:
+            threshold = np.nanmedian(x)
+        step = np.where(np.isnan(x), np.nan, (x > threshold).astype("float64"))
+        return np.column_stack([ones, x, step])
+    raise ValueError(f"Unknown specification {spec!r}; expected one of {SPECIFICATIONS}")
+
+
+@instrumented
+def nonlinear_fits(
+    df: pd.DataFrame,
+    target: str,
+    regressors: Sequence[str],
+    specs: Sequence[str] = SPECIFICATIONS,
+    thresholds: Optional[Dict[str, float]] = None,
+    cov_type: str = "HAC",
+    maxlags: Optional[int] = None,
+) -> pd.DataFrame:
+    """Fit every specification for every regressor, batched by design width.
+
+    Args:
+        df: Frame holding ``target`` and ``regressors``
+        target: Response column
+        regressors: Columns to regress ``target`` on, one at a time
+        specs: Specifications to fit, from ``SPECIFICATIONS``
+        thresholds: Piecewise breakpoint per regressor; medians if missing
+        cov_type: Standard error type, one of ``COV_TYPES``
+        maxlags: HAC lag length
+
+    Returns:
+        One row per (regressor, spec) with ``rsquared``, ``nobs``,
+        ``threshold`` and ``coef_<i>``/``se_<i>`` for each design column
+    """
+    thresholds = thresholds or {}
+    y = df[target].to_numpy("float64")
+    # Group designs by width so each group is one batched solve
+    jobs: Dict[int, List[tuple]] = {}
+    for position, (col, spec) in enumerate((col, spec) for col in regressors for spec in specs):
+        x = df[col].to_numpy("float64")
+        threshold = None
+        if spec == "piecewise":
+            threshold = thresholds.get(col, float(np.nanmedian(x)))
+        X = design(x, spec, threshold)
+        jobs.setdefault(X.shape[1], []).append((position, col, spec, threshold, X))
+
+    rows = {}
+    for width, items in jobs.items():
+        fit = ols(np.stack([item[-1] for item in items]), y, cov_type, maxlags)
+        for b, (position, col, spec, threshold, _) in enumerate(items):
+            row = {"regressor": col, "spec": spec, "threshold": threshold,
+                   "rsquared": fit.rsquared[b], "nobs": int(fit.nobs[b])}
+            for i in range(width):
+                row[f"coef_{i}"] = fit.params[b, i]
+                row[f"se_{i}"] = fit.bse[b, i]
+            rows[position] = row
+    return pd.DataFrame([rows[position] for position in sorted(rows)])
+
+
+@instrumented
+def threshold_scan(
+    x: np.ndarray,
+    y: np.ndarray,
+    thresholds: Optional[np.ndarray] = None,
+    n_grid: int = DEFAULT_N_GRID,
+    trim: float = DEFAULT_TRIM,
+    cov_type: str = "nonrobust",
+    maxlags: Optional[int] = None,
+) -> ThresholdScan:
+    """Fit the piecewise model at every candidate breakpoint in one batch.
+
+    Args:
+        x: Threshold variable and regressor, shape (n,)
+        y: Response, shape (n,)
+        thresholds: Candidate breakpoints; if None, ``n_grid`` distinct
+            quantiles of ``x`` between ``trim`` and ``1 - trim``
+        n_grid: Grid size when ``thresholds`` is None
+        trim: Share of observations each regime must keep
+        cov_type: Standard error type, one of ``COV_TYPES``
+        maxlags: HAC lag length
+
+    Returns:
+        ThresholdScan with the SSR and R^2 at every threshold and the
+        SSR-minimising breakpoint
+    """
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    if thresholds is None:
+        thresholds = np.unique(np.nanquantile(x, np.linspace(trim, 1 - trim, n_grid)))
+    thresholds = np.asarray(thresholds, dtype="float64")
+
+    base = design(x, "linear")
+    step = (x[None, :] > thresholds[:, None]).astype("float64")
+    step[:, np.isnan(x)] = np.nan
+    X = np.concatenate([np.broadcast_to(base, (len(thresholds),) + base.shape), step[..., None]],
+                       axis=2)
+    fit = ols(X, y, cov_type, maxlags)
+    best = int(np.nanargmin(fit.ssr))
+    return ThresholdScan(thresholds, fit.ssr, fit.rsquared, best, fit)
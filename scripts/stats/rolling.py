@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""Rolling correlations for many series and many windows at once.
+
+``rolling_corr`` computes the rolling Pearson correlation of one series with
+every column of a matrix, for several window lengths, from prefix sums of
+the pairwise moments. Each step costs O(1) per window and series, and the
+result is a (window x series x time) array. ``RollingCorrelation`` keeps the
+same running sums in a ring buffer, so a daily run only has to compute the
+newest point, and its state can be saved between runs.
+
+Missing values are handled pairwise: a row counts toward a window only if
+both series are observed. A window needs ``min_periods`` such rows, which
+defaults to its length, matching pandas' ``rolling(w).corr``.
+
+Example:
+    $ python scripts/stats/rolling.py             # full history
+    $ python scripts/stats/rolling.py --update    # only the new panel rows
+
+    >>> from scripts.stats.rolling import rolling_corr
+    >>> cube = rolling_corr(panel["log_mcap"], panel[["DGS10", "10Y-2Y"]], windows=(7, 30))
+"""
+
+import argparse
+import logging
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from scripts.utils.instrument import instrumented
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_WINDOWS = (7, 30, 90, 180)
+# Steps between exact recomputations of the online running sums
+RESYNC_EVERY = 250
+PROCESSED_DIR = Path("data/processed")
+OUTPUT_FILE = PROCESSED_DIR / "rolling_corr.parquet"
+STATE_FILE = PROCESSED_DIR / "rolling_corr_state.npz"
+
+ArrayLike = Union[np.ndarray, pd.Series, pd.DataFrame]
+
+
+def _as_2d(values: ArrayLike) -> np.ndarray:
+    values = np.asarray(values, dtype="float64")
+    return values[:, None] if values.ndim == 1 else values
+
+
+def _standardise(values: np.ndarray) -> np.ndarray:
+    """Centre and scale columns, ignoring NaN; constant columns are only centred."""
+    with np.errstate(invalid="ignore"):
+        scale = np.nanstd(values, axis=0)
+        scale = np.where(np.isfinite(scale) & (scale > 0), scale, 1.0)
+        return (values - np.nanmean(values, axis=0)) / scale
+
+
+def _min_periods(windows: Sequence[int], min_periods: Optional[int]) -> np.ndarray:
+    if min_periods is None:
+        return np.asarray(windows)
+    return np.minimum(np.asarray(windows), max(min_periods, 2))
+
+
+def _corr(n, sx, sy, sxx, syy, sxy, min_periods: np.ndarray) -> np.ndarray:
+    """Pearson correlation from pairwise sums; NaN below min_periods or if constant."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = n * sxy - sx * sy
+        var_x = n * sxx - sx * sx
+        var_y = n * syy - sy * sy
+        corr = cov / np.sqrt(var_x * var_y)
+    tol = 1e-12 * np.maximum(n, 1) ** 2
+    min_periods = min_periods.reshape((-1,) + (1,) * (n.ndim - 1))
+    corr[(n < min_periods) | (var_x <= tol) | (var_y <= tol)] = np.nan
+    return np.clip(corr, -1.0, 1.0)
+
+
+@instrumented
+def rolling_corr(
+    x: ArrayLike,
+    y: ArrayLike,
+    windows: Sequence[int] = DEFAULT_WINDOWS,
+    min_periods: Optional[int] = None,
+) -> np.ndarray:
+    """Rolling correlation of ``x`` with every column of ``y`` for every window.
+
+    Args:
+        x: Series of shape (T,); NaN marks a missing value
+        y: Matrix of shape (T,) or (T, n) on the same rows as ``x``
+        windows: Window lengths in rows
+        min_periods: Minimum paired observations per window; the window
+            length if None
+
+    Returns:
+        Array of shape (len(windows), n, T); entry ``[w, j, t]`` is the
+        correlation over rows ``t - windows[w] + 1 .. t``
+
+    Raises:
+        ValueError: If ``x`` and ``y`` have different lengths
+    """
+    x, y = _as_2d(x), _as_2d(y)
+    if len(x) != len(y):
+        raise ValueError(f"x has {len(x)} rows but y has {len(y)}")
+    windows = np.asarray(windows, dtype="int64")
+
+    # Centre and scale so the prefix sums stay well conditioned
+    mask = np.isfinite(x) & np.isfinite(y)
+    xs = np.where(mask, _standardise(x), 0.0)
+    ys = np.where(mask, _standardise(y), 0.0)
+
+    # Prefix sums of the six pairwise moments, shape (6, T + 1, n)
+    moments = np.stack([mask.astype("float64"), xs, ys, xs * xs, ys * ys, xs * ys])
+    prefix = np.zeros((6, len(x) + 1, y.shape[1]))
+    np.cumsum(moments, axis=1, out=prefix[:, 1:])
+
+    # Window sums for every window at once: prefix[t + 1] - prefix[t + 1 - w]
+    ends = np.arange(1, len(x) + 1)
+    starts = np.maximum(ends[None, :] - windows[:, None], 0)
+    sums = prefix[:, ends][:, None] - prefix[:, starts]  # (6, n_windows, T, n)
+    corr = _corr(*sums, min_periods=_min_periods(windows, min_periods))
+    return corr.transpose(0, 2, 1)
+
+
+class RollingCorrelation:
+    """Online rolling correlation of one series with many, for many windows.
+
+    Running sums are kept per window and series. Each ``update`` adds the
+    new row and subtracts the row leaving each window, read back from a ring
+    buffer as long as the longest window. Values are stored shifted to avoid
+    cancellation; every ``RESYNC_EVERY`` steps the shift is moved to the
+    buffer's mean, so it follows trending series such as market cap, and the
+    sums are recomputed exactly from the buffer.
+
+    Args:
+        windows: Window lengths in rows
+        n_series: Number of ``y`` series
+        min_periods: Minimum paired observations per window; the window
+            length if None
+    """
+
+    def __init__(self, windows: Sequence[int], n_series: int, min_periods: Optional[int] = None):
+        self.windows = np.asarray(windows, dtype="int64")
+        self.n_series = n_series
+        self.min_periods = min_periods
+        size = int(self.windows.max())
+        self.x_buffer = np.zeros(size)
+        self.y_buffer = np.zeros((size, n_series))
+        self.mask_buffer = np.zeros((size, n_series), dtype=bool)
+        self.sums = np.zeros((6, len(self.windows), n_series))
+        self.x_shift = np.nan
+        self.y_shift = np.full(n_series, np.nan)
+        self.steps = 0
+
+    @classmethod
+    def from_history(
+        cls,
+        x: ArrayLike,
+        y: ArrayLike,
+        windows: Sequence[int] = DEFAULT_WINDOWS,
+        min_periods: Optional[int] = None,
+    ) -> "RollingCorrelation":
+        """Warm up from history, replaying only the rows the longest window needs."""
+        x, y = _as_2d(x)[:, 0], _as_2d(y)
+        rolling = cls(windows, y.shape[1], min_periods)
+        start = max(len(x) - int(rolling.windows.max()), 0)
+        for x_value, y_row in zip(x[start:], y[start:]):
+            rolling.update(x_value, y_row)
+        return rolling
+
+    def _set_shifts(self, x: np.ndarray, y: np.ndarray) -> None:
+        if np.isnan(self.x_shift):
+            finite = x[np.isfinite(x)]
+            if finite.size:
+                self.x_shift = finite[0]
+        for j in np.flatnonzero(np.isnan(self.y_shift)):
+            finite = y[np.isfinite(y[:, j]), j]
+            if finite.size:
+                self.y_shift[j] = finite[0]
+
+    def _moments(self, x: np.ndarray, y: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        """Six pairwise moments of rows of shifted values, zero where unpaired."""
+        x = np.where(mask, x, 0.0)
+        y = np.where(mask, y, 0.0)
+        return np.stack([mask.astype("float64"), x, y, x * x, y * y, x * y])
+
+    def update(self, x_value: float, y_row: ArrayLike) -> np.ndarray:
+        """Add one row and return the latest correlations.
+
+        Args:
+            x_value: New observation of ``x`` (NaN if missing)
+            y_row: New observations of the ``y`` series
+
+        Returns:
+            Array of shape (len(windows), n_series)
+        """
+        y_row = np.asarray(y_row, dtype="float64").reshape(self.n_series)
+        self._set_shifts(np.array([x_value], dtype="float64"), y_row[None, :])
+        size = len(self.x_buffer)
+        pos = self.steps % size
+
+        # Rows leaving each window, for windows that are already full
+        leaving = (pos - self.windows) % size
+        full = self.steps >= self.windows
+        out = self._moments(
+            self.x_buffer[leaving][:, None], self.y_buffer[leaving], self.mask_buffer[leaving]
+        )
+        self.sums -= out * full[None, :, None]
+
+        x_shifted = x_value - self.x_shift
+        y_shifted = y_row - self.y_shift
+        mask = np.isfinite(x_shifted) & np.isfinite(y_shifted)
+        self.x_buffer[pos] = x_shifted if np.isfinite(x_shifted) else 0.0
+        self.y_buffer[pos] = np.where(np.isfinite(y_shifted), y_shifted, 0.0)
+        self.mask_buffer[pos] = mask
+        x_row = np.full(self.n_series, self.x_buffer[pos])
+        self.sums += self._moments(x_row, self.y_buffer[pos], mask)[:, None, :]
+        self.steps += 1
+        if self.steps % RESYNC_EVERY == 0:
+            self._resync()
+        return self.latest()
+
+    def _resync(self) -> None:
+        """Re-centre the buffer and recompute the running sums exactly from it."""
+        size = len(self.x_buffer)
+        filled = min(self.steps, size)
+        mask = self.mask_buffer[:filled]
+        paired = mask.any(axis=1)
+        if paired.any():
+            delta_x = self.x_buffer[:filled][paired].mean()
+            self.x_buffer[:filled][paired] -= delta_x
+            self.x_shift += delta_x
+        counts = mask.sum(axis=0)
+        y_sums = (self.y_buffer[:filled] * mask).sum(axis=0)
+        delta_y = np.where(counts > 0, y_sums / np.maximum(counts, 1), 0.0)
+        self.y_buffer[:filled] -= np.where(mask, delta_y, 0.0)
+        self.y_shift += delta_y
+
+        for w, window in enumerate(self.windows):
+            count = min(int(window), self.steps)
+            rows = (self.steps - 1 - np.arange(count)) % size
+            moments = self._moments(
+                self.x_buffer[rows][:, None], self.y_buffer[rows], self.mask_buffer[rows]
+            )
+            self.sums[:, w] = moments.sum(axis=1)
+
+    def latest(self) -> np.ndarray:
+        """Correlations for the most recent row, shape (len(windows), n_series)."""
+        return _corr(*self.sums, min_periods=_min_periods(self.windows, self.min_periods))
+
+    def save(self, path: Union[str, Path], **extra: np.ndarray) -> None:
+        """Save the state, plus any extra arrays, to an ``.npz`` file."""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        np.savez(
+            path,
+            windows=self.windows,
+            min_periods=-1 if self.min_periods is None else self.min_periods,
+            x_buffer=self.x_buffer,
+            y_buffer=self.y_buffer,
+            mask_buffer=self.mask_buffer,
+            sums=self.sums,
+            x_shift=self.x_shift,
+            y_shift=self.y_shift,
+            steps=self.steps,
+            **extra,
+        )
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> Tuple["RollingCorrelation", Dict[str, np.ndarray]]:
+        """Load a saved state; return it and any extra arrays saved with it."""
+        with np.load(path) as data:
+            arrays = {key: data[key] for key in data.files}
+        min_periods = int(arrays.pop("min_periods"))
+        rolling = cls(arrays.pop("windows"), arrays["y_buffer"].shape[1],
+                      None if min_periods < 0 else min_periods)
+        for key in ("x_buffer", "y_buffer", "mask_buffer", "sums", "y_shift"):
+            setattr(rolling, key, arrays.pop(key))
+        rolling.x_shift = float(arrays.pop("x_shift"))
+        rolling.steps = int(arrays.pop("steps"))
+        return rolling, arrays
+
+
+def to_frame(
+    cube: np.ndarray,
+    index: pd.Index,
+    windows: Sequence[int],
+    columns: Sequence[str],
+) -> pd.DataFrame:
+    """Tidy (date, window, series, corr) frame from a rolling correlation cube."""
+    series = np.repeat(np.asarray(columns, dtype=object), len(index))
+    return pd.DataFrame(
+        {
+            "date": np.tile(np.asarray(index), len(windows) * len(columns)),
+            "window": np.repeat(np.asarray(windows), len(columns) * len(index)),
+            "series": np.tile(series, len(windows)),
+            "corr": cube.ravel(),
+        }
+    )
+
+
+if __name__ == "__main__":
+    from scripts.panel import SPREAD_COLUMNS, YIELD_COLUMNS, load_panel
+
+    parser = argparse.ArgumentParser(description="Multi-window rolling correlations")
+    parser.add_argument("--windows", type=int, nargs="+", default=list(DEFAULT_WINDOWS),
+                        help="Window lengths in trading days")
+    parser.add_argument("--target", default="log_mcap", help="Series to correlate against")
+    parser.add_argument("--update", action="store_true",
+                        help="Only compute panel rows newer than the saved state")
+    args = parser.parse_args()
+
+    columns = YIELD_COLUMNS + SPREAD_COLUMNS
+    panel = load_panel(columns=[args.target] + columns, trading_days_only=True)
+
+    if args.update and STATE_FILE.exists() and OUTPUT_FILE.exists():
+        rolling, extra = RollingCorrelation.load(STATE_FILE)
+        last = pd.Timestamp(extra["last_date"].item())
+        if list(rolling.windows) != args.windows:
+            parser.error(f"State uses windows {list(rolling.windows)}; rerun without --update")
+        new = panel[panel.index > last]
+        rows = [rolling.update(x, y) for x, y in zip(new[args.target], new[columns].values)]
+        if rows:
+            cube = np.stack(rows, axis=-1)
+            frame = pd.concat([pd.read_parquet(OUTPUT_FILE),
+                               to_frame(cube, new.index, args.windows, columns)], ignore_index=True)
+            frame.to_parquet(OUTPUT_FILE, index=False)
+        logger.info(f"Updated rolling correlations with {len(new)} new rows")
+    else:
+        cube = rolling_corr(panel[args.target], panel[columns], args.windows)
+        PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+        to_frame(cube, panel.index, args.windows, columns).to_parquet(OUTPUT_FILE, index=False)
+        rolling = RollingCorrelation.from_history(panel[args.target], panel[columns], args.windows)
+        logger.info(f"Computed rolling correlations for {len(panel)} rows")
+    rolling.save(STATE_FILE, last_date=np.datetime64(panel.index.max()))
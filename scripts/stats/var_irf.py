@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""VAR lag selection and bootstrapped orthogonalised impulse responses.
+
+A VAR(p) is fitted by closed-form least squares, and its moving-average
+matrices come from batched powers of the companion matrix. Confidence bands
+are from residual (iid resampling) or wild (Rademacher) bootstrap
+replications. Each chunk of draws simulates all of its samples in parallel
+from the fitted coefficients, refits them with one batched solve and computes
+every IRF with the same vectorised companion powers. No statsmodels objects
+are built per draw.
+
+Chunks run on a process pool. Each chunk's seed is spawned from one
+``SeedSequence`` by chunk index, so results do not depend on the number of
+workers.
+
+Rows with a missing value are gaps, not joins: lag matrices are built on the
+full calendar and every regression row whose target or any lag is missing is
+dropped, so no row pairs observations from either side of a gap. Bootstrap
+samples are simulated segment by segment, each from its observed initial
+values.
+
+Impulse responses are to a one-standard-deviation orthogonalised (Cholesky)
+shock, in the column order of the specification. ``irf[h, i, j]`` is the
+response of variable ``i`` at horizon ``h`` to a shock in variable ``j``,
+matching statsmodels' ``orth_irfs``.
+
+Example:
+    $ python scripts/stats/var_irf.py --replications 2000 --workers 4
+
+    >>> from scripts.stats.var_irf import bootstrap_irf
+    >>> result = bootstrap_irf(panel[["log_mcap", "DGS3MO", "DGS10"]].values, lags=2)
+"""
+
+import argparse
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from scripts.utils.instrument import instrumented
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_HORIZON = 20
+DEFAULT_REPLICATIONS = 2000
+DEFAULT_CHUNK_SIZE = 250
+DEFAULT_MAXLAGS = 10
+DEFAULT_ALPHA = 0.05
+BOOTSTRAP_METHODS = ("residual", "wild")
+FIG_DIR = Path("figures")
+OUTPUT_FILE = Path("data/processed/var_irf.parquet")
+
+
+class VarFit(NamedTuple):
+    """Least-squares VAR(p) estimates with a constant."""
+
+    intercept: np.ndarray  # (k,)
+    coefs: np.ndarray  # (p, k, k); coefs[l] multiplies y[t - l - 1]
+    resid: np.ndarray  # (n, k)
+    sigma_u: np.ndarray  # (k, k), degrees-of-freedom adjusted
+    nobs: int
+
+
+class IRFResult(NamedTuple):
+    """Point impulse responses with bootstrap percentile bands."""
+
+    irf: np.ndarray  # (H + 1, k, k)
+    lower: np.ndarray  # (H + 1, k, k)
+    upper: np.ndarray  # (H + 1, k, k)
+    lags: int
+    replications: int
+
+
+class VarSpec(NamedTuple):
+    """One VAR specification: variables (in Cholesky order) and lag rule."""
+
+    name: str
+    columns: List[str]
+    lags: Union[int, str] = "aic"
+    difference: bool = False
+
+
+def lag_design(Y: np.ndarray, lags: int, offset: int = 0) -> np.ndarray:
+    """Regressors ``[1, y[t-1], ..., y[t-p]]`` for every usable row.
+
+    Args:
+        Y: Array of shape (..., T, k)
+        lags: Lag order p
+        offset: Extra leading rows to drop, so different orders share a sample
+
+    Returns:
+        Array of shape (..., T - p - offset, 1 + k * p)
+    """
+    n_obs = Y.shape[-2]
+    start = lags + offset
+    blocks = [np.ones(Y.shape[:-2] + (n_obs - start, 1))]
+    blocks += [Y[..., start - lag : n_obs - lag, :] for lag in range(1, lags + 1)]
+    return np.concatenate(blocks, axis=-1)
+
+
+def usable_rows(Y: np.ndarray, lags: int, offset: int = 0) -> np.ndarray:
+    """Rows of ``lag_design(Y, lags, offset)`` whose target and every lag are finite.
+
+    Args:
+        Y: Array of shape (T, k); NaN marks a missing value
+        lags: Lag order p
+        offset: Extra leading rows to drop
+
+    Returns:
+        Boolean mask of shape (T - p - offset,)
+    """
+    Y = np.asarray(Y, dtype="float64")
+    Z = lag_design(Y, lags, offset)
+    return np.isfinite(Z).all(axis=-1) & np.isfinite(Y[lags + offset :]).all(axis=-1)
+
+
+def _solve(Z: np.ndarray, target: np.ndarray) -> np.ndarray:
+    """Batched least squares ``Z b = target`` by QR."""
+    q, r = np.linalg.qr(Z)
+    return np.linalg.solve(r, np.swapaxes(q, -1, -2) @ target)
+
+
+def _unpack(beta: np.ndarray, k: int, lags: int):
+    """Split stacked coefficients into intercepts (..., k) and (..., p, k, k)."""
+    intercept = beta[..., 0, :]
+    coefs = beta[..., 1:, :].reshape(beta.shape[:-2] + (lags, k, k))
+    return intercept, np.swapaxes(coefs, -1, -2)
+
+
+@instrumented
+def fit_var(
+    Y: np.ndarray,
+    lags: int,
+    offset: int = 0,
+    rows: Optional[np.ndarray] = None,
+) -> VarFit:
+    """Fit a VAR(p) with a constant by least squares.
+
+    Args:
+        Y: Data of shape (T, k); NaN rows are gaps that no regression row spans
+        lags: Lag order p
+        offset: Extra leading rows to drop
+        rows: Regression rows to use; ``usable_rows(Y, lags, offset)`` if None
+
+    Returns:
+        VarFit matching statsmodels' ``VAR(Y).fit(p)`` on data without gaps
+    """
+    Y = np.asarray(Y, dtype="float64")
+    k = Y.shape[1]
+    if rows is None:
+        rows = usable_rows(Y, lags, offset)
+    Z = lag_design(Y, lags, offset)[rows]
+    target = Y[lags + offset :][rows]
+    beta = _solve(Z, target)
+    resid = target - Z @ beta
+    intercept, coefs = _unpack(beta, k, lags)
+    nobs = len(target)
+    sigma_u = resid.T @ resid / (nobs - k * lags - 1)
+    return VarFit(intercept, coefs, resid, sigma_u, nobs)
+
+
+@instrumented
+def select_order(Y: np.ndarray, maxlags: int = DEFAULT_MAXLAGS) -> pd.DataFrame:
+    """Information criteria for lag orders 0..maxlags on a common sample.
+
+    The sample is the rows usable at ``maxlags``, so every order is fitted on
+    the same targets.
+
+    Args:
+        Y: Data of shape (T, k); NaN rows are gaps
+        maxlags: Largest order to consider
+
+    Returns:
+        Frame indexed by lag order with ``aic``, ``bic`` and ``hqic`` columns,
+        as in statsmodels' ``VAR.select_order``
+    """
+    Y = np.asarray(Y, dtype="float64")
+    k = Y.shape[1]
+    sample = usable_rows(Y, maxlags)
+    rows = []
+    for lags in range(maxlags + 1):
+        fit = fit_var(Y, lags, offset=maxlags - lags, rows=sample)
+        n = fit.nobs
+        sigma_mle = fit.resid.T @ fit.resid / n
+        logdet = np.linalg.slogdet(sigma_mle)[1]
+        free = k * (k * lags + 1)
+        rows.append(
+            {
+                "lags": lags,
+                "aic": logdet + 2 * free / n,
+                "bic": logdet + np.log(n) * free / n,
+                "hqic": logdet + 2 * np.log(np.log(n)) * free / n,
+            }
+        )
+    return pd.DataFrame(rows).set_index("lags")
+
+
+def companion(coefs: np.ndarray) -> np.ndarray:
+    """Companion matrices of shape (..., k * p, k * p) for coefs (..., p, k, k)."""
+    lags, k = coefs.shape[-3], coefs.shape[-1]
+    batch = coefs.shape[:-3]
+    top = np.concatenate([coefs[..., lag, :, :] for lag in range(lags)], axis=-1)
+    shift = np.broadcast_to(np.eye(k * (lags - 1), k * lags), batch + (k * (lags - 1), k * lags))
+    return np.concatenate([top, shift], axis=-2)
+
+
+def ma_matrices(coefs: np.ndarray, horizon: int) -> np.ndarray:
+    """Moving-average matrices Phi_0..Phi_H from batched companion powers.
+
+    Args:
+        coefs: Coefficients of shape (..., p, k, k)
+        horizon: Last horizon H
+
+    Returns:
+        Array of shape (..., H + 1, k, k)
+    """
+    k = coefs.shape[-1]
+    A = companion(coefs)
+    power = np.broadcast_to(np.eye(A.shape[-1]), A.shape).copy()
+    phis = []
+    for _ in range(horizon + 1):
+        phis.append(power[..., :k, :k])
+        power = power @ A
+    return np.stack(phis, axis=-3)
+
+
+def orth_irf(coefs: np.ndarray, sigma_u: np.ndarray, horizon: int) -> np.ndarray:
+    """Responses to one-standard-deviation Cholesky shocks, (..., H + 1, k, k)."""
+    chol = np.linalg.cholesky(sigma_u)
+    return ma_matrices(coefs, horizon) @ chol[..., None, :, :]
+
+
+def _bootstrap_chunk(
+    Y: np.ndarray,
+    fit: VarFit,
+    lags: int,
+    horizon: int,
+    replications: int,
+    method: str,
+    seed: np.random.SeedSequence,
+) -> np.ndarray:
+    """Simulate, refit and compute IRFs for one chunk of bootstrap draws."""
+    rng = np.random.default_rng(seed)
+    n, k = fit.resid.shape
+    resid = fit.resid - fit.resid.mean(axis=0)
+    if method == "residual":
+        shocks = resid[rng.integers(0, n, size=(replications, n))]
+    else:
+        signs = rng.choice(np.array([-1.0, 1.0]), size=(replications, n, 1))
+        shocks = fit.resid * signs
+
+    # Simulate every draw at once. Rows that are not regression targets (the
+    # first p rows of each segment, and gaps) keep their observed values, so
+    # each segment starts from its own initial values
+    stacked = np.concatenate(list(fit.coefs), axis=1).T  # (k * p, k)
+    rows = usable_rows(Y, lags)
+    Y_star = np.repeat(Y[None], replications, axis=0)
+    for i, t in enumerate(np.flatnonzero(rows) + lags):
+        lagged = Y_star[:, t - lags : t][:, ::-1].reshape(replications, k * lags)
+        Y_star[:, t] = fit.intercept + lagged @ stacked + shocks[:, i]
+
+    Z = lag_design(Y_star, lags)[:, rows]
+    target = Y_star[:, lags:][:, rows]
+    beta = _solve(Z, target)
+    resid_star = target - Z @ beta
+    sigma = np.swapaxes(resid_star, 1, 2) @ resid_star / (n - k * lags - 1)
+    _, coefs = _unpack(beta, k, lags)
+    return orth_irf(coefs, sigma, horizon)
+
+
+@instrumented
+def bootstrap_irf(
+    Y: np.ndarray,
+    lags: int,
+    horizon: int = DEFAULT_HORIZON,
+    replications: int = DEFAULT_REPLICATIONS,
+    method: str = "residual",
+    alpha: float = DEFAULT_ALPHA,
+    seed: int = 0,
+    workers: int = 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> IRFResult:
+    """Orthogonalised IRFs with bootstrap percentile confidence bands.
+
+    Args:
+        Y: Data of shape (T, k) in Cholesky order; NaN rows are gaps
+        lags: Lag order p
+        horizon: Last horizon H
+        replications: Bootstrap draws
+        method: ``residual`` or ``wild``
+        alpha: Two-sided band level, e.g. 0.05 for 95% bands
+        seed: Root seed; chunk ``i`` uses the ``i``-th spawned child
+        workers: Processes to run chunks on; 1 runs in-process
+        chunk_size: Draws simulated together per chunk
+
+    Returns:
+        IRFResult with the point estimate and band limits
+
+    Raises:
+        ValueError: If ``method`` is not supported
+    """
+    if method not in BOOTSTRAP_METHODS:
+        raise ValueError(f"Unknown bootstrap method {method!r}; expected {BOOTSTRAP_METHODS}")
+    Y = np.asarray(Y, dtype="float64")
+    fit = fit_var(Y, lags)
+    point = orth_irf(fit.coefs, fit.sigma_u, horizon)
+
+    sizes = [min(chunk_size, replications - start) for start in range(0, replications, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [(Y, fit, lags, horizon, size, method, child) for size, child in zip(sizes, seeds)]
+    if workers <= 1 or len(args) == 1:
+        draws = [_bootstrap_chunk(*arg) for arg in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            draws = list(pool.map(_bootstrap_chunk, *zip(*args)))
+    draws = np.concatenate(draws)
+
+    lower, upper = np.nanquantile(draws, [alpha / 2, 1 - alpha / 2], axis=0)
+    return IRFResult(point, lower, upper, lags, replications)
+
+
+def resolve_lags(Y: np.ndarray, lags: Union[int, str], maxlags: int = DEFAULT_MAXLAGS) -> int:
+    """Lag order of a specification: a fixed order or ``aic``/``bic``/``hqic``."""
+    if isinstance(lags, int):
+        return lags
+    return max(int(select_order(Y, maxlags)[lags].idxmin()), 1)
+
+
+def irf_frame(result: IRFResult, names: Sequence[str], spec: str = "") -> pd.DataFrame:
+    """Tidy (spec, horizon, response, shock, irf, lower, upper) frame."""
+    horizons, k = result.irf.shape[0], len(names)
+    index = pd.MultiIndex.from_product([range(horizons), names, names],
+                                       names=["horizon", "response", "shock"])
+    frame = pd.DataFrame(
+        {
+            "irf": result.irf.ravel(),
+            "lower": result.lower.ravel(),
+            "upper": result.upper.ravel(),
+        },
+        index=index,
+    ).reset_index()
+    frame.insert(0, "spec", spec)
+    frame["lags"] = result.lags
+    return frame
+
+
+@instrumented
+def run_specifications(
+    panel: pd.DataFrame,
+    specs: Sequence[VarSpec],
+    shock: str = "log_mcap",
+    horizon: int = DEFAULT_HORIZON,
+    replications: int = DEFAULT_REPLICATIONS,
+    method: str = "residual",
+    seed: int = 0,
+    workers: int = 1,
+) -> pd.DataFrame:
+    """Bootstrapped IRFs to ``shock`` for every specification.
+
+    Args:
+        panel: Frame holding every specification's columns
+        specs: Specifications to estimate
+        shock: Variable whose orthogonalised shock is reported
+        horizon: Last horizon
+        replications: Bootstrap draws per specification
+        method: ``residual`` or ``wild``
+        seed: Root seed, shared by every specification
+        workers: Processes per specification
+
+    Returns:
+        Tidy frame of responses to ``shock`` across specifications
+    """
+    frames = []
+    for spec in specs:
+        data = panel[spec.columns]
+        if spec.difference:
+            data = data.diff()
+        # Keep the calendar: dropping NaN rows would splice across gaps
+        Y = data.to_numpy("float64")
+        lags = resolve_lags(Y, spec.lags)
+        logger.info(f"Spec {spec.name}: {int(usable_rows(Y, lags).sum())} rows, {lags} lags, "
+                    f"{replications} draws")
+        result = bootstrap_irf(Y, lags, horizon, replications, method, seed=seed, workers=workers)
+        frame = irf_frame(result, spec.columns, spec.name)
+        frames.append(frame[frame["shock"] == shock])
+    return pd.concat(frames, ignore_index=True)
+
+
+def plot_irfs(tidy: pd.DataFrame, path: Union[str, Path], title: Optional[str] = None) -> Path:
+    """Plot responses by variable, one line per specification, bands shaded.
+
+    Args:
+        tidy: Output of ``run_specifications``
+        path: Output image path
+        title: Optional figure title
+
+    Returns:
+        Path of the saved figure
+    """
+    from matplotlib.figure import Figure
+
+    responses = list(dict.fromkeys(tidy["response"]))
+    fig = Figure(figsize=(4 * len(responses), 3.5))
+    axes = fig.subplots(1, len(responses), squeeze=False)
+    for ax, response in zip(axes[0], responses):
+        for spec, group in tidy[tidy["response"] == response].groupby("spec", sort=False):
+            line = ax.plot(group["horizon"], group["irf"], label=spec)[0]
+            ax.fill_between(group["horizon"], group["lower"], group["upper"],
+                            color=line.get_color(), alpha=0.15)
+        ax.axhline(0, color="black", linewidth=0.8)
+        ax.set_title(response)
+        ax.set_xlabel("Horizon (days)")
+    axes[0][0].legend(fontsize="small")
+    fig.suptitle(title or f"Responses to a 1 s.d. {tidy['shock'].iloc[0]} shock")
+    fig.tight_layout()
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(path)
+    return path
+
+
+# Baseline and robustness specifications for the paper
+DEFAULT_SPECS = [
+    VarSpec("baseline", ["log_mcap", "DGS3MO", "DGS2", "DGS10"], "aic"),
+    VarSpec("bic", ["log_mcap", "DGS3MO", "DGS2", "DGS10"], "bic"),
+    VarSpec("yields_first", ["DGS3MO", "DGS2", "DGS10", "log_mcap"], "aic"),
+    VarSpec("spreads", ["log_mcap", "DGS3MO", "10Y-2Y"], "aic"),
+    VarSpec("differences", ["log_mcap", "DGS3MO", "DGS2", "DGS10"], "aic", difference=True),
+]
+
+
+if __name__ == "__main__":
+    from scripts.make_features import load_features
+
+    parser = argparse.ArgumentParser(description="Bootstrapped VAR impulse responses")
+    parser.add_argument("--replications", type=int, default=DEFAULT_REPLICATIONS,
+                        help="Bootstrap draws per specification")
+    parser.add_argument("--horizon", type=int, default=DEFAULT_HORIZON, help="Last IRF horizon")
+    parser.add_argument("--method", choices=BOOTSTRAP_METHODS, default="residual",
+                        help="Bootstrap scheme")
+    parser.add_argument("--seed", type=int, default=0, help="Root random seed")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes")
+    parser.add_argument("--output", default=str(OUTPUT_FILE), help="Tidy parquet output")
+    args = parser.parse_args()
+
+    columns = sorted({col for spec in DEFAULT_SPECS for col in spec.columns})
+    panel = load_features(columns, trading_days_only=True)
+    tidy = run_specifications(panel, DEFAULT_SPECS, horizon=args.horizon,
+                              replications=args.replications, method=args.method,
+                              seed=args.seed, workers=args.workers)
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    tidy.to_parquet(args.output, index=False)
+    plot_irfs(tidy[tidy["spec"] != "differences"], FIG_DIR / "irf_log_mcap.png")
+    logger.info(f"Wrote {len(tidy)} impulse responses to {args.output}")
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""Rolling-window and recursive (expanding-window) VAR re-estimation.
+
+``RecursiveVar`` keeps the least-squares cross-products ``Z'Z``, ``Z'Y`` and
+``Y'Y`` of a VAR(p) with a constant, together with the inverse of ``Z'Z``.
+Each ``update`` adds the newest observation as a rank-one update. In a
+rolling window it also drops the observation leaving the window as a
+rank-one downdate. The inverse follows both by Sherman-Morrison, so a step
+costs O(m^2 k) for ``m = 1 + k p`` regressors, where refitting would cost
+O(n m^2). As in ``rolling.py``, values are stored shifted to avoid
+cancellation. Every ``RESYNC_EVERY`` steps the shift moves to the window's
+mean and the cross-products and inverse are recomputed exactly, so
+rounding errors do not build up. Each fit equals ``var_irf.fit_var`` on
+that window.
+
+``var_path`` runs one specification over a sample and returns its
+coefficient path. ``run_paths`` does so for several specifications in
+parallel and adds orthogonalised IRFs for every window, summarised at a few
+horizons. The CLI asks how the response of yields (the 3-month bill first)
+to a log market cap shock has changed over time.
+
+Rows with a missing value are gaps, not joins. ``var_path`` restarts the
+recursion after a gap, so no window and no lag spans one, and windows that
+would end before the restarted recursion has ``min_nobs`` observations are
+skipped. The rows where it restarted are returned and logged per
+specification.
+
+Example:
+    $ python scripts/stats/var_rolling.py --window 250 --workers 4
+    $ python scripts/stats/var_rolling.py --expanding
+
+    >>> from scripts.stats.var_rolling import var_path
+    >>> path = var_path(panel[["log_mcap", "DGS3MO", "DGS10"]].values, lags=2, window=250)
+"""
+
+import argparse
+import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from scripts.stats.var_irf import (
+    DEFAULT_HORIZON,
+    DEFAULT_SPECS,
+    VarSpec,
+    _unpack,
+    orth_irf,
+    resolve_lags,
+)
+from scripts.utils.instrument import instrumented
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Constants
+# About six months of trading days
+DEFAULT_WINDOW = 120
+# Steps between exact recomputations of the cross-products and the inverse
+RESYNC_EVERY = 250
+SUMMARY_HORIZONS = (0, 1, 5, 10, 20)
+PROCESSED_DIR = Path("data/processed")
+COEF_FILE = PROCESSED_DIR / "var_paths_coefs.parquet"
+IRF_FILE = PROCESSED_DIR / "var_paths_irf.parquet"
+FIG_DIR = Path("figures")
+
+
+class VarPath(NamedTuple):
+    """VAR(p) estimates re-fitted at the end of every window."""
+
+    end: np.ndarray  # (W,) row of each window's last observation
+    intercept: np.ndarray  # (W, k)
+    coefs: np.ndarray  # (W, p, k, k); coefs[w, l] multiplies y[t - l - 1]
+    sigma_u: np.ndarray  # (W, k, k), degrees-of-freedom adjusted
+    nobs: np.ndarray  # (W,)
+    restarts: np.ndarray  # rows where the recursion restarted after a gap
+
+
+class RecursiveVar:
+    """VAR(p) least squares updated one observation at a time.
+
+    Each target observation is kept as ``v = [1, x[t-1], ..., x[t-p], x[t]]``
+    in shifted units, and ``C = sum v v'`` holds ``Z'Z``, ``Z'Y`` and ``Y'Y``
+    as its blocks.
+
+    Args:
+        k: Number of variables
+        lags: Lag order p
+        window: Observations per fit; None for an expanding window
+        min_nobs: Observations in the first expanding window; defaults to
+            ``DEFAULT_WINDOW`` and is ignored for rolling windows
+    """
+
+    def __init__(
+        self,
+        k: int,
+        lags: int,
+        window: Optional[int] = None,
+        min_nobs: Optional[int] = None,
+    ):
+        self.k = k
+        self.lags = lags
+        self.window = window
+        self.n_regressors = 1 + k * lags
+        self.min_nobs = window if window is not None else min_nobs or DEFAULT_WINDOW
+        if self.min_nobs <= self.n_regressors:
+            raise ValueError(f"{self.min_nobs} observations cannot fit {self.n_regressors} "
+                             "regressors")
+        self.vectors: deque = deque(maxlen=window)
+        self.cross = np.zeros((self.n_regressors + k, self.n_regressors + k))
+        self.inverse: Optional[np.ndarray] = None
+        self.shift: Optional[np.ndarray] = None
+        # Latest p observations, newest first, as they enter the next regressors
+        self.recent: Optional[np.ndarray] = None
+        self.seen = 0
+        self.steps = 0
+
+    @property
+    def nobs(self) -> int:
+        """Observations in the current fit."""
+        return len(self.vectors)
+
+    @property
+    def ready(self) -> bool:
+        """Whether enough observations have been added for an estimate."""
+        return self.inverse is not None
+
+    def _rank_one(self, v: np.ndarray, sign: float) -> None:
+        self.cross += sign * np.outer(v, v)
+        if self.inverse is not None:
+            # Sherman-Morrison: (A + s z z')^-1 = A^-1 - s A^-1 z z' A^-1 / (1 + s z' A^-1 z)
+            z = v[: self.n_regressors]
+            iz = self.inverse @ z
+            self.inverse -= sign * np.outer(iz, iz) / (1.0 + sign * (z @ iz))
+
+    def update(self, y_row: Sequence[float]) -> bool:
+        """Add one observation, dropping the oldest once the window is full.
+
+        Args:
+            y_row: New observation of the k variables, without missing values
+
+        Returns:
+            Whether an estimate is available
+        """
+        y_row = np.asarray(y_row, dtype="float64").reshape(self.k)
+        if self.shift is None:
+            self.shift = y_row.copy()
+            self.recent = np.zeros(self.k * self.lags)
+        x = y_row - self.shift
+        if self.seen >= self.lags:
+            v = np.concatenate([[1.0], self.recent, x])
+            if self.nobs == self.window:
+                self._rank_one(self.vectors[0], -1.0)
+            self._rank_one(v, 1.0)
+            self.vectors.append(v)
+            self.steps += 1
+        self.recent = np.concatenate([x, self.recent[: -self.k]]) if self.lags else self.recent
+        self.seen += 1
+        if self.nobs >= self.min_nobs and (
+            self.inverse is None or self.steps % RESYNC_EVERY == 0
+        ):
+            self._resync()
+        return self.ready
+
+    def _resync(self) -> None:
+        """Re-centre the stored observations and recompute everything exactly from them."""
+        vectors = np.array(self.vectors)
+        delta = vectors[:, self.n_regressors:].mean(axis=0)
+        # Every block after the constant is a (lagged) observation
+        vectors[:, 1:] -= np.tile(delta, self.lags + 1)
+        self.recent = self.recent - np.tile(delta, self.lags)
+        self.shift = self.shift + delta
+        self.vectors = deque(vectors, maxlen=self.window)
+        self.cross = vectors.T @ vectors
+        m = self.n_regressors
+        self.inverse = np.linalg.inv(self.cross[:m, :m])
+
+    def estimate(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Current (intercept, coefs, sigma_u), as ``fit_var`` on the window.
+
+        Raises:
+            ValueError: If fewer than ``min_nobs`` observations were added
+        """
+        if not self.ready:
+            raise ValueError(f"Need {self.min_nobs} observations, have {self.nobs}")
+        m = self.n_regressors
+        zy, yy = self.cross[:m, m:], self.cross[m:, m:]
+        beta = self.inverse @ zy
+        sigma_u = (yy - zy.T @ beta) / (self.nobs - m)
+        intercept, coefs = _unpack(beta, self.k, self.lags)
+        # Undo the shift: y = x + c gives an intercept of a + (I - sum_l A_l) c
+        intercept = intercept + (np.eye(self.k) - coefs.sum(axis=0)) @ self.shift
+        return intercept, coefs, sigma_u
+
+
+@instrumented
+def var_path(
+    Y: np.ndarray,
+    lags: int,
+    window: Optional[int] = DEFAULT_WINDOW,
+    min_nobs: Optional[int] = None,
+    step: int = 1,
+) -> VarPath:
+    """Re-fit a VAR(p) on every rolling or expanding window of a sample.
+
+    A row with a missing value ends the current run of observations. The
+    recursion starts afresh on the next complete row, so a window never
+    holds observations from both sides of a gap, and windows ending before
+    the new run has ``lags + min_nobs`` rows are skipped.
+
+    Args:
+        Y: Data of shape (T, k); rows with missing values are gaps
+        lags: Lag order p, fixed across windows
+        window: Observations per fit; None for expanding windows
+        min_nobs: Observations in the first expanding window
+        step: Keep every ``step``-th estimate, counting back from the last;
+            all of them are still computed
+
+    Returns:
+        VarPath with one entry per kept window
+    """
+    Y = np.asarray(Y, dtype="float64")
+    T, k = Y.shape
+    var = RecursiveVar(k, lags, window, min_nobs)
+    complete = np.isfinite(Y).all(axis=1)
+    rows = np.arange(T)
+    # First row of the run of complete rows each row belongs to
+    run_start = np.maximum.accumulate(np.where(complete, 0, rows + 1))
+    estimable = complete & (rows - run_start >= lags + var.min_nobs - 1)
+    # Count steps back from the last window, so the latest estimate is always kept
+    ends = np.flatnonzero(estimable)[::-1][::step][::-1]
+    restarts = np.flatnonzero(complete & (run_start == rows))[1:]
+    W = len(ends)
+    intercept, coefs = np.empty((W, k)), np.empty((W, lags, k, k))
+    sigma_u, nobs = np.empty((W, k, k)), np.empty(W, dtype="int64")
+    w = 0
+    for t in range(T):
+        if not complete[t]:
+            if var.seen:
+                var = RecursiveVar(k, lags, window, min_nobs)
+            continue
+        var.update(Y[t])
+        if w < W and t == ends[w]:
+            intercept[w], coefs[w], sigma_u[w] = var.estimate()
+            nobs[w] = var.nobs
+            w += 1
+    return VarPath(ends, intercept, coefs, sigma_u, nobs, restarts)
+
+
+def path_frames(
+    path: VarPath,
+    dates: pd.Index,
+    names: Sequence[str],
+    spec: str = "",
+    shock: str = "log_mcap",
+    horizon: int = DEFAULT_HORIZON,
+    horizons: Sequence[int] = SUMMARY_HORIZONS,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Tidy coefficient paths and rolling IRF summaries of one specification.
+
+    Args:
+        path: Output of ``var_path``
+        dates: Date of every row of the sample ``path`` was fitted on
+        names: Variable names, in Cholesky order
+        spec: Specification name
+        shock: Variable whose orthogonalised shock is summarised
+        horizon: Last IRF horizon
+        horizons: Horizons to report
+
+    Returns:
+        (coefficients, irfs). Coefficients have one row per (date, equation,
+        regressor) with regressors ``const`` and ``<name>.L<lag>``. IRFs have
+        one row per (date, horizon, response) with the response to a 1 s.d.
+        ``shock`` and its cumulative sum up to that horizon.
+    """
+    names = list(names)
+    W, k, lags = len(path.end), len(names), path.coefs.shape[1]
+    window_dates = np.asarray(dates)[path.end]
+
+    regressors = ["const"] + [f"{name}.L{lag}" for lag in range(1, lags + 1) for name in names]
+    # (W, m, k): rows are regressors, columns equations, as in the stacked OLS solution
+    stacked = np.concatenate([path.intercept[:, None, :],
+                              np.swapaxes(path.coefs, -1, -2).reshape(W, lags * k, k)], axis=1)
+    coefs = pd.DataFrame(
+        {
+            "spec": spec,
+            "date": np.repeat(window_dates, k * len(regressors)),
+            "equation": np.tile(np.repeat(names, len(regressors)), W),
+            "regressor": np.tile(regressors, W * k),
+            "coef": np.swapaxes(stacked, 1, 2).ravel(),
+        }
+    )
+
+    horizons = [h for h in horizons if h <= horizon]
+    irf = orth_irf(path.coefs, path.sigma_u, horizon)[..., names.index(shock)]  # (W, H + 1, k)
+    cumulative = irf.cumsum(axis=1)
+    irfs = pd.DataFrame(
+        {
+            "spec": spec,
+            "date": np.repeat(window_dates, len(horizons) * k),
+            "horizon": np.tile(np.repeat(horizons, k), W),
+            "response": np.tile(names, W * len(horizons)),
+            "shock": shock,
+            "irf": irf[:, horizons].ravel(),
+            "cumulative": cumulative[:, horizons].ravel(),
+        }
+    )
+    return coefs, irfs
+
+
+def _spec_paths(
+    data: pd.DataFrame,
+    spec: VarSpec,
+    window: Optional[int],
+    min_nobs: Optional[int],
+    step: int,
+    shock: str,
+    horizon: int,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Coefficient paths and IRF summaries of one specification."""
+    data = data[spec.columns]
+    if spec.difference:
+        data = data.diff()
+    # Gaps stay in place, so var_path restarts at them rather than joining across
+    Y = data.to_numpy("float64")
+    complete = np.isfinite(Y).all(axis=1)
+    lags = resolve_lags(Y, spec.lags)
+    path = var_path(Y, lags, window, min_nobs, step)
+    skipped = lags + (window or min_nobs or DEFAULT_WINDOW) - 1
+    for restart in path.restarts:
+        gap = restart - 1 - np.flatnonzero(complete[:restart])[-1]
+        logger.warning(f"Spec {spec.name}: {gap} rows missing before "
+                       f"{data.index[restart]:%Y-%m-%d}, recursion restarted; windows ending "
+                       f"in the next {skipped} rows skipped")
+    if len(path.end) == 0:
+        logger.warning(f"Spec {spec.name}: {complete.sum()} rows are too few for one window")
+    else:
+        logger.info(f"Spec {spec.name}: {len(path.end)} windows of {lags} lags")
+    return path_frames(path, data.index, spec.columns, spec.name, shock, horizon)
+
+
+@instrumented
+def run_paths(
+    panel: pd.DataFrame,
+    specs: Sequence[VarSpec] = DEFAULT_SPECS,
+    window: Optional[int] = DEFAULT_WINDOW,
+    min_nobs: Optional[int] = None,
+    step: int = 1,
+    shock: str = "log_mcap",
+    horizon: int = DEFAULT_HORIZON,
+    workers: int = 1,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Time-varying estimates for every specification, one process per specification.
+
+    Lag orders are chosen once per specification on the full sample (or
+    fixed by the specification) and held across windows.
+
+    Args:
+        panel: Frame holding every specification's columns, indexed by date
+        specs: Specifications to estimate
+        window: Observations per fit; None for expanding windows
+        min_nobs: Observations in the first expanding window
+        step: Keep every ``step``-th window
+        shock: Variable whose orthogonalised shock is summarised
+        horizon: Last IRF horizon
+        workers: Processes to spread specifications over; 1 runs in-process
+
+    Returns:
+        (coefficients, irfs) concatenated over specifications, see
+        ``path_frames``
+    """
+    args = [(panel[spec.columns], spec, window, min_nobs, step, shock, horizon) for spec in specs]
+    if workers <= 1 or len(args) == 1:
+        results = [_spec_paths(*arg) for arg in args]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(args))) as pool:
+            results = list(pool.map(_spec_paths, *zip(*args)))
+    coefs, irfs = zip(*results)
+    return pd.concat(coefs, ignore_index=True), pd.concat(irfs, ignore_index=True)
+
+
+def plot_irf_paths(
+    irfs: pd.DataFrame,
+    response: str,
+    path: Union[str, Path],
+    spec: str = "baseline",
+    horizons: Sequence[int] = (0, 5, 20),
+) -> Path:
+    """Plot the response of one variable over time, one line per horizon.
+
+    Args:
+        irfs: IRF summaries from ``run_paths``
+        response: Responding variable
+        path: Output image path
+        spec: Specification to plot
+        horizons: Horizons to draw; cumulative responses are used
+
+    Returns:
+        Path of the saved figure
+    """
+    from matplotlib.figure import Figure
+
+    data = irfs[(irfs["spec"] == spec) & (irfs["response"] == response)]
+    fig = Figure(figsize=(12, 5))
+    ax = fig.subplots()
+    for horizon, group in data[data["horizon"].isin(horizons)].groupby("horizon"):
+        ax.plot(group["date"], group["cumulative"], label=f"Cumulative to h={horizon}")
+    ax.axhline(0, color="black", linewidth=0.8)
+    ax.set_ylabel(f"Response of {response}")
+    ax.set_title(f"Time-varying response of {response} to a 1 s.d. "
+                 f"{data['shock'].iloc[0]} shock ({spec})")
+    ax.legend()
+    fig.tight_layout()
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(path)
+    return path
+
+
+if __name__ == "__main__":
+    from scripts.make_features import load_features
+
+    parser = argparse.ArgumentParser(description="Rolling and recursive VAR re-estimation")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW,
+                        help="Observations per rolling window (the first window if --expanding)")
+    parser.add_argument("--expanding", action="store_true",
+                        help="Recursive estimation on expanding windows")
+    parser.add_argument("--step", type=int, default=1, help="Keep every n-th window")
+    parser.add_argument("--horizon", type=int, default=DEFAULT_HORIZON, help="Last IRF horizon")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes")
+    args = parser.parse_args()
+
+    columns: List[str] = sorted({col for spec in DEFAULT_SPECS for col in spec.columns})
+    panel = load_features(columns, trading_days_only=True)
+    window = None if args.expanding else args.window
+    coefs, irfs = run_paths(panel, DEFAULT_SPECS, window=window, min_nobs=args.window,
+                            step=args.step, horizon=args.horizon, workers=args.workers)
+    COEF_FILE.parent.mkdir(parents=True, exist_ok=True)
+    coefs.to_parquet(COEF_FILE, index=False)
+    irfs.to_parquet(IRF_FILE, index=False)
+    if irfs.empty:
+        raise SystemExit(f"No window of {args.window} observations fits the sample")
+    plot_irf_paths(irfs, "DGS3MO", FIG_DIR / "var_path_irf_DGS3MO.png")
+    logger.info(f"Wrote {len(coefs)} coefficients and {len(irfs)} IRF summaries "
+                f"to {COEF_FILE.parent}")
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""Batched lead/lag cross-correlation between many series.
+
+All lagged Pearson correlations between every pair of series are computed in a
+single FFT pass. Missing values are handled exactly as pandas does for
+``x.corr(y.shift(k))``: each lag uses only the pairs observed in both series,
+with means and variances taken over those pairs. The sums this needs (pair
+counts, sums, sums of squares and cross-products over the overlap) are each a
+cross-correlation of masked series, so six batched FFT products give the
+whole lag x series x series cube. This replaces one pandas ``corr`` call per
+lag and pair. The products are taken over blocks of ``y`` columns sized to a
+memory budget, so hundreds of series do not need an (n_fft, nx, ny) array.
+
+Lags count rows (observations), not calendar days. A positive lag ``k``
+pairs ``x[t]`` with ``y[t - k]``, meaning ``y`` leads ``x`` by ``k`` rows.
+
+Example:
+    $ python scripts/stats/xcorr.py --max-lag 60
+
+    >>> from scripts.stats.xcorr import xcorr_frame
+    >>> tidy = xcorr_frame(panel, ["d_log_mcap"], ["d_DGS10", "d_10Y-2Y"], max_lag=60)
+"""
+
+import argparse
+import logging
+from pathlib import Path
+from typing import Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from scripts.utils.instrument import instrumented
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_MAX_LAG = 60
+DEFAULT_MIN_PERIODS = 10
+# Scratch memory for one block of FFT products
+DEFAULT_BLOCK_BYTES = 1 << 28
+FIG_DIR = Path("figures")
+OUTPUT_FILE = Path("data/processed/xcorr.parquet")
+
+
+def _as_2d(values: np.ndarray) -> np.ndarray:
+    values = np.asarray(values, dtype="float64")
+    return values[:, None] if values.ndim == 1 else values
+
+
+def _standardise(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Zero-fill missing values of standardised columns; return them and the mask.
+
+    Correlation is invariant to each series' location and scale, so
+    standardising first only keeps the FFT sums well conditioned (market caps
+    are ~1e11, so their squares would otherwise swamp rounding error).
+    """
+    mask = np.isfinite(values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        centred = values - np.nanmean(np.where(mask, values, np.nan), axis=0)
+        scale = np.nanstd(np.where(mask, centred, np.nan), axis=0)
+        scale[~np.isfinite(scale) | (scale == 0)] = 1.0
+    return np.where(mask, centred / scale, 0.0), mask.astype("float64")
+
+
+def _corr_block(
+    fx: np.ndarray,
+    fy: np.ndarray,
+    n_fft: int,
+    max_lag: int,
+    min_periods: int,
+) -> np.ndarray:
+    """Lagged correlations from the transforms of ``x`` and one block of ``y`` columns."""
+    # Circular indices -max_lag..-1 sit at the end of the FFT output
+    order = np.r_[np.arange(n_fft - max_lag, n_fft), np.arange(max_lag + 1)]
+
+    def cross(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        # sum_t a[t] * b[t - k] for every pair, laid out as (lag, nx, ny). The
+        # FFT correlates x[t] with y[t + k]; flip so +k means y leads
+        full = np.fft.irfft(a[:, :, None] * b[:, None, :], n=n_fft, axis=0)
+        return full[order][::-1]
+
+    n = np.rint(cross(fx[0], fy[0]))
+    sx, sy = cross(fx[1], fy[0]), cross(fx[0], fy[1])
+    sxx, syy = cross(fx[2], fy[0]), cross(fx[0], fy[2])
+    sxy = cross(fx[1], fy[1])
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = n * sxy - sx * sy
+        var_x = n * sxx - sx * sx
+        var_y = n * syy - sy * sy
+        corr = cov / np.sqrt(var_x * var_y)
+    tol = 1e-9 * np.maximum(n, 1) ** 2
+    corr[(n < max(min_periods, 2)) | (var_x <= tol) | (var_y <= tol)] = np.nan
+    return np.clip(corr, -1.0, 1.0)
+
+
+@instrumented
+def lagged_xcorr(
+    x: np.ndarray,
+    y: np.ndarray,
+    max_lag: int = DEFAULT_MAX_LAG,
+    min_periods: int = DEFAULT_MIN_PERIODS,
+    block_bytes: int = DEFAULT_BLOCK_BYTES,
+) -> np.ndarray:
+    """Lagged Pearson correlation of every column of ``x`` with every column of ``y``.
+
+    Args:
+        x: Array of shape (T,) or (T, nx); NaN marks a missing value
+        y: Array of shape (T,) or (T, ny) on the same rows as ``x``
+        max_lag: Largest lead and lag to compute, in rows
+        min_periods: Minimum overlapping pairs for a lag to be reported
+        block_bytes: Scratch memory for the FFT products; ``y`` columns are
+            processed in blocks that fit it
+
+    Returns:
+        Array of shape (2 * max_lag + 1, nx, ny). Entry ``[max_lag + k, i, j]``
+        equals ``pd.Series(x[:, i]).corr(pd.Series(y[:, j]).shift(k))``, and is
+        NaN where fewer than ``min_periods`` pairs overlap or a side is constant.
+
+    Raises:
+        ValueError: If ``x`` and ``y`` have different lengths
+    """
+    x, y = _as_2d(x), _as_2d(y)
+    if len(x) != len(y):
+        raise ValueError(f"x has {len(x)} rows but y has {len(y)}")
+    n_obs = len(x)
+    max_lag = min(max_lag, n_obs - 1)
+    n_fft = 1 << int(np.ceil(np.log2(max(2 * n_obs - 1, 1))))
+
+    xv, xm = _standardise(x)
+    yv, ym = _standardise(y)
+    # One forward transform per series and moment; conj(X) for the leading side
+    fx = np.conj(np.fft.rfft(np.stack([xm, xv, xv * xv]), n=n_fft, axis=1))
+    fy = np.fft.rfft(np.stack([ym, yv, yv * yv]), n=n_fft, axis=1)
+
+    # A y column costs a complex product and its real inverse per x column
+    block = max(1, block_bytes // (16 * (n_fft // 2 + 1) * x.shape[1] + 8 * n_fft * x.shape[1]))
+    return np.concatenate(
+        [_corr_block(fx, fy[:, :, j:j + block], n_fft, max_lag, min_periods)
+         for j in range(0, max(y.shape[1], 1), block)],
+        axis=2,
+    )
+
+
+def lags(max_lag: int) -> np.ndarray:
+    """Lag labels matching the first axis of ``lagged_xcorr``."""
+    return np.arange(-max_lag, max_lag + 1)
+
+
+def xcorr_frame(
+    df: pd.DataFrame,
+    targets: Sequence[str],
+    others: Optional[Sequence[str]] = None,
+    max_lag: int = DEFAULT_MAX_LAG,
+    min_periods: int = DEFAULT_MIN_PERIODS,
+) -> pd.DataFrame:
+    """Tidy lead/lag correlations of ``targets`` against ``others``.
+
+    Args:
+        df: Frame holding every series on one row index
+        targets: Columns playing ``x``
+        others: Columns playing ``y``; every column of ``df`` if None
+        max_lag: Largest lead and lag to compute, in rows
+        min_periods: Minimum overlapping pairs for a lag to be reported
+
+    Returns:
+        Long DataFrame with columns ``lag``, ``x``, ``y`` and ``corr``
+    """
+    others = list(df.columns) if others is None else list(others)
+    cube = lagged_xcorr(df[list(targets)].to_numpy("float64"), df[others].to_numpy("float64"),
+                        max_lag, min_periods)
+    max_lag = (cube.shape[0] - 1) // 2
+    index = pd.MultiIndex.from_product([lags(max_lag), list(targets), others],
+                                       names=["lag", "x", "y"])
+    return pd.DataFrame({"corr": cube.ravel()}, index=index).reset_index()
+
+
+def lag_profile(tidy: pd.DataFrame, target: str) -> pd.DataFrame:
+    """Wide lag x series table of one target's correlations."""
+    return tidy[tidy["x"] == target].pivot(index="lag", columns="y", values="corr")
+
+
+def peak_lags(tidy: pd.DataFrame) -> pd.DataFrame:
+    """Lag of the largest absolute correlation for every (x, y) pair."""
+    valid = tidy.dropna(subset=["corr"])
+    idx = valid["corr"].abs().groupby([valid["x"], valid["y"]], sort=False).idxmax()
+    return valid.loc[idx, ["x", "y", "lag", "corr"]].reset_index(drop=True)
+
+
+def plot_xcorr_heatmap(
+    tidy: pd.DataFrame,
+    target: str,
+    path: Union[str, Path],
+    title: Optional[str] = None,
+) -> Path:
+    """Save a series x lag heatmap of one target's correlations.
+
+    Args:
+        tidy: Output of ``xcorr_frame``
+        target: ``x`` series to plot
+        path: Output image path
+        title: Optional figure title
+
+    Returns:
+        Path of the saved figure
+    """
+    # Imported here so that the numerical routines do not load matplotlib
+    from matplotlib.figure import Figure
+
+    profile = lag_profile(tidy, target)
+    fig = Figure(figsize=(12, max(3, 0.35 * profile.shape[1] + 1.5)))
+    ax = fig.subplots()
+    mesh = ax.pcolormesh(profile.index, np.arange(profile.shape[1]), profile.T.to_numpy(),
+                         cmap="RdBu_r", vmin=-1, vmax=1, shading="nearest")
+    ax.set_yticks(np.arange(profile.shape[1]))
+    ax.set_yticklabels(profile.columns)
+    ax.axvline(0, color="black", linewidth=0.8)
+    ax.set_xlabel(f"Lag (rows; > 0 means series leads {target})")
+    ax.set_title(title or f"Lead/lag correlation with {target}")
+    fig.colorbar(mesh, ax=ax, label="Correlation")
+    fig.tight_layout()
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(path)
+    return path
+
+
+if __name__ == "__main__":
+    from scripts.panel import SPREAD_COLUMNS, YIELD_COLUMNS, load_panel, load_token_caps
+
+    parser = argparse.ArgumentParser(description="All-pairs lead/lag cross-correlations")
+    parser.add_argument("--max-lag", type=int, default=DEFAULT_MAX_LAG, help="Largest lag in days")
+    parser.add_argument("--min-periods", type=int, default=DEFAULT_MIN_PERIODS,
+                        help="Minimum overlapping observations per lag")
+    parser.add_argument("--levels", action="store_true",
+                        help="Correlate levels instead of first differences")
+    parser.add_argument("--output", default=str(OUTPUT_FILE), help="Tidy parquet output")
+    parser.add_argument("--figure", default=None,
+                        help="Heatmap output (default: figures/xcorr_heatmap_log_mcap_"
+                             "<changes|levels>.png)")
+    args = parser.parse_args()
+
+    panel = load_panel()
+    series = panel[["log_mcap"] + YIELD_COLUMNS + SPREAD_COLUMNS]
+    tokens = load_token_caps(panel.index)
+    if not tokens.empty:
+        series = series.join(np.log(tokens.where(tokens > 0)).add_prefix("log_mcap_"))
+    if not args.levels:
+        series = series.diff()
+
+    tidy = xcorr_frame(series, list(series.columns), max_lag=args.max_lag,
+                       min_periods=args.min_periods)
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    tidy.to_parquet(args.output, index=False)
+    transform = "levels" if args.levels else "changes"
+    figure = args.figure or FIG_DIR / f"xcorr_heatmap_log_mcap_{transform}.png"
+    plot_xcorr_heatmap(tidy, "log_mcap", figure)
+    logger.info(f"Wrote {len(tidy)} correlations to {args.output}")
+    print(peak_lags(tidy[tidy["x"] == "log_mcap"]).to_string(index=False))
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""Pre-aggregated, multi-resolution tiles that back the dashboard.
+
+Every series the dashboard can plot is computed once, when its inputs change:
+total and per-token market caps, yields and spreads from the daily panel, and
+rolling correlations of log market cap with each yield and spread. Each
+series is then rolled up to daily, weekly and monthly buckets, keeping the
+bucket's last value and its min and max. The rollups are written to
+``data/processed/tiles/`` as uncompressed Feather files, one per resolution,
+next to a manifest of the input hashes they were built from.
+
+``TileStore`` holds the tiles in memory and answers range queries by binary
+search. It picks the finest resolution with at most ``max_points`` buckets in
+the range, typically the chart's width in pixels, and min/max-decimates when
+even monthly buckets are too many, so a response never has more points than
+the chart can show. Answers are kept in an LRU cache keyed by series, range,
+resolution and point budget.
+
+Example:
+    $ python -m scripts.tiles           # rebuild if the panel or token panel changed
+    $ python -m scripts.tiles --force
+
+    >>> from scripts.tiles import TileStore
+    >>> store = TileStore.load()
+    >>> window = store.query("10Y-2Y", "2022-01-01", "2024-12-31", max_points=800)
+"""
+
+import argparse
+import json
+import logging
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+from scripts.panel import (
+    PROCESSED_DIR,
+    SPREAD_COLUMNS,
+    TOKEN_PANEL_FILE,
+    YIELD_COLUMNS,
+    ensure_panel,
+    hash_path,
+    load_panel,
+    load_token_caps,
+    read_manifest,
+)
+from scripts.stats.rolling import rolling_corr
+from scripts.utils.instrument import instrumented
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Bump whenever the tiles' construction changes, to force a rebuild
+TILES_VERSION = 1
+
+# Constants
+TILES_DIR = PROCESSED_DIR / "tiles"
+MANIFEST_NAME = "manifest.json"
+# Resolution -> resample rule, finest first; buckets are labelled by their last day
+RESOLUTIONS = {"daily": "D", "weekly": "W-SUN", "monthly": "ME"}
+STATS = ("last", "min", "max")
+CORR_TARGET = "log_mcap"
+CORR_WINDOWS = (30, 90)
+DEFAULT_MAX_POINTS = 1000
+CACHE_SIZE = 512
+
+
+class Window(NamedTuple):
+    """Points of one series over a date range at one resolution.
+
+    Arrays are read-only views into the store; copy before modifying.
+    """
+
+    series: str
+    resolution: str
+    dates: np.ndarray
+    values: np.ndarray
+    low: np.ndarray
+    high: np.ndarray
+
+
+def column(series: str, stat: str) -> str:
+    """Tile column holding one statistic of a series."""
+    return f"{series}|{stat}"
+
+
+@instrumented
+def tile_series(
+    panel: pd.DataFrame,
+    tokens: Optional[pd.DataFrame] = None,
+    windows: Sequence[int] = CORR_WINDOWS,
+) -> pd.DataFrame:
+    """Daily values of every series the dashboard shows.
+
+    Args:
+        panel: Daily panel with ``trading_day``, ``circulating_supply_usd``,
+            ``log_mcap``, yields and spreads
+        tokens: Per-token caps, one column per symbol, e.g. ``load_token_caps``
+        windows: Rolling correlation windows in trading days
+
+    Returns:
+        Frame on the panel's calendar: ``mcap``, ``log_mcap``, the yields and
+        spreads, ``token:<symbol>`` per token and ``corr<w>:<series>`` for the
+        correlation of log market cap with each yield and spread
+    """
+    rates = [col for col in YIELD_COLUMNS + SPREAD_COLUMNS if col in panel.columns]
+    series = {"mcap": panel["circulating_supply_usd"], "log_mcap": panel[CORR_TARGET]}
+    series.update({col: panel[col] for col in rates})
+    if tokens is not None:
+        series.update({f"token:{symbol}": tokens[symbol].reindex(panel.index)
+                       for symbol in tokens.columns})
+
+    # Correlations over trading days, as in stats/rolling.py
+    trading = panel[panel["trading_day"]]
+    cube = rolling_corr(trading[CORR_TARGET].values, trading[rates].values, windows)
+    for w, window in enumerate(windows):
+        for j, col in enumerate(rates):
+            corr = pd.Series(cube[w, j], index=trading.index)
+            series[f"corr{window}:{col}"] = corr.reindex(panel.index)
+    return pd.DataFrame(series, index=panel.index).astype("float64")
+
+
+@instrumented
+def rollup(daily: pd.DataFrame, rule: str) -> pd.DataFrame:
+    """Bucket daily series, keeping each bucket's last value, min and max.
+
+    Args:
+        daily: Daily series indexed by date
+        rule: pandas resample rule, e.g. ``W-SUN``
+
+    Returns:
+        Frame indexed by bucket end with ``column(series, stat)`` columns;
+        buckets with no value in any series are dropped
+    """
+    resampled = daily.resample(rule)
+    frames = {stat: getattr(resampled, stat)() for stat in STATS}
+    out = pd.DataFrame(
+        {column(col, stat): frames[stat][col] for col in daily.columns for stat in STATS}
+    )
+    return out.dropna(how="all")
+
+
+def build_tiles(daily: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """Roll daily series up to every resolution in ``RESOLUTIONS``."""
+    return {resolution: rollup(daily, rule) for resolution, rule in RESOLUTIONS.items()}
+
+
+def tile_inputs() -> Dict[str, str]:
+    """Content hashes of everything the tiles are built from."""
+    return {**read_manifest().get("inputs", {}), "token_panel": hash_path(TOKEN_PANEL_FILE)}
+
+
+@instrumented
+def write_tiles(
+    tiles: Dict[str, pd.DataFrame],
+    directory: Path = TILES_DIR,
+    inputs: Optional[Dict[str, str]] = None,
+) -> Path:
+    """Write each resolution's tile and the manifest.
+
+    Args:
+        tiles: Output of ``build_tiles``
+        directory: Tile directory
+        inputs: Input hashes to record
+
+    Returns:
+        The tile directory
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for resolution, tile in tiles.items():
+        # Uncompressed so that the dashboard can memory-map it without decoding
+        tile.rename_axis("date").reset_index().to_feather(
+            directory / f"{resolution}.feather", compression="uncompressed"
+        )
+    (directory / MANIFEST_NAME).write_text(
+        json.dumps(
+            {
+                "version": TILES_VERSION,
+                "inputs": inputs or {},
+                "rows": {resolution: len(tile) for resolution, tile in tiles.items()},
+                "built_at": datetime.now().isoformat(timespec="seconds"),
+            },
+            indent=2,
+        )
+    )
+    logger.info(f"Wrote {len(tiles)} tile resolutions to {directory}")
+    return directory
+
+
+@instrumented
+def ensure_tiles(force: bool = False, directory: Path = TILES_DIR) -> Path:
+    """Rebuild the tiles if their version or any input changed.
+
+    Args:
+        force: Rebuild even if the tiles are current
+        directory: Tile directory
+
+    Returns:
+        The tile directory
+    """
+    directory = Path(directory)
+    ensure_panel()
+    inputs = tile_inputs()
+    manifest_path = directory / MANIFEST_NAME
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+    if (
+        not force
+        and manifest.get("version") == TILES_VERSION
+        and manifest.get("inputs") == inputs
+        and all((directory / f"{res}.feather").exists() for res in RESOLUTIONS)
+    ):
+        logger.info(f"Tiles in {directory} are up to date")
+        return directory
+
+    panel = load_panel(rebuild=False)
+    daily = tile_series(panel, load_token_caps(panel.index))
+    return write_tiles(build_tiles(daily), directory, inputs)
+
+
+def minmax_downsample(
+    dates: np.ndarray,
+    values: np.ndarray,
+    low: np.ndarray,
+    high: np.ndarray,
+    max_points: int,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Merge consecutive points into at most ``max_points`` buckets.
+
+    Each bucket keeps its last date, its last non-missing value and the min
+    and max of its points, so peaks and troughs survive the reduction.
+
+    Args:
+        dates: Point dates
+        values: Point values
+        low: Lower envelope of each point
+        high: Upper envelope of each point
+        max_points: Largest number of points to return
+
+    Returns:
+        (dates, values, low, high), each of length ``min(len(dates), max_points)``
+    """
+    n = len(dates)
+    if n <= max_points:
+        return dates, values, low, high
+    starts = np.linspace(0, n, max_points, endpoint=False).astype("int64")
+    ends = np.r_[starts[1:], n] - 1
+    valid = np.maximum.reduceat(np.where(np.isnan(values), -1, np.arange(n)), starts)
+    with np.errstate(invalid="ignore"):
+        return (
+            dates[ends],
+            np.where(valid >= 0, values[valid], np.nan),
+            np.fmin.reduceat(low, starts),
+            np.fmax.reduceat(high, starts),
+        )
+
+
+def _read_only(values: np.ndarray) -> np.ndarray:
+    values.setflags(write=False)
+    return values
+
+
+class TileStore:
+    """In-memory tiles answering cached range queries at a bounded point count.
+
+    Args:
+        tiles: Resolution -> tile frame, as returned by ``build_tiles``
+        cache_size: Number of query results to keep
+    """
+
+    def __init__(self, tiles: Dict[str, pd.DataFrame], cache_size: int = CACHE_SIZE):
+        self.resolutions = [res for res in RESOLUTIONS if res in tiles]
+        self._dates: Dict[str, np.ndarray] = {}
+        self._columns: Dict[str, Dict[str, np.ndarray]] = {}
+        for resolution in self.resolutions:
+            tile = tiles[resolution]
+            self._dates[resolution] = _read_only(tile.index.values.astype("datetime64[ns]"))
+            self._columns[resolution] = {
+                col: _read_only(tile[col].to_numpy("float64")) for col in tile.columns
+            }
+        finest = tiles[self.resolutions[0]].columns
+        self.series: List[str] = list(dict.fromkeys(col.split("|")[0] for col in finest))
+        self.query = lru_cache(maxsize=cache_size)(self._query)
+
+    @classmethod
+    @instrumented
+    def load(cls, directory: Path = TILES_DIR, cache_size: int = CACHE_SIZE) -> "TileStore":
+        """Load every resolution's tile from ``directory``."""
+        tiles = {}
+        for resolution in RESOLUTIONS:
+            table = feather.read_table(Path(directory) / f"{resolution}.feather", memory_map=True)
+            tiles[resolution] = table.to_pandas().set_index("date")
+        return cls(tiles, cache_size)
+
+    def bounds(self) -> Tuple[pd.Timestamp, pd.Timestamp]:
+        """First and last date covered by the finest tile."""
+        dates = self._dates[self.resolutions[0]]
+        return pd.Timestamp(dates[0]), pd.Timestamp(dates[-1])
+
+    def _query(
+        self,
+        series: str,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        resolution: str = "auto",
+        max_points: int = DEFAULT_MAX_POINTS,
+    ) -> Window:
+        """Points of ``series`` between ``start`` and ``end`` (inclusive).
+
+        Cached as ``query``; pass dates as strings (e.g. rounded to the day)
+        so that repeated ranges hit the cache.
+
+        Args:
+            series: Series name, one of ``series``
+            start: First date; the start of the data if None
+            end: Last date; the end of the data if None
+            resolution: One of ``RESOLUTIONS``, or ``auto`` for the finest
+                one with at most ``max_points`` points in the range
+            max_points: Most points to return
+
+        Returns:
+            The range's points, min/max-decimated to ``max_points``
+
+        Raises:
+            KeyError: If the series or resolution is unknown
+        """
+        if series not in self.series:
+            raise KeyError(f"Unknown series {series!r}")
+        if resolution != "auto" and resolution not in self.resolutions:
+            raise KeyError(f"Unknown resolution {resolution!r}")
+        lo = None if start is None else np.datetime64(pd.Timestamp(start), "ns")
+        hi = None if end is None else np.datetime64(pd.Timestamp(end), "ns")
+
+        candidates = self.resolutions if resolution == "auto" else [resolution]
+        for res in candidates:
+            dates = self._dates[res]
+            first = 0 if lo is None else int(np.searchsorted(dates, lo, "left"))
+            last = len(dates) if hi is None else int(np.searchsorted(dates, hi, "right"))
+            # Buckets are labelled by their last day, so the one holding ``end``
+            # is the first labelled after it
+            if res != self.resolutions[0] and hi is not None and last < len(dates):
+                last += 1
+            if last - first <= max_points:
+                break
+        columns = self._columns[res]
+        points = minmax_downsample(
+            dates[first:last],
+            *(columns[column(series, stat)][first:last] for stat in STATS),
+            max_points=max_points,
+        )
+        return Window(series, res, *points)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the dashboard's multi-resolution tiles")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if inputs are unchanged")
+    args = parser.parse_args()
+    ensure_tiles(force=args.force)
@@ -1,31 +1,52 @@
 """FRED API utilities for fetching Treasury yield data.
 
 This module provides functions to fetch Treasury yield data from the FRED API.
-It requires a FRED API key to be set in the environment variable FRED_API_KEY.
+It requires a FRED API key to be set in the environment variable FRED_API_KEY;
+the key is only looked up when a request is made, so importing the module
+does not need it.
+
+Series can be fetched serially with ``fetch_treasury_yields`` or concurrently
+with ``fetch_treasury_yields_async``, which shares one pooled ``httpx.AsyncClient``
+across all series and bounds the request rate to stay within FRED's limits.
+Both go through the on-disk response cache in ``scripts.utils.http_cache``.
 
 Example:
     >>> from scripts.utils.fred_api import fetch_treasury_yields
     >>> yields = fetch_treasury_yields("2023-01-01", "2024-03-01")
+    >>> import asyncio
+    >>> from scripts.utils.fred_api import fetch_treasury_yields_async
+    >>> yields = asyncio.run(fetch_treasury_yields_async("2023-01-01", "2024-03-01"))
 """
 
+import asyncio
+import logging
 import os
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Optional, Dict, List
+from typing import AsyncIterator, Dict, Iterable, List, Optional
 
+import httpx
 import pandas as pd
-import requests
 from dotenv import load_dotenv
+from tenacity import retry, stop_after_attempt, wait_exponential
+
+from scripts.utils.http_cache import cached_async_client, cached_client
+from scripts.utils.instrument import instrumented
 
 # Load environment variables
 load_dotenv()
 
-# Constants
-FRED_API_KEY = os.getenv("FRED_API_KEY")
-if not FRED_API_KEY:
-    raise ValueError("FRED_API_KEY environment variable not set")
+logger = logging.getLogger(__name__)
 
+# Constants
 FRED_BASE_URL = "https://api.stlouisfed.org/fred/series/observations"
 
+# Concurrency defaults for the async fetcher. FRED allows 120 requests per
+# minute per API key, so stay at 2 requests/second by default.
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_REQUESTS_PER_SECOND = 2.0
+
 # Treasury series with their descriptions
 TREASURY_SERIES: Dict[str, str] = {
     "DGS3MO": "3-Month Treasury Bill",
@@ -68,6 +89,7 @@ def fetch_series(
     series_id: str,
     start_date: str,
     end_date: str,
+    client: Optional[httpx.Client] = None,
 ) -> pd.DataFrame:
     """Fetch a single series from FRED API.
 
@@ -75,67 +97,89 @@ def fetch_series(
         series_id: FRED series ID
         start_date: Start date in YYYY-MM-DD format
         end_date: End date in YYYY-MM-DD format
+        client: Optional client to reuse; a cached client is used if not given
 
     Returns:
         DataFrame with series data
 
     Raises:
-        requests.exceptions.RequestException: If the API request fails
+        httpx.HTTPError: If the API request fails
+    """
+    params = build_params(series_id, start_date, end_date)
+    if client is None:
+        with cached_client(timeout=30.0) as client:
+            response = client.get(FRED_BASE_URL, params=params)
+    else:
+        response = client.get(FRED_BASE_URL, params=params)
+    response.raise_for_status()
+    return observations_to_frame(series_id, response.json())
+
+
+def fred_api_key() -> str:
+    """Read the FRED API key from the environment.
+
+    Returns:
+        The API key
+
+    Raises:
+        ValueError: If FRED_API_KEY is not set
+    """
+    key = os.getenv("FRED_API_KEY")
+    if not key:
+        raise ValueError("FRED_API_KEY environment variable not set")
+    return key
+
+
+def build_params(series_id: str, start_date: str, end_date: str) -> Dict[str, str]:
+    """Build the query parameters for a FRED observations request.
+
+    Args:
+        series_id: FRED series ID
+        start_date: Start date in YYYY-MM-DD format
+        end_date: End date in YYYY-MM-DD format
+
+    Returns:
+        Query parameters dict
     """
-    params = {
+    return {
         "series_id": series_id,
-        "api_key": FRED_API_KEY,
+        "api_key": fred_api_key(),
         "file_type": "json",
         "observation_start": start_date,
         "observation_end": end_date,
     }
 
-    response = requests.get(FRED_BASE_URL, params=params)
-    response.raise_for_status()
-    data = response.json()
 
-    # Convert to DataFrame
-    df = pd.DataFrame(data["observations"])
+def observations_to_frame(series_id: str, data: dict) -> pd.DataFrame:
+    """Convert a FRED observations payload to a two-column DataFrame.
+
+    Args:
+        series_id: FRED series ID, used as the value column name
+        data: Parsed JSON response from the observations endpoint
+
+    Returns:
+        DataFrame with ``date`` and ``series_id`` columns
+    """
+    df = pd.DataFrame(data["observations"], columns=["date", "value"])
     df["value"] = pd.to_numeric(df["value"], errors="coerce")
-    df = df[["date", "value"]]
     df.columns = ["date", series_id]
-    
     return df
 
 
-def fetch_treasury_yields(
-    start_date: str,
-    end_date: Optional[str] = None,
-) -> pd.DataFrame:
-    """Fetch Treasury yield data from FRED API.
+@instrumented
+def combine_series(dfs: List[pd.DataFrame]) -> pd.DataFrame:
+    """Merge per-series frames into one date-indexed frame with spreads.
 
     Args:
-        start_date: Start date in YYYY-MM-DD format
-        end_date: Optional end date in YYYY-MM-DD format (defaults to today)
+        dfs: DataFrames as returned by ``fetch_series``
 
     Returns:
-        DataFrame with Treasury yields indexed by date, including calculated spreads
+        DataFrame with one column per series indexed by date, including
+        calculated spreads
 
     Raises:
-        requests.exceptions.RequestException: If the API request fails
-        ValueError: If the API key is not set or dates are invalid
+        ValueError: If no series could be fetched
     """
-    if end_date is None:
-        end_date = datetime.now().strftime("%Y-%m-%d")
-
-    # Validate dates
-    validate_dates(start_date, end_date)
-
-    # Fetch data for each series
-    dfs = []
-    for series_id in TREASURY_SERIES:
-        try:
-            df = fetch_series(series_id, start_date, end_date)
-            dfs.append(df)
-        except requests.exceptions.RequestException as e:
-            logger.warning(f"Failed to fetch {series_id}: {e}")
-            continue
-
     if not dfs:
         raise ValueError("No Treasury yield data could be fetched")
 
@@ -164,6 +208,190 @@ def fetch_treasury_yields(
     return result
 
 
+@instrumented
+def fetch_treasury_yields(
+    start_date: str,
+    end_date: Optional[str] = None,
+    series_ids: Optional[Iterable[str]] = None,
+) -> pd.DataFrame:
+    """Fetch Treasury yield data from FRED API.
+
+    Args:
+        start_date: Start date in YYYY-MM-DD format
+        end_date: Optional end date in YYYY-MM-DD format (defaults to today)
+        series_ids: Optional FRED series IDs (defaults to ``TREASURY_SERIES``)
+
+    Returns:
+        DataFrame with Treasury yields indexed by date, including calculated spreads
+
+    Raises:
+        ValueError: If no series could be fetched, dates are invalid or the API key is missing
+    """
+    if end_date is None:
+        end_date = datetime.now().strftime("%Y-%m-%d")
+
+    # Validate dates, and fail before any request if the API key is missing
+    validate_dates(start_date, end_date)
+    fred_api_key()
+
+    # Fetch data for each series over one cached session
+    dfs = []
+    with cached_client(timeout=30.0) as client:
+        for series_id in series_ids or TREASURY_SERIES:
+            try:
+                df = fetch_series(series_id, start_date, end_date, client)
+                dfs.append(df)
+            except httpx.HTTPError as e:
+                logger.warning(f"Failed to fetch {series_id}: {e}")
+                continue
+
+    return combine_series(dfs)
+
+
+class AsyncRateLimiter:
+    """Space out requests so that at most ``rate`` start per second.
+
+    Args:
+        rate: Maximum number of requests per second; ``None`` or ``0``
+            disables limiting
+    """
+
+    def __init__(self, rate: Optional[float] = DEFAULT_REQUESTS_PER_SECOND) -> None:
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        """Block until the next request slot is available."""
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+@retry(
+    wait=wait_exponential(multiplier=1, min=4, max=10),
+    stop=stop_after_attempt(3),
+    reraise=True,
+)
+async def fetch_series_async(
+    client: httpx.AsyncClient,
+    series_id: str,
+    start_date: str,
+    end_date: str,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    limiter: Optional[AsyncRateLimiter] = None,
+) -> pd.DataFrame:
+    """Fetch a single series from FRED API with retry logic.
+
+    Each attempt takes a concurrency slot and a rate-limiter slot, so the
+    backoff between retries does not hold up other series.
+
+    Args:
+        client: Async HTTP client instance
+        series_id: FRED series ID
+        start_date: Start date in YYYY-MM-DD format
+        end_date: End date in YYYY-MM-DD format
+        semaphore: Optional semaphore bounding in-flight requests
+        limiter: Optional rate limiter shared across series
+
+    Returns:
+        DataFrame with series data
+
+    Raises:
+        httpx.HTTPError: If the API request fails after retries
+    """
+    params = build_params(series_id, start_date, end_date)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(1)
+    async with semaphore:
+        if limiter is not None:
+            await limiter.wait()
+        response = await client.get(FRED_BASE_URL, params=params)
+    response.raise_for_status()
+    return observations_to_frame(series_id, response.json())
+
+
+@asynccontextmanager
+async def _client_context(
+    client: Optional[httpx.AsyncClient],
+    limits: httpx.Limits,
+) -> AsyncIterator[httpx.AsyncClient]:
+    """Yield ``client`` as-is, or a new pooled, cached client closed on exit."""
+    if client is not None:
+        yield client
+        return
+    async with cached_async_client(limits=limits, timeout=30.0) as owned:
+        yield owned
+
+
+@instrumented
+async def fetch_treasury_yields_async(
+    start_date: str,
+    end_date: Optional[str] = None,
+    series_ids: Optional[Iterable[str]] = None,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    requests_per_second: Optional[float] = DEFAULT_REQUESTS_PER_SECOND,
+    client: Optional[httpx.AsyncClient] = None,
+) -> pd.DataFrame:
+    """Fetch Treasury yield data from FRED API concurrently.
+
+    All series are requested at once over one pooled client, bounded by
+    ``max_concurrency`` in-flight requests and ``requests_per_second``.
+    Each series is retried independently; series that still fail are
+    logged and skipped, as in ``fetch_treasury_yields``.
+
+    Args:
+        start_date: Start date in YYYY-MM-DD format
+        end_date: Optional end date in YYYY-MM-DD format (defaults to today)
+        series_ids: Optional FRED series IDs (defaults to ``TREASURY_SERIES``)
+        max_concurrency: Maximum number of in-flight requests
+        requests_per_second: Maximum request rate; ``None`` disables limiting
+        client: Optional client to reuse; one is created if not given
+
+    Returns:
+        DataFrame with Treasury yields indexed by date, including calculated spreads
+
+    Raises:
+        ValueError: If no series could be fetched, dates are invalid or the API key is missing
+    """
+    if end_date is None:
+        end_date = datetime.now().strftime("%Y-%m-%d")
+
+    # Validate dates, and fail before any request if the API key is missing
+    validate_dates(start_date, end_date)
+    fred_api_key()
+
+    series_ids = list(series_ids or TREASURY_SERIES)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    limiter = AsyncRateLimiter(requests_per_second)
+    limits = httpx.Limits(max_connections=max_concurrency)
+
+    async with _client_context(client, limits) as session:
+        results = await asyncio.gather(
+            *(
+                fetch_series_async(session, series_id, start_date, end_date, semaphore, limiter)
+                for series_id in series_ids
+            ),
+            return_exceptions=True,
+        )
+
+    dfs = []
+    for series_id, result in zip(series_ids, results):
+        if isinstance(result, httpx.HTTPError):
+            logger.warning(f"Failed to fetch {series_id}: {result}")
+            continue
+        if isinstance(result, BaseException):
+            raise result
+        dfs.append(result)
+
+    return combine_series(dfs)
+
+
 if __name__ == "__main__":
     # Example usage
     yields = fetch_treasury_yields("2023-01-01")
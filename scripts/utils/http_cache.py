@@ -0,0 +1,499 @@
+"""Content-addressed on-disk HTTP response cache for the ingest scripts.
+
+Responses to GET requests are stored gzip-compressed under a key derived from
+the URL and its query parameters (secrets such as ``api_key`` are left out of
+the key). Each source has its own TTL. Stale entries are revalidated with
+``If-None-Match``/``If-Modified-Since``, so an unchanged payload costs a 304
+rather than a full download. The cache is capped in size and evicts least
+recently used entries. In offline mode only cached responses are served.
+
+The cache plugs into httpx as a transport, so existing client code is
+unchanged apart from how the client is built. Bodies are streamed in both
+directions: a miss is passed through to the caller chunk by chunk while it is
+written to the cache, and a hit is decompressed chunk by chunk, so
+``client.stream`` callers keep their bounded memory.
+
+Settings can be overridden from the environment:
+    HTTP_CACHE_DIR: Cache directory (default ``data/cache/http``)
+    HTTP_CACHE_MAX_MB: Size cap in megabytes (default 512)
+    HTTP_CACHE_OFFLINE: Set to 1 to serve only from the cache
+
+Example:
+    >>> from scripts.utils.http_cache import cached_async_client
+    >>> async with cached_async_client() as client:
+    ...     response = await client.get(DEFILLAMA_API_URL)
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Dict, Iterable, Iterator, NamedTuple, Optional, Union
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_CACHE_DIR = Path(os.getenv("HTTP_CACHE_DIR", "data/cache/http"))
+DEFAULT_MAX_BYTES = int(float(os.getenv("HTTP_CACHE_MAX_MB", "512")) * 1024 * 1024)
+IGNORED_PARAMS = ("api_key",)
+STORED_HEADERS = ("content-type", "etag", "last-modified")
+# Bytes read from a cached body at a time
+CHUNK_BYTES = 1 << 16
+
+# Seconds a response is served without revalidation, per source
+DEFAULT_TTLS: Dict[str, float] = {
+    "defillama": 6 * 3600,
+    "fred": 12 * 3600,
+    "default": 3600,
+}
+SOURCE_BY_HOST = {
+    "stablecoins.llama.fi": "defillama",
+    "api.stlouisfed.org": "fred",
+}
+
+
+class OfflineCacheMiss(httpx.RequestError):
+    """Raised in offline mode when a request is not in the cache."""
+
+
+class CacheEntry(NamedTuple):
+    """Index row for one cached response."""
+
+    key: str
+    url: str
+    source: str
+    headers: Dict[str, str]
+    stored_at: float
+    size: int
+
+
+def env_flag(name: str) -> bool:
+    """Return True if an environment variable is set to a truthy value."""
+    return os.getenv(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def source_for(url: httpx.URL) -> str:
+    """Map a request URL to the source name used for TTLs."""
+    return SOURCE_BY_HOST.get(url.host, "default")
+
+
+def cache_key(
+    method: str,
+    url: Union[str, httpx.URL],
+    ignored_params: Iterable[str] = IGNORED_PARAMS,
+) -> str:
+    """Hash a request into a cache key.
+
+    Query parameters are sorted so that parameter order does not matter, and
+    ``ignored_params`` are dropped so secrets do not affect the key.
+
+    Args:
+        method: HTTP method
+        url: Request URL including query parameters
+        ignored_params: Query parameters left out of the key
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    return hashlib.sha256(canonical_url(method, url, ignored_params).encode()).hexdigest()
+
+
+def canonical_url(
+    method: str,
+    url: Union[str, httpx.URL],
+    ignored_params: Iterable[str] = IGNORED_PARAMS,
+) -> str:
+    """Normalise a request into ``METHOD scheme://host/path?sorted-params``."""
+    url = httpx.URL(url)
+    ignored = set(ignored_params)
+    params = sorted((k, v) for k, v in url.params.multi_items() if k not in ignored)
+    return f"{method.upper()} {url.copy_with(query=None)}?{httpx.QueryParams(params)}"
+
+
+class HTTPCache:
+    """On-disk response store with TTLs, validators and LRU eviction.
+
+    Bodies live in ``<root>/<key[:2]>/<key>.gz``; metadata and access times
+    live in a SQLite index next to them.
+
+    Args:
+        root: Cache directory
+        max_bytes: Total compressed size before least recently used entries
+            are evicted
+        ttls: Seconds each source is served without revalidation
+        offline: Serve only from the cache; defaults to ``HTTP_CACHE_OFFLINE``
+    """
+
+    def __init__(
+        self,
+        root: Union[str, Path] = DEFAULT_CACHE_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        ttls: Optional[Dict[str, float]] = None,
+        offline: Optional[bool] = None,
+    ) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.offline = env_flag("HTTP_CACHE_OFFLINE") if offline is None else offline
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.root / "index.sqlite", check_same_thread=False)
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                source TEXT,
+                headers TEXT,
+                stored_at REAL,
+                accessed_at REAL,
+                size INTEGER
+            )"""
+        )
+        self._db.commit()
+
+    def _body_path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.gz"
+
+    def lookup(self, request: httpx.Request) -> Optional[CacheEntry]:
+        """Return the index entry for a request, if its body is on disk."""
+        key = cache_key(request.method, request.url)
+        row = self._db.execute(
+            "SELECT key, url, source, headers, stored_at, size FROM entries WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+        entry = CacheEntry(row[0], row[1], row[2], json.loads(row[3]), row[4], row[5])
+        if not self._body_path(key).exists():
+            self._delete(key)
+            return None
+        return entry
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        """Whether an entry is younger than its source's TTL."""
+        ttl = self.ttls.get(entry.source, self.ttls["default"])
+        return time.time() - entry.stored_at < ttl
+
+    def conditional_headers(self, entry: CacheEntry) -> Dict[str, str]:
+        """Revalidation headers for a stale entry."""
+        headers = {}
+        if "etag" in entry.headers:
+            headers["If-None-Match"] = entry.headers["etag"]
+        if "last-modified" in entry.headers:
+            headers["If-Modified-Since"] = entry.headers["last-modified"]
+        return headers
+
+    def partial_path(self, request: httpx.Request) -> Path:
+        """Unique temporary path a response body is written to before ``commit``."""
+        path = self._body_path(cache_key(request.method, request.url))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path.with_name(f"{path.stem}.{uuid.uuid4().hex}.tmp")
+
+    def store(self, request: httpx.Request, headers: httpx.Headers, body: bytes) -> CacheEntry:
+        """Compress and store a response body, then enforce the size cap."""
+        tmp = self.partial_path(request)
+        tmp.write_bytes(gzip.compress(body))
+        return self.commit(request, headers, tmp)
+
+    def commit(self, request: httpx.Request, headers: httpx.Headers, tmp: Path) -> CacheEntry:
+        """Move a fully written gzip body into place and index it.
+
+        Args:
+            request: Request the body answers
+            headers: Response headers; ``STORED_HEADERS`` are kept
+            tmp: Gzip file from ``partial_path``
+
+        Returns:
+            The new index entry
+        """
+        key = cache_key(request.method, request.url)
+        path = self._body_path(key)
+        tmp.replace(path)
+
+        kept = {name: headers[name] for name in STORED_HEADERS if name in headers}
+        now = time.time()
+        entry = CacheEntry(
+            key,
+            canonical_url(request.method, request.url),
+            source_for(request.url),
+            kept,
+            now,
+            path.stat().st_size,
+        )
+        self._db.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (entry.key, entry.url, entry.source, json.dumps(kept), now, now, entry.size),
+        )
+        self._db.commit()
+        self.evict()
+        return entry
+
+    def refresh(self, entry: CacheEntry) -> CacheEntry:
+        """Mark a revalidated entry as freshly stored."""
+        now = time.time()
+        self._db.execute(
+            "UPDATE entries SET stored_at = ?, accessed_at = ? WHERE key = ?",
+            (now, now, entry.key),
+        )
+        self._db.commit()
+        return entry._replace(stored_at=now)
+
+    def serve(self, entry: CacheEntry, request: httpx.Request) -> httpx.Response:
+        """Build a response streaming a cached body and record the access.
+
+        The body file is opened here, so a later eviction or rewrite of the
+        entry does not affect a response that is still being read.
+        """
+        body = _CachedBody(gzip.open(self._body_path(entry.key), "rb"))
+        self._db.execute(
+            "UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), entry.key)
+        )
+        self._db.commit()
+        headers = {**entry.headers, "x-cache": "HIT"}
+        return httpx.Response(200, headers=headers, stream=body, request=request)
+
+    def total_bytes(self) -> int:
+        """Compressed size of all cached bodies."""
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def evict(self) -> int:
+        """Drop least recently used entries until under ``max_bytes``.
+
+        Returns:
+            Number of entries evicted
+        """
+        total = self.total_bytes()
+        evicted = 0
+        if total <= self.max_bytes:
+            return evicted
+        rows = self._db.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._delete(key)
+            total -= size
+            evicted += 1
+        logger.debug(f"Evicted {evicted} cache entries")
+        return evicted
+
+    def _delete(self, key: str) -> None:
+        self._body_path(key).unlink(missing_ok=True)
+        self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self._db.commit()
+
+    def close(self) -> None:
+        self._db.close()
+
+
+class _CachedBody(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Cached gzip body decompressed ``CHUNK_BYTES`` at a time."""
+
+    def __init__(self, file: BinaryIO) -> None:
+        self.file = file
+
+    def __iter__(self) -> Iterator[bytes]:
+        with self.file:
+            yield from iter(lambda: self.file.read(CHUNK_BYTES), b"")
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for chunk in self:
+            yield chunk
+
+    def close(self) -> None:
+        self.file.close()
+
+    async def aclose(self) -> None:
+        self.file.close()
+
+
+class _TeeStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Upstream body passed to the caller while it is written to the cache.
+
+    The entry is committed once the body has been read to the end. A body
+    that fails or is abandoned part-way is discarded, so the cache never
+    holds a truncated response.
+
+    Args:
+        cache: Cache the body is written to
+        request: Request the body answers
+        response: Upstream response, not yet read
+    """
+
+    def __init__(self, cache: HTTPCache, request: httpx.Request, response: httpx.Response) -> None:
+        self.cache = cache
+        self.request = request
+        self.response = response
+        self.tmp: Optional[Path] = None
+
+    def __iter__(self) -> Iterator[bytes]:
+        self.tmp = tmp = self.cache.partial_path(self.request)
+        try:
+            with gzip.open(tmp, "wb") as f:
+                for chunk in self.response.iter_bytes():
+                    f.write(chunk)
+                    yield chunk
+            self.cache.commit(self.request, self.response.headers, tmp)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        self.tmp = tmp = self.cache.partial_path(self.request)
+        try:
+            with gzip.open(tmp, "wb") as f:
+                async for chunk in self.response.aiter_bytes():
+                    f.write(chunk)
+                    yield chunk
+            self.cache.commit(self.request, self.response.headers, tmp)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def _discard(self) -> None:
+        # An abandoned body's iterator may never resume; drop its file now
+        if self.tmp is not None:
+            self.tmp.unlink(missing_ok=True)
+
+    def close(self) -> None:
+        self.response.close()
+        self._discard()
+
+    async def aclose(self) -> None:
+        await self.response.aclose()
+        self._discard()
+
+
+def _passthrough(
+    cache: HTTPCache,
+    request: httpx.Request,
+    response: httpx.Response,
+) -> httpx.Response:
+    """Response streaming an upstream 200 to the caller through the cache."""
+    headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+    return httpx.Response(200, headers={**headers, "x-cache": "MISS"},
+                          stream=_TeeStream(cache, request, response), request=request)
+
+
+class CachingTransport(httpx.BaseTransport):
+    """Synchronous httpx transport that serves GET requests through ``HTTPCache``.
+
+    Args:
+        cache: Cache to use; the shared default cache if None
+        transport: Transport for cache misses and revalidation
+    """
+
+    def __init__(
+        self,
+        cache: Optional[HTTPCache] = None,
+        transport: Optional[httpx.BaseTransport] = None,
+    ) -> None:
+        self.cache = cache or get_default_cache()
+        self.transport = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method != "GET":
+            return self.transport.handle_request(request)
+        entry = self.cache.lookup(request)
+        if entry is not None and (self.cache.offline or self.cache.is_fresh(entry)):
+            return self.cache.serve(entry, request)
+        if self.cache.offline:
+            raise OfflineCacheMiss(f"Not cached (offline mode): {request.url}", request=request)
+        if entry is not None:
+            request.headers.update(self.cache.conditional_headers(entry))
+
+        response = self.transport.handle_request(request)
+        if entry is not None and response.status_code == 304:
+            response.close()
+            return self.cache.serve(self.cache.refresh(entry), request)
+        if response.status_code != 200:
+            return response
+        return _passthrough(self.cache, request, response)
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class AsyncCachingTransport(httpx.AsyncBaseTransport):
+    """Async httpx transport that serves GET requests through ``HTTPCache``.
+
+    Args:
+        cache: Cache to use; the shared default cache if None
+        transport: Transport for cache misses and revalidation
+    """
+
+    def __init__(
+        self,
+        cache: Optional[HTTPCache] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        self.cache = cache or get_default_cache()
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method != "GET":
+            return await self.transport.handle_async_request(request)
+        entry = self.cache.lookup(request)
+        if entry is not None and (self.cache.offline or self.cache.is_fresh(entry)):
+            return self.cache.serve(entry, request)
+        if self.cache.offline:
+            raise OfflineCacheMiss(f"Not cached (offline mode): {request.url}", request=request)
+        if entry is not None:
+            request.headers.update(self.cache.conditional_headers(entry))
+
+        response = await self.transport.handle_async_request(request)
+        if entry is not None and response.status_code == 304:
+            await response.aclose()
+            return self.cache.serve(self.cache.refresh(entry), request)
+        if response.status_code != 200:
+            return response
+        return _passthrough(self.cache, request, response)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+_default_cache: Optional[HTTPCache] = None
+
+
+def get_default_cache() -> HTTPCache:
+    """Return the process-wide cache, creating it on first use."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = HTTPCache()
+    return _default_cache
+
+
+def cached_client(
+    cache: Optional[HTTPCache] = None,
+    limits: httpx.Limits = httpx.Limits(),
+    **kwargs,
+) -> httpx.Client:
+    """Build an ``httpx.Client`` whose GET requests go through the cache.
+
+    Args:
+        cache: Cache to use; the shared default cache if None
+        limits: Connection pool limits for the underlying transport
+        **kwargs: Passed through to ``httpx.Client``
+    """
+    transport = CachingTransport(cache, httpx.HTTPTransport(limits=limits))
+    return httpx.Client(transport=transport, **kwargs)
+
+
+def cached_async_client(
+    cache: Optional[HTTPCache] = None,
+    limits: httpx.Limits = httpx.Limits(),
+    **kwargs,
+) -> httpx.AsyncClient:
+    """Build an ``httpx.AsyncClient`` whose GET requests go through the cache.
+
+    Args:
+        cache: Cache to use; the shared default cache if None
+        limits: Connection pool limits for the underlying transport
+        **kwargs: Passed through to ``httpx.AsyncClient``
+    """
+    transport = AsyncCachingTransport(cache, httpx.AsyncHTTPTransport(limits=limits))
+    return httpx.AsyncClient(transport=transport, **kwargs)
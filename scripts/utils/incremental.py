@@ -0,0 +1,99 @@
+"""Watermark helpers for incremental (append-only) ingestion.
+
+An incremental run reads the last stored date (the watermark) from the
+existing output, requests only the window after it plus a small overlap so
+that late revisions are picked up, and upserts the new rows on the date key.
+
+Example:
+    >>> from scripts.utils.incremental import incremental_start, upsert
+    >>> start = incremental_start(OUTPUT_FILE, "timestamp", "2018-01-01")
+    >>> df = upsert(pd.read_parquet(OUTPUT_FILE), new_rows, "timestamp")
+"""
+
+import logging
+from datetime import timedelta
+from pathlib import Path
+from typing import List, Optional, Union
+
+import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+# Days re-requested before the watermark to pick up revised observations
+DEFAULT_OVERLAP_DAYS = 7
+
+
+def read_watermark(path: Union[str, Path], date_column: str) -> Optional[pd.Timestamp]:
+    """Read the latest stored date from an existing parquet file or dataset.
+
+    Only the date column is read, so this is cheap even for large files.
+
+    Args:
+        path: Path to the parquet file or partitioned dataset directory
+        date_column: Name of the date column (or the stored index name)
+
+    Returns:
+        Latest date in the file, or None if the file is missing or empty
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    dates = pq.read_table(path, columns=[date_column]).column(date_column)
+    latest = pc.max(dates).as_py()
+    return None if latest is None else pd.Timestamp(latest)
+
+
+def incremental_start(
+    path: Union[str, Path],
+    date_column: str,
+    start_date: str,
+    overlap_days: int = DEFAULT_OVERLAP_DAYS,
+) -> str:
+    """Compute the first date an incremental run needs to request.
+
+    Args:
+        path: Path to the existing parquet file
+        date_column: Name of the date column (or the stored index name)
+        start_date: Full-history start date in YYYY-MM-DD format
+        overlap_days: Days before the watermark to re-request for revisions
+
+    Returns:
+        Start date in YYYY-MM-DD format; ``start_date`` if nothing is stored yet
+    """
+    watermark = read_watermark(path, date_column)
+    if watermark is None:
+        logger.info(f"No watermark in {path}, fetching from {start_date}")
+        return start_date
+    window_start = max(watermark - timedelta(days=overlap_days), pd.Timestamp(start_date))
+    logger.info(f"Watermark for {path} is {watermark.date()}, fetching from {window_start.date()}")
+    return window_start.strftime("%Y-%m-%d")
+
+
+def upsert(
+    existing: pd.DataFrame,
+    new: pd.DataFrame,
+    key: Optional[Union[str, List[str]]] = None,
+) -> pd.DataFrame:
+    """Merge new rows into existing ones, new values winning on key clashes.
+
+    Args:
+        existing: Previously stored rows
+        new: Freshly fetched rows
+        key: Column(s) to deduplicate on; the index is used if None
+
+    Returns:
+        Combined DataFrame sorted by key
+    """
+    if existing.empty:
+        return new
+    if new.empty:
+        return existing
+    combined = pd.concat([existing, new])
+    if key is None:
+        combined = combined[~combined.index.duplicated(keep="last")]
+        return combined.sort_index()
+    keys = [key] if isinstance(key, str) else list(key)
+    combined = combined.drop_duplicates(subset=keys, keep="last")
+    return combined.sort_values(keys).reset_index(drop=True)
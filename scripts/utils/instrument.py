@@ -0,0 +1,455 @@
+"""Timing, memory and I/O instrumentation for the pipeline stages.
+
+``stage`` (a context manager) and ``instrumented`` (a decorator for plain and
+async functions) record one metrics record per call: wall time, CPU time,
+peak resident set size, rows in and out, and bytes read and written. Stages
+nest, and each record names its parent. Records are appended as JSON lines
+to ``METRICS_FILE`` when it is set and logged at DEBUG level otherwise, so
+an unconfigured run pays only a few system calls per stage.
+
+Rows are counted from the arguments and return value of an instrumented
+function: DataFrames, Series and arrays by their first dimension, and lists
+and other sized objects (except strings, bytes and mappings) by ``len``.
+Rows in are those of every frame or array argument and of the first
+argument.
+Peak RSS is the process high-water mark when the stage ends; ``rss_growth``
+is how much the stage raised it. Bytes are the process' ``rchar``/``wchar``
+counters from ``/proc/self/io``, so they include network and pipe traffic
+and are missing on systems without procfs.
+
+Selected stages can also be profiled: cProfile writes ``.prof`` files that
+``python -m pstats`` or snakeviz read, and tracemalloc writes snapshots that
+``tracemalloc.Snapshot.load`` reads and adds the traced peak to the record.
+
+Settings are read from the environment:
+    METRICS_FILE: JSON-lines file to append records to (default: none)
+    PROFILE_STAGES: Comma-separated glob patterns of stages to profile
+    PROFILE_MODE: ``cpu``, ``memory`` or ``cpu,memory`` (default ``cpu``)
+    PROFILE_DIR: Where profiles go (default ``data/cache/profiles``)
+    PIPELINE_RUN_ID, PIPELINE_TASK: Set by the pipeline runner and copied
+        into every record
+
+Example:
+    $ METRICS_FILE=data/cache/metrics.jsonl python -m scripts.stats.granger
+    $ PROFILE_STAGES='stats.*' PROFILE_MODE=cpu,memory python -m scripts.panel --force
+    $ python -m scripts.utils.instrument summary --prometheus metrics.prom
+
+    >>> from scripts.utils.instrument import instrumented, stage
+    >>> @instrumented
+    ... def build(df): ...
+    >>> with stage("figures.render", figures=12) as record:
+    ...     record["rows_out"] = 12
+"""
+
+import argparse
+import contextvars
+import cProfile
+import fnmatch
+import functools
+import inspect
+import json
+import logging
+import os
+import runpy
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_METRICS_FILE = Path("data/cache/metrics.jsonl")
+DEFAULT_PROFILE_DIR = Path("data/cache/profiles")
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+PROMETHEUS_PREFIX = "reserve_shock_stage"
+# ru_maxrss is in kilobytes on Linux and bytes on macOS
+RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+# Summed per stage in summaries and Prometheus output: field -> (metric, help)
+SUMMED_FIELDS = {
+    "wall_s": ("wall_seconds", "Wall-clock time spent in the stage"),
+    "cpu_s": ("cpu_seconds", "CPU time spent in the stage"),
+    "rows_in": ("rows_in", "Rows passed into the stage"),
+    "rows_out": ("rows_out", "Rows returned by the stage"),
+    "bytes_read": ("read_bytes", "Bytes read by the process during the stage"),
+    "bytes_written": ("written_bytes", "Bytes written by the process during the stage"),
+}
+
+# Names of the enclosing stages, innermost last
+_stack = contextvars.ContextVar("stage_stack", default=())
+_profiling = False
+
+
+def count_rows(obj: Any) -> Optional[int]:
+    """Number of rows in a frame, array or sized collection, or None."""
+    shape = getattr(obj, "shape", None)
+    if isinstance(shape, tuple) and shape:
+        return int(shape[0])
+    if isinstance(obj, (str, bytes, bytearray, dict)) or not hasattr(obj, "__len__"):
+        return None
+    try:
+        return len(obj)
+    except TypeError:
+        return None
+
+
+def input_rows(args: Sequence[Any], kwargs: Dict[str, Any]) -> Optional[int]:
+    """Rows passed to a function: its frames and arrays, and its first argument.
+
+    Other sized arguments are usually options such as column lists.
+    """
+    objs = [obj for obj in (*args, *kwargs.values()) if hasattr(obj, "shape")]
+    if args and not hasattr(args[0], "shape"):
+        objs.append(args[0])
+    counts = [n for n in map(count_rows, objs) if n is not None]
+    return sum(counts) if counts else None
+
+
+def peak_rss() -> Optional[int]:
+    """Peak resident set size of this process in bytes, if known."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * RSS_UNIT
+
+
+def io_counters() -> Tuple[Optional[int], Optional[int]]:
+    """Bytes read and written by this process so far, if known."""
+    try:
+        # Raw os calls: a buffered text open costs several times more
+        fd = os.open("/proc/self/io", os.O_RDONLY)
+        try:
+            data = os.read(fd, 512)
+        finally:
+            os.close(fd)
+        counters = dict(line.split(b": ") for line in data.splitlines())
+        return int(counters[b"rchar"]), int(counters[b"wchar"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _profile_modes(name: str) -> List[str]:
+    """Profilers requested for a stage through ``PROFILE_STAGES``."""
+    patterns = [p.strip() for p in os.getenv("PROFILE_STAGES", "").split(",") if p.strip()]
+    if not any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns):
+        return []
+    modes = os.getenv("PROFILE_MODE", "cpu").replace(" ", "").split(",")
+    return [mode for mode in ("cpu", "memory") if mode in modes]
+
+
+def _profile_path(name: str, suffix: str) -> Path:
+    directory = Path(os.getenv("PROFILE_DIR", str(DEFAULT_PROFILE_DIR)))
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+    return directory / f"{name}-{stamp}-{os.getpid()}{suffix}"
+
+
+def emit(record: Dict[str, Any]) -> None:
+    """Append a record to ``METRICS_FILE``, or log it if that is not set."""
+    path = os.getenv("METRICS_FILE")
+    if not path:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps(record, default=str))
+        return
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    # One short write per record keeps lines whole when processes share the file
+    with open(path, "a") as f:
+        f.write(json.dumps(record, default=str) + "\n")
+
+
+@contextmanager
+def stage(name: str, **fields: Any) -> Iterator[Dict[str, Any]]:
+    """Measure a block of code as one stage.
+
+    Args:
+        name: Stage name, dotted by module, e.g. ``panel.build_panel``
+        **fields: Extra fields stored in the record, such as ``rows_in``
+
+    Yields:
+        The record, which the block may update (e.g. ``rows_out``) before
+        it is emitted
+    """
+    global _profiling
+    parents = _stack.get()
+    token = _stack.set(parents + (name,))
+    record: Dict[str, Any] = {
+        "stage": name,
+        "parent": parents[-1] if parents else None,
+        "run_id": os.getenv("PIPELINE_RUN_ID"),
+        "task": os.getenv("PIPELINE_TASK"),
+        "pid": os.getpid(),
+        **fields,
+    }
+
+    # Profilers cannot nest, so only the outermost profiled stage gets them
+    modes = [] if _profiling else _profile_modes(name)
+    profiler = cProfile.Profile() if "cpu" in modes else None
+    trace = "memory" in modes and not tracemalloc.is_tracing()
+    if modes:
+        _profiling = True
+    if trace:
+        tracemalloc.start()
+
+    rss_before = peak_rss()
+    read_before, written_before = io_counters()
+    cpu_before = time.process_time()
+    wall_before = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        yield record
+        record.setdefault("status", "ok")
+    except BaseException as e:
+        record["status"] = "error"
+        record["error"] = type(e).__name__
+        raise
+    finally:
+        if profiler:
+            profiler.disable()
+        record["wall_s"] = time.perf_counter() - wall_before
+        record["cpu_s"] = time.process_time() - cpu_before
+        rss_after = peak_rss()
+        record["peak_rss"] = rss_after
+        record["rss_growth"] = None if rss_after is None else rss_after - rss_before
+        read_after, written_after = io_counters()
+        if read_after is not None and read_before is not None:
+            record["bytes_read"] = read_after - read_before
+            record["bytes_written"] = written_after - written_before
+        if profiler:
+            record["cpu_profile"] = str(_profile_path(name, ".prof"))
+            profiler.dump_stats(record["cpu_profile"])
+        if trace:
+            record["traced_peak"] = tracemalloc.get_traced_memory()[1]
+            record["memory_profile"] = str(_profile_path(name, ".tracemalloc"))
+            tracemalloc.take_snapshot().dump(record["memory_profile"])
+            tracemalloc.stop()
+        if modes:
+            _profiling = False
+        record["ts"] = datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+        _stack.reset(token)
+        emit(record)
+
+
+def stage_name(func: Callable) -> str:
+    """Default stage name: the module path under ``scripts/`` plus the qualname.
+
+    Uses the source file rather than ``__module__``, so a function gets the
+    same name when its module runs as ``__main__``.
+    """
+    try:
+        path = Path(inspect.getfile(func)).resolve().with_suffix("")
+        module = ".".join(path.relative_to(SCRIPTS_DIR).parts)
+    except (TypeError, ValueError):
+        module = func.__module__
+    return f"{module}.{func.__qualname__}"
+
+
+def instrumented(func: Optional[Callable] = None, *, name: Optional[str] = None):
+    """Decorator that runs each call of a function as a ``stage``.
+
+    Works on plain and async functions, with or without arguments:
+    ``@instrumented`` or ``@instrumented(name="ingest.fetch")``. Rows in are
+    counted by ``input_rows``, rows out from the return value.
+
+    Args:
+        func: Function to wrap
+        name: Stage name (default: see ``stage_name``)
+    """
+    if func is None:
+        return functools.partial(instrumented, name=name)
+    label = name or stage_name(func)
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            with stage(label, rows_in=input_rows(args, kwargs)) as record:
+                result = await func(*args, **kwargs)
+                record["rows_out"] = count_rows(result)
+                return result
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with stage(label, rows_in=input_rows(args, kwargs)) as record:
+            result = func(*args, **kwargs)
+            record["rows_out"] = count_rows(result)
+            return result
+    return wrapper
+
+
+def read_records(
+    path: Union[str, Path] = DEFAULT_METRICS_FILE, run_id: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Read metrics records, optionally only those of one pipeline run.
+
+    Args:
+        path: JSON-lines metrics file
+        run_id: Keep only this run; ``"latest"`` picks the last run in the file
+
+    Returns:
+        Records in the order they were written
+    """
+    path = Path(path)
+    if not path.exists():
+        return []
+    records = []
+    for line in path.read_text().splitlines():
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError:
+            logger.warning(f"Skipping a malformed line in {path}")
+    if run_id == "latest":
+        run_id = next((r["run_id"] for r in reversed(records) if r.get("run_id")), None)
+    if run_id:
+        records = [r for r in records if r.get("run_id") == run_id]
+    return records
+
+
+def summarise(records: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Aggregate records per (task, stage), slowest first.
+
+    Args:
+        records: Metrics records
+
+    Returns:
+        One dict per stage with ``calls``, ``errors``, the ``SUMMED_FIELDS``
+        totals and the largest ``peak_rss``
+    """
+    totals: Dict[Tuple[Optional[str], str], Dict[str, Any]] = {}
+    for record in records:
+        key = (record.get("task"), record["stage"])
+        total = totals.setdefault(key, {"task": key[0], "stage": key[1], "calls": 0,
+                                        "errors": 0, "peak_rss": None,
+                                        **{field: None for field in SUMMED_FIELDS}})
+        total["calls"] += 1
+        total["errors"] += record.get("status") == "error"
+        for field in SUMMED_FIELDS:
+            if record.get(field) is not None:
+                total[field] = (total[field] or 0) + record[field]
+        if record.get("peak_rss") is not None:
+            total["peak_rss"] = max(total["peak_rss"] or 0, record["peak_rss"])
+    return sorted(totals.values(), key=lambda t: -(t["wall_s"] or 0))
+
+
+def _label(value: Optional[str]) -> str:
+    return (value or "").replace("\\", "\\\\").replace('"', '\\"')
+
+
+def prometheus_text(records: Sequence[Dict[str, Any]]) -> str:
+    """Render per-stage totals in the Prometheus text exposition format."""
+    summary = summarise(records)
+    metrics = [(field, metric, text) for field, (metric, text) in SUMMED_FIELDS.items()]
+    metrics += [("peak_rss", "peak_rss_bytes", "Peak resident set size of the process"),
+                ("calls", "calls", "Calls of the stage"),
+                ("errors", "errors", "Calls of the stage that raised")]
+    lines = []
+    for field, metric, text in metrics:
+        lines += [f"# HELP {PROMETHEUS_PREFIX}_{metric} {text}",
+                  f"# TYPE {PROMETHEUS_PREFIX}_{metric} gauge"]
+        for total in summary:
+            if total[field] is not None:
+                labels = f'task="{_label(total["task"])}",stage="{_label(total["stage"])}"'
+                lines.append(f"{PROMETHEUS_PREFIX}_{metric}{{{labels}}} {total[field]:g}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(records: Sequence[Dict[str, Any]], path: Union[str, Path]) -> Path:
+    """Write a Prometheus textfile-collector file atomically.
+
+    Args:
+        records: Metrics records, usually those of one pipeline run
+        path: Output ``.prom`` file
+
+    Returns:
+        Path of the written file
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(prometheus_text(records))
+    # The collector must never see a half-written file
+    os.replace(tmp, path)
+    return path
+
+
+def run_module(module: str, args: Sequence[str], name: Optional[str] = None) -> int:
+    """Run a module as ``__main__`` inside one stage.
+
+    Args:
+        module: Module to run, e.g. ``scripts.stats.granger``
+        args: Its command-line arguments
+        name: Stage name (default: the module path without ``scripts.``)
+
+    Returns:
+        The module's exit code
+    """
+    if name is None:
+        name = module[len("scripts."):] if module.startswith("scripts.") else module
+    # runpy replaces argv[0] with the module's path; the arguments are kept
+    sys.argv = [module, *args]
+    code = 0
+    with stage(name) as record:
+        try:
+            runpy.run_module(module, run_name="__main__", alter_sys=True)
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        if code:
+            record["status"] = "error"
+            record["error"] = f"exit {code}"
+    return code
+
+
+def print_summary(summary: Sequence[Dict[str, Any]]) -> None:
+    """Print stage totals as an aligned table."""
+    width = max([len(t["stage"]) for t in summary] + [5])
+    print(f"{'task':<12} {'stage':<{width}} {'calls':>5} {'wall s':>8} {'cpu s':>8} "
+          f"{'peak MB':>8} {'rows out':>10} {'MB read':>8} {'MB written':>10}")
+
+    def fmt(value, scale=1.0, spec=".2f"):
+        return "-" if value is None else format(value / scale, spec)
+
+    for t in summary:
+        print(f"{t['task'] or '-':<12} {t['stage']:<{width}} {t['calls']:>5} "
+              f"{fmt(t['wall_s']):>8} {fmt(t['cpu_s']):>8} "
+              f"{fmt(t['peak_rss'], 2**20, '.0f'):>8} {fmt(t['rows_out'], spec='.0f'):>10} "
+              f"{fmt(t['bytes_read'], 2**20, '.1f'):>8} "
+              f"{fmt(t['bytes_written'], 2**20, '.1f'):>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stage metrics: summaries and instrumented runs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    summary_parser = subparsers.add_parser("summary", help="Where the time went, per stage")
+    summary_parser.add_argument("--file", type=Path,
+                                default=os.getenv("METRICS_FILE", str(DEFAULT_METRICS_FILE)),
+                                help="Metrics file")
+    summary_parser.add_argument("--run", default="latest",
+                                help="Pipeline run ID, 'latest' (default) or 'all'")
+    summary_parser.add_argument("--prometheus", type=Path, metavar="PATH",
+                                help="Also write a Prometheus textfile")
+
+    run_parser = subparsers.add_parser("run", help="Run a module as one stage")
+    run_parser.add_argument("--stage", help="Stage name (default: derived from the module)")
+    run_parser.add_argument("module", help="Module to run, e.g. scripts.panel")
+    run_parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments for the module")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        sys.exit(run_module(args.module, args.args, args.stage))
+
+    records = read_records(args.file, None if args.run == "all" else args.run)
+    if not records:
+        print(f"No metrics in {args.file}", file=sys.stderr)
+        sys.exit(1)
+    print_summary(summarise(records))
+    if args.prometheus:
+        print(f"Wrote {write_prometheus(records, args.prometheus)}")
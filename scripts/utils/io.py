@@ -0,0 +1,419 @@
+"""Partitioned parquet storage for the raw and processed datasets.
+
+Datasets are stored as hive-partitioned parquet directories
+(``<name>/year=YYYY/month=M/part-0.parquet``) compressed with zstd or lz4.
+Each dataset keeps a ``_schema.json`` sidecar recording its date column, its
+column dtypes, the codec and column descriptions. Readers get column projection
+and predicate pushdown on date ranges: whole partitions outside the range are
+skipped, and row groups within a partition are pruned by their statistics.
+
+Datasets written before this layout existed are single ``<name>.parq``
+files; ``read_dataset`` falls back to them transparently and
+``migrate_legacy`` converts them.
+
+``iter_batches`` streams any of these layouts, or a Feather file such as the
+panel, in chunks of at most ``batch_rows`` rows. Datasets too large for
+memory can then be reduced chunk by chunk.
+
+Example:
+    >>> from scripts.utils.io import read_dataset
+    >>> caps = read_dataset("data/raw/stablecoin_caps", columns=["circulating_supply_usd"],
+    ...                     start="2024-06-01")
+"""
+
+import json
+import logging
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from scripts.utils.incremental import upsert
+from scripts.utils.instrument import instrumented
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_COMPRESSION = "zstd"
+# Most rows per chunk when streaming a dataset
+DEFAULT_BATCH_ROWS = 1 << 16
+SUPPORTED_COMPRESSIONS = ("zstd", "lz4", "snappy", "gzip", "none")
+PARTITION_SCHEMA = pa.schema([("year", pa.int16()), ("month", pa.int8())])
+PARTITION_COLUMNS = PARTITION_SCHEMA.names
+SCHEMA_FILE = "_schema.json"
+LEGACY_SUFFIX = ".parq"
+
+PathLike = Union[str, Path]
+DateLike = Union[str, pd.Timestamp, None]
+
+
+def legacy_file(path: PathLike) -> Path:
+    """Single-file location a dataset was stored at before partitioning."""
+    return Path(path).with_suffix(LEGACY_SUFFIX)
+
+
+def dataset_exists(path: PathLike) -> bool:
+    """Whether a dataset exists in either the partitioned or the legacy layout."""
+    return Path(path).is_dir() or legacy_file(path).exists()
+
+
+def read_schema(path: PathLike) -> Dict:
+    """Read a dataset's schema sidecar.
+
+    Args:
+        path: Dataset directory
+
+    Returns:
+        Schema dict, or an empty dict if the dataset has none
+    """
+    schema_file = Path(path) / SCHEMA_FILE
+    if not schema_file.exists():
+        return {}
+    return json.loads(schema_file.read_text())
+
+
+def _to_frame(df: pd.DataFrame, date_column: str) -> Tuple[pd.DataFrame, Optional[str]]:
+    """Move a date index into a column; return the frame and the index name."""
+    if date_column in df.columns:
+        return df, None
+    if df.index.name == date_column:
+        return df.reset_index(), date_column
+    raise KeyError(f"{date_column!r} is neither a column nor the index")
+
+
+def _with_partitions(df: pd.DataFrame, date_column: str) -> pd.DataFrame:
+    dates = pd.to_datetime(df[date_column])
+    return df.assign(year=dates.dt.year.astype("int16"), month=dates.dt.month.astype("int8"))
+
+
+def _write_schema(
+    path: Path,
+    df: pd.DataFrame,
+    date_column: str,
+    index: Optional[str],
+    compression: str,
+    descriptions: Optional[Dict[str, str]],
+) -> None:
+    previous = read_schema(path)
+    schema = {
+        "date_column": date_column,
+        "index": index,
+        "columns": {col: str(dtype) for col, dtype in df.dtypes.items()},
+        "compression": compression,
+        "partitioning": PARTITION_COLUMNS,
+        "descriptions": {**previous.get("descriptions", {}), **(descriptions or {})},
+        "updated_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    (path / SCHEMA_FILE).write_text(json.dumps(schema, indent=2))
+
+
+@instrumented
+def write_dataset(
+    df: pd.DataFrame,
+    path: PathLike,
+    date_column: str,
+    compression: str = DEFAULT_COMPRESSION,
+    overwrite: bool = False,
+    descriptions: Optional[Dict[str, str]] = None,
+) -> List[Tuple[int, int]]:
+    """Write a DataFrame as a year/month-partitioned parquet dataset.
+
+    Only the partitions present in ``df`` are replaced; other partitions are
+    left untouched unless ``overwrite`` is set.
+
+    Args:
+        df: Data to write; the date may be a column or the index
+        path: Dataset directory
+        date_column: Date column (or index name) to partition on
+        compression: Parquet codec, one of ``SUPPORTED_COMPRESSIONS``
+        overwrite: Remove the whole dataset before writing
+        descriptions: Optional column descriptions to record in the schema
+
+    Returns:
+        (year, month) partitions written
+
+    Raises:
+        ValueError: If the codec is not supported
+    """
+    if compression not in SUPPORTED_COMPRESSIONS:
+        raise ValueError(f"Unsupported compression {compression!r}")
+    path = Path(path)
+    if overwrite and path.exists():
+        shutil.rmtree(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    frame, index = _to_frame(df, date_column)
+    partitioned = _with_partitions(frame, date_column)
+    if not partitioned.empty:
+        ds.write_dataset(
+            pa.Table.from_pandas(partitioned, preserve_index=False),
+            path,
+            format="parquet",
+            partitioning=ds.partitioning(PARTITION_SCHEMA, flavor="hive"),
+            existing_data_behavior="delete_matching",
+            basename_template="part-{i}.parquet",
+            file_options=ds.ParquetFileFormat().make_write_options(
+                compression=None if compression == "none" else compression
+            ),
+        )
+    _write_schema(path, frame, date_column, index, compression, descriptions)
+    partitions = _partitions_of(frame, date_column)
+    logger.info(f"Wrote {len(frame)} rows in {len(partitions)} partitions to {path}")
+    return partitions
+
+
+def _partitions_of(df: pd.DataFrame, date_column: str) -> List[Tuple[int, int]]:
+    """Sorted (year, month) partitions covered by a frame's dates."""
+    dates = pd.to_datetime(df[date_column])
+    return sorted(set(zip(dates.dt.year.tolist(), dates.dt.month.tolist())))
+
+
+def _partition_filter(partitions: Sequence[Tuple[int, int]]) -> ds.Expression:
+    expr = None
+    for year, month in partitions:
+        term = (ds.field("year") == year) & (ds.field("month") == month)
+        expr = term if expr is None else expr | term
+    return expr
+
+
+def _date_filter(date_column: str, start: DateLike, end: DateLike) -> Optional[ds.Expression]:
+    """Date-range filter plus a matching partition filter for pruning."""
+    year, month = ds.field("year"), ds.field("month")
+    expr = None
+    if start is not None:
+        start = pd.Timestamp(start)
+        expr = (ds.field(date_column) >= start) & (
+            (year > start.year) | ((year == start.year) & (month >= start.month))
+        )
+    if end is not None:
+        end = pd.Timestamp(end)
+        term = (ds.field(date_column) <= end) & (
+            (year < end.year) | ((year == end.year) & (month <= end.month))
+        )
+        expr = term if expr is None else expr & term
+    return expr
+
+
+def _open(path: Path) -> ds.Dataset:
+    return ds.dataset(
+        path,
+        format="parquet",
+        partitioning=ds.partitioning(PARTITION_SCHEMA, flavor="hive"),
+    )
+
+
+def _finish(df: pd.DataFrame, schema: Dict) -> pd.DataFrame:
+    """Restore recorded dtypes and the index of a frame read from a dataset."""
+    dtypes = {
+        col: dtype
+        for col, dtype in schema.get("columns", {}).items()
+        if col in df.columns and str(df[col].dtype) != dtype
+    }
+    if dtypes:
+        df = df.astype(dtypes)
+    if schema.get("index"):
+        df = df.set_index(schema["index"])
+    return df
+
+
+@instrumented
+def read_dataset(
+    path: PathLike,
+    columns: Optional[Sequence[str]] = None,
+    start: DateLike = None,
+    end: DateLike = None,
+) -> pd.DataFrame:
+    """Read a dataset with column projection and date-range pushdown.
+
+    The date column (or date index) is always returned, sorted ascending.
+
+    Args:
+        path: Dataset directory (or its legacy ``.parq`` location)
+        columns: Columns to read; all columns if None
+        start: Optional first date (inclusive)
+        end: Optional last date (inclusive)
+
+    Returns:
+        DataFrame with the requested columns
+
+    Raises:
+        FileNotFoundError: If neither layout exists
+    """
+    path = Path(path)
+    if not path.is_dir():
+        return _read_legacy(path, columns, start, end)
+
+    schema = read_schema(path)
+    date_column = schema["date_column"]
+    wanted = None
+    if columns is not None:
+        wanted = [date_column] + [col for col in columns if col != date_column]
+    table = _open(path).to_table(columns=wanted, filter=_date_filter(date_column, start, end))
+    df = table.to_pandas()
+    df = df.drop(columns=[col for col in PARTITION_COLUMNS if col in df.columns])
+    df = df.sort_values(date_column, kind="stable").reset_index(drop=True)
+    return _finish(df, schema)
+
+
+def _single_file(path: Path) -> Tuple[ds.Dataset, Optional[str]]:
+    """Dataset over a legacy parquet or Feather file, and its first timestamp column, if any."""
+    if path.suffix == ".feather":
+        dataset = ds.dataset(path, format="ipc")
+    else:
+        file = path if path.suffix == LEGACY_SUFFIX else legacy_file(path)
+        if not file.exists():
+            raise FileNotFoundError(f"No dataset at {path}")
+        dataset = ds.dataset(file, format="parquet")
+    date_column = next(
+        (field.name for field in dataset.schema if pa.types.is_timestamp(field.type)), None
+    )
+    return dataset, date_column
+
+
+def iter_batches(
+    path: PathLike,
+    columns: Optional[Sequence[str]] = None,
+    start: DateLike = None,
+    end: DateLike = None,
+    filter: Optional[ds.Expression] = None,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+) -> Iterator[pd.DataFrame]:
+    """Stream a dataset in chunks instead of reading it whole.
+
+    Row groups are read one at a time and split into chunks of at most
+    ``batch_rows`` rows, so memory is bounded by the chunk size whatever the
+    dataset's size. Chunks come in storage order and are not sorted.
+
+    Args:
+        path: Dataset directory, legacy ``.parq`` file or Feather file
+        columns: Columns to read besides the date; all columns if None
+        start: Optional first date (inclusive)
+        end: Optional last date (inclusive)
+        filter: Optional extra row filter, e.g. ``ds.field("trading_day")``
+        batch_rows: Most rows per chunk
+
+    Yields:
+        DataFrames with the requested columns and a default index
+
+    Raises:
+        FileNotFoundError: If the dataset does not exist
+    """
+    path = Path(path)
+    if path.is_dir():
+        schema = read_schema(path)
+        dataset, date_column = _open(path), schema["date_column"]
+        expr = _date_filter(date_column, start, end)
+    else:
+        schema = {}
+        dataset, date_column = _single_file(path)
+        expr = None
+        if start is not None:
+            expr = ds.field(date_column) >= pd.Timestamp(start)
+        if end is not None:
+            term = ds.field(date_column) <= pd.Timestamp(end)
+            expr = term if expr is None else expr & term
+    if filter is not None:
+        expr = filter if expr is None else expr & filter
+    wanted = None
+    if columns is not None:
+        wanted = [col for col in [date_column, *columns] if col is not None]
+        wanted = list(dict.fromkeys(wanted))
+    for batch in dataset.to_batches(columns=wanted, filter=expr, batch_size=batch_rows):
+        if batch.num_rows == 0:
+            continue
+        df = batch.to_pandas()
+        df = df.drop(columns=[col for col in PARTITION_COLUMNS if col in df.columns])
+        yield _finish(df, {**schema, "index": None})
+
+
+def _read_legacy(
+    path: Path,
+    columns: Optional[Sequence[str]],
+    start: DateLike,
+    end: DateLike,
+) -> pd.DataFrame:
+    """Read a single-file dataset, detecting its date column from the data."""
+    file = path if path.suffix == LEGACY_SUFFIX else legacy_file(path)
+    if not file.exists():
+        raise FileNotFoundError(f"No dataset at {path}")
+    schema = pq.read_schema(file)
+    date_column = next(
+        name for name, typ in zip(schema.names, schema.types) if pa.types.is_timestamp(typ)
+    )
+    filters = []
+    if start is not None:
+        filters.append((date_column, ">=", pd.Timestamp(start)))
+    if end is not None:
+        filters.append((date_column, "<=", pd.Timestamp(end)))
+    wanted = None
+    if columns is not None:
+        wanted = [date_column] + [col for col in columns if col != date_column]
+    return pq.read_table(file, columns=wanted, filters=filters or None).to_pandas()
+
+
+@instrumented
+def upsert_dataset(
+    df: pd.DataFrame,
+    path: PathLike,
+    date_column: str,
+    key: Optional[Union[str, List[str]]] = None,
+    compression: Optional[str] = None,
+    descriptions: Optional[Dict[str, str]] = None,
+) -> List[Tuple[int, int]]:
+    """Merge new rows into a dataset, rewriting only the partitions they touch.
+
+    Args:
+        df: New rows; the date may be a column or the index
+        path: Dataset directory
+        date_column: Date column (or index name)
+        key: Column(s) identifying a row; ``date_column`` if None
+        compression: Parquet codec; the dataset's current codec if None
+        descriptions: Optional column descriptions to record in the schema
+
+    Returns:
+        (year, month) partitions rewritten
+    """
+    path = Path(path)
+    frame, index = _to_frame(df, date_column)
+    if frame.empty:
+        return []
+    compression = compression or read_schema(path).get("compression", DEFAULT_COMPRESSION)
+    touched = _partitions_of(frame, date_column)
+
+    if path.is_dir():
+        existing = _open(path).to_table(filter=_partition_filter(touched)).to_pandas()
+        existing = existing.drop(columns=[c for c in PARTITION_COLUMNS if c in existing.columns])
+        frame = upsert(existing, frame, key or date_column)
+
+    if index:
+        frame = frame.set_index(index)
+    return write_dataset(frame, path, date_column, compression, descriptions=descriptions)
+
+
+def migrate_legacy(
+    path: PathLike,
+    date_column: str,
+    compression: str = DEFAULT_COMPRESSION,
+) -> bool:
+    """Convert a legacy single-file dataset into the partitioned layout.
+
+    Args:
+        path: Dataset directory to create
+        date_column: Date column (or index name)
+        compression: Parquet codec for the new dataset
+
+    Returns:
+        True if a legacy file was converted
+    """
+    path = Path(path)
+    file = legacy_file(path)
+    if path.is_dir() or not file.exists():
+        return False
+    write_dataset(pd.read_parquet(file), path, date_column, compression)
+    logger.info(f"Migrated {file} to partitioned dataset {path}")
+    return True
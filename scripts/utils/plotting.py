@@ -0,0 +1,412 @@
+"""Parallel, cache-aware figure rendering on matplotlib's object-oriented Agg API.
+
+Each figure is described by a picklable ``FigureSpec`` holding its output path,
+a module-level draw function, the data it plots and its style. Figures are
+rendered on their own ``Figure``/``FigureCanvasAgg`` rather than through
+pyplot's global state, so a batch of specs can be rendered in a process pool.
+
+Every spec is keyed by a hash of its data, style and the source code of its
+draw function and of the same-module helpers that function calls. The keys of
+the last render are kept in a small JSON manifest, and ``render_all`` skips
+figures whose key is unchanged and whose file still exists.
+
+Large line series are downsampled with Largest-Triangle-Three-Buckets (LTTB),
+which keeps the visual shape of the series, and large scatter clouds with a
+fixed-seed subsample, so render time stays flat as the history grows.
+
+Example:
+    >>> from scripts.utils.plotting import FigureSpec, draw_lines, render_all
+    >>> spec = FigureSpec(
+    ...     "figures/stablecoin_market_cap.png",
+    ...     draw_lines,
+    ...     {"series": [{"x": df.index, "y": df["circulating_supply_usd"], "label": "Cap"}]},
+    ...     {"title": "Stablecoin Market Cap Over Time", "legend": True},
+    ... )
+    >>> render_all([spec])
+"""
+
+import contextlib
+import hashlib
+import inspect
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Union
+
+import matplotlib
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from scripts.utils.instrument import instrumented
+
+logger = logging.getLogger(__name__)
+
+# Constants
+# Bump to invalidate every cached figure after a change to the drawing code
+PLOT_VERSION = "1"
+DEFAULT_CACHE_FILE = Path(os.getenv("FIGURE_CACHE_FILE", "data/cache/figures.json"))
+# Points kept per line series (LTTB) and per scatter cloud (subsample)
+MAX_LINE_POINTS = 2000
+MAX_SCATTER_POINTS = 5000
+SCATTER_SEED = 0
+# Style keys handled by render(); the remaining keys are passed to the draw function
+FIGURE_KEYS = ("figsize", "dpi", "title", "xlabel", "ylabel", "legend", "grid",
+               "tight_layout", "bbox_inches", "mpl_style")
+
+
+class FigureSpec(NamedTuple):
+    """Everything needed to render one figure.
+
+    Attributes:
+        path: Output file
+        draw: Module-level function ``draw(ax, data, style)`` that plots onto ``ax``
+        data: Arrays, Series or DataFrames plotted by ``draw``
+        style: Figure-level options (see ``FIGURE_KEYS``) plus draw options
+    """
+
+    path: Union[str, Path]
+    draw: Callable[..., None]
+    data: Dict[str, Any]
+    style: Optional[Dict[str, Any]] = None
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Select points with the Largest-Triangle-Three-Buckets algorithm.
+
+    The first and last points are always kept. The interior is split into
+    ``n_out - 2`` buckets, and from each bucket the point forming the largest
+    triangle with the previously kept point and the mean of the next bucket is
+    kept.
+
+    Args:
+        x: Increasing x values as floats
+        y: Finite y values
+        n_out: Number of points to keep
+
+    Returns:
+        Sorted indices of the kept points (all indices if ``n_out >= len(x)``)
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            cx, cy = x[hi:edges[i + 2]].mean(), y[hi:edges[i + 2]].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def _as_float(x: np.ndarray) -> np.ndarray:
+    """Return x as floats, mapping datetimes to nanoseconds."""
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ns]").astype("int64").astype("float64")
+    return x.astype("float64")
+
+
+def downsample_line(x, y, max_points: int = MAX_LINE_POINTS):
+    """Downsample a line series with LTTB if it is longer than ``max_points``.
+
+    Missing values are dropped before downsampling; short series are returned
+    unchanged, gaps included.
+
+    Args:
+        x: x values (numeric or datetime)
+        y: y values
+        max_points: Number of points to keep
+
+    Returns:
+        Tuple of (x, y) arrays
+    """
+    x, y = np.asarray(x), np.asarray(y, dtype="float64")
+    if len(x) <= max_points:
+        return x, y
+    finite = np.flatnonzero(np.isfinite(y))
+    keep = finite[lttb(_as_float(x[finite]), y[finite], max_points)]
+    return x[keep], y[keep]
+
+
+def downsample_scatter(x, y, max_points: int = MAX_SCATTER_POINTS):
+    """Subsample a scatter cloud to at most ``max_points`` points.
+
+    A fixed seed keeps the subsample, and hence the rendered figure, stable
+    between runs.
+
+    Args:
+        x: x values
+        y: y values
+        max_points: Number of points to keep
+
+    Returns:
+        Tuple of (x, y) arrays
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    if len(x) <= max_points:
+        return x, y
+    keep = np.sort(np.random.default_rng(SCATTER_SEED).choice(len(x), max_points, replace=False))
+    return x[keep], y[keep]
+
+
+def _plot_series(ax, series: Iterable[Dict[str, Any]], max_points: int) -> None:
+    """Plot line series given as dicts with x, y, optional label and kw."""
+    for item in series:
+        x, y = downsample_line(item["x"], item["y"], max_points)
+        ax.plot(x, y, label=item.get("label"), **item.get("kw", {}))
+
+
+def draw_lines(ax, data: Dict[str, Any], style: Dict[str, Any]) -> None:
+    """Draw line series.
+
+    Args:
+        ax: Target axes
+        data: ``{"series": [{"x", "y", "label", "kw"}, ...]}``
+        style: ``max_points`` caps the points per series
+    """
+    _plot_series(ax, data["series"], style.get("max_points", MAX_LINE_POINTS))
+
+
+def draw_scatter(ax, data: Dict[str, Any], style: Dict[str, Any]) -> None:
+    """Draw a scatter cloud with optional fitted lines on top.
+
+    Args:
+        ax: Target axes
+        data: ``{"x", "y", "label", "kw", "lines": [{"x", "y", "label", "kw"}, ...]}``
+        style: ``max_points`` caps the scatter points
+    """
+    x, y = downsample_scatter(data["x"], data["y"], style.get("max_points", MAX_SCATTER_POINTS))
+    ax.scatter(x, y, label=data.get("label"), **data.get("kw", {}))
+    _plot_series(ax, data.get("lines", []), MAX_LINE_POINTS)
+
+
+def draw_hist(ax, data: Dict[str, Any], style: Dict[str, Any]) -> None:
+    """Draw overlaid histograms.
+
+    Args:
+        ax: Target axes
+        data: ``{"hists": [{"values", "bins", "label", "kw"}, ...]}``
+        style: Unused
+    """
+    for item in data["hists"]:
+        ax.hist(np.asarray(item["values"]), bins=item.get("bins", 30), label=item.get("label"),
+                **item.get("kw", {}))
+
+
+def draw_heatmap(ax, data: Dict[str, Any], style: Dict[str, Any]) -> None:
+    """Draw an annotated matrix with seaborn.
+
+    Args:
+        ax: Target axes
+        data: ``{"matrix": DataFrame, "kw": seaborn.heatmap options}``
+        style: Unused
+    """
+    import seaborn as sns
+
+    sns.heatmap(data["matrix"], ax=ax, **data.get("kw", {}))
+
+
+def draw_regplots(ax, data: Dict[str, Any], style: Dict[str, Any]) -> None:
+    """Draw one scatter cloud and regression line per regressor.
+
+    The regression and its confidence band use every row; only the scatter
+    points are subsampled.
+
+    Args:
+        ax: Target axes
+        data: ``{"frame": DataFrame, "y": column, "xs": [columns], "kw": scatter options}``
+        style: ``max_points`` caps the scatter points per regressor
+    """
+    import seaborn as sns
+
+    frame = data["frame"]
+    max_points = style.get("max_points", MAX_SCATTER_POINTS)
+    colors = matplotlib.rcParams["axes.prop_cycle"].by_key()["color"]
+    for i, col in enumerate(data["xs"]):
+        color = colors[i % len(colors)]
+        x, y = downsample_scatter(frame[col], frame[data["y"]], max_points)
+        ax.scatter(x, y, color=color, **data.get("kw", {}))
+        sns.regplot(data=frame, x=col, y=data["y"], scatter=False, color=color, label=col, ax=ax)
+
+
+def _code_fingerprint(func: Callable, seen: Optional[set] = None) -> bytes:
+    """Source of a function and of the same-module functions it calls, recursively.
+
+    Compiled code stands in for the source when it is unavailable.
+    """
+    seen = set() if seen is None else seen
+    seen.add(func)
+    try:
+        parts = [inspect.getsource(func).encode()]
+    except (OSError, TypeError):
+        code = getattr(func, "__code__", None)
+        return b"" if code is None else code.co_code + repr(code.co_consts).encode()
+    code = getattr(func, "__code__", None)
+    for name in code.co_names if code is not None else ():
+        helper = func.__globals__.get(name)
+        if (inspect.isfunction(helper) and helper.__module__ == func.__module__
+                and helper not in seen):
+            parts.append(_code_fingerprint(helper, seen))
+    return b"".join(parts)
+
+
+def _hash_update(h, obj: Any) -> None:
+    """Feed a plotting input into a hash in a type-aware, order-stable way."""
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        h.update(type(obj).__name__.encode())
+        if isinstance(obj, pd.DataFrame):
+            h.update(repr(list(obj.columns)).encode())
+        elif isinstance(obj, pd.Series):
+            h.update(repr(obj.name).encode())
+        hashed = pd.util.hash_pandas_object(obj, index=not isinstance(obj, pd.Index))
+        h.update(hashed.values.tobytes())
+    elif isinstance(obj, np.ndarray):
+        h.update(f"{obj.dtype}{obj.shape}".encode())
+        if obj.dtype == object:
+            h.update(repr(obj.tolist()).encode())
+        else:
+            h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        for key in sorted(obj, key=str):
+            h.update(repr(key).encode())
+            _hash_update(h, obj[key])
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"{type(obj).__name__}{len(obj)}".encode())
+        for item in obj:
+            _hash_update(h, item)
+    elif callable(obj):
+        h.update(f"{obj.__module__}.{obj.__qualname__}".encode())
+        h.update(_code_fingerprint(obj))
+    else:
+        h.update(repr(obj).encode())
+
+
+def figure_key(spec: FigureSpec) -> str:
+    """Hash a figure's data, style and draw function code.
+
+    The draw function is hashed by its source and the source of the
+    same-module functions it calls. Changes to code in other modules, such
+    as matplotlib itself beyond its version, are only picked up by bumping
+    ``PLOT_VERSION``.
+
+    Args:
+        spec: Figure specification
+
+    Returns:
+        Hex digest that changes with the data, the style or the drawing code
+    """
+    h = hashlib.sha256(f"{PLOT_VERSION}:{matplotlib.__version__}".encode())
+    _hash_update(h, spec.draw)
+    _hash_update(h, spec.data)
+    _hash_update(h, spec.style or {})
+    return h.hexdigest()
+
+
+@instrumented
+def render(spec: FigureSpec) -> Path:
+    """Render one figure to its path on a private Agg canvas.
+
+    Args:
+        spec: Figure specification
+
+    Returns:
+        Path of the written file
+    """
+    style = dict(spec.style or {})
+    figure_opts = {key: style.pop(key) for key in FIGURE_KEYS if key in style}
+    mpl_style = figure_opts.get("mpl_style")
+    context = matplotlib.style.context(mpl_style) if mpl_style else contextlib.nullcontext()
+    path = Path(spec.path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with context:
+        fig = Figure(figsize=figure_opts.get("figsize", (10, 6)))
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        spec.draw(ax, spec.data, style)
+        if "title" in figure_opts:
+            ax.set_title(figure_opts["title"])
+        if "xlabel" in figure_opts:
+            ax.set_xlabel(figure_opts["xlabel"])
+        if "ylabel" in figure_opts:
+            ax.set_ylabel(figure_opts["ylabel"])
+        if figure_opts.get("legend"):
+            ax.legend()
+        if figure_opts.get("grid"):
+            ax.grid(True)
+        if figure_opts.get("tight_layout", True):
+            fig.tight_layout()
+        fig.savefig(path, dpi=figure_opts.get("dpi", "figure"),
+                    bbox_inches=figure_opts.get("bbox_inches"))
+    return path
+
+
+def read_cache(cache_file: Union[str, Path] = DEFAULT_CACHE_FILE) -> Dict[str, str]:
+    """Read the path -> key manifest of the last render (empty if missing)."""
+    cache_file = Path(cache_file)
+    if not cache_file.exists():
+        return {}
+    with open(cache_file) as f:
+        return json.load(f)
+
+
+def _write_cache(keys: Dict[str, str], cache_file: Path) -> None:
+    """Atomically write the figure manifest."""
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cache_file.with_suffix(cache_file.suffix + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(keys, f, indent=2, sort_keys=True)
+    os.replace(tmp, cache_file)
+
+
+@instrumented
+def render_all(
+    specs: Iterable[FigureSpec],
+    workers: Optional[int] = None,
+    cache_file: Union[str, Path] = DEFAULT_CACHE_FILE,
+    force: bool = False,
+) -> List[Path]:
+    """Render the figures whose inputs changed since the last run.
+
+    Args:
+        specs: Figure specifications
+        workers: Worker processes (default: CPU count); 1 renders in-process
+        cache_file: JSON manifest of the keys of the last render
+        force: Render every figure regardless of the manifest
+
+    Returns:
+        Paths of the figures that were rendered
+    """
+    cache_file = Path(cache_file)
+    keys = read_cache(cache_file)
+    stale = []
+    n_specs = 0
+    for spec in specs:
+        n_specs += 1
+        key = figure_key(spec)
+        path = str(spec.path)
+        if force or keys.get(path) != key or not Path(path).exists():
+            stale.append((spec, key))
+
+    workers = workers or os.cpu_count() or 1
+    logger.info("Rendering %d of %d figures (%d unchanged)", len(stale), n_specs,
+                n_specs - len(stale))
+    if workers > 1 and len(stale) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(stale))) as pool:
+            paths = list(pool.map(render, [spec for spec, _ in stale]))
+    else:
+        paths = [render(spec) for spec, _ in stale]
+
+    if stale:
+        keys.update({str(spec.path): key for spec, key in stale})
+        _write_cache(keys, cache_file)
+    return paths
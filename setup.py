@@ -1,15 +1,35 @@
-from setuptools import setup, find_packages
+from setuptools import setup, find_namespace_packages
 
 setup(
     name="stablecoin_reserve_shock",
     version="0.1.0",
-    packages=find_packages(),
+    # scripts/ has no __init__.py, so its packages are namespace packages
+    packages=find_namespace_packages(include=["scripts", "scripts.*"]),
     install_requires=[
         "pandas",
+        "numpy",
         "requests",
         "python-dotenv",
         "httpx",
         "tenacity",
+        "pyarrow",
+        "ijson",
     ],
+    extras_require={
+        "analysis": [
+            "matplotlib",
+            "seaborn",
+            "scipy",
+            "statsmodels",
+        ],
+        "polars": ["polars>=1.21.0"],
+        "dashboard": ["dash>=2.9.0"],
+        "attestations": ["pdfplumber>=0.10.0"],
+    },
+    entry_points={
+        "console_scripts": [
+            "reserve-shock=scripts.cli:main",
+        ],
+    },
     python_requires=">=3.8",
-) 
\ No newline at end of file
+)
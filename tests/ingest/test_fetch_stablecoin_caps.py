@@ -1,95 +1,83 @@
 """Unit tests for fetch_stablecoin_caps.py."""
 
-import json
-from pathlib import Path
-from unittest.mock import AsyncMock, patch
-
 import httpx
 import pandas as pd
 import pytest
 from scripts.ingest.fetch_stablecoin_caps import (
+    DEFILLAMA_API_URL,
     fetch_stablecoin_data,
     process_stablecoin_data,
 )
+from tenacity import wait_none
+
+DAY = 86400
+T0 = 1704067200  # 2024-01-01
 
-# Sample API response for testing
+# Aggregate /stablecoincharts/all entries, deliberately out of order
 SAMPLE_RESPONSE = [
     {
-        "symbol": "USDC",
-        "name": "USD Coin",
-        "chains": [
-            {
-                "chain": "Ethereum",
-                "circulating": {"peggedUSD": 1000000000},
-            },
-            {
-                "chain": "Solana",
-                "circulating": {"peggedUSD": 500000000},
-            },
-        ],
-    },
-    {
-        "symbol": "USDT",
-        "name": "Tether",
-        "chains": [
-            {
-                "chain": "Ethereum",
-                "circulating": {"peggedUSD": 2000000000},
-            },
-        ],
-    },
+        "date": str(T0 + i * DAY),
+        "totalCirculating": {"peggedUSD": supply, "peggedEUR": 1.0},
+        "totalCirculatingUSD": {"peggedUSD": supply * 1.001, "peggedEUR": 1.1},
+    }
+    for i, supply in [(2, 300.0), (0, 100.0), (1, 200.0), (3, 400.0)]
 ]
 
 
+@pytest.fixture(autouse=True)
+def no_retry_wait(monkeypatch):
+    """Retry immediately instead of backing off for seconds."""
+    monkeypatch.setattr(fetch_stablecoin_data.retry, "wait", wait_none())
+
+
+def make_client(handler):
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
 @pytest.mark.asyncio
 async def test_fetch_stablecoin_data():
-    """Test fetching stablecoin data from API."""
-    mock_client = AsyncMock()
-    mock_response = AsyncMock()
-    mock_response.json.return_value = SAMPLE_RESPONSE
-    mock_client.get.return_value = mock_response
+    """The aggregate chart is fetched with a single GET."""
+    requests = []
 
-    result = await fetch_stablecoin_data(mock_client)
-    assert result == SAMPLE_RESPONSE
-    mock_client.get.assert_called_once()
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json=SAMPLE_RESPONSE)
 
-
-def test_process_stablecoin_data():
-    """Test processing raw stablecoin data into DataFrame."""
-    df = process_stablecoin_data(SAMPLE_RESPONSE)
-    
-    assert isinstance(df, pd.DataFrame)
-    assert len(df) == 3  # 2 chains for USDC + 1 for USDT
-    assert list(df.columns) == [
-        "symbol",
-        "name",
-        "chain",
-        "circulating_supply",
-        "timestamp",
-    ]
-    assert df["symbol"].nunique() == 2
-    assert df["chain"].nunique() == 2
+    async with make_client(handler) as client:
+        result = await fetch_stablecoin_data(client)
+    assert result == SAMPLE_RESPONSE
+    assert [str(r.url) for r in requests] == [DEFILLAMA_API_URL]
 
 
 @pytest.mark.asyncio
 async def test_fetch_stablecoin_data_error():
-    """Test error handling in fetch_stablecoin_data."""
-    mock_client = AsyncMock()
-    mock_client.get.side_effect = httpx.HTTPError("API Error")
+    """HTTP errors are retried and re-raised once the attempts run out."""
+    calls = []
 
-    with pytest.raises(httpx.HTTPError):
-        await fetch_stablecoin_data(mock_client)
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(503)
 
+    async with make_client(handler) as client:
+        with pytest.raises(httpx.HTTPStatusError):
+            await fetch_stablecoin_data(client)
+    assert len(calls) == 3
 
-@pytest.mark.asyncio
-async def test_fetch_stablecoin_data_with_token():
-    """Test fetching data for specific token."""
-    mock_client = AsyncMock()
-    mock_response = AsyncMock()
-    mock_response.json.return_value = [SAMPLE_RESPONSE[0]]  # Just USDC
-    mock_client.get.return_value = mock_response
-
-    result = await fetch_stablecoin_data(mock_client, token="USDC")
-    assert len(result) == 1
-    assert result[0]["symbol"] == "USDC"
-    mock_client.get.assert_called_once() 
\ No newline at end of file
+
+def test_process_stablecoin_data():
+    """Entries become one sorted row per date with the peggedUSD totals."""
+    df = process_stablecoin_data(SAMPLE_RESPONSE)
+
+    assert list(df.columns) == ["timestamp", "circulating_supply", "circulating_supply_usd"]
+    assert df["timestamp"].is_monotonic_increasing
+    assert df["timestamp"].iloc[0] == pd.Timestamp("2024-01-01")
+    assert df["circulating_supply"].tolist() == [100.0, 200.0, 300.0, 400.0]
+    assert df["circulating_supply_usd"].tolist() == pytest.approx([100.1, 200.2, 300.3, 400.4])
+
+
+def test_process_stablecoin_data_filters_dates():
+    """Start and end dates are inclusive; missing totals default to zero."""
+    raw = SAMPLE_RESPONSE + [{"date": str(T0 + 4 * DAY), "totalCirculating": {}}]
+    df = process_stablecoin_data(raw, start_date="2024-01-02", end_date="2024-01-05")
+    assert df["circulating_supply"].tolist() == [200.0, 300.0, 400.0, 0.0]
+    assert process_stablecoin_data([], "2024-01-01").empty
@@ -0,0 +1,138 @@
+"""Unit tests for fetch_stablecoin_panel.py."""
+
+import json
+
+import httpx
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+import scripts.ingest.fetch_stablecoin_panel as panel_module
+from scripts.ingest.fetch_stablecoin_panel import (
+    fetch_token_history,
+    parse_token_history,
+    select_assets,
+    write_panel,
+)
+
+DAY = 86400
+T0 = 1704067200  # 2024-01-01
+
+
+def token_payload(symbol, chains):
+    """Build a /stablecoin/{id} payload with per-chain daily balances."""
+    return {
+        "id": "1",
+        "symbol": symbol,
+        "tokens": [{"date": T0, "circulating": {"peggedUSD": 999.0}}],
+        "chainBalances": {
+            chain: {
+                "tokens": [
+                    {
+                        "date": T0 + i * DAY,
+                        "circulating": {"peggedUSD": value},
+                        "bridgedTo": {"peggedUSD": 1.0},
+                    }
+                    for i, value in enumerate(values)
+                ]
+            }
+            for chain, values in chains.items()
+        },
+    }
+
+
+USDT = token_payload("USDT", {"Ethereum": [10.0, 11.0, 12.0], "Tron": [20.0, 21.0, 22.0]})
+USDC = token_payload("USDC", {"Ethereum": [5.0, 6.0], "zkSync Era": [1.5, 2.5]})
+ASSETS = [
+    {"id": "1", "symbol": "USDT", "pegType": "peggedUSD"},
+    {"id": "2", "symbol": "USDC", "pegType": "peggedUSD"},
+    {"id": "3", "symbol": "EURT", "pegType": "peggedEUR"},
+]
+
+
+def test_parse_token_history_keeps_only_chain_balances():
+    """Per-chain rows are parsed; the aggregate tokens array is skipped."""
+    buffer = parse_token_history(json.dumps(USDT).encode())
+    assert len(buffer) == 6
+    df = buffer.to_frame("1", "USDT")
+    assert list(df.columns) == ["date", "token_id", "symbol", "chain", "circulating"]
+    assert sorted(df["chain"].unique()) == ["Ethereum", "Tron"]
+    assert df["circulating"].sum() == pytest.approx(96.0)
+    assert df["date"].min() == pd.Timestamp("2024-01-01")
+
+
+def test_to_frame_filters_dates():
+    """Start and end dates are applied on the timestamp buffer."""
+    df = parse_token_history(json.dumps(USDT).encode()).to_frame(
+        "1", "USDT", start_date="2024-01-02", end_date="2024-01-02"
+    )
+    assert df["date"].unique().tolist() == [pd.Timestamp("2024-01-02")]
+    assert df["circulating"].tolist() == [11.0, 21.0]
+
+
+def test_select_assets():
+    """Assets are filtered by symbol and peg type."""
+    assert [a["symbol"] for a in select_assets(ASSETS, ["usdt", "FDUSD"])] == ["USDT"]
+    assert [a["symbol"] for a in select_assets(ASSETS)] == ["USDT", "USDC"]
+
+
+def make_client():
+    payloads = {"/stablecoin/1": USDT, "/stablecoin/2": USDC}
+
+    def handler(request):
+        body = json.dumps(payloads[request.url.path]).encode()
+
+        async def chunks():
+            # Serve the body in small chunks so parsing spans many reads
+            for i in range(0, len(body), 16):
+                yield body[i : i + 16]
+
+        return httpx.Response(200, content=chunks())
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.mark.asyncio
+async def test_fetch_token_history_streams_response():
+    """A streamed response yields the same rows as an in-memory parse."""
+    async with make_client() as client:
+        buffer = await fetch_token_history(client, "2")
+    expected = parse_token_history(json.dumps(USDC).encode())
+    pd.testing.assert_frame_equal(buffer.to_frame("2", "USDC"), expected.to_frame("2", "USDC"))
+
+
+@pytest.mark.asyncio
+async def test_write_panel_one_row_group_per_token(tmp_path):
+    """Each token is written as its own row group of a long-format panel."""
+    output = tmp_path / "panel.parq"
+    async with make_client() as client:
+        rows = await write_panel(client, ASSETS[:2], output)
+
+    assert rows == 10
+    assert pq.ParquetFile(output).num_row_groups == 2
+    df = pd.read_parquet(output)
+    wide = df.pivot_table(index="date", columns=["symbol", "chain"], values="circulating")
+    assert wide.loc["2024-01-03", ("USDT", "Tron")] == 22.0
+    assert wide.loc["2024-01-02", ("USDC", "zkSync Era")] == 2.5
+
+
+@pytest.mark.asyncio
+async def test_write_panel_failure_keeps_previous_file(tmp_path, monkeypatch):
+    """A run that fails part-way leaves the previous panel untouched."""
+    output = tmp_path / "panel.parq"
+    async with make_client() as client:
+        await write_panel(client, ASSETS[:1], output)
+    before = output.read_bytes()
+
+    fetch = panel_module.fetch_token_history
+
+    async def flaky(client, asset_id, peg_type="peggedUSD"):
+        if asset_id == "2":
+            raise httpx.ConnectError("network down")
+        return await fetch(client, asset_id, peg_type)
+
+    monkeypatch.setattr(panel_module, "fetch_token_history", flaky)
+    async with make_client() as client:
+        with pytest.raises(httpx.ConnectError):
+            await write_panel(client, ASSETS[:2], output)
+    assert output.read_bytes() == before
+    assert list(tmp_path.iterdir()) == [output]
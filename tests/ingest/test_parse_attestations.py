@@ -0,0 +1,125 @@
+"""Unit tests for parse_attestations.py."""
+
+import json
+
+import pandas as pd
+import pytest
+from scripts.ingest.parse_attestations import (
+    AttestationError,
+    file_key,
+    parse_amount,
+    parse_directory,
+    parse_text,
+)
+
+CIRCLE = """
+USDC Reserve Report
+Circle Internet Financial, LLC
+Reserve composition as of March 31, 2024
+(in millions)
+Circle Reserve Fund (USDXX)                          $ 28,011.2     87.1%
+Cash held at regulated financial institutions          4,152.0     12.9%
+Total reserves                                        32,163.2    100.0%
+Page 2 of 4
+"""
+
+TETHER = """
+Tether Holdings Limited - Consolidated Reserves Report
+As of 31 December 2023 (reported figures in USD)
+Report date: December 31, 2023
+U.S. Treasury Bills                                  72,723,215,829
+Overnight Reverse Repurchase Agreements              11,218,941,590
+Term Reverse Repurchase Agreements                    1,000,000,000
+Non-U.S. Treasury Bills                                  63,040,436
+Money Market Funds                                    6,489,470,353
+Cash & Bank Deposits                                     14,538,014
+Secured Loans                                         4,817,016,803
+Negative adjustment                                      (1,000,000)
+Total Assets                                         96,325,222,025
+"""
+
+
+def test_parse_amount():
+    assert parse_amount("$ 1,234.5") == 1234.5
+    assert parse_amount("(2,000)") == -2000.0
+    assert parse_amount("12.9 4.0%") == 12.9
+    assert parse_amount("$12") == 12.0
+    for token in ("n/a", "(1)", "2025", "$2024", "17"):
+        with pytest.raises(ValueError):
+            parse_amount(token)
+
+
+def test_parse_text_footnotes_years_and_continuations():
+    """Footnotes and years are not amounts; a class label carries to the next line."""
+    text = """Circle reserves as of March 31, 2024 (in millions)
+U.S. Treasury Bills (1)
+U.S. Treasury bills with maturities before 2025
+maturing through June 2024              $ 10,000.0
+Cash held at banks                         1,500.5
+Money market funds (2)
+Total reserves                            11,500.5
+"""
+    records = {r["asset_class"]: r["amount_usd"] for r in parse_text(text)}
+    assert records == {"tbills": pytest.approx(10_000e6), "cash": pytest.approx(1_500.5e6)}
+
+
+def test_parse_text_circle():
+    """Units scale amounts, totals and page numbers are skipped."""
+    records = {r["asset_class"]: r for r in parse_text(CIRCLE, "report.pdf")}
+    assert set(records) == {"mmf", "cash"}
+    assert records["mmf"]["amount_usd"] == pytest.approx(28_011.2e6)
+    assert records["cash"]["issuer"] == "Circle"
+    assert records["cash"]["report_date"] == "2024-03-31"
+
+
+def test_parse_text_tether():
+    """Rows of a class are summed; non-U.S. bills are not T-bills."""
+    parsed = parse_text(TETHER)
+    assert parsed[0]["report_date"] == "2023-12-31"
+    records = {r["asset_class"]: r["amount_usd"] for r in parsed}
+    assert records == {
+        "tbills": 72_723_215_829,
+        "repo": 12_218_941_590,
+        "cash": 14_538_014,
+        "mmf": 6_489_470_353,
+        "other": 63_040_436 + 4_817_016_803,
+    }
+    with pytest.raises(AttestationError):
+        parse_text("Tether Holdings\nAs of March 31, 2024\nNothing to see here\n")
+
+
+def test_parse_directory_caches_by_content(tmp_path):
+    """Unchanged files come from the cache; changed and new files are parsed."""
+    reports, cache = tmp_path / "reports", tmp_path / "cache"
+    reports.mkdir()
+    (reports / "circle_2024-03.txt").write_text(CIRCLE)
+    (reports / "tether_2023-12.txt").write_text(TETHER)
+    (reports / "broken.txt").write_text("no issuer here")
+
+    df = parse_directory(reports, cache, workers=2)
+    assert set(df["issuer"]) == {"Circle", "Tether"}
+    assert list(df.columns) == ["issuer", "month", "report_date", "asset_class", "amount_usd",
+                                "share", "file"]
+    assert df.groupby(["issuer", "month"])["share"].sum().tolist() == pytest.approx([1.0, 1.0])
+    assert df.loc[df["issuer"] == "Circle", "month"].iloc[0] == pd.Timestamp("2024-03-01")
+    # One entry per parsed file; the broken file is retried next time
+    assert len(list(cache.glob("*.json"))) == 2
+
+    # Mark the Circle entry, so a cache hit is visible in the output
+    entry = cache / f"{file_key(reports / 'circle_2024-03.txt')}.json"
+    cached = json.loads(entry.read_text())
+    for record in cached["records"]:
+        record["amount_usd"] = 1.0
+    entry.write_text(json.dumps(cached))
+    (reports / "tether_2023-12.txt").write_text(TETHER.replace("14,538,014", "24,538,014"))
+    (reports / "tether_2024-03.txt").write_text(TETHER.replace("31 December 2023",
+                                                               "31 March 2024"))
+
+    df = parse_directory(reports, cache, workers=2).set_index(["issuer", "month", "asset_class"])
+    assert df.loc[("Circle", "2024-03-01", "mmf"), "amount_usd"] == 1.0
+    assert df.loc[("Tether", "2023-12-01", "cash"), "amount_usd"] == 24_538_014
+    assert df.loc[("Tether", "2024-03-01", "cash"), "file"] == "tether_2024-03.txt"
+    assert len(list(cache.glob("*.json"))) == 4
+
+    df = parse_directory(reports, cache, workers=1, force=True)
+    assert df.loc[df["asset_class"] == "mmf", "amount_usd"].iloc[0] == pytest.approx(28_011.2e6)
@@ -0,0 +1,97 @@
+"""Unit tests for the event-study engine in event_study.py."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from scripts.stats.event_study import (
+    align_events,
+    ar1_coefficients,
+    ar1_prefix_sums,
+    event_study,
+    newey_west_tstat,
+    shock_events,
+)
+
+
+@pytest.fixture
+def calendar():
+    return pd.bdate_range("2024-01-01", periods=400)
+
+
+@pytest.fixture
+def data(calendar):
+    rng = np.random.default_rng(0)
+    values = np.zeros((len(calendar), 2))
+    for t in range(1, len(calendar)):
+        values[t] = 0.01 + 0.4 * values[t - 1] + rng.normal(scale=0.05, size=2)
+    return pd.DataFrame(values, index=calendar, columns=["d_10Y-2Y", "d_2Y-3M"])
+
+
+def test_daily_and_intraday_alignment(calendar):
+    """Intraday alignment moves events after the New York close to the next day."""
+    # Tuesday 2024-01-02 at 20:30 UTC is 15:30 in New York; 21:30 UTC is after the close
+    timestamps = pd.Series(pd.to_datetime(["2024-01-02 20:30", "2024-01-02 21:30",
+                                           "2024-01-06 12:00", "2030-01-01 00:00"]))
+    daily = align_events(timestamps, calendar, "daily")
+    intraday = align_events(timestamps, calendar, "intraday")
+
+    assert daily.tolist() == [1, 1, 5, len(calendar)]
+    assert intraday.tolist() == [1, 2, 5, len(calendar)]
+
+
+def test_ar1_coefficients_match_least_squares(data):
+    """Prefix-sum AR(1) fits equal a direct regression over the same rows."""
+    values = data.to_numpy()
+    prefix = ar1_prefix_sums(values)
+    intercept, slope = ar1_coefficients(prefix, np.array([50]), np.array([170]))
+
+    x, y = values[49:169, 0], values[50:170, 0]
+    expected_slope, expected_intercept = np.polyfit(x, y, 1)
+    assert slope[0, 0] == pytest.approx(expected_slope)
+    assert intercept[0, 0] == pytest.approx(expected_intercept)
+    short = ar1_coefficients(prefix, np.array([50]), np.array([60]), min_obs=30)
+    assert np.isnan(short).all()
+
+
+def test_newey_west_tstat_without_lags_is_classical():
+    """With zero lags the statistic is mean / (std / sqrt(n)) using the MLE variance."""
+    x = np.random.default_rng(1).normal(0.3, 1.0, size=(200, 1))
+    expected = x.mean() / (x.std() / np.sqrt(len(x)))
+    assert newey_west_tstat(x, 0)[0] == pytest.approx(expected)
+
+
+def test_event_windows_and_abnormal_changes(calendar, data):
+    """Injected jumps show up as abnormal changes on day 0 only."""
+    shocked = data.copy()
+    event_rows = np.arange(150, 390, 20)
+    shocked.iloc[event_rows, 0] += 1.0
+    events = pd.DataFrame(
+        {"timestamp": calendar[event_rows] + pd.Timedelta(hours=15),
+         "event": ["mint", "burn"] * (len(event_rows) // 2)}
+    )
+    result = event_study(shocked, events, pre=5, post=10, by="event")
+
+    assert result.abnormal.shape == (len(event_rows), 16, 2)
+    assert result.offsets[0] == -5
+    np.testing.assert_array_equal(result.events["event_row"], event_rows)
+    day0 = result.abnormal[:, 5, 0]
+    assert np.all(day0 > 0.8)
+    np.testing.assert_allclose(result.car[:, -1], np.nansum(result.abnormal, axis=1))
+    summary = result.summary.set_index(["group", "series", "rel_day"])
+    assert summary.loc[("all", "d_10Y-2Y", 0), "t_car"] > 5
+    assert summary.loc[("mint", "d_10Y-2Y", 0), "n"] == len(event_rows) // 2
+    assert abs(summary.loc[("all", "d_2Y-3M", 0), "mean_ar"]) < 0.1
+
+
+def test_shock_events_filters_large_transfers():
+    transfers = pd.DataFrame(
+        {
+            "token": ["USDT", "USDC", "USDT"],
+            "event": ["mint", "burn", "mint"],
+            "amount": [5e8, 1e6, 2e8],
+            "block_timestamp": pd.to_datetime(["2024-01-02", "2024-01-03", "2024-01-04"]),
+        }
+    )
+    events = shock_events(transfers, min_amount=1e8)
+    assert list(events.columns) == ["timestamp", "token", "event", "amount"]
+    assert events["amount"].tolist() == [5e8, 2e8]
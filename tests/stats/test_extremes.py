@@ -0,0 +1,70 @@
+"""Unit tests for the extreme-move response grid in extremes.py."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from scripts.stats.extremes import extreme_grid, extreme_responses, forward_changes
+
+
+@pytest.fixture
+def panel():
+    rng = np.random.default_rng(0)
+    n = 400
+    dates = pd.date_range("2023-01-02", periods=n, freq="B")
+    changes = pd.DataFrame(rng.standard_t(3, size=(n, 2)), index=dates, columns=["DGS10", "10Y-2Y"])
+    changes.iloc[0] = np.nan
+    changes.iloc[50, 1] = np.nan
+    # Market cap falls for three days after large rises in DGS10
+    shocks = rng.normal(0, 0.002, n)
+    z = changes["DGS10"] / changes["DGS10"].std()
+    for lag in range(3):
+        shocks -= 0.01 * (z.shift(lag) > 2).to_numpy()
+    cap = pd.Series(1e11 * np.exp(np.cumsum(shocks)), index=dates)
+    return changes, cap
+
+
+def test_forward_changes():
+    """Horizon 0 is pct_change; later horizons compound from the previous day."""
+    levels = np.array([100.0, 110.0, 99.0, 0.0, 120.0])
+    out = forward_changes(levels, [0, 2])
+    np.testing.assert_allclose(out[:, 0], pd.Series(levels).replace(0, np.nan).pct_change())
+    assert out[2, 1] == pytest.approx(120.0 / 110.0 - 1)
+    # No previous day, a zero level two days ahead, or past the end
+    assert np.isnan(out[[0, 1, 3, 4], 1]).all()
+
+
+def test_grid_matches_masks(panel):
+    """Every cell equals the boolean-mask computation it replaces."""
+    changes, cap = panel
+    tidy = extreme_responses(changes, cap, thresholds=[1.0, 2.0], horizons=[0, 3],
+                             permutations=0)
+
+    for (driver, side, threshold, horizon), row in tidy.set_index(
+            ["driver", "side", "threshold", "horizon"]).iterrows():
+        z = changes[driver] / changes[driver].std()
+        extreme = {"both": z.abs(), "up": z, "down": -z}[side] > threshold
+        response = cap.shift(-horizon) / cap.shift(1) - 1
+        observed = changes[driver].notna()
+        expected_extreme = response[extreme].mean()
+        assert row["n_extreme"] == response[extreme].count()
+        if row["n_extreme"] >= 5:
+            assert row["mean_extreme"] == pytest.approx(expected_extreme, rel=1e-9)
+        assert row["mean_normal"] == pytest.approx(response[observed & ~extreme].mean(), rel=1e-9)
+    assert tidy["p_value"].isna().all()
+
+
+def test_permutation_p_values(panel):
+    """The planted effect is significant, and p-values do not depend on workers."""
+    changes, cap = panel
+    grid = extreme_grid(changes.values, cap.values, permutations=300, chunk_size=64)
+    parallel = extreme_grid(changes.values, cap.values, permutations=300, chunk_size=64,
+                            workers=2)
+    np.testing.assert_array_equal(grid.p_value, parallel.p_value)
+
+    # side "up", threshold 2.0, DGS10, horizon 2
+    assert grid.diff[1, 2, 0, 2] < 0
+    assert grid.p_value[1, 2, 0, 2] < 0.01
+    valid = grid.p_value[np.isfinite(grid.p_value)]
+    assert ((valid > 0) & (valid <= 1)).all()
+    # Cells with too few events are not reported
+    assert np.isnan(grid.diff[grid.n_extreme < 5]).all()
@@ -0,0 +1,87 @@
+"""Unit tests for the batched regression engine in regression.py."""
+
+import numpy as np
+import pandas as pd
+import pytest
+import statsmodels.api as sm
+from scripts.stats.regression import design, nonlinear_fits, ols, threshold_scan
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    n = 250
+    x = rng.normal(size=n)
+    noise = np.cumsum(rng.normal(size=n)) * 0.1 + rng.normal(size=n) * (1 + np.abs(x))
+    y = 1 + 2 * x + 0.5 * x**2 + 3 * (x > 0.4) + noise
+    return x, y
+
+
+@pytest.mark.parametrize("cov_type", ["nonrobust", "HC0", "HC1", "HC3", "HAC"])
+def test_matches_statsmodels(data, cov_type):
+    """Estimates and standard errors match statsmodels for every cov_type."""
+    x, y = data
+    X = design(x, "quadratic")
+    fit = ols(X, y, cov_type, maxlags=4)
+    kwargs = {"cov_kwds": {"maxlags": 4}} if cov_type == "HAC" else {}
+    expected = sm.OLS(y, X).fit(cov_type=cov_type, **kwargs)
+
+    np.testing.assert_allclose(fit.params[0], expected.params, rtol=1e-10)
+    np.testing.assert_allclose(fit.bse[0], expected.bse, rtol=1e-10)
+    assert fit.rsquared[0] == pytest.approx(expected.rsquared)
+
+
+def test_hac_skips_missing_rows(data):
+    """HAC errors with gaps match statsmodels on the rows that remain."""
+    x, y = data
+    gappy = x.copy()
+    gappy[[3, 50, 51, 52, 120, 200]] = np.nan
+    fit = ols(np.stack([design(x, "linear"), design(gappy, "linear")]), y, "HAC")
+
+    keep = np.isfinite(gappy)
+    for b, rows in enumerate([slice(None), keep]):
+        nobs = len(y[rows])
+        lags = int(np.floor(4 * (nobs / 100) ** (2 / 9)))
+        expected = sm.OLS(y[rows], design(x[rows], "linear")).fit(
+            cov_type="HAC", cov_kwds={"maxlags": lags})
+        np.testing.assert_allclose(fit.bse[b], expected.bse, rtol=1e-10)
+
+
+def test_batch_with_missing_rows_and_singular_design(data):
+    """Each batch item drops its own missing rows; singular designs are NaN."""
+    x, y = data
+    x_missing = x.copy()
+    x_missing[:10] = np.nan
+    singular = np.column_stack([np.ones_like(x), x, 2 * x])
+    fit = ols(np.stack([design(x, "quadratic"), design(x_missing, "quadratic"), singular]), y)
+
+    expected = sm.OLS(y[10:], design(x[10:], "quadratic")).fit()
+    np.testing.assert_allclose(fit.params[1], expected.params, rtol=1e-10)
+    assert fit.nobs.tolist() == [250, 240, 250]
+    assert np.isnan(fit.params[2]).all()
+
+
+def test_nonlinear_fits_one_row_per_spec(data):
+    """Every regressor and specification is reported in input order."""
+    x, y = data
+    df = pd.DataFrame({"y": y, "a": x, "b": np.sin(x)})
+    fits = nonlinear_fits(df, "y", ["a", "b"], cov_type="HC1")
+
+    assert list(zip(fits["regressor"], fits["spec"])) == [
+        (col, spec) for col in ("a", "b") for spec in ("linear", "quadratic", "piecewise")
+    ]
+    linear = sm.OLS(y, design(x, "linear")).fit()
+    assert fits.loc[0, "rsquared"] == pytest.approx(linear.rsquared)
+    assert fits.loc[2, "threshold"] == pytest.approx(np.median(x))
+    assert np.isnan(fits.loc[0, "coef_2"])
+
+
+def test_threshold_scan_finds_breakpoint(data):
+    """The grid search recovers the true breakpoint and matches single fits."""
+    x, y = data
+    scan = threshold_scan(x, y, n_grid=300)
+
+    assert scan.best_threshold == pytest.approx(0.4, abs=0.1)
+    single = sm.OLS(y, design(x, "piecewise", scan.thresholds[7])).fit()
+    assert scan.ssr[7] == pytest.approx(single.ssr)
+    assert scan.rsquared[scan.best] == np.nanmax(scan.rsquared)
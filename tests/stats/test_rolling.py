@@ -0,0 +1,67 @@
+"""Unit tests for the multi-window rolling correlation kernel in rolling.py."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from scripts.stats.rolling import RollingCorrelation, rolling_corr
+
+WINDOWS = (7, 30, 90)
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(1)
+    n = 400
+    x = pd.Series(np.linspace(1e11, 1.5e11, n) + np.cumsum(rng.normal(size=n)) * 1e8)
+    y = pd.DataFrame(rng.normal(size=(n, 3)).cumsum(axis=0), columns=["a", "b", "c"])
+    return x, y
+
+
+def test_matches_pandas(data):
+    """Every window and series matches pandas' rolling correlation."""
+    x, y = data
+    cube = rolling_corr(x, y, WINDOWS)
+
+    assert cube.shape == (len(WINDOWS), 3, len(x))
+    for w, window in enumerate(WINDOWS):
+        for j, col in enumerate(y.columns):
+            expected = x.rolling(window).corr(y[col]).to_numpy()
+            np.testing.assert_allclose(cube[w, j], expected, atol=1e-7)
+
+
+def test_min_periods_with_missing_values(data):
+    """Missing rows are skipped pairwise and min_periods is honoured."""
+    x, y = data
+    x = x.copy()
+    x.iloc[100:104] = np.nan
+    cube = rolling_corr(x, y, (7,), min_periods=5)
+
+    # Window ending at row 105 holds rows 99..105, of which only 3 are paired
+    assert np.isnan(cube[0, 0, 105])
+    # Window ending at row 109 holds rows 103..109, of which 6 are paired
+    expected = x.iloc[103:110].corr(y["a"].iloc[103:110])
+    assert cube[0, 0, 109] == pytest.approx(expected)
+
+
+def test_online_update_matches_batch(data):
+    """Replaying rows one at a time gives the batch result."""
+    x, y = data
+    cube = rolling_corr(x, y, WINDOWS)
+    rolling = RollingCorrelation(WINDOWS, 3)
+    online = np.stack([rolling.update(a, b) for a, b in zip(x, y.to_numpy())], axis=-1)
+
+    np.testing.assert_allclose(online, cube, atol=1e-7)
+
+
+def test_warm_start_save_and_load(tmp_path, data):
+    """A saved state picks up where it left off."""
+    x, y = data
+    cube = rolling_corr(x, y, WINDOWS)
+    rolling = RollingCorrelation.from_history(x[:300], y[:300], WINDOWS)
+    rolling.save(tmp_path / "state.npz", last_date=np.datetime64("2024-01-01"))
+
+    restored, extra = RollingCorrelation.load(tmp_path / "state.npz")
+    assert extra["last_date"] == np.datetime64("2024-01-01")
+    for t in range(300, 400):
+        latest = restored.update(x.iloc[t], y.iloc[t].to_numpy())
+        np.testing.assert_allclose(latest, cube[:, :, t], atol=1e-7)
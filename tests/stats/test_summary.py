@@ -0,0 +1,84 @@
+"""Unit tests for the out-of-core summary statistics in summary.py."""
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+import pytest
+from scripts.stats.summary import QuantileSketch, Summary, summarise, summarise_dataset
+from scripts.utils.io import write_dataset
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    n = 1000
+    x = rng.normal(size=n)
+    df = pd.DataFrame(
+        {
+            "date": pd.date_range("2021-01-01", periods=n),
+            # A large level, as market caps have, plus a correlated yield
+            "mcap": 1e11 + 1e9 * x,
+            "yield": 4.0 + 0.5 * x + rng.normal(size=n),
+            "spread": rng.standard_t(4, size=n),
+            "trading_day": np.arange(n) % 7 < 5,
+        }
+    )
+    df.loc[rng.random(n) < 0.1, "yield"] = np.nan
+    df.loc[rng.random(n) < 0.2, "spread"] = np.nan
+    return df
+
+
+def test_chunked_matches_pandas(frame):
+    """Merged partials of uneven chunks reproduce describe, cov and corr."""
+    columns = ["mcap", "yield", "spread"]
+    bounds = [0, 1, 17, 300, 301, 650, 1000]
+    chunks = (frame.iloc[a:b] for a, b in zip(bounds[:-1], bounds[1:]))
+    summary = summarise(chunks, columns)
+
+    pd.testing.assert_frame_equal(summary.describe(), frame[columns].describe(), rtol=1e-10)
+    pd.testing.assert_frame_equal(summary.cov(), frame[columns].cov(), rtol=1e-9)
+    pd.testing.assert_frame_equal(summary.corr(), frame[columns].corr(), rtol=1e-9)
+
+
+def test_merge_of_worker_partials(frame):
+    """Summaries built separately merge into the summary of all rows."""
+    left = summarise([frame.iloc[:400]])
+    right = summarise([frame.iloc[400:]])
+    assert left.columns == ["mcap", "yield", "spread"]
+    merged = left.merge(right)
+    pd.testing.assert_frame_equal(merged.corr(), frame[merged.columns].corr(), rtol=1e-9)
+    with pytest.raises(ValueError):
+        merged.merge(Summary(["mcap"]))
+
+
+def test_quantile_sketch():
+    """Exact below the sketch size; small rank error after compaction."""
+    rng = np.random.default_rng(1)
+    values = rng.lognormal(size=200_000)
+    q = [0.01, 0.25, 0.5, 0.75, 0.99]
+
+    small = QuantileSketch(size=256).update(values[:200])
+    np.testing.assert_allclose(small.quantile(q), np.quantile(values[:200], q))
+
+    sketch = QuantileSketch(size=512)
+    for chunk in np.array_split(values, 37):
+        sketch.merge(QuantileSketch(size=512).update(chunk))
+    assert sketch.count == len(values)
+    assert sum(map(len, sketch.levels)) < 512 * 12
+    ranks = np.searchsorted(np.sort(values), sketch.quantile(q)) / len(values)
+    np.testing.assert_allclose(ranks, q, atol=0.01)
+    assert np.isnan(QuantileSketch().quantile([0.5])).all()
+
+
+def test_summarise_dataset(tmp_path, frame):
+    """A stored dataset is streamed in small chunks, with filters pushed down."""
+    write_dataset(frame, tmp_path / "panel", "date")
+    frame.to_feather(tmp_path / "panel.feather")
+    columns = ["mcap", "yield", "spread"]
+    expected = frame[frame["trading_day"] & (frame["date"] >= "2022-01-01")][columns]
+
+    for path in (tmp_path / "panel", tmp_path / "panel.feather"):
+        summary = summarise_dataset(path, columns, start="2022-01-01",
+                                    filter=ds.field("trading_day"), batch_rows=64)
+        pd.testing.assert_frame_equal(summary.describe(), expected.describe(), rtol=1e-10)
+        pd.testing.assert_frame_equal(summary.corr(), expected.corr(), rtol=1e-9)
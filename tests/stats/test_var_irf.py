@@ -0,0 +1,119 @@
+"""Unit tests for the VAR impulse-response engine in var_irf.py."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from scripts.stats.var_irf import (
+    VarSpec,
+    bootstrap_irf,
+    companion,
+    fit_var,
+    lag_design,
+    ma_matrices,
+    orth_irf,
+    run_specifications,
+    select_order,
+    usable_rows,
+)
+from statsmodels.tsa.api import VAR
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    n, k = 300, 3
+    A = np.array([[0.5, 0.1, 0.0], [0.0, 0.4, 0.2], [0.1, 0.0, 0.3]])
+    Y = np.zeros((n, k))
+    for t in range(1, n):
+        Y[t] = A @ Y[t - 1] + rng.normal(size=k)
+    return Y
+
+
+def test_fit_and_irf_match_statsmodels(data):
+    """Coefficients, residual covariance and orthogonalised IRFs match statsmodels."""
+    expected = VAR(data).fit(2)
+    fit = fit_var(data, 2)
+
+    np.testing.assert_allclose(fit.coefs, expected.coefs, atol=1e-12)
+    np.testing.assert_allclose(fit.intercept, expected.intercept, atol=1e-12)
+    np.testing.assert_allclose(fit.sigma_u, expected.sigma_u, atol=1e-12)
+    irf = orth_irf(fit.coefs, fit.sigma_u, 10)
+    np.testing.assert_allclose(irf, expected.irf(10).orth_irfs, atol=1e-12)
+
+
+def test_select_order_matches_statsmodels(data):
+    """Information criteria on a common sample match statsmodels."""
+    expected = VAR(data).select_order(5)
+    criteria = select_order(data, 5)
+
+    np.testing.assert_allclose(criteria["aic"], expected.ics["aic"], atol=1e-10)
+    np.testing.assert_allclose(criteria["bic"], expected.ics["bic"], atol=1e-10)
+    assert criteria["aic"].idxmin() == expected.selected_orders["aic"]
+
+
+def test_interior_gap_is_not_spliced(data):
+    """No regression row straddles a block of missing rows."""
+    gappy = data.copy()
+    gappy[100:140] = np.nan
+    lags = 2
+    rows = usable_rows(gappy, lags)
+    targets = np.flatnonzero(rows) + lags
+    # Neither a target nor any of its lags falls in the gap
+    assert not ((targets[:, None] - np.arange(lags + 1) >= 100)
+                & (targets[:, None] - np.arange(lags + 1) < 140)).any()
+    assert rows.sum() == (100 - lags) + (len(data) - 140 - lags)
+
+    # The fit equals stacking the two segments' own regressions
+    fit = fit_var(gappy, lags)
+    Z = np.vstack([lag_design(data[:100], lags), lag_design(data[140:], lags)])
+    target = np.vstack([data[lags:100], data[140 + lags:]])
+    beta = np.linalg.lstsq(Z, target, rcond=None)[0]
+    np.testing.assert_allclose(fit.intercept, beta[0], atol=1e-12)
+    np.testing.assert_allclose(fit.coefs[0], beta[1:4].T, atol=1e-12)
+    before, after = VAR(data[:100]).fit(lags), VAR(data[140:]).fit(lags)
+    spliced = fit_var(gappy[~np.isnan(gappy).any(axis=1)], lags)
+    assert fit.nobs == before.nobs + after.nobs == spliced.nobs - lags
+    assert not np.allclose(fit.coefs, spliced.coefs)
+
+    result = bootstrap_irf(gappy, lags, horizon=4, replications=20)
+    assert np.isfinite(result.lower).all() and np.isfinite(result.upper).all()
+    assert np.isfinite(select_order(gappy, 4).to_numpy()).all()
+
+
+def test_batched_companion_powers():
+    """MA matrices of a batch equal those of each member."""
+    rng = np.random.default_rng(1)
+    coefs = rng.normal(scale=0.2, size=(4, 2, 3, 3))
+    batched = ma_matrices(coefs, 6)
+
+    assert companion(coefs).shape == (4, 6, 6)
+    np.testing.assert_allclose(batched[2], ma_matrices(coefs[2], 6))
+    np.testing.assert_allclose(batched[:, 1], coefs[:, 0])
+
+
+@pytest.mark.parametrize("method", ["residual", "wild"])
+def test_bootstrap_bands_are_deterministic(data, method):
+    """Bands bracket the estimate and do not depend on the worker count."""
+    serial = bootstrap_irf(data, 1, horizon=8, replications=120, method=method, seed=3,
+                           chunk_size=50)
+    pooled = bootstrap_irf(data, 1, horizon=8, replications=120, method=method, seed=3,
+                           chunk_size=50, workers=2)
+
+    np.testing.assert_array_equal(serial.lower, pooled.lower)
+    np.testing.assert_array_equal(serial.upper, pooled.upper)
+    assert (serial.lower[1:] <= serial.irf[1:] + 1e-12).mean() > 0.9
+    assert (serial.upper[1:] >= serial.irf[1:] - 1e-12).mean() > 0.9
+
+
+def test_run_specifications(data):
+    """Each specification reports responses to the named shock."""
+    panel = pd.DataFrame(data, columns=["log_mcap", "DGS3MO", "DGS10"])
+    specs = [
+        VarSpec("aic", ["log_mcap", "DGS3MO", "DGS10"], "aic"),
+        VarSpec("fixed", ["DGS10", "log_mcap"], 2, difference=True),
+    ]
+    tidy = run_specifications(panel, specs, horizon=5, replications=40)
+
+    assert set(tidy["shock"]) == {"log_mcap"}
+    assert len(tidy) == 6 * 3 + 6 * 2
+    assert tidy.loc[tidy["spec"] == "fixed", "lags"].eq(2).all()
@@ -0,0 +1,105 @@
+"""Unit tests for rolling and recursive VAR re-estimation in var_rolling.py."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from scripts.stats.var_irf import VarSpec, fit_var, orth_irf
+from scripts.stats.var_rolling import RecursiveVar, run_paths, var_path
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    n, k = 700, 3
+    A = np.array([[0.5, 0.1, 0.0], [0.0, 0.4, 0.2], [0.1, 0.0, 0.3]])
+    Y = np.zeros((n, k))
+    for t in range(1, n):
+        Y[t] = A @ Y[t - 1] + rng.normal(size=k)
+    # A large level, so the updates would lose precision without the shift
+    return Y + np.array([1e4, 5.0, -3.0])
+
+
+@pytest.mark.parametrize("window", [60, None])
+def test_path_matches_refits(data, window):
+    """Every window's estimates equal a fresh fit, past several resyncs."""
+    path = var_path(data, 2, window, min_nobs=60, step=7)
+
+    assert path.end[-1] == len(data) - 1
+    assert path.end[0] >= 61
+    for w, end in enumerate(path.end):
+        start = 0 if window is None else end + 1 - window - 2
+        fit = fit_var(data[start : end + 1], 2)
+        assert path.nobs[w] == fit.nobs
+        np.testing.assert_allclose(path.coefs[w], fit.coefs, atol=1e-8)
+        np.testing.assert_allclose(path.intercept[w], fit.intercept, rtol=1e-8, atol=1e-6)
+        np.testing.assert_allclose(path.sigma_u[w], fit.sigma_u, rtol=1e-8)
+
+
+def test_window_too_small():
+    """A window must leave residual degrees of freedom."""
+    with pytest.raises(ValueError):
+        RecursiveVar(3, 2, window=7)
+    var = RecursiveVar(2, 1, window=10)
+    with pytest.raises(ValueError):
+        var.estimate()
+
+
+def test_run_paths(data):
+    """Tidy coefficients and IRF summaries, identical in-process and in parallel."""
+    dates = pd.date_range("2022-01-03", periods=len(data), freq="B")
+    panel = pd.DataFrame(data, index=dates, columns=["log_mcap", "a", "b"])
+    specs = [VarSpec("levels", ["log_mcap", "a", "b"], 2),
+             VarSpec("differences", ["log_mcap", "a"], 1, difference=True)]
+
+    coefs, irfs = run_paths(panel, specs, window=100, step=50, horizon=10)
+    parallel = run_paths(panel, specs, window=100, step=50, horizon=10, workers=2)
+    pd.testing.assert_frame_equal(coefs, parallel[0])
+    pd.testing.assert_frame_equal(irfs, parallel[1])
+
+    last = coefs[(coefs["spec"] == "levels") & (coefs["date"] == dates[-1])]
+    fit = fit_var(data[-102:], 2)
+    row = last.set_index(["equation", "regressor"])["coef"]
+    assert row["a", "log_mcap.L2"] == pytest.approx(fit.coefs[1, 1, 0], abs=1e-8)
+    assert row["b", "const"] == pytest.approx(fit.intercept[2], abs=1e-6)
+
+    expected = orth_irf(fit.coefs, fit.sigma_u, 10)[..., 0]
+    last = irfs[(irfs["spec"] == "levels") & (irfs["date"] == dates[-1])]
+    np.testing.assert_allclose(last.pivot(index="horizon", columns="response", values="irf")
+                               [["log_mcap", "a", "b"]], expected[[0, 1, 5, 10]], atol=1e-8)
+    assert set(irfs["horizon"]) == {0, 1, 5, 10}
+    assert (irfs.loc[irfs["horizon"] == 0, "irf"]
+            == irfs.loc[irfs["horizon"] == 0, "cumulative"]).all()
+
+
+@pytest.mark.parametrize("window", [60, None])
+def test_gap_restarts_recursion(data, window):
+    """No window or lag spans an interior gap; the recursion restarts after it."""
+    gapped = data.copy()
+    gapped[300:340] = np.nan
+    path = var_path(gapped, 2, window, min_nobs=60, step=5)
+
+    np.testing.assert_array_equal(path.restarts, [340])
+    assert path.end[-1] == len(data) - 1
+    # Windows end at least lags + min_nobs - 1 rows after each run of complete rows starts
+    assert not ((path.end >= 300) & (path.end < 340 + 61)).any()
+    for w, end in enumerate(path.end):
+        run_start = 0 if end < 300 else 340
+        start = run_start if window is None else end + 1 - window - 2
+        assert start >= run_start
+        fit = fit_var(gapped[start : end + 1], 2)
+        assert path.nobs[w] == fit.nobs
+        np.testing.assert_allclose(path.coefs[w], fit.coefs, atol=1e-8)
+        np.testing.assert_allclose(path.intercept[w], fit.intercept, rtol=1e-8, atol=1e-6)
+
+
+def test_run_paths_logs_gap(data, caplog):
+    """Specifications report where a gap restarted the recursion."""
+    dates = pd.date_range("2022-01-03", periods=len(data), freq="B")
+    panel = pd.DataFrame(data, index=dates, columns=["log_mcap", "a", "b"])
+    panel.iloc[300:340, 0] = np.nan
+    spec = VarSpec("levels", ["log_mcap", "a", "b"], 2)
+
+    with caplog.at_level("WARNING", logger="scripts.stats.var_rolling"):
+        coefs, _ = run_paths(panel, [spec], window=100, step=50)
+    assert f"40 rows missing before {dates[340]:%Y-%m-%d}" in caplog.text
+    assert not coefs["date"].between(dates[300], dates[340 + 100]).any()
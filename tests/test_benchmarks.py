@@ -0,0 +1,95 @@
+"""Unit tests for the benchmark payloads and runner in benchmarks/."""
+
+import json
+
+import pytest
+from benchmarks.payloads import (
+    REAL_CHAINS,
+    REAL_DAYS,
+    REAL_FRED_SERIES,
+    REAL_TOKEN_DAYS,
+    defillama_aggregate,
+    defillama_token,
+    fred_observations,
+    panel_arrays,
+)
+from benchmarks.run import (
+    BASELINE_FILE,
+    Benchmark,
+    compare,
+    discover,
+    read_baseline,
+    time_benchmark,
+    write_baseline,
+)
+from scripts.ingest.fetch_stablecoin_caps import process_stablecoin_data
+from scripts.ingest.fetch_stablecoin_panel import parse_token_history
+from scripts.utils.fred_api import combine_series, observations_to_frame
+
+
+@pytest.mark.parametrize("scale", [1, 10])
+def test_payloads_match_the_parsers(scale):
+    """Each payload parses with the production code into ``scale`` x real size."""
+    caps = process_stablecoin_data(defillama_aggregate(scale))
+    assert len(caps) == REAL_DAYS * scale
+    assert caps["timestamp"].is_unique and caps["circulating_supply"].gt(0).all()
+
+    buffer = parse_token_history(defillama_token(scale))
+    assert len(buffer) == REAL_CHAINS * scale * REAL_TOKEN_DAYS
+
+    payloads = fred_observations(scale)
+    yields = combine_series([observations_to_frame(sid, data) for sid, data in payloads.items()])
+    assert len(payloads) == REAL_FRED_SERIES * scale
+    assert {"DGS10", "10Y-2Y"} <= set(yields.columns)
+    assert 0 < yields["DGS10"].isna().mean() < 0.1
+
+    assert len(panel_arrays(scale)) == REAL_DAYS * scale
+
+
+def test_payloads_are_deterministic():
+    assert defillama_token() == defillama_token()
+    assert json.dumps(defillama_aggregate()) == json.dumps(defillama_aggregate())
+
+
+def test_discover_covers_every_suite():
+    names = [bench.name for bench in discover()]
+    for suite in ("bench_ingest.ProcessStablecoinData", "bench_panel.BuildPanel",
+                  "bench_stats.GrangerTable", "bench_stats.BootstrapIRF",
+                  "bench_figures.RenderFigure"):
+        assert any(name.startswith(suite) for name in names)
+    assert set(read_baseline(BASELINE_FILE)["results"]) == set(names)
+    assert [b.name for b in discover("Rolling", scales=[10])] == [
+        "bench_stats.RollingCorr.time_rolling_corr(10)"
+    ]
+
+
+def test_time_benchmark_runs_setup_and_teardown():
+    calls = []
+
+    class Fake:
+        def setup(self, n):
+            calls.append("setup")
+
+        def teardown(self, n):
+            calls.append("teardown")
+
+        def time_sum(self, n):
+            sum(range(n))
+
+    assert time_benchmark(Benchmark("fake", Fake, "time_sum", 1000)) > 0
+    assert calls == ["setup", "teardown"]
+
+
+def test_compare_flags_regressions(tmp_path):
+    baseline = {"a": 1.0, "b": 1.0, "c": 1.0}
+    rows = compare({"a": 1.2, "b": 2.0, "c": 0.5, "d": 1.0}, baseline, tolerance=1.5)
+    assert [row.status for row in rows] == ["ok", "regressed", "improved", "new"]
+    assert rows[1].ratio == pytest.approx(2.0)
+
+    path = tmp_path / "baseline.json"
+    write_baseline({"a": 1.0, "b": 2.0}, path)
+    write_baseline({"b": 3.0}, path)
+    stored = read_baseline(path)
+    assert stored["results"] == {"a": 1.0, "b": 3.0}
+    assert stored["machine"]["cpu_count"]
+    assert read_baseline(tmp_path / "missing.json")["results"] == {}
@@ -0,0 +1,163 @@
+"""Unit tests for build_transactions_dataset.py against a fake JSON-RPC node."""
+
+import json
+import shutil
+
+import httpx
+import pandas as pd
+import pytest
+from scripts.build_transactions_dataset import (
+    TRANSFER_TOPIC,
+    ZERO_TOPIC,
+    LogScanner,
+    Token,
+    load_events,
+    plan_shards,
+)
+
+TOKENS = {
+    "AAA": Token("0x" + "a" * 40, 6),
+    "BBB": Token("0x" + "b" * 40, 18),
+}
+HOLDER = "0x" + "0" * 24 + "c" * 40
+
+
+def transfer_log(token, block, index, event, amount):
+    """Build a raw Transfer log for a mint or burn."""
+    topics = [TRANSFER_TOPIC, ZERO_TOPIC, HOLDER] if event == "mint" else [TRANSFER_TOPIC, HOLDER, ZERO_TOPIC]
+    return {
+        "address": TOKENS[token].address,
+        "topics": topics,
+        "data": hex(int(amount * 10 ** TOKENS[token].decimals)),
+        "blockNumber": hex(block),
+        "logIndex": hex(index),
+        "transactionHash": f"0x{block:064x}",
+    }
+
+
+class FakeNode:
+    """Minimal JSON-RPC stand-in that caps eth_getLogs result counts."""
+
+    def __init__(self, logs, max_results=3, fail_blocks=()):
+        self.logs = logs
+        self.max_results = max_results
+        self.fail_blocks = set(fail_blocks)
+        self.get_logs_calls = []
+
+    def matches(self, log, query):
+        block = int(log["blockNumber"], 16)
+        if log["address"] != query["address"]:
+            return False
+        if not int(query["fromBlock"], 16) <= block <= int(query["toBlock"], 16):
+            return False
+        return all(t is None or t == log["topics"][i] for i, t in enumerate(query["topics"]))
+
+    def handle(self, request):
+        body = json.loads(request.content)
+        method, params = body["method"], body["params"]
+        if method == "eth_blockNumber":
+            result = hex(1000)
+        elif method == "eth_getBlockByNumber":
+            result = {"timestamp": hex(1_700_000_000 + 12 * int(params[0], 16))}
+        elif method == "eth_getLogs":
+            query = params[0]
+            self.get_logs_calls.append((int(query["fromBlock"], 16), int(query["toBlock"], 16)))
+            if int(query["fromBlock"], 16) in self.fail_blocks:
+                return httpx.Response(200, json={"jsonrpc": "2.0", "id": 1, "error": {"code": -32000, "message": "boom"}})
+            result = [log for log in self.logs if self.matches(log, query)]
+            if len(result) > self.max_results:
+                error = {"code": -32005, "message": f"query returned more than {self.max_results} results"}
+                return httpx.Response(200, json={"jsonrpc": "2.0", "id": 1, "error": error})
+        return httpx.Response(200, json={"jsonrpc": "2.0", "id": 1, "result": result})
+
+
+LOGS = [transfer_log("AAA", block, 0, "mint", 600e6) for block in range(10, 20)] + [
+    transfer_log("AAA", 150, 1, "burn", 700e6),
+    transfer_log("AAA", 151, 0, "mint", 1e6),
+    transfer_log("BBB", 250, 0, "burn", 2e9),
+]
+
+
+def make_scanner(node, tmp_path, **kwargs):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(node.handle))
+    return LogScanner(client, "http://node", tmp_path, tokens=TOKENS, **kwargs)
+
+
+def test_plan_shards():
+    """Shards cover the range inclusively for every token."""
+    shards = plan_shards(["AAA", "BBB"], 0, 250, shard_size=100)
+    assert [(s.symbol, s.start, s.end) for s in shards[:2]] == [("AAA", 0, 99), ("BBB", 0, 99)]
+    assert shards[-1].end == 250
+    assert len(shards) == 6
+    assert not shards[-1].complete and shards[0].complete
+
+    # Boundaries sit on the grid, so extending the range keeps the keys
+    first = plan_shards(["AAA"], 30, 160, shard_size=100)
+    later = plan_shards(["AAA"], 30, 420, shard_size=100)
+    assert [(s.start, s.end) for s in first] == [(30, 99), (100, 160)]
+    assert [s.key for s in first] == [s.key for s in later[:2]]
+
+
+@pytest.mark.asyncio
+async def test_scan_splits_capped_shards_and_filters(tmp_path):
+    """Capped queries are split, and small transfers are dropped."""
+    node = FakeNode(LOGS, max_results=3)
+    scanner = make_scanner(node, tmp_path, concurrency=4, min_amount=500e6)
+    written = await scanner.run(plan_shards(list(TOKENS), 0, 299, shard_size=100))
+
+    events = load_events(tmp_path)
+    assert written == len(events) == 12
+    assert scanner.splits > 0
+    assert set(events["event"]) == {"mint", "burn"}
+    burn = events[events["block_number"] == 250].iloc[0]
+    assert burn["token"] == "BBB"
+    assert burn["amount"] == pytest.approx(2e9)
+    assert burn["counterparty"] == "0x" + "c" * 40
+    assert burn["block_timestamp"] == pd.to_datetime(1_700_000_000 + 12 * 250, unit="s")
+
+    large = load_events(tmp_path, min_amount=1.5e9)
+    assert 0 < len(large) < len(events)
+    pd.testing.assert_frame_equal(
+        large, events[events["amount"] >= 1.5e9].reset_index(drop=True)
+    )
+    assert load_events(tmp_path, min_amount=1e30).empty
+
+
+@pytest.mark.asyncio
+async def test_scan_resumes_from_checkpoint(tmp_path):
+    """An interrupted scan only re-requests shards that did not finish."""
+    shards = plan_shards(["AAA"], 0, 299, shard_size=100)
+    failing = FakeNode(LOGS, max_results=100, fail_blocks={200})
+    with pytest.raises(Exception, match="boom"):
+        await make_scanner(failing, tmp_path, concurrency=1, min_amount=0).run(shards)
+
+    node = FakeNode(LOGS, max_results=100)
+    await make_scanner(node, tmp_path, concurrency=1, min_amount=0).run(shards)
+
+    assert {start for start, _ in node.get_logs_calls} == {200}
+    assert len(load_events(tmp_path)) == 12
+
+
+@pytest.mark.asyncio
+async def test_rerun_after_head_advances_has_no_duplicates(tmp_path):
+    """The open shard at the head is rescanned in place, not duplicated."""
+    node = FakeNode(LOGS, max_results=100)
+    scanner = make_scanner(node, tmp_path, concurrency=2, min_amount=500e6)
+    await scanner.run(plan_shards(["AAA"], 0, 160, shard_size=100))
+    assert len(load_events(tmp_path)) == 11
+
+    node.get_logs_calls.clear()
+    scanner = make_scanner(node, tmp_path, concurrency=2, min_amount=500e6)
+    await scanner.run(plan_shards(["AAA"], 0, 299, shard_size=100))
+    assert {start for start, _ in node.get_logs_calls} == {100, 200}
+    assert len(list(tmp_path.glob("part-*.parq"))) == 3
+
+    events = load_events(tmp_path)
+    assert len(events) == 11
+    assert not events.duplicated(["tx_hash", "log_index"]).any()
+
+    # A stray overlapping part file, e.g. from an older shard plan, is deduped
+    part = next(tmp_path.glob("part-AAA-0000000000-*.parq"))
+    shutil.copy(part, tmp_path / "part-AAA-0000000000-0000000150.parq")
+    assert len(load_events(tmp_path)) == 11
+    assert len(load_events(tmp_path, min_amount=650e6)) == 1
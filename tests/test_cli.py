@@ -0,0 +1,69 @@
+"""Unit tests for the command-line entry point in cli.py."""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from scripts.cli import SCRIPTS, build_parser
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY = ("matplotlib", "scipy", "statsmodels", "seaborn")
+
+
+def run_python(code, cwd, check=True):
+    """Run code in a fresh interpreter with the repo importable."""
+    environ = {k: v for k, v in os.environ.items() if k != "FRED_API_KEY"}
+    environ["PYTHONPATH"] = str(ROOT)
+    return subprocess.run([sys.executable, "-c", code], cwd=cwd, env=environ,
+                          capture_output=True, text=True, check=check)
+
+
+def test_every_script_has_a_subcommand():
+    for module, _ in SCRIPTS.values():
+        assert ROOT.joinpath(*module.split(".")).with_suffix(".py").exists()
+    choices = build_parser()._subparsers._group_actions[0].choices
+    assert {"status", "show"} | set(SCRIPTS) == set(choices)
+
+
+def test_status_does_not_load_heavy_dependencies(tmp_path):
+    """status works without a panel or credentials and skips the scientific stack."""
+    result = run_python(
+        "import sys\n"
+        "from scripts.cli import main\n"
+        "main(['status'])\n"
+        f"print(sorted(m for m in {HEAVY!r} if m in sys.modules))\n",
+        cwd=tmp_path,
+    )
+    assert "Panel: not built" in result.stdout
+    assert "fetch_caps: stale" in result.stdout
+    assert result.stdout.strip().endswith("[]")
+
+
+def test_imports_have_no_side_effects(tmp_path):
+    """Library modules import without an API key and without doing any work."""
+    result = run_python(
+        "import scripts.utils.fred_api as fred\n"
+        "import scripts.analyze_stablecoin_treasury\n"
+        "try:\n"
+        "    fred.fred_api_key()\n"
+        "except ValueError as e:\n"
+        "    print(e)\n",
+        cwd=tmp_path,
+    )
+    assert "FRED_API_KEY environment variable not set" in result.stdout
+    assert not (tmp_path / "figures").exists()
+
+
+def test_wrapped_scripts_receive_their_arguments(tmp_path, capsys):
+    with pytest.raises(SystemExit):
+        build_parser().parse_args(["--help"])
+    assert "granger" in capsys.readouterr().out
+
+    cli = "import sys\nfrom scripts.cli import main\nsys.exit(main({}))\n"
+    result = run_python(cli.format(["panel", "--help"]), cwd=tmp_path)
+    assert "--force" in result.stdout
+    result = run_python(cli.format(["granger", "--no-such-flag"]), cwd=tmp_path, check=False)
+    assert result.returncode == 2
+    assert "unrecognized arguments: --no-such-flag" in result.stderr
@@ -0,0 +1,36 @@
+"""Unit tests for the dashboard callbacks in dashboard/app.py."""
+
+import numpy as np
+import pandas as pd
+from dashboard.app import MAX_POINTS, axis_range, figure, point_budget
+from scripts.tiles import TileStore, build_tiles
+
+
+def test_axis_range():
+    assert axis_range(None) == (None, None)
+    assert axis_range({"autosize": True}) == (None, None)
+    assert axis_range({"xaxis.autorange": True}) == (None, None)
+    assert axis_range({"xaxis.range[0]": "2021-03-04 17:22:01.5",
+                       "xaxis.range[1]": "2022-01-01"}) == ("2021-03-04", "2022-01-01")
+    assert axis_range({"xaxis.range": ["2020-01-01", "2020-02-01 06:00"]}) == (
+        "2020-01-01", "2020-02-01"
+    )
+    assert point_budget(None) < point_budget(10**6) == MAX_POINTS
+
+
+def test_figure():
+    index = pd.date_range("2018-01-01", periods=3000, freq="D")
+    daily = pd.DataFrame({"mcap": np.linspace(1e10, 2e11, 3000),
+                          "DGS10": np.linspace(2, 4, 3000)}, index=index)
+    store = TileStore(build_tiles(daily))
+
+    fig = figure(store, ["mcap", "DGS10"], max_points=800)
+    # Weekly buckets: a min/max band and a line per series, each within the budget
+    assert len(fig["data"]) == 6
+    assert all(len(trace["x"]) <= 800 for trace in fig["data"])
+    assert [trace["yaxis"] for trace in fig["data"]] == ["y2"] * 3 + ["y"] * 3
+    assert fig["layout"]["title"]["text"] == "Resolution: weekly"
+
+    fig = figure(store, ["DGS10"], "2020-01-01", "2020-06-30", max_points=800)
+    assert len(fig["data"]) == 1 and len(fig["data"][0]["x"]) == 182
+    assert fig["layout"]["xaxis"]["range"] == ["2020-01-01", "2020-06-30"]
@@ -0,0 +1,133 @@
+"""Unit tests for make_features.py: token features and the feature store."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from scripts.make_features import (
+    FEATURES,
+    Feature,
+    compute_features,
+    feature_columns,
+    load_features,
+    materialise_features,
+    read_store_manifest,
+    token_features,
+    write_features,
+)
+from scripts.panel import build_panel
+
+
+def make_token_panel(n_days=60, seed=0):
+    """Long panel of two tokens on uneven chains, shuffled, with gaps and zeros."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for symbol, chains in {"USDT": ["Ethereum", "Tron", "Solana"], "USDC": ["Ethereum"]}.items():
+        for i, chain in enumerate(chains):
+            dates = pd.date_range("2024-01-01", periods=n_days - 7 * i, freq="D").as_unit("s")
+            values = 1e9 * np.exp(np.cumsum(rng.normal(0, 0.02, len(dates))))
+            frames.append(pd.DataFrame({"date": dates, "token_id": symbol[-1], "symbol": symbol,
+                                        "chain": chain, "circulating": values}))
+    df = pd.concat(frames, ignore_index=True)
+    df.loc[[3, 40], "circulating"] = 0.0
+    df.loc[[10, 11, 70], "circulating"] = np.nan
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def make_panel(start="2024-01-01", periods=150, seed=0):
+    """Daily panel from random-walk caps and business-day yields."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=periods, freq="D")
+    supply = 1e11 * np.exp(np.cumsum(rng.normal(0, 0.01, periods)))
+    caps = pd.DataFrame({"timestamp": dates, "circulating_supply": supply,
+                         "circulating_supply_usd": supply})
+    days = pd.DatetimeIndex(pd.bdate_range(dates[0], dates[-1]), name="date")
+    yields = pd.DataFrame(
+        {col: level + np.cumsum(rng.normal(0, 0.02, len(days)))
+         for col, level in [("DGS3MO", 5.0), ("DGS1", 4.8), ("DGS2", 4.5),
+                            ("DGS5", 4.2), ("DGS10", 4.0), ("DGS30", 4.3)]},
+        index=days,
+    )
+    return build_panel(caps, yields)
+
+
+def test_backends_match():
+    pytest.importorskip("polars")
+    df = make_token_panel()
+    expected = token_features(df)
+    result = token_features(df, backend="polars")
+    pd.testing.assert_frame_equal(result, expected, check_exact=False, rtol=1e-10)
+    assert list(expected.columns) == list(df.columns) + feature_columns()
+
+
+def test_features():
+    df = token_features(make_token_panel(), windows=(3,))
+    tron = df[(df["symbol"] == "USDT") & (df["chain"] == "Tron")].reset_index(drop=True)
+    assert tron["date"].is_monotonic_increasing
+    assert np.isnan(tron.loc[0, "d_circulating"]) and np.isnan(tron.loc[0, "pct_change"])
+    assert tron.loc[5, "d_log_circulating"] == pytest.approx(
+        np.log(tron.loc[5, "circulating"] / tron.loc[4, "circulating"])
+    )
+    assert tron.loc[5, "d_log_circulating_mean_3"] == pytest.approx(
+        tron.loc[3:5, "d_log_circulating"].mean()
+    )
+    assert np.isnan(tron.loc[2, "d_log_circulating_mean_3"])
+    shares = df.groupby(["symbol", "date"])["chain_share"].sum()
+    assert shares.loc["USDC"].eq(1.0).all()
+    assert shares.loc["USDT"].dropna().round(12).eq(1.0).all()
+
+
+def test_write_features_streaming(tmp_path):
+    pytest.importorskip("polars")
+    path = tmp_path / "panel.parq"
+    make_token_panel(n_days=200).to_parquet(path, index=False)
+    expected = pd.read_parquet(write_features(path, tmp_path / "pandas.parquet"))
+    result = pd.read_parquet(write_features(path, tmp_path / "polars.parquet",
+                                            backend="polars", streaming=True))
+    pd.testing.assert_frame_equal(result.astype({"date": expected["date"].dtype}), expected,
+                                  check_exact=False, rtol=1e-10)
+
+
+def test_features_from_a_date_match_the_full_computation():
+    """Reading ``lookback`` rows before ``since`` reproduces the full tail."""
+    panel = make_panel()
+    full = compute_features(panel)
+    trading = panel[panel["trading_day"]]
+    assert full["mcap_vol_20"].dropna().equals(
+        trading["circulating_supply_usd"].pct_change().rolling(20).std().dropna()
+    )
+    assert full.loc[~full["trading_day"], "chg_DGS10"].isna().all()
+    assert full["log_mcap"].equals(panel["log_mcap"])
+
+    for since in ["2024-02-05", "2024-03-16", "2024-05-27"]:
+        tail = compute_features(panel, since=pd.Timestamp(since))
+        pd.testing.assert_frame_equal(tail, full.loc[since:])
+
+
+def test_materialise_recomputes_only_the_tail(tmp_path):
+    store = tmp_path / "features"
+    panel = make_panel()
+    assert materialise_features(panel.iloc[:120], store) == 120
+    assert read_store_manifest(store)["last_date"] == "2024-04-29T00:00:00"
+
+    # The 30 new days, plus the watermark and the week before it for revised rows
+    assert materialise_features(panel, store, overlap_days=7) == 38
+    names = [feature.name for feature in FEATURES]
+    stored = load_features(names, refresh=False, path=store)
+    expected = compute_features(panel)[names]
+    pd.testing.assert_frame_equal(stored, expected, check_freq=False,
+                                  check_index_type=False)
+    assert load_features(["chg_log_mcap"], trading_days_only=True, refresh=False,
+                         path=store).index.equals(panel.index[panel["trading_day"]])
+
+    # A changed definition rebuilds the whole store
+    changed = FEATURES[:-1] + [FEATURES[-1]._replace(window=10)]
+    assert materialise_features(panel, store, changed) == len(panel)
+    assert materialise_features(panel, store, changed, full=True) == len(panel)
+
+
+def test_feature_lookbacks():
+    assert Feature("x", "DGS10").lookback == 0
+    assert Feature("x", "DGS10", "diff").lookback == 1
+    assert Feature("x", "DGS10", "pct_change_std", 20).lookback == 20
+    with pytest.raises(KeyError):
+        load_features(["not_a_feature"], refresh=False)
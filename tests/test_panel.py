@@ -0,0 +1,147 @@
+"""Unit tests for the canonical daily panel in panel.py."""
+
+import numpy as np
+import pandas as pd
+import pytest
+import scripts.panel as panel_module
+from scripts.panel import build_panel, ensure_panel, load_panel, load_token_caps, read_manifest
+from scripts.utils.io import write_dataset
+
+
+def make_caps(start="2024-01-01", end="2024-01-31"):
+    dates = pd.date_range(start, end)
+    return pd.DataFrame(
+        {
+            "timestamp": dates,
+            "circulating_supply": np.arange(1, len(dates) + 1, dtype="int64"),
+            "circulating_supply_usd": np.arange(1, len(dates) + 1, dtype="int64") * 100,
+        }
+    )
+
+
+def make_yields(start="2024-01-02", end="2024-01-30"):
+    dates = pd.DatetimeIndex(pd.bdate_range(start, end), name="date")
+    n = len(dates)
+    return pd.DataFrame(
+        {
+            "DGS3MO": np.linspace(5.0, 4.5, n),
+            "DGS1": np.linspace(4.8, 4.4, n),
+            "DGS2": np.linspace(4.5, 4.2, n),
+            "DGS5": np.linspace(4.2, 4.0, n),
+            "DGS10": np.linspace(4.0, 3.9, n),
+            "DGS30": np.linspace(4.3, 4.1, n),
+        },
+        index=dates,
+    )
+
+
+@pytest.fixture
+def panel_dirs(tmp_path, monkeypatch):
+    """Point the panel at temporary input and output locations."""
+    inputs = {
+        "stablecoin_caps": tmp_path / "raw" / "stablecoin_caps",
+        "treasury_yields": tmp_path / "raw" / "treasury_yields",
+    }
+    processed = tmp_path / "processed"
+    monkeypatch.setattr(panel_module, "INPUTS", inputs)
+    monkeypatch.setattr(panel_module, "PROCESSED_DIR", processed)
+    monkeypatch.setattr(panel_module, "PANEL_FILE", processed / "panel.feather")
+    monkeypatch.setattr(panel_module, "MANIFEST_FILE", processed / "manifest.json")
+    write_dataset(make_caps(), inputs["stablecoin_caps"], "timestamp")
+    write_dataset(make_yields(), inputs["treasury_yields"], "date")
+    return inputs
+
+
+def test_build_panel_aligns_on_daily_calendar():
+    """The panel covers the overlap daily and forward-fills weekend yields."""
+    panel = build_panel(make_caps(), make_yields())
+
+    assert panel.index[0] == pd.Timestamp("2024-01-02")
+    assert panel.index[-1] == pd.Timestamp("2024-01-30")
+    assert len(panel) == 29
+    saturday = pd.Timestamp("2024-01-06")
+    assert not panel.loc[saturday, "trading_day"]
+    assert panel.loc[saturday, "DGS10"] == panel.loc[pd.Timestamp("2024-01-05"), "DGS10"]
+
+
+def test_build_panel_derives_spreads_and_differences():
+    """Spreads, log market cap and first differences are precomputed."""
+    panel = build_panel(make_caps(), make_yields())
+
+    np.testing.assert_allclose(panel["3M-1Y"], panel["DGS3MO"] - panel["DGS1"])
+    np.testing.assert_allclose(panel["30Y-10Y"], panel["DGS30"] - panel["DGS10"])
+    np.testing.assert_allclose(panel["log_mcap"], np.log(panel["circulating_supply_usd"]))
+    np.testing.assert_allclose(panel["d_DGS10"].iloc[1:], np.diff(panel["DGS10"]))
+    assert np.isnan(panel["d_log_mcap"].iloc[0])
+
+
+def test_ensure_panel_rebuilds_only_when_inputs_change(panel_dirs):
+    """An unchanged input hash reuses the panel; a new row triggers a rebuild."""
+    path = ensure_panel()
+    first = read_manifest()
+    mtime = path.stat().st_mtime_ns
+
+    ensure_panel()
+    assert path.stat().st_mtime_ns == mtime
+
+    write_dataset(make_caps("2024-01-01", "2024-02-15"), panel_dirs["stablecoin_caps"], "timestamp")
+    write_dataset(make_yields("2024-01-02", "2024-02-14"), panel_dirs["treasury_yields"], "date")
+    ensure_panel()
+    second = read_manifest()
+    assert second["inputs"] != first["inputs"]
+    assert second["rows"] > first["rows"]
+
+
+def test_load_panel_projection_and_trading_days(panel_dirs):
+    """Only requested columns are loaded, optionally on trading days only."""
+    panel = load_panel(columns=["log_mcap", "3M-1Y"], trading_days_only=True)
+
+    assert list(panel.columns) == ["log_mcap", "3M-1Y"]
+    assert panel.index.name == "date"
+    assert (panel.index.dayofweek < 5).all()
+    assert len(panel) == len(make_yields())
+
+
+def test_polars_backend_matches_pandas():
+    """The lazy Polars build gives the same panel, including its edge cases."""
+    pytest.importorskip("polars")
+    caps = make_caps("2023-12-30", "2024-02-10")
+    # An intraday snapshot that supersedes its day, a missing day and a zero cap
+    late = caps.iloc[[5]].assign(circulating_supply_usd=7)
+    late["timestamp"] += pd.Timedelta(hours=12)
+    caps = pd.concat([caps, late])
+    caps = caps[caps["timestamp"] != "2024-01-10"]
+    caps.loc[caps["timestamp"] == "2024-01-12", "circulating_supply_usd"] = 0
+    yields = make_yields("2024-01-02", "2024-02-08")
+    # A gap longer than the forward-fill limit and a row with no observations
+    yields.loc["2024-01-15":"2024-01-24", ["DGS10", "DGS2"]] = np.nan
+    yields.loc["2024-01-26"] = np.nan
+    yields["10Y-2Y"] = 99.0  # stored spreads are recomputed
+
+    expected = build_panel(caps.sample(frac=1, random_state=0), yields)
+    result = build_panel(caps.sample(frac=1, random_state=0), yields, backend="polars")
+    pd.testing.assert_frame_equal(result, expected, check_exact=False, rtol=1e-12)
+    assert expected.loc["2024-01-04", "circulating_supply_usd"] == 7
+    assert expected["circulating_supply"].isna().sum() == 1
+
+    with pytest.raises(ValueError):
+        build_panel(caps, yields, backend="spark")
+
+
+def test_load_token_caps_chunked_matches_whole(tmp_path):
+    """Streaming the token panel in small chunks gives the same wide frame."""
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2024-01-01", periods=40, freq="D")
+    long = pd.DataFrame(
+        [(d + pd.Timedelta(hours=h), s, c, rng.uniform(1e6, 1e9))
+         for d in dates for h in (0, 6) for s in ("USDC", "USDT") for c in ("A", "B")],
+        columns=["date", "symbol", "chain", "circulating"],
+    )
+    long = long[~((long["symbol"] == "USDT") & (long["date"] < "2024-01-10"))]
+    path = tmp_path / "stablecoin_panel.parq"
+    long.to_parquet(path, row_group_size=50)
+
+    whole = load_token_caps(path=path)
+    chunked = load_token_caps(path=path, batch_rows=7)
+    pd.testing.assert_frame_equal(chunked, whole, check_freq=False, rtol=1e-12)
+    assert chunked["USDT"].first_valid_index() == pd.Timestamp("2024-01-10")
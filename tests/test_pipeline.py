@@ -0,0 +1,165 @@
+"""Unit tests for the DAG pipeline runner in pipeline.py."""
+
+import json
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from scripts.pipeline import (
+    TASKS,
+    Task,
+    code_files,
+    dependencies,
+    metrics_file,
+    run_pipeline,
+    select_tasks,
+    task_key,
+)
+from scripts.utils.instrument import read_records
+from scripts.utils.io import SCHEMA_FILE, upsert_dataset
+
+MODULES = {
+    "steps/helper.py": "SUFFIX = '!'\n",
+    "steps/make.py": (
+        "import sys\n"
+        "from pathlib import Path\n"
+        "Path('out').mkdir(exist_ok=True)\n"
+        "Path('out/a.txt').write_text(sys.argv[1])\n"
+    ),
+    "steps/double.py": (
+        "from pathlib import Path\n"
+        "from steps.helper import SUFFIX\n"
+        "Path('out/b.txt').write_text(Path('out/a.txt').read_text() * 2 + SUFFIX)\n"
+    ),
+    "steps/count.py": (
+        "from pathlib import Path\n"
+        "print(len(Path('out/a.txt').read_text()))\n"
+    ),
+    "steps/fail.py": "raise SystemExit(1)\n",
+}
+
+
+@pytest.fixture
+def root(tmp_path):
+    for name, source in MODULES.items():
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text(source)
+    return tmp_path
+
+
+def make_tasks(value="ab"):
+    return [
+        Task("make", "steps.make", args=[value], outputs=[Path("out/a.txt")]),
+        Task("double", "steps.double", inputs=[Path("out/a.txt")], outputs=[Path("out/b.txt")]),
+        Task("count", "steps.count", inputs=[Path("out/a.txt")], stdout=Path("out/count.txt")),
+        Task("broken", "steps.fail", inputs=[Path("out/b.txt")], optional=True),
+    ]
+
+
+def test_default_dag():
+    """Every declared input has at most one writer and the stages are chained."""
+    deps = dependencies(TASKS)
+    assert deps["panel"] == {"fetch_caps", "fetch_yields"}
+    assert "panel" in deps["figures"] and "panel" in deps["report"]
+    assert "event_study" not in select_tasks(TASKS)
+    assert "fetch_caps" not in select_tasks(TASKS, start="panel")
+
+
+def test_dependencies_and_selection():
+    tasks = make_tasks()
+    assert dependencies(tasks) == {"make": set(), "double": {"make"}, "count": {"make"},
+                                   "broken": {"double"}}
+    assert select_tasks(tasks) == ["make", "double", "count"]
+    assert select_tasks(tasks, start="double") == ["double"]
+    assert select_tasks(tasks, start="make") == ["make", "double", "count"]
+    assert select_tasks(tasks, only=["count", "broken"]) == ["count", "broken"]
+    with pytest.raises(ValueError):
+        select_tasks(tasks, only=["missing"])
+    with pytest.raises(ValueError):
+        dependencies(tasks + [Task("again", "steps.make", outputs=[Path("out/a.txt")])])
+
+
+def test_code_files_follow_local_imports(root):
+    assert [p.name for p in code_files("steps.double", root)] == ["double.py", "helper.py"]
+
+
+def test_memoisation(root):
+    """Only tasks whose code, arguments or inputs changed are re-run."""
+    statuses = run_pipeline(make_tasks(), root=root, jobs=2)
+    assert statuses == {"make": "ran", "double": "ran", "count": "ran"}
+    assert (root / "out/b.txt").read_text() == "abab!"
+    assert (root / "out/count.txt").read_text().strip() == "2"
+
+    assert set(run_pipeline(make_tasks(), root=root).values()) == {"cached"}
+
+    (root / "steps/helper.py").write_text("SUFFIX = '?'\n")
+    statuses = run_pipeline(make_tasks(), root=root)
+    assert statuses == {"make": "cached", "double": "ran", "count": "cached"}
+
+    assert run_pipeline(make_tasks("xyz"), root=root, dry_run=True) == {
+        "make": "stale", "double": "stale", "count": "stale"
+    }
+    statuses = run_pipeline(make_tasks("xyz"), root=root)
+    assert set(statuses.values()) == {"ran"}
+    assert (root / "out/b.txt").read_text() == "xyzxyz?"
+
+    (root / "out/b.txt").unlink()
+    assert run_pipeline(make_tasks("xyz"), root=root)["double"] == "ran"
+
+
+def test_noop_upsert_keeps_key(root):
+    """Re-upserting the same rows only touches the schema stamp, which the key ignores."""
+    dataset = root / "data/caps"
+    rows = pd.DataFrame({"date": pd.date_range("2024-01-01", periods=3), "mcap": [1.0, 2.0, 3.0]})
+    upsert_dataset(rows, dataset, "date")
+    schema_file = dataset / SCHEMA_FILE
+    schema = json.loads(schema_file.read_text())
+    schema_file.write_text(json.dumps({**schema, "updated_at": "2000-01-01T00:00:00"}))
+    task = Task("double", "steps.double", inputs=[Path("data/caps")])
+    key = task_key(task, root)
+
+    upsert_dataset(rows, dataset, "date")
+    assert json.loads(schema_file.read_text())["updated_at"] != "2000-01-01T00:00:00"
+    assert task_key(task, root) == key
+
+    upsert_dataset(rows.assign(mcap=[1.0, 2.0, 4.0]), dataset, "date")
+    assert task_key(task, root) != key
+
+
+def test_volatile_tasks_always_run(root):
+    """A volatile task runs every time; unchanged output keeps downstream cached."""
+    tasks = make_tasks()
+    tasks[0] = tasks[0]._replace(volatile=True)
+    run_pipeline(tasks, root=root)
+    statuses = run_pipeline(tasks, root=root)
+    assert statuses == {"make": "ran", "double": "cached", "count": "cached"}
+    assert run_pipeline(tasks, root=root, dry_run=True)["make"] == "stale"
+    assert all(task.volatile for task in TASKS if task.name.startswith("fetch_"))
+
+
+def test_failure_skips_downstream(root):
+    tasks = make_tasks() + [
+        Task("after", "steps.count", inputs=[Path("out/c.txt")]),
+    ]
+    tasks[3] = tasks[3]._replace(outputs=[Path("out/c.txt")])
+    statuses = run_pipeline(tasks, start="make", root=root)
+    assert statuses["make"] == "ran"
+    assert "broken" not in statuses
+
+    statuses = run_pipeline(tasks, only=["broken", "after"], root=root)
+    assert statuses == {"broken": "failed", "after": "skipped"}
+    assert (root / "data/cache/pipeline_logs/broken.log").exists()
+
+
+def test_tasks_record_metrics(root, monkeypatch):
+    """Each task runs as a stage tagged with its name and the run ID."""
+    monkeypatch.delenv("METRICS_FILE", raising=False)
+    prom = root / "stages.prom"
+    run_pipeline(make_tasks(), only=["make", "broken"], root=root, prometheus=prom)
+
+    records = read_records(metrics_file(root), "latest")
+    assert {(r["task"], r["stage"], r["status"]) for r in records} == {
+        ("make", "task.make", "ok"), ("broken", "task.broken", "error")
+    }
+    assert all(r["wall_s"] > 0 and r["peak_rss"] > 0 for r in records)
+    assert 'reserve_shock_stage_errors{task="broken",stage="task.broken"} 1' in prom.read_text()
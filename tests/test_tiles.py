@@ -0,0 +1,106 @@
+"""Unit tests for tiles.py."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from scripts.tiles import (
+    TileStore,
+    build_tiles,
+    column,
+    minmax_downsample,
+    tile_series,
+    write_tiles,
+)
+
+
+def make_daily(days=1000, seed=0):
+    """Daily series starting on a Monday, with a gap in one of them."""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2018-01-01", periods=days, freq="D", name="date")
+    daily = pd.DataFrame(
+        {"a": np.cumsum(rng.normal(size=days)), "b": np.arange(days, dtype="float64")},
+        index=index,
+    )
+    daily.iloc[100:130, 0] = np.nan
+    return daily
+
+
+@pytest.fixture
+def store(tmp_path):
+    write_tiles(build_tiles(make_daily()), tmp_path)
+    return TileStore.load(tmp_path)
+
+
+def test_tile_series():
+    index = pd.date_range("2024-01-01", periods=60, freq="D", name="date")
+    rng = np.random.default_rng(1)
+    panel = pd.DataFrame(
+        {"circulating_supply_usd": np.linspace(1e11, 2e11, 60),
+         "log_mcap": np.log(np.linspace(1e11, 2e11, 60)) + rng.normal(0, 0.01, 60),
+         "DGS10": rng.normal(4, 0.1, 60), "10Y-2Y": rng.normal(0, 0.1, 60),
+         "trading_day": index.dayofweek < 5},
+        index=index,
+    )
+    tokens = pd.DataFrame({"USDT": np.ones(30)}, index=index[::2])
+    daily = tile_series(panel, tokens, windows=(5,))
+    assert list(daily.columns) == ["mcap", "log_mcap", "DGS10", "10Y-2Y", "token:USDT",
+                                   "corr5:DGS10", "corr5:10Y-2Y"]
+    assert daily["token:USDT"].isna().sum() == 30
+    # Correlations are over trading days, so missing on weekends
+    assert daily.loc[~panel["trading_day"], "corr5:DGS10"].isna().all()
+    trading = panel[panel["trading_day"]]
+    expected = trading["log_mcap"].rolling(5).corr(trading["DGS10"])
+    assert np.allclose(daily["corr5:DGS10"].dropna(), expected.dropna())
+
+
+def test_rollups():
+    tiles = build_tiles(make_daily())
+    weekly, monthly = tiles["weekly"], tiles["monthly"]
+    # Weeks end on Sunday; the first is 2018-01-01 to 2018-01-07
+    assert weekly.index[0] == pd.Timestamp("2018-01-07")
+    assert weekly.loc["2018-01-07", column("b", "last")] == 6
+    assert weekly.loc["2018-01-07", column("b", "min")] == 0
+    assert monthly.loc["2018-02-28", column("b", "max")] == 58
+    assert (monthly[column("a", "min")] <= monthly[column("a", "last")]).all()
+    assert len(tiles["daily"]) == 1000
+
+
+def test_query_picks_the_finest_resolution_that_fits(store):
+    full = store.query("b", max_points=2000)
+    assert (full.resolution, len(full.dates)) == ("daily", 1000)
+    assert store.query("b", max_points=500).resolution == "weekly"
+    assert store.query("b", max_points=40).resolution == "monthly"
+
+    # A range covers the buckets holding its first and last day
+    window = store.query("b", "2018-01-03", "2018-01-10", "weekly")
+    assert window.dates.tolist() == [
+        pd.Timestamp("2018-01-07").value, pd.Timestamp("2018-01-14").value
+    ]
+    assert window.low.tolist() == [0, 7] and window.values.tolist() == [6, 13]
+
+    window = store.query("b", "2018-03-01", "2018-03-10")
+    assert window.resolution == "daily" and window.values.tolist() == list(range(59, 69))
+    with pytest.raises(ValueError):
+        window.values[0] = 1
+    with pytest.raises(KeyError):
+        store.query("missing")
+
+
+def test_query_never_exceeds_the_point_budget(store):
+    window = store.query("a", max_points=10)
+    assert window.resolution == "monthly" and len(window.dates) == 10
+    monthly = store.query("a", resolution="monthly")
+    assert np.nanmin(window.low) == np.nanmin(monthly.low)
+    assert np.nanmax(window.high) == np.nanmax(monthly.high)
+    assert store.query("a", max_points=10) is window  # served from the cache
+
+
+def test_minmax_downsample():
+    values = np.array([1.0, 5.0, 2.0, np.nan, 3.0, 0.0, 4.0])
+    dates = np.arange(7)
+    out = minmax_downsample(dates, values, values, values, 3)
+    assert out[0].tolist() == [1, 3, 6]
+    assert out[1].tolist() == [5.0, 2.0, 4.0]  # last non-missing value per bucket
+    assert out[2].tolist() == [1.0, 2.0, 0.0]
+    assert out[3].tolist() == [5.0, 2.0, 4.0]
+    assert minmax_downsample(dates, values, values, values, 10)[0] is dates
@@ -0,0 +1,146 @@
+"""Unit tests for the async FRED fetcher in fred_api.py."""
+
+import asyncio
+import json
+import os
+
+import httpx
+import pandas as pd
+import pytest
+
+os.environ.setdefault("FRED_API_KEY", "test-key")
+
+from scripts.utils.fred_api import (  # noqa: E402
+    AsyncRateLimiter,
+    fetch_series_async,
+    fetch_treasury_yields_async,
+)
+from tenacity import wait_none  # noqa: E402
+
+
+def observations(values):
+    """Build a FRED observations payload from (date, value) pairs."""
+    return {"observations": [{"date": d, "value": v} for d, v in values]}
+
+
+PAYLOADS = {
+    "DGS3MO": observations([("2024-01-02", "5.46"), ("2024-01-03", "5.48")]),
+    "DGS2": observations([("2024-01-02", "4.33"), ("2024-01-03", ".")]),
+    "DGS10": observations([("2024-01-02", "3.95"), ("2024-01-03", "3.91")]),
+}
+
+
+@pytest.fixture(autouse=True)
+def no_retry_wait(monkeypatch):
+    """Skip the exponential backoff between retries."""
+    monkeypatch.setattr(fetch_series_async.retry, "wait", wait_none())
+
+
+def make_client(handler):
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.mark.asyncio
+async def test_fetch_treasury_yields_async_merges_series_and_spreads():
+    """All series are fetched over one client and merged with spreads."""
+    seen = []
+
+    def handler(request):
+        series_id = request.url.params["series_id"]
+        seen.append(series_id)
+        return httpx.Response(200, json=PAYLOADS[series_id])
+
+    async with make_client(handler) as client:
+        df = await fetch_treasury_yields_async(
+            "2024-01-01",
+            "2024-01-05",
+            series_ids=list(PAYLOADS),
+            requests_per_second=None,
+            client=client,
+        )
+
+    assert sorted(seen) == sorted(PAYLOADS)
+    assert list(df.index) == list(pd.to_datetime(["2024-01-02", "2024-01-03"]))
+    assert df.loc["2024-01-02", "10Y-2Y"] == pytest.approx(-0.38)
+    assert df.loc["2024-01-02", "10Y-3M"] == pytest.approx(-1.51)
+    assert pd.isna(df.loc["2024-01-03", "DGS2"])
+
+
+@pytest.mark.asyncio
+async def test_fetch_treasury_yields_async_respects_concurrency_limit():
+    """No more than max_concurrency requests are in flight at once."""
+    in_flight = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200, json=observations([("2024-01-02", "1.0")]))
+
+    series_ids = [f"S{i}" for i in range(10)]
+    async with make_client(handler) as client:
+        df = await fetch_treasury_yields_async(
+            "2024-01-01",
+            "2024-01-05",
+            series_ids=series_ids,
+            max_concurrency=3,
+            requests_per_second=None,
+            client=client,
+        )
+
+    assert peak == 3
+    assert list(df.columns) == series_ids
+
+
+@pytest.mark.asyncio
+async def test_fetch_series_async_retries_transient_errors():
+    """A series is retried independently after a server error."""
+    calls = {"n": 0}
+
+    def handler(request):
+        calls["n"] += 1
+        if calls["n"] == 1:
+            return httpx.Response(503)
+        return httpx.Response(200, json=PAYLOADS["DGS10"])
+
+    async with make_client(handler) as client:
+        df = await fetch_series_async(client, "DGS10", "2024-01-01", "2024-01-05")
+
+    assert calls["n"] == 2
+    assert list(df.columns) == ["date", "DGS10"]
+
+
+@pytest.mark.asyncio
+async def test_fetch_treasury_yields_async_skips_failed_series():
+    """Series that keep failing are skipped, the rest are returned."""
+
+    def handler(request):
+        series_id = request.url.params["series_id"]
+        if series_id == "DGS2":
+            return httpx.Response(500, content=json.dumps({"error": "boom"}))
+        return httpx.Response(200, json=PAYLOADS[series_id])
+
+    async with make_client(handler) as client:
+        df = await fetch_treasury_yields_async(
+            "2024-01-01",
+            "2024-01-05",
+            series_ids=list(PAYLOADS),
+            requests_per_second=None,
+            client=client,
+        )
+
+    assert "DGS2" not in df.columns
+    assert "10Y-3M" in df.columns
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_spaces_requests():
+    """Requests are started no faster than the configured rate."""
+    limiter = AsyncRateLimiter(rate=50.0)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    await asyncio.gather(*(limiter.wait() for _ in range(5)))
+    assert loop.time() - start >= 4 / 50.0 * 0.9
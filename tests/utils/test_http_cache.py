@@ -0,0 +1,157 @@
+"""Unit tests for http_cache.py."""
+
+import httpx
+import pytest
+from scripts.utils.http_cache import (
+    AsyncCachingTransport,
+    CachingTransport,
+    HTTPCache,
+    OfflineCacheMiss,
+    cache_key,
+)
+
+URL = "https://stablecoins.llama.fi/stablecoincharts/all"
+BODY = b'[{"date": "1704067200"}]' * 100
+
+
+class Upstream:
+    """Mock origin server supporting ETag revalidation."""
+
+    def __init__(self, etag='"v1"'):
+        self.etag = etag
+        self.requests = []
+
+    def __call__(self, request):
+        self.requests.append(request)
+        if request.headers.get("If-None-Match") == self.etag:
+            return httpx.Response(304)
+        return httpx.Response(200, headers={"ETag": self.etag, "Content-Type": "application/json"}, content=BODY)
+
+
+def make_client(cache, upstream):
+    return httpx.Client(transport=CachingTransport(cache, httpx.MockTransport(upstream)))
+
+
+def test_cache_key_ignores_param_order_and_secrets():
+    """Parameter order and api_key do not change the key."""
+    a = cache_key("GET", "https://x/obs?series_id=DGS10&api_key=a&file_type=json")
+    b = cache_key("GET", "https://x/obs?file_type=json&series_id=DGS10&api_key=b")
+    c = cache_key("GET", "https://x/obs?file_type=json&series_id=DGS2")
+    assert a == b != c
+
+
+def test_fresh_entries_are_served_from_disk(tmp_path):
+    """A second request within the TTL does not reach the network."""
+    upstream = Upstream()
+    cache = HTTPCache(tmp_path, offline=False)
+    with make_client(cache, upstream) as client:
+        first = client.get(URL)
+        second = client.get(URL)
+    assert len(upstream.requests) == 1
+    assert first.content == second.content == BODY
+    assert second.headers["x-cache"] == "HIT"
+    assert cache.total_bytes() < len(BODY)
+
+
+def test_stale_entries_are_revalidated(tmp_path):
+    """Stale entries send the ETag and reuse the body on 304."""
+    upstream = Upstream()
+    cache = HTTPCache(tmp_path, ttls={"defillama": 0}, offline=False)
+    with make_client(cache, upstream) as client:
+        client.get(URL)
+        response = client.get(URL)
+    assert upstream.requests[1].headers["If-None-Match"] == '"v1"'
+    assert response.status_code == 200
+    assert response.content == BODY
+
+    upstream.etag = '"v2"'
+    with make_client(cache, upstream) as client:
+        client.get(URL)
+    assert len(upstream.requests) == 3
+    assert cache.lookup(upstream.requests[-1]).headers["etag"] == '"v2"'
+
+
+def test_offline_mode_serves_only_cached(tmp_path):
+    """Offline mode serves stale entries and fails on misses."""
+    upstream = Upstream()
+    with make_client(HTTPCache(tmp_path, offline=False), upstream) as client:
+        client.get(URL)
+
+    offline = HTTPCache(tmp_path, ttls={"defillama": 0}, offline=True)
+    with make_client(offline, upstream) as client:
+        assert client.get(URL).content == BODY
+        with pytest.raises(OfflineCacheMiss):
+            client.get(URL + "?other=1")
+    assert len(upstream.requests) == 1
+
+
+def test_lru_eviction(tmp_path):
+    """The least recently used entry is evicted once over the size cap."""
+    upstream = Upstream()
+    cache = HTTPCache(tmp_path, offline=False)
+    with make_client(cache, upstream) as client:
+        client.get(URL + "?a=1")
+        one_entry = cache.total_bytes()
+        cache.max_bytes = 2 * one_entry
+        client.get(URL + "?b=1")
+        client.get(URL + "?a=1")  # touch a, so b is now least recently used
+        client.get(URL + "?c=1")
+    assert cache.total_bytes() <= 2 * one_entry
+    keys = {r.url.params.get("a") or r.url.params.get("b") or r.url.params.get("c") for r in upstream.requests}
+    assert keys == {"1"}
+    assert cache.lookup(httpx.Request("GET", URL + "?a=1")) is not None
+    assert cache.lookup(httpx.Request("GET", URL + "?b=1")) is None
+
+
+@pytest.mark.asyncio
+async def test_async_transport(tmp_path):
+    """The async transport shares the same cache behaviour."""
+    upstream = Upstream()
+    cache = HTTPCache(tmp_path, offline=False)
+    transport = AsyncCachingTransport(cache, httpx.MockTransport(upstream))
+    async with httpx.AsyncClient(transport=transport) as client:
+        await client.get(URL)
+        response = await client.get(URL)
+    assert len(upstream.requests) == 1
+    assert response.content == BODY
+
+
+def test_non_get_requests_bypass_cache(tmp_path):
+    """POST requests are never cached."""
+    upstream = Upstream()
+    with make_client(HTTPCache(tmp_path, offline=False), upstream) as client:
+        client.post(URL, json={})
+        client.post(URL, json={})
+    assert len(upstream.requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_streamed_responses_are_not_buffered(tmp_path):
+    """A miss is passed through chunk by chunk; only complete bodies are cached."""
+    sent = []
+
+    async def body():
+        for i in range(4):
+            sent.append(i)
+            yield BODY
+
+    def upstream(request):
+        return httpx.Response(200, headers={"ETag": '"v1"'}, content=body())
+
+    cache = HTTPCache(tmp_path, offline=False)
+    transport = AsyncCachingTransport(cache, httpx.MockTransport(upstream))
+    async with httpx.AsyncClient(transport=transport) as client:
+        async with client.stream("GET", URL) as response:
+            assert response.headers["x-cache"] == "MISS"
+            chunks = response.aiter_bytes()
+            await chunks.__anext__()
+            assert len(sent) < 4
+        assert cache.lookup(httpx.Request("GET", URL)) is None
+
+        async with client.stream("GET", URL) as response:
+            received = b"".join([chunk async for chunk in response.aiter_bytes()])
+        assert received == BODY * 4
+        async with client.stream("GET", URL) as response:
+            assert response.headers["x-cache"] == "HIT"
+            assert b"".join([chunk async for chunk in response.aiter_bytes()]) == BODY * 4
+    assert not list(tmp_path.rglob("*.tmp"))
@@ -0,0 +1,60 @@
+"""Unit tests for incremental.py."""
+
+import pandas as pd
+import pytest
+from scripts.utils.incremental import incremental_start, read_watermark, upsert
+
+
+@pytest.fixture
+def caps_file(tmp_path):
+    """Stored stablecoin caps up to 2024-01-10."""
+    df = pd.DataFrame(
+        {
+            "timestamp": pd.date_range("2024-01-01", "2024-01-10"),
+            "circulating_supply_usd": range(10),
+        }
+    )
+    path = tmp_path / "stablecoin_caps.parq"
+    df.to_parquet(path, index=False)
+    return path
+
+
+def test_read_watermark(caps_file, tmp_path):
+    """The watermark is the latest stored date, None without a file."""
+    assert read_watermark(caps_file, "timestamp") == pd.Timestamp("2024-01-10")
+    assert read_watermark(tmp_path / "missing.parq", "timestamp") is None
+
+
+def test_read_watermark_from_index(tmp_path):
+    """A date index stored by pandas can be used as the date column."""
+    df = pd.DataFrame(
+        {"DGS10": [3.9, 4.0]},
+        index=pd.DatetimeIndex(["2024-01-02", "2024-01-03"], name="date"),
+    )
+    path = tmp_path / "treasury_yields.parq"
+    df.to_parquet(path)
+    assert read_watermark(path, "date") == pd.Timestamp("2024-01-03")
+
+
+def test_incremental_start(caps_file, tmp_path):
+    """The window starts at the watermark minus the overlap."""
+    assert incremental_start(caps_file, "timestamp", "2018-01-01", overlap_days=3) == "2024-01-07"
+    assert incremental_start(caps_file, "timestamp", "2024-01-09", overlap_days=3) == "2024-01-09"
+    assert incremental_start(tmp_path / "missing.parq", "timestamp", "2018-01-01") == "2018-01-01"
+
+
+def test_upsert_on_column():
+    """New rows replace revised ones and extend the history."""
+    existing = pd.DataFrame({"timestamp": pd.date_range("2024-01-01", periods=3), "v": [1, 2, 3]})
+    new = pd.DataFrame({"timestamp": pd.date_range("2024-01-03", periods=2), "v": [30, 40]})
+    result = upsert(existing, new, "timestamp")
+    assert result["v"].tolist() == [1, 2, 30, 40]
+    assert result["timestamp"].is_monotonic_increasing
+
+
+def test_upsert_on_index():
+    """Without a key the index is used."""
+    existing = pd.DataFrame({"v": [1.0, 2.0]}, index=pd.date_range("2024-01-01", periods=2))
+    new = pd.DataFrame({"v": [20.0, 3.0]}, index=pd.date_range("2024-01-02", periods=2))
+    result = upsert(existing, new)
+    assert result["v"].tolist() == [1.0, 20.0, 3.0]
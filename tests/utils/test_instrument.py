@@ -0,0 +1,130 @@
+"""Unit tests for instrument.py."""
+
+import asyncio
+import json
+import pstats
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+from scripts.stats.granger import granger_table
+from scripts.utils.instrument import (
+    count_rows,
+    instrumented,
+    prometheus_text,
+    read_records,
+    stage,
+    summarise,
+    write_prometheus,
+)
+
+
+@pytest.fixture
+def metrics(tmp_path, monkeypatch):
+    path = tmp_path / "metrics.jsonl"
+    monkeypatch.setenv("METRICS_FILE", str(path))
+    monkeypatch.delenv("PROFILE_STAGES", raising=False)
+    monkeypatch.setenv("PIPELINE_TASK", "test")
+    return path
+
+
+@instrumented
+def double(df):
+    return pd.concat([df, df])
+
+
+@instrumented(name="custom.fetch")
+async def fetch(values):
+    await asyncio.sleep(0)
+    return values[:1]
+
+
+def test_count_rows():
+    assert count_rows(pd.DataFrame({"a": range(3)})) == 3
+    assert count_rows(np.zeros((4, 2))) == 4
+    assert count_rows([1, 2]) == 2
+    assert count_rows(b"abc") is None
+    assert count_rows({"a": 1}) is None
+    assert count_rows(3.0) is None
+
+
+def test_stage_records_nested_stages(metrics):
+    with stage("outer", rows_in=5) as record:
+        with stage("inner"):
+            sum(range(1000))
+        record["rows_out"] = 2
+    with pytest.raises(KeyError):
+        with stage("broken"):
+            raise KeyError("x")
+
+    inner, outer, broken = read_records(metrics)
+    assert (inner["stage"], inner["parent"], inner["task"]) == ("inner", "outer", "test")
+    assert outer["parent"] is None
+    assert (outer["rows_in"], outer["rows_out"], outer["status"]) == (5, 2, "ok")
+    assert outer["wall_s"] >= inner["wall_s"] > 0
+    assert outer["peak_rss"] > 0 and outer["rss_growth"] >= 0
+    assert (broken["status"], broken["error"]) == ("error", "KeyError")
+
+
+def test_instrumented_functions(metrics):
+    df = pd.DataFrame({"a": range(3)})
+    assert len(double(df)) == 6
+    assert asyncio.run(fetch([1, 2, 3])) == [1]
+    granger_table(pd.DataFrame(np.random.default_rng(0).normal(size=(50, 2)), columns=["x", "y"]),
+                  ["x"], ["y"], maxlag=2)
+
+    records = read_records(metrics)
+    names = [r["stage"] for r in records]
+    assert names == ["test_instrument.double", "custom.fetch", "stats.granger.granger_table"]
+    assert (records[0]["rows_in"], records[0]["rows_out"]) == (3, 6)
+    assert (records[1]["rows_in"], records[1]["rows_out"]) == (3, 1)
+    assert records[2]["rows_in"] == 50
+
+
+def test_profiling(metrics, tmp_path, monkeypatch):
+    monkeypatch.setenv("PROFILE_STAGES", "prof.*")
+    monkeypatch.setenv("PROFILE_MODE", "cpu,memory")
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path / "profiles"))
+    with stage("prof.outer"):
+        with stage("prof.inner"):
+            np.ones(100_000)
+
+    inner, outer = read_records(metrics)
+    assert "cpu_profile" not in inner
+    assert pstats.Stats(outer["cpu_profile"]).total_calls > 0
+    snapshot = tracemalloc.Snapshot.load(outer["memory_profile"])
+    assert snapshot.statistics("filename")
+    assert outer["traced_peak"] >= 800_000
+    assert not tracemalloc.is_tracing()
+
+
+def test_summary_and_prometheus(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    records = [
+        {"stage": "a", "task": "t", "run_id": "1", "wall_s": 1.0, "rows_out": 10,
+         "peak_rss": 100, "status": "ok"},
+        {"stage": "a", "task": "t", "run_id": "2", "wall_s": 2.0, "rows_out": 5,
+         "peak_rss": 300, "status": "error"},
+        {"stage": 'b"q', "task": None, "run_id": "2", "wall_s": 0.5, "status": "ok"},
+    ]
+    path.write_text("".join(json.dumps(r) + "\n" for r in records) + "{truncated\n")
+    assert read_records(path, "latest") == records[1:]
+    assert len(read_records(path)) == 3
+
+    summary = summarise(records)
+    assert [s["stage"] for s in summary] == ["a", 'b"q']
+    assert summary[0]["calls"] == 2 and summary[0]["errors"] == 1
+    assert summary[0]["wall_s"] == 3.0 and summary[0]["peak_rss"] == 300
+    assert summary[1]["rows_out"] is None
+
+    text = prometheus_text(records)
+    assert 'reserve_shock_stage_wall_seconds{task="t",stage="a"} 3\n' in text
+    assert 'reserve_shock_stage_peak_rss_bytes{task="t",stage="a"} 300\n' in text
+    assert 'stage="b\\"q"' in text
+    assert "# TYPE reserve_shock_stage_calls gauge" in text
+    assert "rows_out{task=\"\"" not in text
+
+    prom = write_prometheus(records, tmp_path / "out" / "stages.prom")
+    assert prom.read_text() == text
+    assert not list(prom.parent.glob("*.tmp"))
@@ -0,0 +1,120 @@
+"""Unit tests for the partitioned storage layer in io.py."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from scripts.utils.io import (
+    iter_batches,
+    migrate_legacy,
+    read_dataset,
+    read_schema,
+    upsert_dataset,
+    write_dataset,
+)
+
+
+@pytest.fixture
+def caps():
+    dates = pd.date_range("2024-01-01", "2024-04-30")
+    return pd.DataFrame(
+        {
+            "timestamp": dates,
+            "circulating_supply": np.arange(len(dates), dtype="int64"),
+            "circulating_supply_usd": np.arange(len(dates), dtype="int64") * 2,
+        }
+    )
+
+
+@pytest.fixture
+def yields():
+    dates = pd.DatetimeIndex(pd.date_range("2024-01-01", "2024-03-31"), name="date")
+    return pd.DataFrame({"DGS3MO": np.linspace(5, 4, len(dates)), "DGS10": 4.0}, index=dates)
+
+
+def test_roundtrip_with_partitions_and_schema(tmp_path, caps):
+    """Data is split by year/month and the schema is recorded."""
+    path = tmp_path / "stablecoin_caps"
+    partitions = write_dataset(caps, path, "timestamp", compression="lz4")
+
+    assert partitions == [(2024, 1), (2024, 2), (2024, 3), (2024, 4)]
+    assert (path / "year=2024" / "month=3").is_dir()
+    schema = read_schema(path)
+    assert schema["date_column"] == "timestamp"
+    assert schema["compression"] == "lz4"
+    assert schema["columns"]["circulating_supply"] == "int64"
+    pd.testing.assert_frame_equal(read_dataset(path), caps)
+
+
+def test_projection_and_date_pushdown(tmp_path, caps):
+    """Only requested columns and dates are returned."""
+    path = tmp_path / "stablecoin_caps"
+    write_dataset(caps, path, "timestamp")
+    df = read_dataset(path, columns=["circulating_supply_usd"], start="2024-02-10", end="2024-03-05")
+    assert list(df.columns) == ["timestamp", "circulating_supply_usd"]
+    assert df["timestamp"].min() == pd.Timestamp("2024-02-10")
+    assert df["timestamp"].max() == pd.Timestamp("2024-03-05")
+    assert len(df) == 25
+
+
+def test_iter_batches_streams_bounded_chunks(tmp_path, caps):
+    """Chunks are bounded, filtered, and reassemble the dataset read whole."""
+    import pyarrow.dataset as ds
+
+    path = tmp_path / "stablecoin_caps"
+    write_dataset(caps, path, "timestamp")
+    chunks = list(iter_batches(path, ["circulating_supply"], start="2024-01-20",
+                               filter=ds.field("circulating_supply") < 100, batch_rows=8))
+    assert max(map(len, chunks)) <= 8
+    assert list(chunks[0].columns) == ["timestamp", "circulating_supply"]
+    streamed = pd.concat(chunks, ignore_index=True).sort_values("timestamp", ignore_index=True)
+    expected = read_dataset(path, columns=["circulating_supply"], start="2024-01-20")
+    expected = expected[expected["circulating_supply"] < 100].reset_index(drop=True)
+    pd.testing.assert_frame_equal(streamed, expected)
+    with pytest.raises(FileNotFoundError):
+        next(iter_batches(tmp_path / "missing"))
+
+
+def test_date_index_is_restored(tmp_path, yields):
+    """A date index is stored as a column and restored on read."""
+    path = tmp_path / "treasury_yields"
+    write_dataset(yields, path, "date", descriptions={"DGS10": "10-Year Treasury Note"})
+    df = read_dataset(path, columns=["DGS10"], start="2024-03-01")
+    assert df.index.name == "date"
+    assert list(df.columns) == ["DGS10"]
+    assert len(df) == 31
+    assert read_schema(path)["descriptions"]["DGS10"] == "10-Year Treasury Note"
+
+
+def test_upsert_rewrites_only_touched_partitions(tmp_path, caps):
+    """Upserting late-March rows leaves January and February files alone."""
+    path = tmp_path / "stablecoin_caps"
+    write_dataset(caps[caps["timestamp"] < "2024-04-01"], path, "timestamp")
+    january = path / "year=2024" / "month=1" / "part-0.parquet"
+    mtime = january.stat().st_mtime_ns
+
+    new = caps[caps["timestamp"] >= "2024-03-28"].copy()
+    new["circulating_supply_usd"] += 1
+    touched = upsert_dataset(new, path, "timestamp")
+
+    assert touched == [(2024, 3), (2024, 4)]
+    assert january.stat().st_mtime_ns == mtime
+    df = read_dataset(path)
+    assert len(df) == len(caps)
+    assert df.set_index("timestamp").loc["2024-03-28", "circulating_supply_usd"] == new.iloc[0][
+        "circulating_supply_usd"
+    ]
+    assert df.set_index("timestamp").loc["2024-03-27", "circulating_supply_usd"] == 2 * 86
+
+
+def test_legacy_file_fallback_and_migration(tmp_path, yields):
+    """Single-file datasets are read transparently and can be migrated."""
+    path = tmp_path / "treasury_yields"
+    yields.to_parquet(tmp_path / "treasury_yields.parq", compression="gzip")
+
+    legacy = read_dataset(path, columns=["DGS3MO"], end="2024-01-10")
+    assert legacy.index.name == "date"
+    assert len(legacy) == 10
+
+    assert migrate_legacy(path, "date")
+    assert not migrate_legacy(path, "date")
+    pd.testing.assert_frame_equal(read_dataset(path), yields, check_freq=False)
@@ -0,0 +1,115 @@
+"""Unit tests for the cache-aware figure renderer in plotting.py."""
+
+import numpy as np
+import pandas as pd
+from scripts.utils.plotting import (
+    FigureSpec,
+    downsample_line,
+    downsample_scatter,
+    draw_hist,
+    draw_lines,
+    draw_scatter,
+    figure_key,
+    lttb,
+    read_cache,
+    render_all,
+)
+
+
+def line_spec(path, y, title="Line"):
+    x = pd.date_range("2024-01-01", periods=len(y)).values
+    return FigureSpec(path, draw_lines, {"series": [{"x": x, "y": y, "label": "y"}]},
+                      {"title": title, "legend": True})
+
+
+def test_lttb_keeps_endpoints_and_spikes():
+    """LTTB keeps the first and last points and isolated extremes."""
+    x = np.arange(10_000, dtype="float64")
+    y = np.sin(x / 500)
+    y[4321] = 50.0
+    keep = lttb(x, y, 200)
+
+    assert len(keep) == 200
+    assert keep[0] == 0 and keep[-1] == len(x) - 1
+    assert np.all(np.diff(keep) > 0)
+    assert 4321 in keep
+
+
+def test_downsampling_leaves_small_series_alone():
+    """Short series are returned unchanged; long ones are capped."""
+    y = np.array([1.0, np.nan, 3.0])
+    x_out, y_out = downsample_line(np.arange(3), y, max_points=10)
+    np.testing.assert_array_equal(y_out, y)
+
+    dates = pd.date_range("2020-01-01", periods=5000).values
+    values = np.random.default_rng(0).normal(size=5000)
+    values[10] = np.nan
+    x_out, y_out = downsample_line(dates, values, max_points=300)
+    assert len(x_out) == 300 and np.isfinite(y_out).all()
+    assert x_out.dtype == dates.dtype
+
+    x_out, y_out = downsample_scatter(np.arange(5000), np.arange(5000), max_points=100)
+    assert len(x_out) == 100
+    np.testing.assert_array_equal(x_out, y_out)
+
+
+def test_figure_key_tracks_data_and_style():
+    """The key changes with the data, the style and the draw function only."""
+    y = np.arange(50, dtype="float64")
+    base = figure_key(line_spec("a.png", y))
+
+    assert figure_key(line_spec("b.png", y.copy())) == base
+    assert figure_key(line_spec("a.png", y + 1)) != base
+    assert figure_key(line_spec("a.png", y, title="Other")) != base
+    assert figure_key(line_spec("a.png", y)._replace(draw=draw_scatter)) != base
+
+
+def test_figure_key_tracks_draw_code(tmp_path, monkeypatch):
+    """Editing a draw function, or a helper it calls, changes the key."""
+    import importlib
+    import sys
+
+    source = (
+        "def helper(ax):\n    ax.grid(True)\n\n"
+        "def draw(ax, data, style):\n    helper(ax)\n    ax.plot(data['y'])\n"
+    )
+    module = tmp_path / "custom_draw.py"
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    def key(text):
+        module.write_text(text)
+        sys.modules.pop("custom_draw", None)
+        draw = importlib.import_module("custom_draw").draw
+        return figure_key(FigureSpec("a.png", draw, {"y": [1, 2]}))
+
+    base = key(source)
+    assert key(source) == base
+    assert key(source.replace("ax.plot", "ax.step")) != base
+    assert key(source.replace("grid(True)", "grid(False)")) != base
+
+
+def test_render_all_skips_unchanged_figures(tmp_path):
+    """Only new, changed or deleted figures are rendered on the next run."""
+    cache = tmp_path / "figures.json"
+    rng = np.random.default_rng(1)
+    specs = [
+        line_spec(tmp_path / "line.png", rng.normal(size=100)),
+        FigureSpec(tmp_path / "scatter.png", draw_scatter,
+                   {"x": rng.normal(size=50), "y": rng.normal(size=50), "kw": {"alpha": 0.5}},
+                   {"figsize": (5, 4)}),
+        FigureSpec(tmp_path / "hist.png", draw_hist,
+                   {"hists": [{"values": rng.normal(size=200), "bins": 20, "label": "all"}]}),
+    ]
+
+    rendered = render_all(specs, workers=2, cache_file=cache)
+    assert sorted(p.name for p in rendered) == ["hist.png", "line.png", "scatter.png"]
+    assert all(p.stat().st_size > 0 for p in rendered)
+    assert set(read_cache(cache)) == {str(spec.path) for spec in specs}
+
+    assert render_all(specs, workers=1, cache_file=cache) == []
+
+    (tmp_path / "hist.png").unlink()
+    specs[0] = line_spec(tmp_path / "line.png", rng.normal(size=100))
+    rendered = render_all(specs, workers=1, cache_file=cache)
+    assert sorted(p.name for p in rendered) == ["hist.png", "line.png"]
+    assert len(render_all(specs, workers=1, cache_file=cache, force=True)) == 3